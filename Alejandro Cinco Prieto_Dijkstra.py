@@ -1,26 +1,34 @@
-# Importamos la librería osmnx y le ponemos el alias 'ox' que usaremos para descargar los mapas y datos de calles.
-# Importamos networkx con el alias 'nx' que usaremos para el manejo de grafos y el algoritmo de Dijkstra.
-# Importamos matplotlib.pyplot con el alias 'plt' que usaremos para mostrar el mapa en una ventana.
 # Importamos 'heapq' (cola de prioridad). Es la herramienta que usa Dijkstra para saber cuál es el siguiente nodo más cercano que debe visitar.
+# La librería osmnx (alias 'ox', para descargar los mapas y datos de calles), networkx (alias 'nx', para el manejo de grafos)
+# y matplotlib.pyplot (alias 'plt', para mostrar el mapa en una ventana) tardan cientos de milisegundos en importarse,
+# así que las importamos dentro de las funciones que las usan. Un script que solo quiere 'dijkstra_iterativo' o los pesos no las carga.
 
-import osmnx as ox
-import networkx as nx
-import matplotlib.pyplot as plt
 import heapq
+# Importamos los observadores de 'instrumentacion.py', con ellos decidimos si la búsqueda imprime su paso a paso o solo cuenta métricas
+from instrumentacion import ObservadorContadores
+# Importamos las estrategias de búsqueda rápidas (A*, bidireccional) que trabajan sobre el grafo compilado
+from estrategias_busqueda import buscar_ruta
+# Importamos la instantánea en disco del grafo compilado, para no descargar ni recalcular el grafo en cada ejecución
+from instantanea_grafo import DIRECTORIO_INSTANTANEAS, obtener_instantanea
+# Importamos el cálculo vectorizado de velocidades y tiempos de viaje
+from ponderacion import compilar_grafo_ponderado, ponderar_grafo
+# Importamos el índice espacial para encontrar los nodos más cercanos a las coordenadas del usuario
+from indice_espacial import obtener_indice_espacial
+# Importamos el renderizador que dibuja la ruta sobre un mapa base guardado en caché
+from renderizado_mapa import RenderizadorMapa, anotar_mapa, geometrias_aristas, texto_resumen
 
 # Aquí hago una división ya que lo siguiente se usa para la interfaz gráfica
-# Importamos tkinter con el alias 'tk' que usaremos para crear ventanas e interfaces gráficas.
-# Desde tkinter, importamos 'messagebox' que usaremos para mostrar ventanas emergentes de error o información.
-# Desde tkinter, importamos "ttk" que usaremos para crear un "LabelFrame" con un estilo visual más moderno.
-
-import tkinter as tk
-from tkinter import messagebox
-from tkinter import ttk 
+# tkinter (alias 'tk', para crear ventanas e interfaces gráficas), su 'messagebox' (ventanas emergentes de error o información)
+# y "ttk" (para crear un "LabelFrame" con un estilo visual más moderno) se importan dentro de la clase de la ventana,
+# así los procesos sin pantalla (el servidor, la línea de comandos) no necesitan Tk
 
 # Ahora vamos a crear una clase que contendrá toda la lógica de nuestra ventana gráfica para ingresar las coordenadas
 class VentanaCoordenadas:
     # El método __init__ es el "constructor", se ejecuta automáticamente cuando creamos una nueva "VentanaCoordenadas" y la "ventana_raiz" es la ventana principal de Tkinter que le pasamos como argumento
     def __init__(self, ventana_raiz):
+        import tkinter as tk
+        from tkinter import ttk
+
         # Guardamos la ventana raíz en una variable de la clase para usarla después
         self.ventana = ventana_raiz
         self.ventana.title("Calculador de la Ruta más Óptima con Dijkstra") # Este es el título de nuestra ventana
@@ -116,6 +124,7 @@ class VentanaCoordenadas:
             
         except ValueError:
             # Si la conversión 'float()' falla,se ejecuta este bloque y mostramos un mensaje de error
+            from tkinter import messagebox
             messagebox.showerror("Error", "Introduce solo valores válidos de latitud y longitud (números decimales).")
 
     # Este método es llamado por el script principal para obtener las coordenadas ingresadas por el usuario
@@ -125,7 +134,15 @@ class VentanaCoordenadas:
         # Una vez que la ventana se cierra, devolvemos el diccionario en 'self.coordenadas' y listo, tenemos los datos para el análisis
         return self.coordenadas
     
-def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso):
+# 'observador' es opcional: si es 'None' la búsqueda es silenciosa y no hace ninguna llamada extra
+# Para ver el paso a paso en la consola se pasa 'ObservadorConsola()', para métricas 'ObservadorContadores()' (ver 'instrumentacion.py')
+def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso, observador=None):
+
+    # Guardamos en una variable si hay observador, así dentro del bucle solo revisamos un booleano
+    observando = observador is not None
+    if observando:
+        observador.inicio_busqueda(nodo_origen, nodo_destino, atributo_peso)
+        observador.cambio_fase('inicializacion')
 
     # Guardaremos la distancia más corta desde el origen a CADA nodo, al inicio, todas son Infinitas, excepto la del origen (que es 0)
     distancias = {nodo: float('inf') for nodo in grafo.nodes()}
@@ -141,12 +158,11 @@ def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso):
     # Un conjunto para guardar los nodos que ya hemos visitado y de los que ya procesamos todos sus vecinos
     nodos_visitados = set()
     
-    # Un contador para imprimir las iteraciones, que mientras más lejos estemos, más grande será
+    # Un contador de iteraciones, que mientras más lejos estemos, más grande será
     iteracion = 0
-    
-    print("\nITERACIONES DEL ALGORITMO DIJKSTRA\n")
-    print(f"Buscando ruta de {nodo_origen} a {nodo_destino}...")
-    print(f"Peso a minimizar: {atributo_peso}\n")
+
+    if observando:
+        observador.cambio_fase('busqueda')
 
     # Mientras haya nodos en nuestra cola de prioridad, hacemos lo siguiente
     while cola_prioridad:
@@ -154,15 +170,15 @@ def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso):
         # Sacamos el nodo con la distancia más pequeña de la cola y heapq.heappop() se encarga de esto automáticamente, por eso usamos 'heapq' arriba
         distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
         
-        # Aquí imprimimos información de la iteración actual en la consola
+        # Avisamos al observador de la iteración actual, le pasamos también el tamaño que tenía la cola antes de sacar el nodo
         iteracion += 1
-        print(f"--- Iteración {iteracion} ---")
-        print(f"Nodo actual (más cercano y no visitado): {nodo_actual}")
-        print(f"Distancia conocida para llegar a él: {distancia_actual:.2f} (segundos)")
+        if observando:
+            observador.nodo_extraido(iteracion, nodo_actual, distancia_actual, len(cola_prioridad) + 1)
         
         # Si ya hemos visitado este nodo, lo ignoramos y seguimos con el siguiente en la cola
         if nodo_actual in nodos_visitados:
-            print("Este nodo ya fue visitado")
+            if observando:
+                observador.nodo_repetido(nodo_actual)
             continue
             
         # Marcamos el nodo actual como visitado para no procesarlo de nuevo
@@ -171,10 +187,12 @@ def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso):
         # Si el nodo actual es nuestro destino señalamos que lo encontramos y salimos del bucle
         # Podemos detenernos porque Dijkstra garantiza que la primera vez que visitamos el nodo destino, es por el camino más corto 
         if nodo_actual == nodo_destino:
-            print(f"\nNodo destino {nodo_destino} encontrado, hemos terminado la búsqueda")
+            if observando:
+                observador.destino_encontrado(nodo_destino)
             break
             
-        print("  Revisando vecinos")
+        if observando:
+            observador.inicio_vecinos(nodo_actual)
         # 'grafo.neighbors(nodo_actual)' nos da todos los nodos conectados a él (sus vecinos)
         for vecino in grafo.neighbors(nodo_actual):
 
@@ -190,25 +208,26 @@ def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso):
             # Calculamos la nueva distancia que será la distancia para llegar a nuestro nodo actual + el peso de la calle para llegar al vecino
             nueva_distancia = distancia_actual + peso_arista
             
-            print(f"  +++++++ Vecino: {vecino} (Peso calle: {peso_arista:.2f} s)")
-            
             # Si esta nueva distancia es MEJOR (más corta) que la
             # que teníamos registrada para ese vecino...
             if nueva_distancia < distancias[vecino]:
                 # ¡Actualizamos!
-                print(f"       *Camino mejorado* --Anterior: {distancias[vecino]:.2f}, Nuevo: {nueva_distancia:.2f}--")
+                if observando:
+                    observador.arista_relajada(nodo_actual, vecino, peso_arista, distancias[vecino], nueva_distancia, True)
                 distancias[vecino] = nueva_distancia
                 predecesores[vecino] = nodo_actual
                 
                 # Y añadimos al vecino a nuestra cola de prioridad
                 # para que sea visitado en el futuro.
                 heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
-            else:
-                print(f"       --Camino no mejorado, la distancia actual es: {distancias[vecino]:.2f}--")
-        print("-" * 22) # Separador
+            elif observando:
+                observador.arista_relajada(nodo_actual, vecino, peso_arista, distancias[vecino], nueva_distancia, False)
+        if observando:
+            observador.fin_iteracion()
 
     # Al terminar el bucle, usamos el diccionario 'predecesores' para ir hacia atrás desde el destino hasta el origen, siendo el camino más corto
-    print("\nFinalizando y reconstruyendo el camino más corto")
+    if observando:
+        observador.cambio_fase('reconstruccion')
     camino = []
     nodo_camino_actual = nodo_destino
     
@@ -219,96 +238,120 @@ def dijkstra_iterativo(grafo, nodo_origen, nodo_destino, atributo_peso):
 
     # Si el último nodo en nuestro camino no es el origen, esto significa que no se encontró un camino válido
     if not camino or camino[-1] != nodo_origen:
-        print("ERROR: No se pudo reconstruir el camino. El destino es inalcanzable.")
+        if observando:
+            observador.fin_busqueda(None)
         return None
     
     # El camino está al revés (destino -> origen), así que lo invertimos para devolverlo en el orden correcto
     camino_invertido = camino[::-1]
-    print(f"Camino encontrado: {camino_invertido}")
+    if observando:
+        observador.fin_busqueda(camino_invertido)
     return camino_invertido
 
-# Metemos todo nuestro código de análisis en una función que acepta el diccionario "coordenadas" como argumento para traducir la GUI del código principal
-def ejecutar_analisis_ruta(coordenadas):
+# Lista de lugares que queremos descargar y modelar
+LISTA_DE_LUGARES = [
+    "Oaxaca de Juárez, Oaxaca, Mexico",
+    "Santa Cruz Xoxocotlán, Oaxaca, Mexico",
+    "San Raymundo Jalpan, Oaxaca, Mexico",
+    "San Antonio de la Cal, Oaxaca, Mexico",
+    "San Agustín de las Juntas, Oaxaca, Mexico"
+]
+# Con 'network_type="drive"' filtramos calles solo para autos
+TIPO_DE_RED = 'drive'
+
+# Constantes para el calculo de pesos (tiempo de viaje) de cada arista del grafo
+VELOCIDAD_POR_DEFECTO_KMH = 20.0
+FACTOR_CONVERSION_MS = 3.6
+# Velocidad por defecto (km/h) para cada tipo de calle ('highway') que no tenga 'maxspeed', por ejemplo {'primary': 50.0, 'residential': 20.0}
+# Los tipos que no aparezcan aquí usan 'VELOCIDAD_POR_DEFECTO_KMH'
+VELOCIDADES_POR_TIPO_KMH = {}
+
+# Esta función realiza el calculo de pesos (tiempo de viaje) para cada arista del grafo y los guarda en los atributos 'velocidad_kmh' y 'tiempo_viaje_segundos'
+def calcular_tiempos_de_viaje(grafo_proyectado_metros):
+    # Cada valor distinto de 'maxspeed' se interpreta una sola vez y los tiempos de todas las aristas se calculan juntos con NumPy (ver 'ponderacion.py')
+    ponderar_grafo(grafo_proyectado_metros, VELOCIDADES_POR_TIPO_KMH, VELOCIDAD_POR_DEFECTO_KMH)
+
+# Esta función descarga el grafo de OSM, lo proyecta a metros y le calcula los tiempos de viaje
+# Devuelve los dos grafos: el original en (Latitud, Longitud) y el proyectado en metros con los pesos
+# Con 'ponderar=False' nos saltamos el calculo de pesos, por ejemplo cuando los pesos se van a calcular directo en el grafo compilado
+def descargar_grafo(lista_de_lugares=LISTA_DE_LUGARES, tipo_de_red=TIPO_DE_RED, ponderar=True):
+    import osmnx as ox
+
     # Configuramos OSMnx para que muestre mensajes en la consola y use el caché para no descargar el mapa cada vez que corremos el script y tarde más
     ox.settings.log_console = True
     ox.settings.use_cache = True
-    
-    # Primero definimos la lista de lugares que queremos descargar y modelar
-    lista_de_lugares = [
-        "Oaxaca de Juárez, Oaxaca, Mexico",
-        "Santa Cruz Xoxocotlán, Oaxaca, Mexico",
-        "San Raymundo Jalpan, Oaxaca, Mexico",
-        "San Antonio de la Cal, Oaxaca, Mexico",
-        "San Agustín de las Juntas, Oaxaca, Mexico"
-    ]
-    
+
     print(f"Iniciando la descarga de {lista_de_lugares}")
 
-    try:
-        # Una vez definidos, usamos 'ox.graph_from_place' para descargar los mapas y datos de calles de OSM, con 'network_type="drive"' filtramos calles solo para autos
-        # El grafo que devuelve está en coordenadas de tipo Latitud, Longitud
-        grafo_original_latlon = ox.graph_from_place(lista_de_lugares, network_type='drive', simplify=True)
-        print("Descarga completada exitosamente")
-    except Exception as e:
-        # Si falla la descarga se muestra el error y terminamos la función
-        print(f"Error en la descarga del grafo: {e}")
-        return # Salimos de la función y se termina el análisis
+    # Usamos 'ox.graph_from_place' para descargar los mapas y datos de calles de OSM
+    # El grafo que devuelve está en coordenadas de tipo Latitud, Longitud
+    grafo_original_latlon = ox.graph_from_place(lista_de_lugares, network_type=tipo_de_red, simplify=True)
+    print("Descarga completada exitosamente")
 
     # Proyectamos el grafo y lo convertimos de Latitud, Longitud a un sistema de coordenadas en Metros para que la longitud de las calles esté en metros
     grafo_proyectado_metros = ox.project_graph(grafo_original_latlon)
     # Ahora vamos a realizar el calculo de pesos (tiempo de viaje) para cada arista del grafo
-    # Lo primero es definir nuestras constantes 
-    VELOCIDAD_POR_DEFECTO_KMH = 20.0
-    FACTOR_CONVERSION_MS = 3.6
-    
-    # Obtenemos una lista de todas las aristas o calles y sus datos
-    aristas_del_grafo = list(grafo_proyectado_metros.edges(keys=True, data=True))
-    
-    # Creamos diccionarios vacíos para guardar los nuevos atributos de velocidad y tiempo
-    diccionario_velocidades_kmh = {}
-    diccionario_tiempos_segundos = {}
+    if ponderar:
+        calcular_tiempos_de_viaje(grafo_proyectado_metros)
+    return grafo_original_latlon, grafo_proyectado_metros
 
-    # Iteramos sobre cada arista que obtuvimos y (nodo_u, nodo_v, clave_arista) es el ID único de la arista, luego usamos 'datos_arista' para obtener sus atributos
-    for nodo_u, nodo_v, clave_arista, datos_arista in aristas_del_grafo:
-        
-        id_arista = (nodo_u, nodo_v, clave_arista)
-        # Asumimos la velocidad por defecto al inicio de cada iteración
-        velocidad_calle_kmh = VELOCIDAD_POR_DEFECTO_KMH
-        
-        # Revisamos si la arista tiene el atributo 'maxspeed', que indica la velocidad máxima permitida en esa calle
-        if 'maxspeed' in datos_arista:
-            dato_velocidad_maxima = datos_arista['maxspeed']
-            # Hacemos un 'try except' porque este dato puede ser una lista ['40', '50'] o un string '60 km/h'
-            try:
-                if isinstance(dato_velocidad_maxima, list):
-                    # Si es una lista, la limpiamos y sacamos el promedio de los valores numéricos que contenga
-                    lista_valores_velocidad = [float(val.split()[0]) for val in dato_velocidad_maxima if val.split()[0].isdigit()]
-                    if lista_valores_velocidad:
-                        velocidad_calle_kmh = sum(lista_valores_velocidad) / len(lista_valores_velocidad)
-                elif isinstance(dato_velocidad_maxima, str):
-                    # Si es un string, extraemos solo el número al inicio del string
-                    partes_velocidad = dato_velocidad_maxima.split()
-                    if partes_velocidad[0].isdigit():
-                        velocidad_calle_kmh = float(partes_velocidad[0])
-            except Exception:
-                # Si algo falla, no hacemos nada y se queda la velocidad por defecto para esa calle
-                velocidad_calle_kmh = VELOCIDAD_POR_DEFECTO_KMH
-        
-        # Obtenemos la longitud en metros desde los datos de la arista
-        longitud_calle_metros = datos_arista['length']
-        # Convertimos la velocidad a metros/segundo para el cálculo del tiempo de viaje
-        velocidad_calle_ms = velocidad_calle_kmh / FACTOR_CONVERSION_MS
-        
-        # Calculamos el tiempo en segundos (Tiempo = Distancia / Velocidad) y si la velocidad es 0, asignamos un tiempo "infinito"
-        tiempo_viaje_segundos = longitud_calle_metros / velocidad_calle_ms if velocidad_calle_ms > 0 else float('inf')
-        
-        # Guardamos los nuevos valores en nuestros diccionarios y listos para asignarlos al grafo
-        diccionario_velocidades_kmh[id_arista] = velocidad_calle_kmh
-        diccionario_tiempos_segundos[id_arista] = tiempo_viaje_segundos
+# Devuelve el grafo compilado listo para buscar rutas, abierto desde la instantánea guardada en disco
+# La primera vez descarga y construye el grafo, las siguientes solo abre los arreglos de la instantánea, que tarda mucho menos de un segundo
+# Si ya tenemos el grafo proyectado de 'descargar_grafo' lo pasamos en 'grafo_proyectado_metros' y la instantánea se construye con él,
+# sin descargar ni proyectar la ciudad otra vez
+def cargar_grafo_enrutamiento(directorio_instantaneas=DIRECTORIO_INSTANTANEAS, grafo_proyectado_metros=None):
+    def construir_grafo():
+        grafo = grafo_proyectado_metros if grafo_proyectado_metros is not None else descargar_grafo(ponderar=False)[1]
+        # Los pesos se calculan directo en los arreglos del grafo compilado, aunque el grafo de NetworkX ya traiga los suyos
+        return compilar_grafo_ponderado(grafo, VELOCIDADES_POR_TIPO_KMH, VELOCIDAD_POR_DEFECTO_KMH)
 
-    # Ahora, asignamos todos los nuevos atributos al grafo de una sola vez usando 'nx.set_edge_attributes'
-    nx.set_edge_attributes(grafo_proyectado_metros, diccionario_velocidades_kmh, 'velocidad_kmh')
-    nx.set_edge_attributes(grafo_proyectado_metros, diccionario_tiempos_segundos, 'tiempo_viaje_segundos')
+    return obtener_instantanea(
+        LISTA_DE_LUGARES,
+        TIPO_DE_RED,
+        {'velocidad_por_defecto_kmh': VELOCIDAD_POR_DEFECTO_KMH, 'velocidades_por_tipo_kmh': VELOCIDADES_POR_TIPO_KMH},
+        construir_grafo,
+        directorio_instantaneas,
+    )
+
+# Versión rápida del análisis para cuando solo queremos la ruta (sin mapa ni ventana): usa la instantánea guardada en disco
+# Devuelve un diccionario con la ruta (IDs de OSM), la distancia en metros, el tiempo en segundos y los nodos visitados, o 'None' si no hay camino
+def calcular_ruta_rapida(coordenadas, estrategia='bidireccional_a_estrella', directorio_instantaneas=DIRECTORIO_INSTANTANEAS):
+    grafo_compilado = cargar_grafo_enrutamiento(directorio_instantaneas)
+    # Buscamos los nodos más cercanos con el índice espacial que se guarda junto con la instantánea
+    indice_espacial = obtener_indice_espacial(grafo_compilado)
+    nodo_origen = indice_espacial.nodo_mas_cercano(coordenadas['lat_origen'], coordenadas['lon_origen'])
+    nodo_destino = indice_espacial.nodo_mas_cercano(coordenadas['lat_destino'], coordenadas['lon_destino'])
+    resultado_busqueda = buscar_ruta(grafo_compilado, nodo_origen, nodo_destino, estrategia)
+    if resultado_busqueda.camino is None:
+        return None
+    distancia_total_metros, tiempo_total_segundos = grafo_compilado.resumen_ruta(resultado_busqueda.camino)
+    return {
+        'ruta': resultado_busqueda.camino,
+        'distancia_metros': distancia_total_metros,
+        'tiempo_segundos': tiempo_total_segundos,
+        'nodos_visitados': resultado_busqueda.nodos_visitados,
+    }
+
+# Metemos todo nuestro código de análisis en una función que acepta el diccionario "coordenadas" como argumento para traducir la GUI del código principal
+# 'observador' es opcional y se le pasa a 'dijkstra_iterativo', si no se da ninguno usamos 'ObservadorContadores' para mostrar las métricas de la búsqueda sin llenar la consola
+# Para ver el paso a paso completo se puede pasar 'ObservadorConsola()' de 'instrumentacion.py'
+# 'estrategia' elige el algoritmo: 'iterativo' es nuestro 'dijkstra_iterativo' y las demás ('dijkstra', 'a_estrella', 'bidireccional',
+# 'bidireccional_a_estrella') usan el grafo compilado de 'estrategias_busqueda.py', todas dan el mismo tiempo de viaje
+def ejecutar_analisis_ruta(coordenadas, observador=None, estrategia='iterativo'):
+    import networkx as nx
+    import matplotlib.pyplot as plt
+
+    try:
+        # El grafo de NetworkX solo lo necesita 'dijkstra_iterativo', las demás estrategias no lo descargan
+        grafo_proyectado_metros = descargar_grafo()[1] if estrategia == 'iterativo' else None
+        # Abrimos el grafo compilado desde la instantánea en disco; si todavía no existe se construye con el grafo que acabamos
+        # de descargar (si lo hay), así la ciudad se descarga y se proyecta una sola vez
+        # Con él pegamos los puntos a la red, buscamos con las estrategias rápidas y sumamos el resumen
+        grafo_compilado = cargar_grafo_enrutamiento(grafo_proyectado_metros=grafo_proyectado_metros)
+    except Exception as e:
+        # Si falla la descarga se muestra el error y terminamos la función
+        print(f"Error en la descarga del grafo: {e}")
+        return # Salimos de la función y se termina el análisis
 
     # Ahora inicializamos la ruta como 'None' antes de calcularla con los datos del usuario
     ruta_optima_nodos = None
@@ -319,22 +362,33 @@ def ejecutar_analisis_ruta(coordenadas):
         latitud_destino = coordenadas['lat_destino']
         longitud_destino = coordenadas['lon_destino']
         
-        # Definimos una función rápida para encontrar el nodo más cercano con las coordenadas dadas
-        def obtener_nodo_mas_cercano(grafo, lat, lon):
-            # Usamos el grafo 'grafo_original_latlon' porque está en (Lat, Lon), igual que nuestras coordenadas y 'ox.nearest_nodes' espera las coordenadas en orden Longitud, Latitud
-            return ox.nearest_nodes(grafo, X=lon, Y=lat)
-        # Buscamos el nodo de inicio más cercano 
-        nodo_origen = obtener_nodo_mas_cercano(grafo_original_latlon, latitud_origen, longitud_origen)
-        # Buscamos el nodo de fin más cercano 
-        nodo_destino = obtener_nodo_mas_cercano(grafo_original_latlon, latitud_destino, longitud_destino)
-
-        # Llamamos a nuestra función que imprime cada paso del proceso.
-        ruta_optima_nodos = dijkstra_iterativo(
-            grafo_proyectado_metros,
-            nodo_origen,
-            nodo_destino,
-            'tiempo_viaje_segundos' # Este es el atributo "weight", en este caso, el tiempo de viaje en segundos
-        )
+        # Buscamos los nodos de inicio y fin más cercanos con una sola llamada al índice espacial (se guarda junto con la instantánea)
+        indice_espacial = obtener_indice_espacial(grafo_compilado)
+        nodos_cercanos, _ = indice_espacial.nodos_mas_cercanos([latitud_origen, latitud_destino], [longitud_origen, longitud_destino])
+        nodo_origen, nodo_destino = nodos_cercanos.tolist()
+
+        if estrategia == 'iterativo':
+            # Si no nos pasaron un observador, usamos uno de contadores para mostrar un resumen de la búsqueda al final
+            if observador is None:
+                observador = ObservadorContadores()
+
+            # Llamamos a nuestra función de Dijkstra, el observador recibe cada paso del proceso.
+            ruta_optima_nodos = dijkstra_iterativo(
+                grafo_proyectado_metros,
+                nodo_origen,
+                nodo_destino,
+                'tiempo_viaje_segundos', # Este es el atributo "weight", en este caso, el tiempo de viaje en segundos
+                observador
+            )
+
+            # Si el observador lleva contadores, mostramos las métricas de la búsqueda
+            if isinstance(observador, ObservadorContadores):
+                print(f"Métricas de la búsqueda: {observador.como_diccionario()}")
+        else:
+            # Buscamos sobre el grafo compilado con la estrategia elegida
+            resultado_busqueda = buscar_ruta(grafo_compilado, nodo_origen, nodo_destino, estrategia)
+            ruta_optima_nodos = resultado_busqueda.camino
+            print(f"Estrategia '{estrategia}': {resultado_busqueda.nodos_visitados} nodos visitados")
         
         # Si nuestra función devolvió 'None', significa que no encontró un camino, así que lanzamos el error 'NetworkXNoPath' para que nuestro 'except' de abajo lo atrape
         if ruta_optima_nodos is None:
@@ -351,20 +405,9 @@ def ejecutar_analisis_ruta(coordenadas):
 
     # Verificamos si 'ruta_optima_nodos' se pudo calcular o no
     if ruta_optima_nodos:
-        # Inicializamos nuestros contadores para distancia y tiempo
-        distancia_total_metros = 0
-        tiempo_total_segundos = 0
-        
-        # Iteramos sobre los pares de nodos (calles) de la ruta
-        for nodo_u, nodo_v in zip(ruta_optima_nodos[:-1], ruta_optima_nodos[1:]):
-            # Obtenemos las aristas paralelas entre estos dos nodos
-            datos_multiples_aristas = grafo_proyectado_metros.get_edge_data(nodo_u, nodo_v)
-            # Elegimos la arista que Dijkstra eligió que se basa en el menor tiempo de viaje
-            arista_optima = min(datos_multiples_aristas.values(), key=lambda x: x['tiempo_viaje_segundos'])
-            
-            # Sumamos los valores de esa arista a nuestros contadores
-            distancia_total_metros += arista_optima['length']
-            tiempo_total_segundos += arista_optima['tiempo_viaje_segundos']
+        # Sumamos la distancia y el tiempo de cada calle de la ruta; el grafo compilado guarda, de las aristas paralelas entre dos nodos,
+        # la que eligió Dijkstra (la de menor tiempo de viaje)
+        distancia_total_metros, tiempo_total_segundos = grafo_compilado.resumen_ruta(ruta_optima_nodos)
 
         # Convertimos las unidades para que sean legibles en el resumen final
         distancia_total_km = distancia_total_metros / 1000
@@ -375,51 +418,16 @@ def ejecutar_analisis_ruta(coordenadas):
         print(f"Tiempo Estimado de Viaje: {tiempo_total_minutos:.2f} minutos")
         
         
-        # Creamos la figura y los ejes usando la función de OSMnx
-        figura, eje = ox.plot_graph_route(
-            grafo_proyectado_metros,
-            ruta_optima_nodos,
-            route_color='cyan',
-            route_linewidth=3,
-            route_alpha=0.8,
-            orig_dest_size=100,
-            ax=None,
-            node_size=0,
-            edge_linewidth=0.5,
-            edge_color='#999999',
-            bgcolor='k',               
-            figsize=(15, 15),
-            show=False,               
-            close=False               
-        )
+        # Creamos la figura y los ejes con el renderizador de 'renderizado_mapa.py': las calles de la ciudad se rasterizan una sola vez
+        # (y se guardan como PNG para las siguientes ejecuciones), encima solo se dibujan la ruta y los marcadores de origen y destino
+        # Si descargamos el grafo de NetworkX, las calles y la ruta siguen su geometría curva; con solo la instantánea van rectas
+        geometrias = None if grafo_proyectado_metros is None else geometrias_aristas(grafo_proyectado_metros, grafo_compilado)
+        renderizador = RenderizadorMapa(grafo_compilado, geometrias=geometrias)
+        figura, eje = renderizador.figura_ruta(ruta_optima_nodos, plt.figure(figsize=renderizador.tamano_pulgadas))
         
-        # Añadimos un título simple al mapa para una mejor presentación
-        eje.set_title(
-            "Ruta Óptima de Oaxaca (Dijkstra por Tiempo)",
-            fontsize=20,
-            color='white' 
-        )
-
-        # Creamos el texto del resumen que vimos en la consola para ponerlo en el mapa y mostrarlo al usuario
-        texto_resumen = (
-            f"Distancia Física Total: {distancia_total_km:.2f} km\n"
-            f"Tiempo Estimado de Viaje: {tiempo_total_minutos:.2f} min"
-        )
-        # Usamos eje.text() para poner texto sobre los ejes de el mapa y mostrar el resumen
-        eje.text(
-            0.03,                           
-            0.97,                           
-            texto_resumen,                  
-            transform=eje.transAxes,        
-            fontsize=14,
-            color='black',                  
-            verticalalignment='top',        
-            bbox=dict(boxstyle='round,pad=0.5', 
-                      fc='white',               
-                      ec='cyan',                
-                      lw=1,                     
-                      alpha=0.8)                
-        )
+        # Añadimos el título y el cuadro con el resumen que vimos en la consola; 'anotar_mapa' y 'texto_resumen' son los mismos
+        # que usa el servidor de rutas, así los dos mapas no pueden quedar con formatos distintos
+        anotar_mapa(eje, texto=texto_resumen(distancia_total_metros, tiempo_total_segundos))
 
         print("Mostrando mapa. Cierra la ventana del mapa para terminar el programa")
         plt.show()
@@ -432,6 +440,8 @@ def ejecutar_analisis_ruta(coordenadas):
 # Esta condición especial '__name__ == "__main__"' se asegura de que este código solo se ejecute cuando corremos este archivo .py directamente.
 if __name__ == "__main__":
     
+    import tkinter as tk
+
     # Creamos la ventana "raíz" o principal de Tkinter que vizualizaremos
     ventana_raiz = tk.Tk()
     
@@ -0,0 +1,319 @@
+# En este archivo están los "parches" de pesos: cambios puntuales al tiempo de viaje de algunas calles (cierres, obras, embotellamientos)
+# que se aplican sobre el grafo compilado ya cargado, sin volver a correr la ponderación de todo el mapa ni recalcular las rutas desde cero.
+#
+# Cada parche tiene un identificador, un selector de aristas y una operación:
+#   - Selector: una arista por sus nodos de OSM ('arista': [u, v] o [u, v, clave]), todas las aristas con algún extremo dentro de una
+#     caja ('caja': [lat_min, lon_min, lat_max, lon_max]) o todas las de un tipo de calle ('highway': 'primary').
+#   - Operación: multiplicar el tiempo ('factor': 1.5), fijarlo en segundos ('segundos': 90) o cerrar la calle ('cerrada': true).
+#   - Con 'quitar': true se quita el parche con ese identificador y sus aristas regresan a su peso original.
+# Mandar otra vez un parche con el mismo identificador lo reemplaza, así un embotellamiento que crece o se despeja es un solo parche.
+#
+# El peso de cada arista se calcula a partir de su peso original (el que tenía al crear el 'ActualizadorPesos') y de todos los parches
+# activos que la tocan: si alguno la cierra vale infinito, si no, si alguno fija segundos manda el último de ellos, y si no, el peso
+# original se multiplica por todos los factores. Solo se recalculan y se escriben las aristas de los parches que cambiaron.
+#
+# El grafo compilado guarda una sola arista por par de nodos (la más barata de las paralelas), pero los parches se aplican a cada arista
+# paralela por su (u, v, clave): con las paralelas descartadas ('aristas_paralelas' de 'grafo_compilado.py', o 'leer_aristas_paralelas'
+# de la instantánea) en la posición compilada se escribe el mínimo de los pesos ya parchados de todas sus paralelas. Así, cerrar la
+# arista elegida deja pasar por la siguiente y fijar segundos en una paralela más lenta puede volverla la más barata.
+#
+# Al escribir los pesos con 'actualizar_pesos' del grafo compilado, las cachés de 'cache_rutas.py' descartan o reparan solo lo que
+# usaba esas aristas, y las jerarquías de 'jerarquia_personalizable.py' que se registren se recalculan solo donde hace falta.
+#
+# Uso típico:
+#   actualizador = ActualizadorPesos(grafo_compilado, valores_highway, jerarquias=[jerarquia], aristas_paralelas=paralelas)
+#   actualizador.aplicar([{'id': 'obra-5', 'arista': [u, v], 'cerrada': True},
+#                         {'id': 'centro', 'caja': [17.05, -96.73, 17.07, -96.71], 'factor': 1.8}])
+#   actualizador.quitar('obra-5')
+# 'verificar_parches_instantanea' revisa que una instantánea recién construida traiga lo que necesitan los parches.
+
+# Importamos 'json' para el registro de parches compartido entre procesos
+import json
+# Importamos 'os' para revisar los archivos de la instantánea en la verificación
+import os
+# Importamos 'time' para medir cuánto tarda cada lote de parches
+import time
+
+# Importamos numpy con el alias 'np' para seleccionar aristas y calcular pesos
+import numpy as np
+
+
+# Aplica parches de pesos a un grafo compilado y a las jerarquías personalizables construidas sobre él
+class ActualizadorPesos:
+    # 'valores_highway' (opcional) es el 'highway' de cada arista compilada en el orden del CSR, como en 'reponderar_grafo_compilado'
+    # (se puede sacar del grafo de NetworkX con 'valores_aristas' o de la instantánea con 'leer_valores_highway'); sin él no hay parches por tipo de calle
+    # 'aristas_paralelas' (opcional) son las paralelas que el grafo compilado descartó, como [posición compilada, clave, peso, 'highway'];
+    # sin ellas cada arista compilada se trata como si fuera la única entre sus dos nodos
+    def __init__(self, grafo_compilado, valores_highway=None, jerarquias=(), aristas_paralelas=None):
+        self.grafo_compilado = grafo_compilado
+        self.jerarquias = list(jerarquias)
+        # Las aristas que tocan los parches son las compiladas (la arista i es la posición i del CSR) seguidas de las paralelas
+        # descartadas; para cada una guardamos la posición compilada donde cuenta, su clave y su peso original
+        paralelas = list(aristas_paralelas or ())
+        self.posiciones_compiladas = np.concatenate([
+            np.arange(grafo_compilado.numero_aristas, dtype=np.int64),
+            np.array([paralela[0] for paralela in paralelas], dtype=np.int64),
+        ])
+        self.claves = np.concatenate([
+            np.asarray(grafo_compilado.claves, dtype=np.int64), np.array([paralela[1] for paralela in paralelas], dtype=np.int64),
+        ])
+        self.pesos_originales = np.concatenate([
+            np.asarray(grafo_compilado.pesos, dtype=np.float64), np.array([paralela[2] for paralela in paralelas], dtype=np.float64),
+        ])
+        self.valores_highway = None if valores_highway is None else list(valores_highway) + [paralela[3] for paralela in paralelas]
+        self._con_paralelas = aristas_paralelas is not None
+        # Identificador -> (aristas, operación, valor), en el orden en que se aplicaron
+        self._parches = {}
+        self._posiciones_por_highway = None
+        self._siguiente_identificador = 1
+
+    # Devuelve las aristas de u a v: sin 'clave' todas las paralelas (se cierra la calle completa), con 'clave' solo esa
+    # Sin las paralelas descartadas no sabemos si una clave que no es la elegida existe, así que no se devuelve nada
+    def aristas_por_nodos(self, nodo_u, nodo_v, clave=None):
+        grafo_compilado = self.grafo_compilado
+        posicion = grafo_compilado.posicion_arista(grafo_compilado.indice(nodo_u), grafo_compilado.indice(nodo_v))
+        if posicion == -1:
+            raise KeyError(f"No hay una calle de {nodo_u} a {nodo_v} en el grafo compilado")
+        aristas = self._aristas_de_posiciones(np.array([posicion], dtype=np.int64))
+        if clave is not None:
+            aristas = aristas[self.claves[aristas] == clave]
+            if len(aristas) == 0 and self._con_paralelas:
+                raise KeyError(f"No hay una calle de {nodo_u} a {nodo_v} con clave {clave}")
+        return aristas
+
+    # Devuelve las aristas con al menos un extremo dentro de la caja (en grados), así un cierre por zona no deja entrar
+    def aristas_en_caja(self, lat_min, lon_min, lat_max, lon_max):
+        grafo_compilado = self.grafo_compilado
+        lat = np.asarray(grafo_compilado.lat)
+        lon = np.asarray(grafo_compilado.lon)
+        dentro = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        origenes = np.repeat(np.arange(grafo_compilado.numero_nodos), np.diff(grafo_compilado.desplazamientos))
+        return self._aristas_de_posiciones(np.nonzero(dentro[origenes] | dentro[grafo_compilado.destinos])[0])
+
+    # Devuelve las aristas (la compilada y sus paralelas descartadas) de las posiciones compiladas 'posiciones' (ordenadas, sin repetir)
+    def _aristas_de_posiciones(self, posiciones):
+        numero_aristas = self.grafo_compilado.numero_aristas
+        paralelas = numero_aristas + np.nonzero(np.isin(self.posiciones_compiladas[numero_aristas:], posiciones))[0]
+        return np.concatenate([posiciones.astype(np.int64), paralelas])
+
+    # Devuelve las aristas de un tipo de calle; una arista con varios tipos (una lista en OSM) entra en todos ellos
+    def aristas_por_highway(self, clase):
+        if self.valores_highway is None:
+            raise ValueError("Este grafo no tiene los tipos de calle ('highway') de sus aristas, no se puede seleccionar por tipo")
+        if self._posiciones_por_highway is None:
+            posiciones_por_highway = {}
+            for posicion, valor in enumerate(self.valores_highway):
+                for clase_arista in (valor if isinstance(valor, (list, tuple)) else [valor]):
+                    posiciones_por_highway.setdefault(clase_arista, []).append(posicion)
+            self._posiciones_por_highway = {
+                clase_arista: np.array(posiciones, dtype=np.int64) for clase_arista, posiciones in posiciones_por_highway.items()
+            }
+        return self._posiciones_por_highway.get(clase, np.zeros(0, dtype=np.int64))
+
+    # Revisa un parche (diccionario) y lo convierte en (identificador, aristas, operación, valor); con 'quitar' las aristas son 'None'
+    # Lanza ValueError (o KeyError si un nodo no existe) antes de tocar nada, así un lote con un parche malo no se aplica a medias
+    def _interpretar(self, especificacion):
+        if not isinstance(especificacion, dict):
+            raise ValueError('Cada parche debe ser un diccionario')
+        identificador = especificacion.get('id')
+        if identificador is None:
+            identificador = f'parche-{self._siguiente_identificador}'
+            self._siguiente_identificador += 1
+        identificador = str(identificador)
+        if especificacion.get('quitar'):
+            return identificador, None, None, None
+
+        selectores = [nombre for nombre in ('arista', 'caja', 'highway') if nombre in especificacion]
+        if len(selectores) != 1:
+            raise ValueError(f"El parche '{identificador}' debe tener exactamente uno de 'arista', 'caja' o 'highway'")
+        selector = selectores[0]
+        valor_selector = especificacion[selector]
+        mensaje_selector = f"El selector '{selector}' del parche '{identificador}' no es válido"
+        if selector == 'arista':
+            try:
+                nodos = [int(nodo) for nodo in valor_selector]
+            except (TypeError, ValueError):
+                raise ValueError(mensaje_selector) from None
+            if len(nodos) not in (2, 3):
+                raise ValueError(mensaje_selector)
+            aristas = self.aristas_por_nodos(nodos[0], nodos[1], nodos[2] if len(nodos) == 3 else None)
+        elif selector == 'caja':
+            try:
+                lat_min, lon_min, lat_max, lon_max = (float(valor) for valor in valor_selector)
+            except (TypeError, ValueError):
+                raise ValueError(mensaje_selector) from None
+            aristas = self.aristas_en_caja(lat_min, lon_min, lat_max, lon_max)
+        else:
+            if not isinstance(valor_selector, str):
+                raise ValueError(mensaje_selector)
+            aristas = self.aristas_por_highway(valor_selector)
+
+        operaciones = [nombre for nombre in ('factor', 'segundos', 'cerrada') if nombre in especificacion]
+        if len(operaciones) != 1:
+            raise ValueError(f"El parche '{identificador}' debe tener exactamente uno de 'factor', 'segundos' o 'cerrada'")
+        operacion = operaciones[0]
+        if operacion == 'cerrada':
+            if especificacion['cerrada'] is not True:
+                raise ValueError(f"En el parche '{identificador}', 'cerrada' solo puede ser true (para reabrir se quita el parche)")
+            return identificador, aristas, operacion, None
+        try:
+            valor = float(especificacion[operacion])
+        except (TypeError, ValueError):
+            raise ValueError(f"En el parche '{identificador}', '{operacion}' debe ser un número") from None
+        # Un factor de 0 o un peso negativo romperían Dijkstra (y la heurística de A*), por eso se rechazan
+        if not (np.isfinite(valor) and (valor > 0 if operacion == 'factor' else valor >= 0)):
+            raise ValueError(f"En el parche '{identificador}', '{operacion}' debe ser un número {'positivo' if operacion == 'factor' else 'no negativo'}")
+        return identificador, aristas, operacion, valor
+
+    # Aplica un lote de parches (lista de diccionarios) y escribe de una sola vez los pesos que cambiaron
+    # Devuelve un resumen con los parches activos, las aristas que cambiaron, lo que tardó y el identificador de cada parche del lote
+    # (a los que no traían 'id' se les asigna uno)
+    def aplicar(self, especificaciones):
+        inicio = time.perf_counter()
+        siguiente_identificador = self._siguiente_identificador
+        try:
+            interpretados = [self._interpretar(especificacion) for especificacion in especificaciones]
+        except (KeyError, ValueError):
+            # Un lote rechazado no gasta identificadores automáticos
+            self._siguiente_identificador = siguiente_identificador
+            raise
+        tocadas = []
+        for identificador, aristas, operacion, valor in interpretados:
+            anterior = self._parches.pop(identificador, None)
+            if anterior is not None:
+                tocadas.append(anterior[0])
+            if aristas is not None:
+                self._parches[identificador] = (aristas, operacion, valor)
+                tocadas.append(aristas)
+        resumen = self._escribir(tocadas, inicio)
+        resumen['identificadores'] = [identificador for identificador, _, _, _ in interpretados]
+        return resumen
+
+    # Quita un parche por su identificador (si no existe no pasa nada)
+    def quitar(self, identificador):
+        return self.aplicar([{'id': identificador, 'quitar': True}])
+
+    # Avisa que los pesos del grafo se recalcularon completos (por ejemplo con 'reponderar_grafo_compilado'): esos pasan a ser
+    # los pesos originales y los parches activos se vuelven a aplicar encima (las paralelas descartadas conservan su peso)
+    def pesos_recalculados(self):
+        self.pesos_originales[:self.grafo_compilado.numero_aristas] = self.grafo_compilado.pesos
+        return self._escribir([aristas for aristas, _, _ in self._parches.values()], time.perf_counter())
+
+    # Lista de parches activos como diccionarios (identificador, operación, valor y número de aristas)
+    def parches(self):
+        return [
+            {'id': identificador, 'operacion': operacion, 'valor': valor, 'aristas': len(aristas)}
+            for identificador, (aristas, operacion, valor) in self._parches.items()
+        ]
+
+    # Peso de las aristas 'aristas' (sin repetir) con todos los parches activos
+    def _pesos_con_parches(self, aristas):
+        factores = np.ones(len(aristas))
+        segundos = np.full(len(aristas), np.nan)
+        cerradas = np.zeros(len(aristas), dtype=bool)
+        for aristas_parche, operacion, valor in self._parches.values():
+            tocadas = np.isin(aristas, aristas_parche)
+            if operacion == 'factor':
+                factores[tocadas] *= valor
+            elif operacion == 'segundos':
+                segundos[tocadas] = valor
+            else:
+                cerradas |= tocadas
+        pesos = np.where(np.isnan(segundos), self.pesos_originales[aristas] * factores, segundos)
+        pesos[cerradas] = np.inf
+        return pesos
+
+    # Recalcula las posiciones compiladas de las aristas 'tocadas' con el mínimo de sus paralelas ya parchadas y escribe las que cambiaron
+    def _escribir(self, tocadas, inicio):
+        grafo_compilado = self.grafo_compilado
+        aristas = np.concatenate(tocadas) if tocadas else np.zeros(0, dtype=np.int64)
+        posiciones = np.unique(self.posiciones_compiladas[aristas])
+        aristas = self._aristas_de_posiciones(posiciones)
+        pesos = np.full(len(posiciones), np.inf)
+        np.minimum.at(pesos, np.searchsorted(posiciones, self.posiciones_compiladas[aristas]), self._pesos_con_parches(aristas))
+        cambian = pesos != grafo_compilado.pesos[posiciones]
+        posiciones, pesos = posiciones[cambian], pesos[cambian]
+        aristas_jerarquia = 0
+        if len(posiciones):
+            grafo_compilado.actualizar_pesos(posiciones, pesos)
+            for jerarquia in self.jerarquias:
+                aristas_jerarquia += jerarquia.actualizar_aristas(grafo_compilado, posiciones)
+        return {
+            'parches_activos': len(self._parches),
+            'aristas_cambiadas': int(len(posiciones)),
+            'aristas_jerarquia_cambiadas': aristas_jerarquia,
+            'segundos': time.perf_counter() - inicio,
+        }
+
+
+# Arma una instantánea en 'directorio_base' con 'obtener_instantanea' y 'compilar_grafo_ponderado', como el script principal, y revisa
+# que traiga 'highway.json' y 'paralelas.json', que un parche por tipo de calle cambie pesos y que un parche sobre una arista paralela
+# descartada (por su clave) pase a ser el peso de su arista compilada. 'grafo' es el grafo de NetworkX proyectado, sin ponderar
+# Devuelve un reporte con los errores encontrados (lista vacía si todo está bien)
+def verificar_parches_instantanea(grafo, directorio_base):
+    # Importamos aquí la instantánea y la ponderación, el servidor solo necesita el actualizador
+    from instantanea_grafo import (ARCHIVO_HIGHWAY, ARCHIVO_PARALELAS, leer_aristas_paralelas, leer_valores_highway,
+                                   obtener_instantanea)
+    from ponderacion import compilar_grafo_ponderado
+
+    grafo_compilado = obtener_instantanea(['verificacion-parches'], None, None, lambda: compilar_grafo_ponderado(grafo),
+                                          directorio_base)
+    directorio = grafo_compilado.directorio_instantanea
+    errores = [
+        f"La instantánea no trae '{archivo}'"
+        for archivo in (ARCHIVO_HIGHWAY, ARCHIVO_PARALELAS) if not os.path.isfile(os.path.join(directorio, archivo))
+    ]
+    valores_highway = leer_valores_highway(directorio)
+    paralelas = leer_aristas_paralelas(directorio)
+    actualizador = ActualizadorPesos(grafo_compilado, valores_highway, aristas_paralelas=paralelas)
+
+    clases = [clase for valor in (valores_highway or []) for clase in (valor if isinstance(valor, list) else [valor]) if clase]
+    if clases:
+        resumen = actualizador.aplicar([{'id': 'verificacion-highway', 'highway': clases[0], 'factor': 2}])
+        if resumen['aristas_cambiadas'] == 0:
+            errores.append(f"El parche por tipo de calle '{clases[0]}' no cambió ninguna arista")
+        actualizador.quitar('verificacion-highway')
+
+    if paralelas:
+        posicion, clave, _, _ = paralelas[0]
+        nodo_u = int(np.searchsorted(grafo_compilado.desplazamientos, posicion, side='right')) - 1
+        arista = [int(grafo_compilado.ids_nodos[nodo_u]), int(grafo_compilado.ids_nodos[grafo_compilado.destinos[posicion]]), clave]
+        peso_original = float(grafo_compilado.pesos[posicion])
+        actualizador.aplicar([{'id': 'verificacion-paralela', 'arista': arista, 'segundos': 0}])
+        if float(grafo_compilado.pesos[posicion]) != 0.0:
+            errores.append(f"El parche sobre la arista paralela {arista} no llegó a su arista compilada")
+        actualizador.quitar('verificacion-paralela')
+        if float(grafo_compilado.pesos[posicion]) != peso_original:
+            errores.append(f"Al quitar el parche de {arista} su arista compilada no regresó a {peso_original}")
+
+    return {
+        'directorio': directorio,
+        'aristas': grafo_compilado.numero_aristas,
+        'aristas_paralelas': len(paralelas or []),
+        'errores': errores,
+    }
+
+
+# Registro de lotes de parches en un archivo (una línea JSON por lote) para repartirlos entre procesos
+# Un proceso agrega lotes y los demás leen solo lo nuevo desde la última posición que leyeron, así todos aplican los mismos parches
+# en el mismo orden sin tener que mandarse el grafo ni los pesos
+class RegistroParches:
+    def __init__(self, ruta_archivo):
+        self.ruta_archivo = ruta_archivo
+        self._posicion = 0
+
+    def agregar(self, especificaciones):
+        with open(self.ruta_archivo, 'a', encoding='utf-8') as archivo:
+            archivo.write(json.dumps(especificaciones, ensure_ascii=False) + '\n')
+
+    # Devuelve los lotes agregados desde la última lectura (una línea a medio escribir se deja para la siguiente)
+    def leer_nuevos(self):
+        try:
+            with open(self.ruta_archivo, 'rb') as archivo:
+                archivo.seek(self._posicion)
+                contenido = archivo.read()
+        except FileNotFoundError:
+            return []
+        completo = contenido[:contenido.rfind(b'\n') + 1]
+        self._posicion += len(completo)
+        return [json.loads(linea) for linea in completo.decode('utf-8').splitlines() if linea]
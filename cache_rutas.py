@@ -0,0 +1,332 @@
+# En este archivo está la caché que se pone delante de las búsquedas sobre el grafo compilado.
+# En la práctica casi todas las consultas salen de unos pocos orígenes (el aeropuerto, el centro, ...), y cada búsqueda nueva
+# empezaba otra vez desde cero aunque la anterior hubiera salido del mismo lugar. La caché guarda dos cosas:
+#   - Rutas terminadas, con la llave (nodo origen, nodo destino, atributo de peso).
+#   - Árboles de búsqueda a medio terminar por cada origen: las distancias, los predecesores, los nodos ya cerrados y la cola.
+#     Si llega otra consulta desde el mismo origen, el Dijkstra sigue desde donde se quedó en lugar de empezar de nuevo,
+#     y si el destino ya estaba cerrado la ruta sale directo del árbol sin sacar ningún nodo de la cola.
+#
+# Las dos cosas comparten un presupuesto de memoria (en bytes, aproximado) y se desalojan por LRU: cuando se pasa del presupuesto
+# se tira lo que lleva más tiempo sin usarse.
+#
+# Cuando cambian los pesos de unas cuantas aristas ('actualizar_pesos' del grafo compilado, por ejemplo por un cierre o un embotellamiento)
+# la caché no se vacía: en la siguiente consulta revisa el registro de cambios del grafo y solo toca lo que esos cambios afectan.
+#   - Una ruta que pasa por una arista que subió de peso se descarta; si la arista bajó, la ruta sigue siendo la mejor y solo se corrige su tiempo.
+#   - Una ruta que NO pasa por una arista que bajó se conserva si ni siquiera yendo en línea recta a la velocidad máxima se podría mejorar.
+#   - Un árbol se repara si el cambio solo toca nodos que todavía no cierra (se corrige su etiqueta en la cola) y se descarta si toca
+#     la distancia de un nodo ya cerrado.
+# Si los pesos se recalcularon completos ('pesos_modificados') no hay registro de qué cambió y la caché se vacía entera.
+
+# Importamos 'heapq' para la cola de prioridad de los árboles de búsqueda
+import heapq
+# Importamos 'math' para las distancias en línea recta al revisar rutas guardadas
+import math
+# Importamos 'OrderedDict' para llevar el orden de uso de las entradas (la más vieja al principio)
+from collections import OrderedDict
+
+# Importamos numpy con el alias 'np' para juntar los cambios de pesos de varios lotes
+import numpy as np
+
+# Importamos las estrategias de búsqueda y su clase de resultado
+from estrategias_busqueda import ResultadoBusqueda, buscar_ruta
+
+# Presupuesto de memoria si no se indica otro (64 MB)
+PRESUPUESTO_POR_DEFECTO_BYTES = 64 * 1024 * 1024
+
+# Bytes aproximados que ocupa en Python cada nodo alcanzado de un árbol (su entrada en 'distancias', 'predecesores' y 'cerrados')
+BYTES_POR_NODO_ARBOL = 200
+# Bytes aproximados de cada elemento pendiente en la cola de un árbol (la tupla y su lugar en la lista)
+BYTES_POR_ELEMENTO_COLA = 80
+# Bytes aproximados de cada nodo de una ruta guardada y de lo fijo de cada entrada (llave, resultado, lugar en el diccionario)
+BYTES_POR_NODO_RUTA = 40
+BYTES_POR_ENTRADA = 400
+
+
+# Árbol de búsqueda de Dijkstra desde un origen que se puede continuar más tarde
+class ArbolBusqueda:
+    def __init__(self, indice_origen):
+        self.indice_origen = indice_origen
+        self.distancias = {indice_origen: 0.0}
+        self.predecesores = {indice_origen: -1}
+        self.cerrados = set()
+        self.cola = [(0.0, indice_origen)]
+        # Distancia del último nodo cerrado: todos los cerrados están a esa distancia o menos y todo lo que está en la cola a esa o más
+        self.radio = 0.0
+
+    # Bytes aproximados que ocupa el árbol, para el presupuesto de la caché
+    def tamano_bytes(self):
+        return BYTES_POR_ENTRADA + BYTES_POR_NODO_ARBOL * len(self.distancias) + BYTES_POR_ELEMENTO_COLA * len(self.cola)
+
+    # Sigue el Dijkstra hasta cerrar 'indice_destino' (o hasta vaciar la cola si es inalcanzable)
+    # Devuelve cuántos nodos se cerraron en esta llamada, 0 si el destino ya estaba cerrado de antes
+    def continuar_hasta(self, grafo_compilado, indice_destino):
+        if indice_destino in self.cerrados:
+            return 0
+        desplazamientos, destinos, pesos = grafo_compilado.listas()
+        distancias = self.distancias
+        predecesores = self.predecesores
+        cerrados = self.cerrados
+        cola_prioridad = self.cola
+        nodos_visitados = 0
+        while cola_prioridad:
+            distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+            # Además de los nodos ya cerrados saltamos las entradas que ya no coinciden con la etiqueta (una reparación la cambió)
+            if nodo_actual in cerrados or distancia_actual != distancias.get(nodo_actual):
+                continue
+            cerrados.add(nodo_actual)
+            self.radio = distancia_actual
+            nodos_visitados += 1
+            for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+                vecino = destinos[posicion]
+                nueva_distancia = distancia_actual + pesos[posicion]
+                if nueva_distancia < distancias.get(vecino, float('inf')):
+                    distancias[vecino] = nueva_distancia
+                    predecesores[vecino] = nodo_actual
+                    heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+            # Revisamos el destino después de relajar sus aristas, así al continuar el árbol queda igual que si nunca se hubiera detenido
+            if nodo_actual == indice_destino:
+                break
+        return nodos_visitados
+
+    # Devuelve (tiempo_total, lista de índices) del origen a 'indice_destino', o (inf, None) si el destino no está cerrado
+    def camino_hasta(self, indice_destino):
+        if indice_destino not in self.cerrados:
+            return float('inf'), None
+        camino = []
+        nodo_camino_actual = indice_destino
+        while nodo_camino_actual != -1:
+            camino.append(nodo_camino_actual)
+            nodo_camino_actual = self.predecesores[nodo_camino_actual]
+        return self.distancias[indice_destino], camino[::-1]
+
+    # Ajusta el árbol a que el peso de la arista u -> v pasó de 'peso_anterior' a 'peso_nuevo' (los pesos del grafo ya cambiaron)
+    # Devuelve False si el cambio afecta a un nodo ya cerrado y el árbol ya no sirve
+    def reparar(self, grafo_compilado, nodo_u, nodo_v, peso_anterior, peso_nuevo):
+        distancias = self.distancias
+        if peso_nuevo > peso_anterior:
+            # Solo importa si v tenía su etiqueta gracias a esta arista
+            if self.predecesores.get(nodo_v) != nodo_u:
+                return True
+            if nodo_v in self.cerrados:
+                return False
+            # v sigue en la cola: su etiqueta correcta es la mejor entre sus vecinos de entrada ya cerrados
+            desplazamientos, origenes, pesos = grafo_compilado.reverso().listas()
+            mejor_distancia, mejor_predecesor = float('inf'), -1
+            for posicion in range(desplazamientos[nodo_v], desplazamientos[nodo_v + 1]):
+                vecino = origenes[posicion]
+                if vecino in self.cerrados and distancias[vecino] + pesos[posicion] < mejor_distancia:
+                    mejor_distancia, mejor_predecesor = distancias[vecino] + pesos[posicion], vecino
+            if mejor_predecesor == -1:
+                del distancias[nodo_v]
+                del self.predecesores[nodo_v]
+            else:
+                distancias[nodo_v] = mejor_distancia
+                self.predecesores[nodo_v] = mejor_predecesor
+                heapq.heappush(self.cola, (mejor_distancia, nodo_v))
+            return True
+        # La arista bajó de peso: solo importa si u ya está cerrado (si no, se usará el peso nuevo cuando se cierre) y mejora a v
+        if nodo_u not in self.cerrados:
+            return True
+        nueva_distancia = distancias[nodo_u] + peso_nuevo
+        if nueva_distancia >= distancias.get(nodo_v, float('inf')):
+            return True
+        # Si v todavía no está cerrado y su nueva etiqueta no queda por debajo de los ya cerrados, basta con meterla a la cola
+        if nodo_v in self.cerrados or nueva_distancia < self.radio:
+            return False
+        distancias[nodo_v] = nueva_distancia
+        self.predecesores[nodo_v] = nodo_u
+        heapq.heappush(self.cola, (nueva_distancia, nodo_v))
+        return True
+
+
+# La caché: rutas terminadas y árboles por origen, con desalojo LRU por presupuesto de memoria
+class CacheRutas:
+    def __init__(self, grafo_compilado, presupuesto_bytes=PRESUPUESTO_POR_DEFECTO_BYTES):
+        self.grafo_compilado = grafo_compilado
+        self.presupuesto_bytes = presupuesto_bytes
+        # Llave -> (tamaño en bytes, valor); las llaves son ('ruta', origen, destino, atributo) o ('arbol', origen, atributo)
+        self._entradas = OrderedDict()
+        self.bytes_usados = 0
+        self._version_pesos = grafo_compilado.version_pesos
+        self.reiniciar_contadores()
+
+    def reiniciar_contadores(self):
+        self.aciertos_ruta = 0
+        self.fallos_ruta = 0
+        self.aciertos_arbol = 0
+        self.fallos_arbol = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+        self.entradas_descartadas = 0
+        self.entradas_reparadas = 0
+
+    # Tira todo lo guardado (por ejemplo porque cambiaron los pesos)
+    def vaciar(self):
+        self._entradas.clear()
+        self.bytes_usados = 0
+
+    # Si los pesos cambiaron desde la última consulta, descarta o repara lo que usaba las aristas que cambiaron
+    # Si el grafo ya no tiene el registro de esos cambios, nada de lo guardado es confiable y se vacía la caché
+    def _revisar_version(self):
+        grafo_compilado = self.grafo_compilado
+        if grafo_compilado.version_pesos == self._version_pesos:
+            return
+        cambios = grafo_compilado.cambios_desde(self._version_pesos)
+        if cambios is None:
+            self.vaciar()
+            self.invalidaciones += 1
+        elif cambios and self._entradas:
+            self._aplicar_cambios(cambios)
+        self._version_pesos = grafo_compilado.version_pesos
+
+    def _aplicar_cambios(self, cambios):
+        grafo_compilado = self.grafo_compilado
+        # Juntamos los lotes: de cada arista nos interesa su peso antes del primer cambio y su peso actual
+        posiciones = np.concatenate([cambio[1] for cambio in cambios])
+        anteriores = np.concatenate([cambio[2] for cambio in cambios])
+        posiciones, primeras = np.unique(posiciones, return_index=True)
+        anteriores = anteriores[primeras]
+        nuevos = grafo_compilado.pesos[posiciones]
+        distintas = anteriores != nuevos
+        posiciones, anteriores, nuevos = posiciones[distintas], anteriores[distintas], nuevos[distintas]
+        if len(posiciones) == 0:
+            return
+        origenes = np.searchsorted(grafo_compilado.desplazamientos, posiciones, side='right') - 1
+        destinos = grafo_compilado.destinos[posiciones]
+        aristas = list(zip(origenes.tolist(), destinos.tolist(), anteriores.tolist(), nuevos.tolist()))
+        # Las rutas guardan IDs de OSM, así que también indexamos los cambios por par de IDs
+        ids = grafo_compilado.ids_nodos.tolist()
+        cambio_por_par = {(ids[nodo_u], ids[nodo_v]): (anterior, nuevo) for nodo_u, nodo_v, anterior, nuevo in aristas}
+        bajadas = [(nodo_u, nodo_v, nuevo, (ids[nodo_u], ids[nodo_v])) for nodo_u, nodo_v, anterior, nuevo in aristas if nuevo < anterior]
+
+        for llave in list(self._entradas):
+            tamano_bytes, valor = self._entradas[llave]
+            if llave[0] == 'arbol':
+                conservar = all(valor.reparar(grafo_compilado, *arista) for arista in aristas)
+                if conservar:
+                    self._entradas[llave] = (valor.tamano_bytes(), valor)
+                    self.bytes_usados += valor.tamano_bytes() - tamano_bytes
+            else:
+                valor, conservar = self._revisar_ruta(llave, valor, cambio_por_par, bajadas)
+                if conservar:
+                    self._entradas[llave] = (tamano_bytes, valor)
+            if not conservar:
+                del self._entradas[llave]
+                self.bytes_usados -= tamano_bytes
+                self.entradas_descartadas += 1
+
+    # Revisa una ruta guardada contra los cambios, devuelve (resultado corregido, si se conserva)
+    def _revisar_ruta(self, llave, resultado_busqueda, cambio_por_par, bajadas):
+        camino = resultado_busqueda.camino
+        # Sin camino, cualquier arista que baje (por ejemplo una calle que se reabre) podría conectar los nodos
+        if camino is None:
+            return resultado_busqueda, not bajadas
+        diferencia = 0.0
+        pares_cambiados = set()
+        for par in zip(camino[:-1], camino[1:]):
+            cambio = cambio_por_par.get(par)
+            if cambio is not None:
+                if cambio[1] > cambio[0]:
+                    return resultado_busqueda, False
+                diferencia += cambio[1] - cambio[0]
+                pares_cambiados.add(par)
+        tiempo_total = resultado_busqueda.tiempo_total + diferencia
+        # Una arista que bajó fuera de la ruta solo puede mejorarla si origen -> u -> v -> destino, contando la línea recta
+        # a la velocidad máxima para los tramos desconocidos, queda por debajo del tiempo de la ruta
+        # (las que bajaron dentro de la ruta la abaratan igual que a cualquier otra ruta que pase por ellas, así que no la cambian)
+        if bajadas:
+            grafo_compilado = self.grafo_compilado
+            x, y = grafo_compilado.coordenadas_listas()
+            velocidad_maxima = grafo_compilado.velocidad_maxima()
+            indice_origen = grafo_compilado.indice(llave[1])
+            indice_destino = grafo_compilado.indice(llave[2])
+            for nodo_u, nodo_v, peso_nuevo, par in bajadas:
+                if par in pares_cambiados:
+                    continue
+                if velocidad_maxima > 0:
+                    cota = (peso_nuevo
+                            + math.hypot(x[nodo_u] - x[indice_origen], y[nodo_u] - y[indice_origen]) / velocidad_maxima
+                            + math.hypot(x[indice_destino] - x[nodo_v], y[indice_destino] - y[nodo_v]) / velocidad_maxima)
+                else:
+                    cota = peso_nuevo
+                # Si faltan coordenadas la cota es NaN y la comparación de abajo no descarta nada, por eso se pregunta al revés
+                if not cota >= tiempo_total:
+                    return resultado_busqueda, False
+        if diferencia:
+            self.entradas_reparadas += 1
+            resultado_busqueda = ResultadoBusqueda(camino, tiempo_total, resultado_busqueda.nodos_visitados, resultado_busqueda.estrategia)
+        return resultado_busqueda, True
+
+    def _obtener(self, llave):
+        entrada = self._entradas.get(llave)
+        if entrada is None:
+            return None
+        self._entradas.move_to_end(llave)
+        return entrada[1]
+
+    # Guarda (o actualiza el tamaño de) una entrada y desaloja las más viejas hasta volver a caber en el presupuesto
+    def _guardar(self, llave, valor, tamano_bytes):
+        anterior = self._entradas.pop(llave, None)
+        if anterior is not None:
+            self.bytes_usados -= anterior[0]
+        self._entradas[llave] = (tamano_bytes, valor)
+        self.bytes_usados += tamano_bytes
+        while self.bytes_usados > self.presupuesto_bytes and self._entradas:
+            _, (tamano_desalojado, _) = self._entradas.popitem(last=False)
+            self.bytes_usados -= tamano_desalojado
+            self.desalojos += 1
+
+    # Busca la ruta de 'nodo_origen' a 'nodo_destino' (IDs de OSM) pasando primero por la caché
+    # Con 'estrategia' = 'dijkstra' los fallos continúan el árbol del origen; con cualquier otra estrategia de 'estrategias_busqueda.py'
+    # los fallos se calculan con esa estrategia y solo se guarda la ruta terminada
+    # 'nodos_visitados' del resultado cuenta solo los nodos cerrados en esta llamada (0 si la respuesta salió de la caché)
+    def buscar_ruta(self, nodo_origen, nodo_destino, estrategia='dijkstra'):
+        self._revisar_version()
+        atributo_peso = self.grafo_compilado.atributo_peso
+        llave_ruta = ('ruta', nodo_origen, nodo_destino, atributo_peso)
+        resultado_guardado = self._obtener(llave_ruta)
+        if resultado_guardado is not None:
+            self.aciertos_ruta += 1
+            return ResultadoBusqueda(resultado_guardado.camino, resultado_guardado.tiempo_total, 0, resultado_guardado.estrategia)
+        self.fallos_ruta += 1
+
+        if estrategia == 'dijkstra':
+            resultado_busqueda = self._buscar_en_arbol(nodo_origen, nodo_destino, atributo_peso)
+        else:
+            resultado_busqueda = buscar_ruta(self.grafo_compilado, nodo_origen, nodo_destino, estrategia)
+        longitud_camino = len(resultado_busqueda.camino) if resultado_busqueda.camino else 0
+        self._guardar(llave_ruta, resultado_busqueda, BYTES_POR_ENTRADA + BYTES_POR_NODO_RUTA * longitud_camino)
+        return resultado_busqueda
+
+    def _buscar_en_arbol(self, nodo_origen, nodo_destino, atributo_peso):
+        indice_origen = self.grafo_compilado.indice(nodo_origen)
+        indice_destino = self.grafo_compilado.indice(nodo_destino)
+        llave_arbol = ('arbol', nodo_origen, atributo_peso)
+        arbol = self._obtener(llave_arbol)
+        if arbol is None:
+            self.fallos_arbol += 1
+            arbol = ArbolBusqueda(indice_origen)
+        else:
+            self.aciertos_arbol += 1
+        nodos_visitados = arbol.continuar_hasta(self.grafo_compilado, indice_destino)
+        # El árbol creció, lo volvemos a guardar con su tamaño nuevo (y queda como el más recién usado)
+        self._guardar(llave_arbol, arbol, arbol.tamano_bytes())
+        tiempo_total, camino_indices = arbol.camino_hasta(indice_destino)
+        camino = None if camino_indices is None else self.grafo_compilado.nodos_de_indices(camino_indices)
+        return ResultadoBusqueda(camino, tiempo_total, nodos_visitados, 'dijkstra')
+
+    # Contadores y uso de memoria de la caché
+    def estadisticas(self):
+        return {
+            'aciertos_ruta': self.aciertos_ruta,
+            'fallos_ruta': self.fallos_ruta,
+            'aciertos_arbol': self.aciertos_arbol,
+            'fallos_arbol': self.fallos_arbol,
+            'desalojos': self.desalojos,
+            'invalidaciones': self.invalidaciones,
+            'entradas_descartadas': self.entradas_descartadas,
+            'entradas_reparadas': self.entradas_reparadas,
+            'entradas': len(self._entradas),
+            'bytes_usados': self.bytes_usados,
+            'presupuesto_bytes': self.presupuesto_bytes,
+        }
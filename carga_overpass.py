@@ -0,0 +1,682 @@
+# En este archivo armamos el grafo compilado directamente desde respuestas de Overpass (JSON), sin NetworkX ni OSMnx.
+# 'ox.graph_from_place' construye un MultiDiGraph con todos los atributos de cada nodo y calle, después se proyecta y se recorre otra vez
+# solo para sacar longitudes y velocidades. Aquí el JSON se lee por partes (un elemento a la vez, sin cargar el archivo completo) y de
+# cada vía guardamos solo lo que usa el enrutamiento: sus nodos en orden, 'highway', 'maxspeed' y el sentido ('oneway', 'junction').
+#
+# El grafo que sale es el mismo que arma OSMnx con esas respuestas (los pasos de 'ox.graph_from_xml'):
+#   1. una arista por cada par de nodos consecutivos de cada vía, también en sentido contrario si la vía no es de un solo sentido
+#   2. la longitud de cada tramo es la distancia de gran círculo, con la misma fórmula y el mismo radio de la Tierra que OSMnx
+#   3. nos quedamos con la componente débilmente conexa más grande
+#   4. simplificamos: los nodos intermedios (los que solo dan forma a la calle) se quitan y sus tramos se juntan en una sola arista,
+#      sumando las longitudes; si los tramos tienen 'highway' o 'maxspeed' distintos la arista se queda con la lista de valores
+#   5. proyectamos a metros (UTM), calculamos los tiempos con 'ponderacion.py' y compilamos con 'compilar_desde_aristas'
+# Lo que no se reproduce es el recorte con el polígono del lugar que hace 'ox.graph_from_place' (necesita shapely),
+# las respuestas se usan completas igual que en 'ox.graph_from_xml'.
+#
+# Uso: python carga_overpass.py instantanea [ARCHIVOS ...] --salida CARPETA   -> arma el grafo y lo guarda como instantánea
+#      python carga_overpass.py comparar [ARCHIVOS ...] [--pares 200]         -> tiempo, pico de memoria y rutas contra el camino de OSMnx
+# Sin archivos se usan las respuestas de Overpass que OSMnx guardó en 'cache/'.
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'array' para acumular los nodos en arreglos compactos mientras leemos (una lista de Python ocupa varias veces más)
+from array import array
+# Importamos 'glob' para buscar las respuestas de Overpass en la carpeta de caché
+import glob
+# Importamos 'json' para decodificar cada elemento y escribir el reporte
+import json
+# Importamos 'os' para armar rutas de archivos
+import os
+# Importamos 'random' para elegir los pares de la comparación con semilla fija
+import random
+# Importamos 're' para saltar los espacios entre elementos del JSON
+import re
+# Importamos 'shutil', 'subprocess', 'sys' y 'tempfile' para medir cada camino de construcción en un proceso nuevo
+import shutil
+import subprocess
+import sys
+import tempfile
+# Importamos 'time' para medir cuánto tarda armar la instantánea
+import time
+
+# Importamos numpy con el alias 'np' para las longitudes, la simplificación y la proyección
+import numpy as np
+
+# Importamos la construcción del grafo compilado y el cálculo vectorizado de velocidades y tiempos
+from grafo_compilado import anotar_aristas_compiladas, compilar_desde_aristas, dijkstra_compilado
+from ponderacion import VELOCIDAD_POR_DEFECTO_KMH, calcular_tiempos, calcular_velocidades
+
+# Carpeta donde OSMnx guarda las respuestas de Overpass y de Nominatim
+DIRECTORIO_CACHE_OSM = 'cache'
+
+# Cuántos caracteres del archivo se leen de una vez
+TAMANO_BLOQUE_LECTURA = 1 << 20
+
+# Radio de la Tierra que usa OSMnx para la longitud de las calles, con el mismo radio las longitudes salen idénticas
+RADIO_TIERRA_METROS = 6371009.0
+
+# Valores de 'oneway' que OSMnx toma como sentido único, y los que además indican que se circula al revés del orden de los nodos
+SENTIDO_UNICO = ('yes', 'true', '1', '-1', 'reverse', 'T', 'F')
+SENTIDO_CONTRARIO = ('-1', 'reverse', 'T')
+
+# Parámetros del elipsoide WGS84 y de la proyección UTM
+SEMIEJE_MAYOR_METROS = 6378137.0
+ACHATAMIENTO = 1 / 298.257223563
+FACTOR_ESCALA_UTM = 0.9996
+FALSO_ESTE_METROS = 500000.0
+FALSO_NORTE_SUR_METROS = 10000000.0
+
+# Tolerancia para decir que dos rutas tienen el mismo tiempo en la comparación
+TOLERANCIA_SEGUNDOS = 1e-6
+
+# Expresión para saltar los espacios en blanco del JSON
+_ESPACIOS = re.compile(r'[ \t\n\r]*')
+
+# Caracteres que pueden seguir a un número completo dentro del JSON
+_FIN_DE_NUMERO = ' \t\n\r,]}'
+
+
+# Lee un archivo JSON por bloques y va decodificando un valor a la vez, el texto ya decodificado se descarta al leer el siguiente bloque
+class _LectorJson:
+    def __init__(self, archivo, tamano_bloque):
+        self.archivo = archivo
+        self.tamano_bloque = tamano_bloque
+        self.texto = ''
+        self.posicion = 0
+        self.terminado = False
+        self.decodificador = json.JSONDecoder()
+
+    # Lee otro bloque del archivo, devuelve 'False' si ya no queda nada
+    def _leer_mas(self):
+        if self.terminado:
+            return False
+        bloque = self.archivo.read(self.tamano_bloque)
+        if not bloque:
+            self.terminado = True
+            return False
+        self.texto = self.texto[self.posicion:] + bloque
+        self.posicion = 0
+        return True
+
+    # Salta los espacios y devuelve el siguiente carácter sin consumirlo ('' al final del archivo)
+    def siguiente_caracter(self):
+        while True:
+            self.posicion = _ESPACIOS.match(self.texto, self.posicion).end()
+            if self.posicion < len(self.texto):
+                return self.texto[self.posicion]
+            if not self._leer_mas():
+                return ''
+
+    # Consume el carácter esperado ('{', ':', ',', ...) o lanza un ValueError
+    def consumir(self, caracter):
+        encontrado = self.siguiente_caracter()
+        if encontrado != caracter:
+            raise ValueError(f"JSON inválido: se esperaba '{caracter}' y se encontró '{encontrado}'")
+        self.posicion += 1
+
+    # Después de un valor dentro de un objeto o una lista: consume ',' y devuelve 'True', o consume 'cierre' y devuelve 'False'
+    def hay_otro(self, cierre):
+        if self.siguiente_caracter() == cierre:
+            self.posicion += 1
+            return False
+        self.consumir(',')
+        return True
+
+    # Decodifica el siguiente valor completo, si el bloque lo dejó cortado leemos más y lo intentamos otra vez
+    def valor(self):
+        self.siguiente_caracter()
+        while True:
+            try:
+                valor, fin = self.decodificador.raw_decode(self.texto, self.posicion)
+            except json.JSONDecodeError:
+                if self._leer_mas():
+                    continue
+                raise
+            # Un número al final del bloque puede estar cortado ('0.' de '0.6' se lee como 0), así que solo lo aceptamos si después
+            # viene un separador; si no, leemos más y lo decodificamos otra vez
+            cortado = fin == len(self.texto) or (isinstance(valor, (int, float)) and self.texto[fin] not in _FIN_DE_NUMERO)
+            if cortado and self._leer_mas():
+                continue
+            self.posicion = fin
+            return valor
+
+
+# Recorre los elementos ('node', 'way', ...) de una respuesta de Overpass guardada en JSON sin cargar el archivo completo en memoria
+# Las demás llaves del objeto principal ('version', 'osm3s', ...) se leen y se descartan
+def leer_elementos_overpass(ruta_archivo, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    with open(ruta_archivo, encoding='utf-8') as archivo:
+        lector = _LectorJson(archivo, tamano_bloque)
+        if lector.siguiente_caracter() != '{':
+            raise ValueError(f"{ruta_archivo} no es una respuesta de Overpass (se esperaba un objeto JSON)")
+        lector.consumir('{')
+        if lector.siguiente_caracter() == '}':
+            return
+        while True:
+            llave = lector.valor()
+            lector.consumir(':')
+            if llave != 'elements':
+                lector.valor()
+            else:
+                lector.consumir('[')
+                if lector.siguiente_caracter() == ']':
+                    lector.consumir(']')
+                else:
+                    while True:
+                        yield lector.valor()
+                        if not lector.hay_otro(']'):
+                            break
+            if not lector.hay_otro('}'):
+                return
+
+
+# Busca en la carpeta de caché de OSMnx las respuestas de Overpass (las de Nominatim son listas, las de Overpass son objetos)
+def respuestas_overpass(directorio_cache=DIRECTORIO_CACHE_OSM):
+    rutas = []
+    for ruta_archivo in sorted(glob.glob(os.path.join(directorio_cache, '*.json'))):
+        with open(ruta_archivo, encoding='utf-8') as archivo:
+            if archivo.read(64).lstrip().startswith('{'):
+                rutas.append(ruta_archivo)
+    return rutas
+
+
+# Sentido de una vía con las reglas de OSMnx: 0 en los dos sentidos, 1 en el orden de sus nodos y -1 al revés
+def _sentido_via(etiquetas, bidireccional):
+    if bidireccional:
+        return 0
+    sentido = etiquetas.get('oneway')
+    if sentido in SENTIDO_UNICO:
+        return -1 if sentido in SENTIDO_CONTRARIO else 1
+    if etiquetas.get('junction') == 'roundabout':
+        return 1
+    return 0
+
+
+# Junta los nodos y las vías de una o varias respuestas, igual que OSMnx: si un nodo o una vía aparece en varias respuestas
+# se queda con los datos de la última, pero en la posición de la primera
+def _leer_respuestas(rutas_archivos, solo_calles, bidireccional, tamano_bloque):
+    indice_de_nodo = {}
+    ids_nodos, latitudes, longitudes = array('q'), array('d'), array('d')
+    # Cada vía es (nodos, código de sus etiquetas, sentido), las combinaciones de (highway, maxspeed) se guardan una sola vez
+    vias = {}
+    codigo_de_etiquetas = {}
+    for ruta_archivo in rutas_archivos:
+        for elemento in leer_elementos_overpass(ruta_archivo, tamano_bloque):
+            tipo = elemento.get('type')
+            if tipo == 'node':
+                indice = indice_de_nodo.setdefault(elemento['id'], len(ids_nodos))
+                if indice == len(ids_nodos):
+                    ids_nodos.append(elemento['id'])
+                    latitudes.append(elemento['lat'])
+                    longitudes.append(elemento['lon'])
+                else:
+                    latitudes[indice] = elemento['lat']
+                    longitudes[indice] = elemento['lon']
+            elif tipo == 'way':
+                etiquetas = elemento.get('tags', {})
+                if solo_calles and 'highway' not in etiquetas:
+                    continue
+                # Quitamos los nodos repetidos seguidos, como OSMnx
+                nodos_via = array('q')
+                for nodo in elemento.get('nodes', ()):
+                    if not nodos_via or nodos_via[-1] != nodo:
+                        nodos_via.append(nodo)
+                combinacion = (etiquetas.get('highway'), etiquetas.get('maxspeed'))
+                codigo = codigo_de_etiquetas.setdefault(combinacion, len(codigo_de_etiquetas))
+                vias[elemento['id']] = (nodos_via, codigo, _sentido_via(etiquetas, bidireccional))
+    return indice_de_nodo, ids_nodos, latitudes, longitudes, vias, list(codigo_de_etiquetas)
+
+
+# Convierte las vías en tramos dirigidos (índice de nodo origen, índice de nodo destino, código de etiquetas) en el orden en que OSMnx
+# agrega las aristas: primero los tramos de la vía en su sentido y después, si es de doble sentido, los mismos al revés
+# Un tramo con un nodo que no viene en las respuestas se salta (OSMnx falla con un error en ese caso)
+def _tramos(indice_de_nodo, vias):
+    origenes, destinos, codigos = array('q'), array('q'), array('q')
+    for nodos_via, codigo, sentido in vias.values():
+        indices = [indice_de_nodo.get(nodo, -1) for nodo in nodos_via]
+        if sentido < 0:
+            indices.reverse()
+        pares = [(nodo_u, nodo_v) for nodo_u, nodo_v in zip(indices[:-1], indices[1:]) if nodo_u >= 0 and nodo_v >= 0]
+        if sentido == 0:
+            pares += [(nodo_v, nodo_u) for nodo_u, nodo_v in pares]
+        for nodo_u, nodo_v in pares:
+            origenes.append(nodo_u)
+            destinos.append(nodo_v)
+        codigos.extend([codigo] * len(pares))
+    return np.frombuffer(origenes, dtype=np.int64), np.frombuffer(destinos, dtype=np.int64), np.frombuffer(codigos, dtype=np.int64)
+
+
+# Distancia de gran círculo en metros entre pares de puntos, con la misma fórmula que 'ox.distance.great_circle'
+def distancia_gran_circulo(lat_1, lon_1, lat_2, lon_2):
+    y_1 = np.deg2rad(lat_1)
+    y_2 = np.deg2rad(lat_2)
+    x_1 = np.deg2rad(lon_1)
+    x_2 = np.deg2rad(lon_2)
+    h = np.sin((y_2 - y_1) / 2) ** 2 + np.cos(y_1) * np.cos(y_2) * np.sin((x_2 - x_1) / 2) ** 2
+    h = np.minimum(1, h)
+    distancias = 2 * np.arcsin(np.sqrt(h)) * RADIO_TIERRA_METROS
+    distancias[np.isnan(distancias)] = 0
+    return distancias
+
+
+# Etiqueta cada nodo con el índice más chico de su componente débilmente conexa
+# Cada ronda cuelga la raíz de cada arista de la menor de las dos y después acorta los apuntadores, así se necesitan pocas rondas
+def _componentes_debiles(numero_nodos, origenes, destinos):
+    etiquetas = np.arange(numero_nodos, dtype=np.int64)
+    while True:
+        etiquetas_u, etiquetas_v = etiquetas[origenes], etiquetas[destinos]
+        menores = np.minimum(etiquetas_u, etiquetas_v)
+        nuevas = etiquetas.copy()
+        np.minimum.at(nuevas, etiquetas_u, menores)
+        np.minimum.at(nuevas, etiquetas_v, menores)
+        while True:
+            acortadas = nuevas[nuevas]
+            if np.array_equal(acortadas, nuevas):
+                break
+            nuevas = acortadas
+        if np.array_equal(nuevas, etiquetas):
+            return etiquetas
+        etiquetas = nuevas
+
+
+# Decide qué nodos son extremos de calle con las reglas de OSMnx ('_is_endpoint'): tiene un lazo, no tiene aristas de entrada
+# o de salida, o no tiene exactamente dos vecinos con grado 2 o 4. Los demás son nodos intermedios que solo dan forma a la calle
+def _nodos_extremo(numero_nodos, origenes, destinos):
+    grado_salida = np.bincount(origenes, minlength=numero_nodos)
+    grado_entrada = np.bincount(destinos, minlength=numero_nodos)
+    grado = grado_salida + grado_entrada
+    pares = np.unique(np.concatenate([origenes * numero_nodos + destinos, destinos * numero_nodos + origenes]))
+    numero_vecinos = np.bincount(pares // numero_nodos, minlength=numero_nodos)
+    con_lazo = np.zeros(numero_nodos, dtype=bool)
+    con_lazo[origenes[origenes == destinos]] = True
+    return con_lazo | (grado_salida == 0) | (grado_entrada == 0) | ~((numero_vecinos == 2) & ((grado == 2) | (grado == 4)))
+
+
+# Sigue la calle desde un extremo y su sucesor hasta el siguiente extremo, igual que '_build_path' de OSMnx
+# 'sucesores' y 'primeras' son la lista de sucesores distintos de cada nodo (en el orden en que se agregaron) y la primera arista hacia
+# cada uno. Devuelve los nodos del camino y las aristas que lo forman
+def _construir_camino(extremo, sucesor, arista_inicial, es_extremo, desplazamientos, sucesores, primeras):
+    camino, aristas = [extremo, sucesor], [arista_inicial]
+    en_camino = {extremo, sucesor}
+    for posicion in range(desplazamientos[sucesor], desplazamientos[sucesor + 1]):
+        siguiente = sucesores[posicion]
+        if siguiente in en_camino:
+            continue
+        camino.append(siguiente)
+        en_camino.add(siguiente)
+        aristas.append(primeras[posicion])
+        while not es_extremo[siguiente]:
+            candidatos = [otra for otra in range(desplazamientos[siguiente], desplazamientos[siguiente + 1])
+                          if sucesores[otra] not in en_camino]
+            if len(candidatos) == 1:
+                siguiente = sucesores[candidatos[0]]
+                camino.append(siguiente)
+                en_camino.add(siguiente)
+                aristas.append(primeras[candidatos[0]])
+            elif not candidatos:
+                # La calle da la vuelta y regresa al extremo donde empezó
+                for otra in range(desplazamientos[siguiente], desplazamientos[siguiente + 1]):
+                    if sucesores[otra] == extremo:
+                        return camino + [extremo], aristas + [primeras[otra]]
+                return camino, aristas
+            else:
+                raise ValueError(f"No se pudo simplificar la calle cerca del nodo con índice {siguiente}")
+        return camino, aristas
+    return camino, aristas
+
+
+# Junta los valores de un atributo de los tramos de una calle como OSMnx: si todos son iguales queda uno, si no una tupla con los distintos
+def _juntar_valores(valores):
+    presentes = [valor for valor in valores if valor is not None]
+    if not presentes:
+        return None
+    distintos = tuple(dict.fromkeys(presentes))
+    return distintos[0] if len(distintos) == 1 else distintos
+
+
+# Simplifica la topología como 'ox.simplify_graph': cada calle entre dos extremos queda como una sola arista
+# Devuelve los nodos que quedan (máscara), y las aristas (origen, destino, longitud, código de etiquetas) con las combinaciones nuevas
+# que aparecen al juntar tramos con etiquetas distintas
+def _simplificar(numero_nodos, origenes, destinos, longitudes, codigos, etiquetas):
+    es_extremo = _nodos_extremo(numero_nodos, origenes, destinos)
+    if not es_extremo.any():
+        # Todo el grafo es un anillo sin cruces, OSMnx lo quita completo
+        vacio = np.zeros(0, dtype=np.int64)
+        return np.zeros(numero_nodos, dtype=bool), vacio, vacio, np.zeros(0, dtype=np.float64), vacio, etiquetas
+
+    # Sucesores distintos de cada nodo en el orden en que se agregaron, con la primera arista (la de clave 0) hacia cada uno
+    _, primeras = np.unique(origenes * numero_nodos + destinos, return_index=True)
+    primeras = np.sort(primeras)
+    primeras = primeras[np.argsort(origenes[primeras], kind='stable')]
+    desplazamientos = np.zeros(numero_nodos + 1, dtype=np.int64)
+    desplazamientos[1:] = np.cumsum(np.bincount(origenes[primeras], minlength=numero_nodos))
+    desplazamientos_lista = desplazamientos.tolist()
+    sucesores = destinos[primeras].tolist()
+    primeras_lista = primeras.tolist()
+    es_extremo_lista = es_extremo.tolist()
+    longitudes_lista = longitudes.tolist()
+    codigos_lista = codigos.tolist()
+
+    codigo_de_etiquetas = {combinacion: codigo for codigo, combinacion in enumerate(etiquetas)}
+    etiquetas = list(etiquetas)
+    quitar = np.zeros(numero_nodos, dtype=bool)
+    nuevas_origenes, nuevas_destinos, nuevas_longitudes, nuevas_codigos = [], [], [], []
+    for extremo in np.flatnonzero(es_extremo).tolist():
+        for posicion in range(desplazamientos_lista[extremo], desplazamientos_lista[extremo + 1]):
+            sucesor = sucesores[posicion]
+            if es_extremo_lista[sucesor]:
+                continue
+            camino, aristas = _construir_camino(extremo, sucesor, primeras_lista[posicion], es_extremo_lista, desplazamientos_lista,
+                                                sucesores, primeras_lista)
+            quitar[camino[1:-1]] = True
+            nuevas_origenes.append(camino[0])
+            nuevas_destinos.append(camino[-1])
+            # La longitud se suma tramo por tramo en el mismo orden que OSMnx, así el resultado es idéntico
+            nuevas_longitudes.append(sum(longitudes_lista[arista] for arista in aristas))
+            codigos_camino = [codigos_lista[arista] for arista in aristas]
+            if len(set(codigos_camino)) == 1:
+                nuevas_codigos.append(codigos_camino[0])
+            else:
+                combinacion = (_juntar_valores([etiquetas[codigo][0] for codigo in codigos_camino]),
+                               _juntar_valores([etiquetas[codigo][1] for codigo in codigos_camino]))
+                codigo = codigo_de_etiquetas.setdefault(combinacion, len(etiquetas))
+                if codigo == len(etiquetas):
+                    etiquetas.append(combinacion)
+                nuevas_codigos.append(codigo)
+
+    # Se conservan las aristas entre nodos que no se quitaron, las calles simplificadas van después de las originales
+    # OSMnx agrega las calles simplificadas antes de quitar los nodos intermedios, así que si una calle termina en un nodo que quitó
+    # otro camino (pasa cuando la calle no tiene nodos intermedios propios) también desaparece
+    nuevas_origenes = np.array(nuevas_origenes, dtype=np.int64)
+    nuevas_destinos = np.array(nuevas_destinos, dtype=np.int64)
+    conservar = ~quitar[origenes] & ~quitar[destinos]
+    conservar_nuevas = ~quitar[nuevas_origenes] & ~quitar[nuevas_destinos]
+    return (
+        ~quitar,
+        np.concatenate([origenes[conservar], nuevas_origenes[conservar_nuevas]]),
+        np.concatenate([destinos[conservar], nuevas_destinos[conservar_nuevas]]),
+        np.concatenate([longitudes[conservar], np.array(nuevas_longitudes, dtype=np.float64)[conservar_nuevas]]),
+        np.concatenate([codigos[conservar], np.array(nuevas_codigos, dtype=np.int64)[conservar_nuevas]]),
+        etiquetas,
+    )
+
+
+# Proyecta latitud y longitud (grados) a metros en la zona UTM del centro del grafo, como 'ox.project_graph'
+# Usa las series de Snyder para el elipsoide WGS84, dentro de la zona la diferencia con pyproj es de milímetros
+def proyectar_utm(lat, lon):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if not len(lat):
+        return lat.copy(), lon.copy()
+    latitud_centro = (np.nanmin(lat) + np.nanmax(lat)) / 2
+    longitud_centro = (np.nanmin(lon) + np.nanmax(lon)) / 2
+    zona = int((longitud_centro + 180) // 6) + 1
+    meridiano_central = np.deg2rad((zona - 1) * 6 - 180 + 3)
+
+    e2 = ACHATAMIENTO * (2 - ACHATAMIENTO)
+    ep2 = e2 / (1 - e2)
+    phi = np.deg2rad(lat)
+    seno, coseno, tangente = np.sin(phi), np.cos(phi), np.tan(phi)
+    n = SEMIEJE_MAYOR_METROS / np.sqrt(1 - e2 * seno ** 2)
+    t = tangente ** 2
+    c = ep2 * coseno ** 2
+    a = coseno * (np.deg2rad(lon) - meridiano_central)
+    m = SEMIEJE_MAYOR_METROS * (
+        (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * phi
+        - (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) * np.sin(2 * phi)
+        + (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * phi)
+        - (35 * e2 ** 3 / 3072) * np.sin(6 * phi)
+    )
+    x = FACTOR_ESCALA_UTM * n * (a + (1 - t + c) * a ** 3 / 6 + (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * a ** 5 / 120)
+    y = FACTOR_ESCALA_UTM * (m + n * tangente * (
+        a ** 2 / 2 + (5 - t + 9 * c + 4 * c ** 2) * a ** 4 / 24 + (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * a ** 6 / 720
+    ))
+    return x + FALSO_ESTE_METROS, y + (FALSO_NORTE_SUR_METROS if latitud_centro < 0 else 0.0)
+
+
+# Número de cada arista entre su par (origen, destino), en el orden en que se agregaron: es la clave que le da NetworkX
+def _claves_paralelas(numero_nodos, origenes, destinos):
+    orden = np.argsort(origenes * numero_nodos + destinos, kind='stable')
+    pares = (origenes * numero_nodos + destinos)[orden]
+    inicio_grupo = np.ones(len(pares), dtype=bool)
+    inicio_grupo[1:] = pares[1:] != pares[:-1]
+    posiciones = np.arange(len(pares))
+    claves = np.empty(len(pares), dtype=np.int64)
+    claves[orden] = posiciones - np.maximum.accumulate(np.where(inicio_grupo, posiciones, 0))
+    return claves
+
+
+# Lee una o varias respuestas de Overpass y devuelve el 'GrafoCompilado' con los tiempos de viaje, sin construir un grafo de NetworkX
+# 'solo_calles' descarta las vías sin 'highway' (las respuestas de OSMnx ya vienen filtradas, un volcado local puede traer de todo)
+# 'bidireccional' trata todas las vías como de doble sentido, como OSMnx con las redes a pie
+# El grafo lleva en 'valores_highway' el 'highway' de cada arista compilada (en el orden del CSR) y en 'aristas_paralelas' las paralelas
+# que se descartaron, para guardarlos con la instantánea
+def compilar_desde_overpass(rutas_archivos, velocidades_por_tipo=None, velocidad_por_defecto_kmh=VELOCIDAD_POR_DEFECTO_KMH,
+                            solo_calles=False, bidireccional=False, atributo_peso='tiempo_viaje_segundos',
+                            tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    if isinstance(rutas_archivos, str):
+        rutas_archivos = [rutas_archivos]
+    indice_de_nodo, ids_nodos, latitudes, longitudes, vias, etiquetas = _leer_respuestas(
+        rutas_archivos, solo_calles, bidireccional, tamano_bloque)
+    if not ids_nodos:
+        raise ValueError(f"Las respuestas {', '.join(rutas_archivos)} no traen nodos")
+    origenes, destinos, codigos = _tramos(indice_de_nodo, vias)
+    # Ya no necesitamos los IDs de OSM de las vías ni el diccionario de nodos, los soltamos antes de armar los arreglos
+    del indice_de_nodo, vias
+    ids_nodos = np.frombuffer(ids_nodos, dtype=np.int64)
+    lat = np.frombuffer(latitudes, dtype=np.float64)
+    lon = np.frombuffer(longitudes, dtype=np.float64)
+    longitudes_tramos = distancia_gran_circulo(lat[origenes], lon[origenes], lat[destinos], lon[destinos])
+
+    # Nos quedamos con la componente débilmente conexa más grande, si hay empate gana la del nodo que aparece primero (como OSMnx)
+    componentes = _componentes_debiles(len(ids_nodos), origenes, destinos)
+    tamanos = np.bincount(componentes, minlength=len(ids_nodos))
+    en_componente = componentes == int(np.argmax(tamanos))
+    nuevo_indice = np.cumsum(en_componente) - 1
+    conservar = en_componente[origenes]
+    origenes, destinos = nuevo_indice[origenes[conservar]], nuevo_indice[destinos[conservar]]
+    longitudes_tramos, codigos = longitudes_tramos[conservar], codigos[conservar]
+    ids_nodos, lat, lon = ids_nodos[en_componente], lat[en_componente], lon[en_componente]
+
+    quedan, origenes, destinos, longitudes_aristas, codigos, etiquetas = _simplificar(
+        len(ids_nodos), origenes, destinos, longitudes_tramos, codigos, etiquetas)
+    nuevo_indice = np.cumsum(quedan) - 1
+    origenes, destinos = nuevo_indice[origenes], nuevo_indice[destinos]
+    ids_nodos, lat, lon = ids_nodos[quedan], lat[quedan], lon[quedan]
+
+    # Velocidad de cada combinación de etiquetas una sola vez, después se reparte a las aristas
+    velocidades_por_codigo = calcular_velocidades([velocidad for _, velocidad in etiquetas], [highway for highway, _ in etiquetas],
+                                                  velocidades_por_tipo, velocidad_por_defecto_kmh)
+    velocidades_kmh = velocidades_por_codigo[codigos]
+    pesos = calcular_tiempos(longitudes_aristas, velocidades_kmh)
+    claves = _claves_paralelas(len(ids_nodos), origenes, destinos)
+    x, y = proyectar_utm(lat, lon)
+    grafo_compilado = compilar_desde_aristas(ids_nodos.tolist(), x, y, origenes, destinos, pesos, longitudes_aristas, claves,
+                                             atributo_peso, velocidades_kmh, lat, lon)
+
+    # El 'highway' de cada arista compilada y las paralelas descartadas, para guardarlos con la instantánea
+    return anotar_aristas_compiladas(grafo_compilado, origenes, destinos, claves, pesos, [highway for highway, _ in etiquetas], codigos)
+
+
+# Programa que arma el grafo en un proceso nuevo, guarda la instantánea en 'salida' y reporta el tiempo y la memoria
+# 'memoria_base_kb' es el pico después de importar las librerías, lo que crece desde ahí es lo que costó armar el grafo
+_PROGRAMA_CONSTRUCCION = '''
+import json, sys, time
+sys.path.insert(0, {directorio_codigo!r})
+try:
+    import resource
+    def memoria_kb():
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico // 1024 if sys.platform == 'darwin' else pico
+except ImportError:
+    def memoria_kb():
+        return None
+from instantanea_grafo import guardar_instantanea
+{importaciones}
+memoria_base_kb = memoria_kb()
+inicio = time.perf_counter()
+{construccion}
+segundos = time.perf_counter() - inicio
+pico_memoria_kb = memoria_kb()
+guardar_instantanea(grafo_compilado, {salida!r}, None, grafo_compilado.valores_highway, grafo_compilado.aristas_paralelas)
+print(json.dumps({{'segundos': segundos, 'memoria_base_kb': memoria_base_kb, 'pico_memoria_kb': pico_memoria_kb}}))
+'''
+
+# Cómo arma el grafo cada camino: (importaciones, construcción)
+# 'osmnx' son los mismos pasos que 'ox.graph_from_place' hace con las respuestas ya descargadas, más la proyección y la compilación
+# que hace el script principal; 'flujo' es 'compilar_desde_overpass'. Los dos dejan en el grafo compilado el 'highway' y las paralelas
+CAMINOS_CONSTRUCCION = {
+    'osmnx': ('''
+import osmnx as ox
+from osmnx import simplification, truncate
+from osmnx.graph import _create_graph
+from ponderacion import compilar_grafo_ponderado
+ox.settings.log_console = False
+''', '''
+def respuestas():
+    for ruta_archivo in {rutas!r}:
+        with open(ruta_archivo, encoding='utf-8') as archivo:
+            respuesta = json.load(archivo)
+        if {solo_calles!r}:
+            respuesta['elements'] = [elemento for elemento in respuesta['elements']
+                                     if elemento.get('type') != 'way' or 'highway' in elemento.get('tags', {{}})]
+        yield respuesta
+grafo = _create_graph(respuestas(), {bidireccional!r})
+grafo = truncate.largest_component(grafo, strongly=False)
+grafo = simplification.simplify_graph(grafo)
+grafo = ox.project_graph(grafo)
+grafo_compilado = compilar_grafo_ponderado(grafo, {velocidades_por_tipo!r}, {velocidad_por_defecto_kmh!r})
+'''),
+    'flujo': ('''
+from carga_overpass import compilar_desde_overpass
+''', '''
+grafo_compilado = compilar_desde_overpass({rutas!r}, {velocidades_por_tipo!r}, {velocidad_por_defecto_kmh!r}, {solo_calles!r},
+                                          {bidireccional!r})
+'''),
+}
+
+
+# Busca las mismas rutas en los dos grafos con Dijkstra y cuenta cuántas salen idénticas (mismos nodos y mismo tiempo)
+# Si dos caminos distintos empatan en tiempo se cuentan aparte, eso depende solo del orden en que se revisan los vecinos
+def comparar_rutas(grafo_referencia, grafo_nuevo, numero_pares=200, semilla=0):
+    comunes = sorted(set(grafo_referencia.ids_nodos.tolist()).intersection(grafo_nuevo.ids_nodos.tolist()))
+    generador = random.Random(semilla)
+    pares = [(generador.choice(comunes), generador.choice(comunes)) for _ in range(numero_pares)] if comunes else []
+    identicas, empates, distintas = 0, 0, 0
+    for nodo_origen, nodo_destino in pares:
+        ruta_referencia = dijkstra_compilado(grafo_referencia, nodo_origen, nodo_destino)
+        ruta_nueva = dijkstra_compilado(grafo_nuevo, nodo_origen, nodo_destino)
+        if ruta_referencia is None or ruta_nueva is None:
+            if ruta_referencia is None and ruta_nueva is None:
+                identicas += 1
+            else:
+                distintas += 1
+            continue
+        distancia_referencia, tiempo_referencia = grafo_referencia.resumen_ruta(ruta_referencia)
+        distancia_nueva, tiempo_nuevo = grafo_nuevo.resumen_ruta(ruta_nueva)
+        if abs(tiempo_referencia - tiempo_nuevo) > TOLERANCIA_SEGUNDOS:
+            distintas += 1
+        elif ruta_referencia == ruta_nueva and abs(distancia_referencia - distancia_nueva) <= TOLERANCIA_SEGUNDOS:
+            identicas += 1
+        else:
+            empates += 1
+    return {
+        'mismos_nodos': set(comunes) == set(grafo_referencia.ids_nodos.tolist()) == set(grafo_nuevo.ids_nodos.tolist()),
+        'pares': len(pares),
+        'rutas_identicas': identicas,
+        'mismo_tiempo_otro_camino': empates,
+        'rutas_distintas': distintas,
+    }
+
+
+# Arma el grafo con el camino de OSMnx y con 'compilar_desde_overpass', cada uno en un proceso nuevo para que el pico de memoria
+# de uno no se mezcle con el del otro, y compara el tiempo de construcción, la memoria y las rutas
+def comparar_con_osmnx(rutas_archivos, numero_pares=200, semilla=0, velocidades_por_tipo=None,
+                       velocidad_por_defecto_kmh=VELOCIDAD_POR_DEFECTO_KMH, solo_calles=False, bidireccional=False):
+    # La instantánea se importa aquí porque este módulo también la usa el proceso que arma el grafo
+    from instantanea_grafo import cargar_instantanea
+
+    parametros = {
+        'rutas': [os.path.abspath(ruta_archivo) for ruta_archivo in rutas_archivos],
+        'velocidades_por_tipo': dict(velocidades_por_tipo or {}),
+        'velocidad_por_defecto_kmh': float(velocidad_por_defecto_kmh),
+        'solo_calles': bool(solo_calles),
+        'bidireccional': bool(bidireccional),
+    }
+    carpeta_temporal = tempfile.mkdtemp(prefix='comparacion_overpass_')
+    try:
+        reporte, grafos = {}, {}
+        for camino, (importaciones, construccion) in CAMINOS_CONSTRUCCION.items():
+            directorio_salida = os.path.join(carpeta_temporal, camino)
+            programa = _PROGRAMA_CONSTRUCCION.format(
+                directorio_codigo=os.path.dirname(os.path.abspath(__file__)),
+                importaciones=importaciones,
+                construccion=construccion.format(**parametros),
+                salida=directorio_salida,
+            )
+            salida = subprocess.run([sys.executable, '-c', programa], capture_output=True, text=True)
+            if salida.returncode != 0:
+                ultima_linea = salida.stderr.strip().splitlines()[-1] if salida.stderr.strip() else 'falló'
+                raise RuntimeError(f"No se pudo armar el grafo con el camino '{camino}': {ultima_linea}")
+            datos = json.loads(salida.stdout.strip().splitlines()[-1])
+            grafos[camino] = cargar_instantanea(directorio_salida)
+            if datos['pico_memoria_kb'] is not None:
+                datos['memoria_construccion_kb'] = datos['pico_memoria_kb'] - datos['memoria_base_kb']
+            datos['numero_nodos'] = grafos[camino].numero_nodos
+            datos['numero_aristas'] = grafos[camino].numero_aristas
+            reporte[camino] = datos
+        reporte['rutas'] = comparar_rutas(grafos['osmnx'], grafos['flujo'], numero_pares, semilla)
+        return reporte
+    finally:
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    analizador = argparse.ArgumentParser(description='Grafo de rutas directo desde respuestas de Overpass, sin NetworkX')
+    subcomandos = analizador.add_subparsers(dest='comando', required=True)
+
+    comando_instantanea = subcomandos.add_parser('instantanea', help='arma el grafo y lo guarda como instantánea')
+    comando_instantanea.add_argument('--salida', required=True, help='carpeta de la instantánea')
+
+    comando_comparar = subcomandos.add_parser('comparar', help='compara tiempo, memoria y rutas contra el camino de OSMnx')
+    comando_comparar.add_argument('--pares', type=int, default=200)
+    comando_comparar.add_argument('--semilla', type=int, default=0)
+    comando_comparar.add_argument('--reporte', help='archivo JSON donde guardar el reporte (por defecto solo se imprime)')
+
+    for comando in (comando_instantanea, comando_comparar):
+        comando.add_argument('archivos', nargs='*', help=f"respuestas de Overpass en JSON (por defecto las de '{DIRECTORIO_CACHE_OSM}/')")
+        comando.add_argument('--solo-calles', action='store_true', help="descartar las vías sin 'highway'")
+        comando.add_argument('--bidireccional', action='store_true', help='todas las vías en los dos sentidos (redes a pie)')
+    argumentos = analizador.parse_args()
+
+    rutas_archivos = argumentos.archivos or respuestas_overpass()
+    if not rutas_archivos:
+        sys.exit(f"No hay respuestas de Overpass en '{DIRECTORIO_CACHE_OSM}/', pasa los archivos en la línea de comandos")
+
+    # Usamos los mismos parámetros de velocidad que el script principal
+    from script_principal import cargar_script_principal
+    script_principal = cargar_script_principal()
+    velocidades_por_tipo = script_principal.VELOCIDADES_POR_TIPO_KMH
+    velocidad_por_defecto_kmh = script_principal.VELOCIDAD_POR_DEFECTO_KMH
+
+    if argumentos.comando == 'instantanea':
+        from instantanea_grafo import guardar_instantanea
+        inicio = time.perf_counter()
+        grafo_compilado = compilar_desde_overpass(rutas_archivos, velocidades_por_tipo, velocidad_por_defecto_kmh,
+                                                  argumentos.solo_calles, argumentos.bidireccional)
+        guardar_instantanea(grafo_compilado, argumentos.salida, {
+            'archivos_overpass': [os.path.basename(ruta_archivo) for ruta_archivo in rutas_archivos],
+            'parametros_velocidad': {'velocidad_por_defecto_kmh': velocidad_por_defecto_kmh,
+                                     'velocidades_por_tipo_kmh': velocidades_por_tipo},
+        }, grafo_compilado.valores_highway, grafo_compilado.aristas_paralelas)
+        print(f"{grafo_compilado.numero_nodos} nodos y {grafo_compilado.numero_aristas} aristas guardados en {argumentos.salida} "
+              f"en {time.perf_counter() - inicio:.2f} s")
+    else:
+        reporte = comparar_con_osmnx(rutas_archivos, argumentos.pares, argumentos.semilla, velocidades_por_tipo,
+                                     velocidad_por_defecto_kmh, argumentos.solo_calles, argumentos.bidireccional)
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        print(texto)
+        if argumentos.reporte:
+            with open(argumentos.reporte, 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        # Terminamos con código 1 si alguna ruta no salió igual, así se puede usar en una revisión automática
+        sys.exit(1 if reporte['rutas']['rutas_distintas'] else 0)
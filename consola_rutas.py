@@ -0,0 +1,234 @@
+# En este archivo está la línea de comandos para calcular rutas sin ventana ni mapa, pensada para trabajos por lotes que lanzan
+# muchos procesos cortos. Solo importa lo necesario para buscar rutas (numpy y nuestros módulos): osmnx, matplotlib y tkinter
+# se cargan únicamente si hace falta construir la instantánea del grafo por primera vez (la descarga de OSM).
+#
+# Subcomandos:
+#   ruta LAT_ORIGEN LON_ORIGEN LAT_DESTINO LON_DESTINO   -> imprime un JSON con la ruta
+#   lote ARCHIVO.csv                                      -> lee pares de un CSV y escribe una línea JSON (o CSV) por par, según se calculan
+#   arranque                                              -> mide cuánto tarda en arrancar cada modo y lo compara contra su presupuesto
+#
+# El CSV de entrada tiene las columnas 'lat_origen,lon_origen,lat_destino,lon_destino' (el encabezado es opcional y puede traer más columnas).
+# Con '-' como archivo se lee de la entrada estándar.
+#
+# Uso: python consola_rutas.py ruta 17.0612 -96.7254 17.0776 -96.7081 [--estrategia a_estrella] [--instantanea CARPETA]
+#      python consola_rutas.py lote pares.csv [--formato jsonl|csv] [--con-ruta] [--salida resultados.jsonl]
+#      python consola_rutas.py arranque [--repeticiones 5]
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'csv' para leer los pares y escribir los resultados en CSV
+import csv
+# Importamos 'json' para escribir los resultados
+import json
+# Importamos 'os', 'subprocess' y 'sys' para medir el arranque de cada modo en un proceso nuevo
+import os
+import subprocess
+import sys
+# Importamos 'time' para medir cuánto tarda cada lote
+import time
+
+# Importamos lo necesario para abrir el grafo, pegar puntos a la red y buscar rutas (nada de esto importa osmnx, matplotlib ni tkinter)
+from estrategias_busqueda import ESTRATEGIAS, buscar_ruta
+from indice_espacial import obtener_indice_espacial
+from instantanea_grafo import cargar_instantanea
+from script_principal import cargar_script_principal
+
+# Estrategia de búsqueda que se usa si no se pide otra
+ESTRATEGIA_POR_DEFECTO = 'bidireccional_a_estrella'
+
+# Número de pares que se leen del CSV antes de pegarlos a la red, el índice espacial pega muchos puntos de una sola vez
+PARES_POR_BLOQUE = 1000
+
+# Columnas del CSV de entrada y de salida
+COLUMNAS_ENTRADA = ('lat_origen', 'lon_origen', 'lat_destino', 'lon_destino')
+COLUMNAS_SALIDA = COLUMNAS_ENTRADA + ('nodo_origen', 'nodo_destino', 'encontrada', 'distancia_metros', 'tiempo_segundos',
+                                      'nodos_visitados')
+
+# Código que ejecuta cada modo al arrancar, y su presupuesto de tiempo de importación en milisegundos ('None' = solo se reporta)
+# 'grafico' es lo que cargaba antes cualquier script que importara el script principal, sirve de comparación
+MODOS_ARRANQUE = {
+    'motor': ('from script_principal import cargar_script_principal; cargar_script_principal()', 300),
+    'consola': ('import consola_rutas', 300),
+    'servidor': ('import servidor_rutas', 400),
+    'grafico': ('import tkinter, matplotlib.pyplot, osmnx', None),
+}
+
+# Módulos que los modos sin pantalla no deberían cargar
+MODULOS_PESADOS = ('osmnx', 'networkx', 'matplotlib', 'tkinter', 'geopandas', 'shapely')
+
+# Programa que corre cada proceso de la medición de arranque: importa el modo y reporta el tiempo y los módulos pesados cargados
+# La carpeta del código va primero en 'sys.path', así la medición funciona desde cualquier carpeta
+_PROGRAMA_ARRANQUE = '''
+import json, sys, time
+sys.path.insert(0, {directorio_codigo!r})
+inicio = time.perf_counter()
+{codigo}
+importacion_ms = (time.perf_counter() - inicio) * 1000.0
+print(json.dumps({{'importacion_ms': importacion_ms,
+                  'modulos_pesados': sorted(m for m in {modulos!r} if m in sys.modules)}}))
+'''
+
+
+# Abre el grafo compilado: de la carpeta de instantánea indicada, o la del script principal (que se construye descargando el mapa si no existe)
+def abrir_grafo(directorio_instantanea=None):
+    if directorio_instantanea is not None:
+        return cargar_instantanea(directorio_instantanea)
+    return cargar_script_principal().cargar_grafo_enrutamiento()
+
+
+# Calcula las rutas de una lista de pares [(lat_o, lon_o, lat_d, lon_d), ...] y devuelve un diccionario por par
+def calcular_pares(grafo_compilado, indice_espacial, pares, estrategia=ESTRATEGIA_POR_DEFECTO, con_ruta=False):
+    latitudes = [par[0] for par in pares] + [par[2] for par in pares]
+    longitudes = [par[1] for par in pares] + [par[3] for par in pares]
+    nodos, _ = indice_espacial.nodos_mas_cercanos(latitudes, longitudes)
+    nodos = nodos.tolist()
+    resultados = []
+    for posicion, (lat_origen, lon_origen, lat_destino, lon_destino) in enumerate(pares):
+        nodo_origen, nodo_destino = nodos[posicion], nodos[len(pares) + posicion]
+        resultado_busqueda = buscar_ruta(grafo_compilado, nodo_origen, nodo_destino, estrategia)
+        resultado = {
+            'lat_origen': lat_origen, 'lon_origen': lon_origen, 'lat_destino': lat_destino, 'lon_destino': lon_destino,
+            'nodo_origen': nodo_origen, 'nodo_destino': nodo_destino,
+            'encontrada': resultado_busqueda.camino is not None,
+            'distancia_metros': None, 'tiempo_segundos': None,
+            'nodos_visitados': resultado_busqueda.nodos_visitados,
+        }
+        if resultado_busqueda.camino is not None:
+            resultado['distancia_metros'], resultado['tiempo_segundos'] = grafo_compilado.resumen_ruta(resultado_busqueda.camino)
+            if con_ruta:
+                resultado['ruta'] = resultado_busqueda.camino
+        resultados.append(resultado)
+    return resultados
+
+
+# Lee los pares del CSV poco a poco (sin cargar todo el archivo) y los devuelve en bloques de 'tamano_bloque'
+# Las filas vacías o que no son números (como el encabezado) se saltan; si hay encabezado se usan sus nombres de columna
+def leer_pares(archivo, tamano_bloque=PARES_POR_BLOQUE):
+    lector = csv.reader(archivo)
+    posiciones = list(range(len(COLUMNAS_ENTRADA)))
+    bloque = []
+    for numero_fila, fila in enumerate(lector, start=1):
+        if not fila or not any(valor.strip() for valor in fila):
+            continue
+        if numero_fila == 1 and all(columna in fila for columna in COLUMNAS_ENTRADA):
+            posiciones = [fila.index(columna) for columna in COLUMNAS_ENTRADA]
+            continue
+        try:
+            bloque.append(tuple(float(fila[posicion]) for posicion in posiciones))
+        except (ValueError, IndexError):
+            print(f"Fila {numero_fila} ignorada: se esperaban cuatro números", file=sys.stderr)
+            continue
+        if len(bloque) >= tamano_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+# Procesa un CSV de pares y escribe cada resultado en cuanto se calcula, devuelve cuántos pares se procesaron
+def procesar_lote(grafo_compilado, archivo_entrada, archivo_salida, estrategia=ESTRATEGIA_POR_DEFECTO, formato='jsonl',
+                  con_ruta=False):
+    indice_espacial = obtener_indice_espacial(grafo_compilado)
+    escritor_csv = None
+    if formato == 'csv':
+        escritor_csv = csv.DictWriter(archivo_salida, fieldnames=COLUMNAS_SALIDA, extrasaction='ignore')
+        escritor_csv.writeheader()
+    total = 0
+    for bloque in leer_pares(archivo_entrada):
+        for resultado in calcular_pares(grafo_compilado, indice_espacial, bloque, estrategia, con_ruta):
+            if escritor_csv is not None:
+                escritor_csv.writerow(resultado)
+            else:
+                archivo_salida.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        # Vaciamos la salida después de cada bloque para que otro programa pueda ir leyendo los resultados
+        archivo_salida.flush()
+        total += len(bloque)
+    return total
+
+
+# Mide el arranque de cada modo en procesos nuevos (la mediana de varias repeticiones) y lo compara contra su presupuesto
+def medir_arranque(modos=None, repeticiones=5):
+    reporte = {}
+    for modo in modos or MODOS_ARRANQUE:
+        codigo, presupuesto_ms = MODOS_ARRANQUE[modo]
+        programa = _PROGRAMA_ARRANQUE.format(directorio_codigo=os.path.dirname(os.path.abspath(__file__)), codigo=codigo,
+                                             modulos=MODULOS_PESADOS)
+        importaciones, procesos, modulos_pesados = [], [], []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            salida = subprocess.run([sys.executable, '-c', programa], capture_output=True, text=True)
+            procesos.append((time.perf_counter() - inicio) * 1000.0)
+            if salida.returncode != 0:
+                reporte[modo] = {'error': salida.stderr.strip().splitlines()[-1] if salida.stderr.strip() else 'falló'}
+                break
+            datos = json.loads(salida.stdout.strip().splitlines()[-1])
+            importaciones.append(datos['importacion_ms'])
+            modulos_pesados = datos['modulos_pesados']
+        if modo in reporte:
+            continue
+        importacion_ms = sorted(importaciones)[len(importaciones) // 2]
+        reporte[modo] = {
+            'importacion_ms': importacion_ms,
+            'proceso_completo_ms': sorted(procesos)[len(procesos) // 2],
+            'presupuesto_ms': presupuesto_ms,
+            # Un modo sin pantalla que carga un módulo pesado tampoco cumple, aunque esta vez haya arrancado a tiempo
+            'dentro_de_presupuesto': None if presupuesto_ms is None else importacion_ms <= presupuesto_ms and not modulos_pesados,
+            'modulos_pesados': modulos_pesados,
+        }
+    return reporte
+
+
+if __name__ == "__main__":
+    analizador = argparse.ArgumentParser(description='Rutas desde la línea de comandos, sin ventana ni mapa')
+    subcomandos = analizador.add_subparsers(dest='comando', required=True)
+
+    comando_ruta = subcomandos.add_parser('ruta', help='una ruta entre dos puntos')
+    for nombre in COLUMNAS_ENTRADA:
+        comando_ruta.add_argument(nombre, type=float)
+    comando_ruta.add_argument('--con-ruta', action='store_true', help='incluir la lista de nodos de la ruta')
+
+    comando_lote = subcomandos.add_parser('lote', help='muchas rutas desde un CSV')
+    comando_lote.add_argument('archivo', help="CSV de pares ('-' para la entrada estándar)")
+    comando_lote.add_argument('--formato', choices=('jsonl', 'csv'), default='jsonl')
+    comando_lote.add_argument('--salida', default='-', help="archivo de salida ('-' para la salida estándar)")
+    comando_lote.add_argument('--con-ruta', action='store_true', help='incluir la lista de nodos de cada ruta (solo jsonl)')
+
+    for comando in (comando_ruta, comando_lote):
+        comando.add_argument('--estrategia', choices=tuple(ESTRATEGIAS), default=ESTRATEGIA_POR_DEFECTO)
+        comando.add_argument('--instantanea', help='carpeta de una instantánea del grafo (por defecto la del script principal)')
+
+    comando_arranque = subcomandos.add_parser('arranque', help='mide el tiempo de arranque de cada modo')
+    comando_arranque.add_argument('--modos', default=','.join(MODOS_ARRANQUE), help='lista separada por comas')
+    comando_arranque.add_argument('--repeticiones', type=int, default=5)
+    argumentos = analizador.parse_args()
+
+    if argumentos.comando == 'arranque':
+        reporte = medir_arranque([modo.strip() for modo in argumentos.modos.split(',') if modo.strip()], argumentos.repeticiones)
+        print(json.dumps(reporte, indent=2, ensure_ascii=False))
+        # Terminamos con código 1 si algún modo se pasó de su presupuesto, así se puede usar en una revisión automática
+        sys.exit(1 if any(datos.get('dentro_de_presupuesto') is False or 'error' in datos for datos in reporte.values()) else 0)
+
+    grafo_compilado = abrir_grafo(argumentos.instantanea)
+    if argumentos.comando == 'ruta':
+        par = tuple(getattr(argumentos, nombre) for nombre in COLUMNAS_ENTRADA)
+        resultado = calcular_pares(grafo_compilado, obtener_indice_espacial(grafo_compilado), [par], argumentos.estrategia,
+                                   argumentos.con_ruta)[0]
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        sys.exit(0 if resultado['encontrada'] else 1)
+
+    inicio = time.perf_counter()
+    archivo_entrada = sys.stdin if argumentos.archivo == '-' else open(argumentos.archivo, newline='', encoding='utf-8')
+    archivo_salida = sys.stdout if argumentos.salida == '-' else open(argumentos.salida, 'w', newline='', encoding='utf-8')
+    try:
+        total = procesar_lote(grafo_compilado, archivo_entrada, archivo_salida, argumentos.estrategia, argumentos.formato,
+                              argumentos.con_ruta)
+    except BrokenPipeError:
+        # El programa que leía la salida (por ejemplo 'head') ya terminó, no es un error nuestro
+        sys.stderr.close()
+        sys.exit(0)
+    finally:
+        if archivo_entrada is not sys.stdin:
+            archivo_entrada.close()
+        if archivo_salida is not sys.stdout:
+            archivo_salida.close()
+    print(f"{total} pares en {time.perf_counter() - inicio:.2f} s", file=sys.stderr)
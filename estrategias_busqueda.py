@@ -0,0 +1,204 @@
+# En este archivo están las distintas estrategias para buscar la ruta más corta sobre el grafo compilado (ver 'grafo_compilado.py').
+# Todas devuelven exactamente el mismo tiempo de viaje, lo que cambia es cuántos nodos tienen que visitar para encontrarlo:
+#   - 'dijkstra': se expande en todas las direcciones hasta sacar el destino de la cola, como 'dijkstra_iterativo'
+#   - 'a_estrella': A* con la distancia en línea recta dividida entre la velocidad máxima del grafo como heurística
+#   - 'bidireccional': un Dijkstra desde el origen y otro desde el destino (sobre las aristas invertidas) hasta que se encuentran
+#   - 'bidireccional_a_estrella': lo mismo pero guiando ambas búsquedas con la heurística de A*
+# La heurística usa las coordenadas 'x'/'y' en metros que deja 'ox.project_graph' en cada nodo.
+
+# Importamos 'heapq' para las colas de prioridad
+import heapq
+# Importamos 'math' para calcular distancias en línea recta con 'math.hypot'
+import math
+
+# Importamos el Dijkstra sobre índices densos del grafo compilado
+from grafo_compilado import dijkstra_indices
+
+
+# Esta clase guarda el resultado de una búsqueda: el camino, su tiempo total y cuántos nodos se visitaron para encontrarlo
+class ResultadoBusqueda:
+    def __init__(self, camino, tiempo_total, nodos_visitados, estrategia):
+        # Lista de IDs de OSM del origen al destino, o 'None' si el destino es inalcanzable
+        self.camino = camino
+        # Suma de los pesos de las aristas del camino (segundos si el peso es 'tiempo_viaje_segundos')
+        self.tiempo_total = tiempo_total
+        # Nodos que la búsqueda sacó de la cola y marcó como visitados (en las bidireccionales se suman ambos lados)
+        self.nodos_visitados = nodos_visitados
+        # Nombre de la estrategia que produjo este resultado
+        self.estrategia = estrategia
+
+    def __repr__(self):
+        return (f"ResultadoBusqueda(estrategia={self.estrategia!r}, tiempo_total={self.tiempo_total:.2f}, "
+                f"nodos_visitados={self.nodos_visitados}, nodos_en_camino={len(self.camino) if self.camino else 0})")
+
+
+# Construye la función heurística h(v) = distancia en línea recta de v al nodo 'indice_objetivo' / velocidad máxima
+# Multiplicamos la velocidad por un poquito más de 1 para que los redondeos de punto flotante nunca hagan que la heurística sobreestime
+def heuristica_hacia(grafo_compilado, indice_objetivo, velocidad_maxima):
+    lista_x, lista_y = grafo_compilado.coordenadas_listas()
+    objetivo_x = lista_x[indice_objetivo]
+    objetivo_y = lista_y[indice_objetivo]
+    # Si la velocidad es infinita o no hay coordenadas la heurística vale 0 y A* se comporta igual que Dijkstra
+    if not math.isfinite(velocidad_maxima) or velocidad_maxima <= 0 or math.isnan(objetivo_x) or math.isnan(objetivo_y):
+        return lambda indice: 0.0
+    inverso_velocidad = 1.0 / (velocidad_maxima * (1.0 + 1e-9))
+    return lambda indice: math.hypot(lista_x[indice] - objetivo_x, lista_y[indice] - objetivo_y) * inverso_velocidad
+
+
+# Reconstruye la lista de índices yendo hacia atrás por los predecesores desde 'indice_final' hasta encontrar -1
+def _reconstruir(predecesores, indice_final):
+    camino = []
+    nodo_camino_actual = indice_final
+    while nodo_camino_actual != -1:
+        camino.append(nodo_camino_actual)
+        nodo_camino_actual = predecesores[nodo_camino_actual]
+    return camino
+
+
+# A* sobre índices densos, devuelve (tiempo_total, lista_de_indices, nodos_visitados)
+# La heurística es consistente, así que la primera vez que sacamos el destino de la cola ya tenemos el camino más corto
+def a_estrella_indices(grafo_compilado, indice_origen, indice_destino, velocidad_maxima):
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+    memoria = grafo_compilado.memoria_busqueda()
+    consulta = memoria.nueva_consulta()
+    distancias = memoria.distancias
+    predecesores = memoria.predecesores
+    marcas = memoria.marcas
+    cerrados = memoria.cerrados
+    heuristica = heuristica_hacia(grafo_compilado, indice_destino, velocidad_maxima)
+
+    distancias[indice_origen] = 0.0
+    predecesores[indice_origen] = -1
+    marcas[indice_origen] = consulta
+    # En la cola guardamos (distancia + heurística, nodo), así se sacan primero los nodos que parecen estar más cerca del destino
+    cola_prioridad = [(heuristica(indice_origen), indice_origen)]
+    nodos_visitados = 0
+
+    while cola_prioridad:
+        _, nodo_actual = heapq.heappop(cola_prioridad)
+        if cerrados[nodo_actual] == consulta:
+            continue
+        cerrados[nodo_actual] = consulta
+        nodos_visitados += 1
+        if nodo_actual == indice_destino:
+            break
+        distancia_actual = distancias[nodo_actual]
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            nueva_distancia = distancia_actual + pesos[posicion]
+            # Una calle cerrada (peso infinito) no alcanza a ningún nodo, aunque el nodo todavía no tenga distancia en esta consulta
+            if ((marcas[vecino] != consulta and nueva_distancia < float('inf'))
+                    or nueva_distancia < distancias[vecino]):
+                distancias[vecino] = nueva_distancia
+                predecesores[vecino] = nodo_actual
+                marcas[vecino] = consulta
+                heapq.heappush(cola_prioridad, (nueva_distancia + heuristica(vecino), vecino))
+
+    if cerrados[indice_destino] != consulta:
+        return float('inf'), None, nodos_visitados
+    return distancias[indice_destino], _reconstruir(predecesores, indice_destino)[::-1], nodos_visitados
+
+
+# Búsqueda bidireccional sobre índices densos, devuelve (tiempo_total, lista_de_indices, nodos_visitados)
+# Si 'velocidad_maxima' es 'None' es un Dijkstra bidireccional; si no, es A* bidireccional con potenciales promediados:
+#   p(v) = (h_destino(v) - h_origen(v)) / 2
+# La búsqueda hacia adelante ordena su cola por d(v) + p(v) y la de hacia atrás por d(v) - p(v), así ambas usan pesos reducidos no negativos.
+# Regla de parada: 'mejor_total' es el mejor camino completo visto hasta ahora (suma de una distancia hacia adelante, una arista y una hacia atrás)
+# y cuando la suma de los topes de ambas colas ya no es menor que 'mejor_total', ningún camino sin revisar puede mejorarlo.
+def bidireccional_indices(grafo_compilado, indice_origen, indice_destino, velocidad_maxima=None):
+    # Caso especial: el origen y el destino son el mismo nodo
+    if indice_origen == indice_destino:
+        return 0.0, [indice_origen], 1
+
+    grafo_reverso = grafo_compilado.reverso()
+    # Preparamos los datos de cada lado: 0 es hacia adelante (desde el origen) y 1 es hacia atrás (desde el destino)
+    lados = []
+    for grafo_lado, indice_inicio in ((grafo_compilado, indice_origen), (grafo_reverso, indice_destino)):
+        memoria = grafo_lado.memoria_busqueda()
+        consulta = memoria.nueva_consulta()
+        memoria.distancias[indice_inicio] = 0.0
+        memoria.predecesores[indice_inicio] = -1
+        memoria.marcas[indice_inicio] = consulta
+        lados.append((grafo_lado.listas(), memoria, consulta))
+
+    # Potencial de cada nodo, si no hay heurística vale 0 y tenemos un Dijkstra bidireccional normal
+    if velocidad_maxima is None:
+        potencial = lambda indice: 0.0
+    else:
+        heuristica_destino = heuristica_hacia(grafo_compilado, indice_destino, velocidad_maxima)
+        heuristica_origen = heuristica_hacia(grafo_compilado, indice_origen, velocidad_maxima)
+        potencial = lambda indice: 0.5 * (heuristica_destino(indice) - heuristica_origen(indice))
+    # El lado de hacia atrás usa el potencial con el signo contrario
+    signos = (1.0, -1.0)
+
+    colas = ([(potencial(indice_origen), indice_origen)], [(-potencial(indice_destino), indice_destino)])
+    mejor_total = float('inf')
+    nodo_encuentro = -1
+    nodos_visitados = 0
+
+    while colas[0] and colas[1]:
+        # Regla de parada: con los topes de ambas colas ya no se puede mejorar 'mejor_total'
+        if colas[0][0][0] + colas[1][0][0] >= mejor_total:
+            break
+        # Expandimos el lado cuya cola tenga el tope más pequeño
+        lado = 0 if colas[0][0][0] <= colas[1][0][0] else 1
+        (desplazamientos, destinos, pesos), memoria, consulta = lados[lado]
+        _, memoria_otro, consulta_otro = lados[1 - lado]
+        cola = colas[lado]
+        signo = signos[lado]
+
+        _, nodo_actual = heapq.heappop(cola)
+        if memoria.cerrados[nodo_actual] == consulta:
+            continue
+        memoria.cerrados[nodo_actual] = consulta
+        nodos_visitados += 1
+        distancia_actual = memoria.distancias[nodo_actual]
+
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            nueva_distancia = distancia_actual + pesos[posicion]
+            if ((memoria.marcas[vecino] != consulta and nueva_distancia < float('inf'))
+                    or nueva_distancia < memoria.distancias[vecino]):
+                memoria.distancias[vecino] = nueva_distancia
+                memoria.predecesores[vecino] = nodo_actual
+                memoria.marcas[vecino] = consulta
+                heapq.heappush(cola, (nueva_distancia + signo * potencial(vecino), vecino))
+            # Si los dos lados ya alcanzaron a este vecino, tenemos un camino completo candidato
+            # (este lado puede no haberlo alcanzado si la arista es una calle cerrada)
+            if memoria_otro.marcas[vecino] == consulta_otro and memoria.marcas[vecino] == consulta:
+                total = memoria.distancias[vecino] + memoria_otro.distancias[vecino]
+                if total < mejor_total:
+                    mejor_total = total
+                    nodo_encuentro = vecino
+
+    if nodo_encuentro == -1:
+        return float('inf'), None, nodos_visitados
+
+    # El camino es: origen -> ... -> nodo_encuentro (predecesores de adelante) y nodo_encuentro -> ... -> destino (predecesores de atrás)
+    mitad_adelante = _reconstruir(lados[0][1].predecesores, nodo_encuentro)[::-1]
+    mitad_atras = _reconstruir(lados[1][1].predecesores, nodo_encuentro)
+    return mejor_total, mitad_adelante + mitad_atras[1:], nodos_visitados
+
+
+# Diccionario con las estrategias disponibles, cada una recibe (grafo_compilado, indice_origen, indice_destino)
+ESTRATEGIAS = {
+    'dijkstra': lambda grafo_compilado, origen, destino: dijkstra_indices(grafo_compilado, origen, destino),
+    'a_estrella': lambda grafo_compilado, origen, destino: a_estrella_indices(
+        grafo_compilado, origen, destino, grafo_compilado.velocidad_maxima()),
+    'bidireccional': lambda grafo_compilado, origen, destino: bidireccional_indices(grafo_compilado, origen, destino),
+    'bidireccional_a_estrella': lambda grafo_compilado, origen, destino: bidireccional_indices(
+        grafo_compilado, origen, destino, grafo_compilado.velocidad_maxima()),
+}
+
+
+# Función principal de este archivo: busca la ruta de 'nodo_origen' a 'nodo_destino' (IDs de OSM) con la estrategia elegida
+def buscar_ruta(grafo_compilado, nodo_origen, nodo_destino, estrategia='dijkstra'):
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia desconocida '{estrategia}', las disponibles son: {', '.join(ESTRATEGIAS)}")
+    tiempo_total, camino_indices, nodos_visitados = ESTRATEGIAS[estrategia](
+        grafo_compilado,
+        grafo_compilado.indice(nodo_origen),
+        grafo_compilado.indice(nodo_destino),
+    )
+    camino = None if camino_indices is None else grafo_compilado.nodos_de_indices(camino_indices)
+    return ResultadoBusqueda(camino, tiempo_total, nodos_visitados, estrategia)
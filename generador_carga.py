@@ -0,0 +1,123 @@
+# En este archivo está un generador de carga para 'servidor_rutas.py': abre varias conexiones a la vez y manda peticiones de ruta
+# con puntos al azar dentro de la caja que cubre el grafo, durante un número fijo de segundos.
+# Al final muestra cuántas peticiones por segundo se atendieron y los percentiles de latencia vistos desde el cliente.
+#
+# Uso: python generador_carga.py [--url http://127.0.0.1:8080] [--conexiones 32] [--segundos 10] [--puntos-distintos 50]
+# Con '--puntos-distintos' pequeño se repiten más las peticiones, útil para ver cómo el servidor junta las idénticas.
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'asyncio' para mantener muchas conexiones abiertas a la vez con un solo proceso
+import asyncio
+# Importamos 'json' para armar y leer los cuerpos de las peticiones
+import json
+# Importamos 'random' para elegir los puntos (con semilla, para que dos corridas manden lo mismo)
+import random
+# Importamos 'time' para medir latencias y la duración de la prueba
+import time
+# Importamos 'urlparse' para separar el anfitrión y el puerto de la URL
+from urllib.parse import urlparse
+
+
+# Manda una petición HTTP/1.1 por una conexión ya abierta y devuelve (código de estado, cuerpo en JSON)
+async def peticion(lector, escritor, anfitrion, metodo, ruta, datos=None):
+    cuerpo = b'' if datos is None else json.dumps(datos).encode('utf-8')
+    escritor.write(
+        f'{metodo} {ruta} HTTP/1.1\r\nHost: {anfitrion}\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(cuerpo)}\r\n\r\n'.encode('latin-1') + cuerpo
+    )
+    await escritor.drain()
+    estado = int((await lector.readline()).split()[1])
+    tamano_cuerpo = 0
+    while True:
+        linea = await lector.readline()
+        if linea in (b'\r\n', b'\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        if nombre.strip().lower() == 'content-length':
+            tamano_cuerpo = int(valor)
+    return estado, json.loads(await lector.readexactly(tamano_cuerpo))
+
+
+# Percentil 'porcentaje' (0 a 100) de una lista ya ordenada
+def percentil(valores_ordenados, porcentaje):
+    if not valores_ordenados:
+        return None
+    posicion = min(len(valores_ordenados) - 1, int(round(porcentaje / 100.0 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[posicion]
+
+
+# Una conexión del generador: manda peticiones una tras otra hasta que se acabe el tiempo
+async def _cliente(anfitrion, puerto, peticiones, generador, fin, latencias, estados):
+    lector, escritor = await asyncio.open_connection(anfitrion, puerto)
+    try:
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            estado, _ = await peticion(lector, escritor, anfitrion, 'POST', '/ruta', generador.choice(peticiones))
+            latencias.append((time.perf_counter() - inicio) * 1000.0)
+            estados[estado] = estados.get(estado, 0) + 1
+    finally:
+        escritor.close()
+
+
+# Corre la prueba de carga y devuelve un diccionario con el resultado
+async def generar_carga(url, conexiones=32, segundos=10.0, puntos_distintos=50, estrategia=None, semilla=0):
+    direccion = urlparse(url)
+    anfitrion, puerto = direccion.hostname, direccion.port or 80
+
+    # Preguntamos al servidor qué zona cubre el grafo para elegir puntos dentro de ella
+    lector, escritor = await asyncio.open_connection(anfitrion, puerto)
+    _, salud = await peticion(lector, escritor, anfitrion, 'GET', '/salud')
+    escritor.close()
+    caja = salud['caja']
+
+    generador = random.Random(semilla)
+    peticiones = []
+    for _ in range(puntos_distintos):
+        datos = {
+            'lat_origen': generador.uniform(caja['lat_min'], caja['lat_max']),
+            'lon_origen': generador.uniform(caja['lon_min'], caja['lon_max']),
+            'lat_destino': generador.uniform(caja['lat_min'], caja['lat_max']),
+            'lon_destino': generador.uniform(caja['lon_min'], caja['lon_max']),
+        }
+        if estrategia is not None:
+            datos['estrategia'] = estrategia
+        peticiones.append(datos)
+
+    latencias = []
+    estados = {}
+    inicio = time.perf_counter()
+    fin = inicio + segundos
+    await asyncio.gather(*(
+        _cliente(anfitrion, puerto, peticiones, random.Random(semilla + 1 + numero), fin, latencias, estados)
+        for numero in range(conexiones)
+    ))
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'conexiones': conexiones,
+        'segundos': duracion,
+        'peticiones': len(latencias),
+        'peticiones_por_segundo': len(latencias) / duracion if duracion > 0 else 0.0,
+        'estados': estados,
+        'p50_ms': percentil(latencias, 50),
+        'p95_ms': percentil(latencias, 95),
+        'p99_ms': percentil(latencias, 99),
+        'maximo_ms': latencias[-1] if latencias else None,
+    }
+
+
+if __name__ == "__main__":
+    analizador = argparse.ArgumentParser(description='Generador de carga para el servidor de rutas')
+    analizador.add_argument('--url', default='http://127.0.0.1:8080')
+    analizador.add_argument('--conexiones', type=int, default=32)
+    analizador.add_argument('--segundos', type=float, default=10.0)
+    analizador.add_argument('--puntos-distintos', type=int, default=50)
+    analizador.add_argument('--estrategia', default=None)
+    analizador.add_argument('--semilla', type=int, default=0)
+    argumentos = analizador.parse_args()
+
+    resultado = asyncio.run(generar_carga(argumentos.url, argumentos.conexiones, argumentos.segundos,
+                                          argumentos.puntos_distintos, argumentos.estrategia, argumentos.semilla))
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -0,0 +1,476 @@
+# En este archivo guardamos el "grafo compilado", una versión compacta del grafo de OSMnx pensada solo para buscar rutas rápido.
+# El 'MultiDiGraph' de NetworkX guarda cada calle en diccionarios anidados y cada consulta paga el costo de buscar en ellos.
+# Aquí convertimos el grafo UNA sola vez a arreglos de NumPy en formato CSR (Compressed Sparse Row):
+#   - 'desplazamientos[i]' y 'desplazamientos[i + 1]' marcan dónde empiezan y terminan las aristas que salen del nodo i
+#   - 'destinos[j]' es el nodo al que llega la arista j
+#   - 'pesos[j]' es el peso (tiempo de viaje) de la arista j
+# Los IDs de OSM (números enormes) se cambian por índices densos 0, 1, 2, ... para poder usarlos como posiciones de un arreglo.
+
+# Importamos 'heapq' para la cola de prioridad de Dijkstra, igual que en el script principal
+import heapq
+
+# Importamos numpy con el alias 'np' que usaremos para guardar los arreglos del grafo compilado
+import numpy as np
+
+# Cuántos lotes de cambios de pesos se recuerdan; una caché que se quedó más atrás que esto se vacía completa
+MAXIMO_CAMBIOS_REGISTRADOS = 1000
+
+
+# Esta clase guarda los arreglos del grafo compilado y sabe traducir entre IDs de OSM e índices densos
+class GrafoCompilado:
+    # El constructor recibe los arreglos ya construidos (normalmente por 'compilar_grafo')
+    # 'velocidades_kmh', 'lat' y 'lon' son opcionales, si no se conocen se llenan con NaN
+    def __init__(self, ids_nodos, x, y, desplazamientos, destinos, pesos, longitudes, claves, atributo_peso,
+                 velocidades_kmh=None, lat=None, lon=None):
+        # 'ids_nodos[i]' es el ID de OSM del nodo con índice i
+        self.ids_nodos = np.asarray(ids_nodos, dtype=np.int64)
+        # Coordenadas proyectadas (en metros) de cada nodo
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        # Los tres arreglos del formato CSR
+        self.desplazamientos = np.asarray(desplazamientos, dtype=np.int32)
+        self.destinos = np.asarray(destinos, dtype=np.int32)
+        self.pesos = np.asarray(pesos, dtype=np.float64)
+        # Longitud en metros y clave de la arista paralela que elegimos (la más barata) para cada arista compilada
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.claves = np.asarray(claves, dtype=np.int64)
+        # Velocidad (km/h) de la arista elegida y coordenadas geográficas (grados) de cada nodo
+        self.velocidades_kmh = _arreglo_o_nan(velocidades_kmh, len(self.destinos))
+        self.lat = _arreglo_o_nan(lat, len(self.ids_nodos))
+        self.lon = _arreglo_o_nan(lon, len(self.ids_nodos))
+        # Guardamos el nombre del atributo con el que se calcularon los pesos
+        self.atributo_peso = atributo_peso
+
+        # Diccionario para traducir un ID de OSM a su índice denso
+        self.indice_de_nodo = {nodo: indice for indice, nodo in enumerate(self.ids_nodos.tolist())}
+
+        # Copias en listas de Python de los arreglos CSR, se crean la primera vez que se buscan rutas
+        # Leer un elemento de una lista es mucho más rápido que leer un escalar de NumPy dentro de un bucle de Python
+        self._listas = None
+        self._coordenadas = None
+        self._longitudes_lista = None
+        # Velocidad máxima del grafo para la heurística de A*, se calcula la primera vez que se pide
+        self._velocidad_maxima = None
+        # Memoria de trabajo reutilizable entre consultas, para no crear diccionarios del tamaño del grafo cada vez
+        self._memoria = None
+        # Grafo con todas las aristas invertidas, se construye la primera vez que una búsqueda hacia atrás lo necesita
+        self._reverso = None
+        # Contador que sube cada vez que cambian los pesos, las cachés lo comparan para saber si sus resultados siguen siendo válidos
+        self.version_pesos = 0
+        # Registro de los últimos cambios de pesos arista por arista ('actualizar_pesos'), como tuplas (versión, posiciones, pesos anteriores)
+        # Las cachés lo leen para descartar solo lo que usaba esas aristas; '_version_base' es la versión desde la que el registro está completo
+        self._cambios_pesos = []
+        self._version_base = 0
+        # Para cada arista de este grafo, su posición en el grafo reverso (se llena junto con el grafo reverso)
+        self._posiciones_en_reverso = None
+
+    # Número de nodos (intersecciones) del grafo compilado
+    @property
+    def numero_nodos(self):
+        return len(self.ids_nodos)
+
+    # Número de aristas (calles) del grafo compilado, ya sin aristas paralelas
+    @property
+    def numero_aristas(self):
+        return len(self.destinos)
+
+    # Devuelve las listas de Python (desplazamientos, destinos, pesos) que usa el bucle de Dijkstra
+    def listas(self):
+        if self._listas is None:
+            self._listas = (self.desplazamientos.tolist(), self.destinos.tolist(), self.pesos.tolist())
+        return self._listas
+
+    # Devuelve las longitudes (metros) de las aristas como lista de Python, las usan las búsquedas que suman distancias
+    def longitudes_lista(self):
+        if self._longitudes_lista is None:
+            self._longitudes_lista = self.longitudes.tolist()
+        return self._longitudes_lista
+
+    # Devuelve las coordenadas como listas de Python, las usan las heurísticas de A* dentro de su bucle
+    def coordenadas_listas(self):
+        if self._coordenadas is None:
+            self._coordenadas = (self.x.tolist(), self.y.tolist())
+        return self._coordenadas
+
+    # Devuelve la memoria de trabajo de las búsquedas, creándola la primera vez
+    def memoria_busqueda(self):
+        if self._memoria is None:
+            self._memoria = MemoriaBusqueda(self.numero_nodos)
+        return self._memoria
+
+    # Avisa que los arreglos de pesos cambiaron: se descartan las listas, la velocidad máxima y el grafo reverso que dependían de ellos
+    # Como no se sabe qué aristas cambiaron, el registro de cambios se reinicia y las cachés se vacían completas
+    def pesos_modificados(self):
+        self.version_pesos += 1
+        self._cambios_pesos = []
+        self._version_base = self.version_pesos
+        self._listas = None
+        self._velocidad_maxima = None
+        if self._reverso is not None:
+            self._reverso._reverso = None
+            self._reverso._posiciones_en_reverso = None
+            self._reverso = None
+            self._posiciones_en_reverso = None
+
+    # Cambia el peso de unas pocas aristas sin tirar nada: se escribe en el arreglo, en las listas de Python y en el grafo reverso
+    # 'posiciones' son posiciones de aristas compiladas y 'pesos_nuevos' sus pesos (np.inf para una calle cerrada)
+    # Si el arreglo de pesos viene de una instantánea (mapeado en memoria, solo lectura) primero se hace una copia propia de este proceso
+    def actualizar_pesos(self, posiciones, pesos_nuevos):
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        pesos_nuevos = np.asarray(pesos_nuevos, dtype=np.float64)
+        if len(posiciones) == 0:
+            return
+        pesos_anteriores = np.array(self.pesos[posiciones])
+        self._escribir_pesos(posiciones, pesos_nuevos)
+        if self._reverso is not None:
+            self._reverso._escribir_pesos(self._posiciones_en_reverso[posiciones], pesos_nuevos)
+        self.version_pesos += 1
+        self._cambios_pesos.append((self.version_pesos, posiciones, pesos_anteriores))
+        if len(self._cambios_pesos) > MAXIMO_CAMBIOS_REGISTRADOS:
+            del self._cambios_pesos[0]
+            self._version_base = self._cambios_pesos[0][0] - 1
+
+    def _escribir_pesos(self, posiciones, pesos_nuevos):
+        if not self.pesos.flags.writeable:
+            self.pesos = np.array(self.pesos)
+        self.pesos[posiciones] = pesos_nuevos
+        if self._listas is not None:
+            lista_pesos = self._listas[2]
+            for posicion, peso in zip(posiciones.tolist(), pesos_nuevos.tolist()):
+                lista_pesos[posicion] = peso
+        # Si algún peso bajó, la velocidad máxima puede subir; si solo subieron, la anterior sigue sin sobreestimar (A* sigue siendo correcto)
+        if self._velocidad_maxima is not None:
+            self._velocidad_maxima = max(self._velocidad_maxima, float(self._velocidades_aristas(posiciones).max()))
+
+    # Devuelve la lista de cambios (versión, posiciones, pesos anteriores) posteriores a 'version'
+    # o 'None' si el registro ya no llega tan atrás (hubo un 'pesos_modificados' o se descartaron cambios viejos)
+    def cambios_desde(self, version):
+        if version < self._version_base:
+            return None
+        return [cambio for cambio in self._cambios_pesos if cambio[0] > version]
+
+    # Devuelve el grafo con las aristas invertidas (la arista u -> v se vuelve v -> u) para las búsquedas desde el destino
+    # Las aristas se reordenan por su nodo de destino con un 'argsort' estable y el grafo reverso de este grafo reverso es él mismo
+    def reverso(self):
+        if self._reverso is None:
+            numero_nodos = self.numero_nodos
+            origenes = np.repeat(np.arange(numero_nodos, dtype=np.int32), np.diff(self.desplazamientos))
+            orden = np.argsort(self.destinos, kind='stable')
+            desplazamientos = np.zeros(numero_nodos + 1, dtype=np.int32)
+            desplazamientos[1:] = np.cumsum(np.bincount(self.destinos, minlength=numero_nodos))
+            reverso = GrafoCompilado(
+                self.ids_nodos, self.x, self.y, desplazamientos, origenes[orden],
+                self.pesos[orden], self.longitudes[orden], self.claves[orden], self.atributo_peso,
+                self.velocidades_kmh[orden], self.lat, self.lon,
+            )
+            reverso._reverso = self
+            # 'orden[j]' es la posición en este grafo de la arista j del reverso, y al revés con la permutación inversa
+            reverso._posiciones_en_reverso = orden
+            self._posiciones_en_reverso = np.empty_like(orden)
+            self._posiciones_en_reverso[orden] = np.arange(len(orden))
+            self._reverso = reverso
+        return self._reverso
+
+    # Calcula la velocidad más alta (metros/segundo) con la que se recorre cualquier arista del grafo
+    # Usamos tanto la longitud de la calle como la distancia en línea recta entre sus extremos, así la heurística de A* nunca sobreestima
+    # El resultado se guarda para no recalcularlo en cada consulta de A*
+    def velocidad_maxima(self):
+        if self._velocidad_maxima is not None:
+            return self._velocidad_maxima
+        velocidades = self._velocidades_aristas(np.arange(self.numero_aristas))
+        self._velocidad_maxima = float(velocidades.max()) if len(velocidades) else 0.0
+        return self._velocidad_maxima
+
+    # Velocidad (metros/segundo) de las aristas en 'posiciones', usando la mayor entre la longitud y la línea recta
+    def _velocidades_aristas(self, posiciones):
+        origenes = np.searchsorted(self.desplazamientos, posiciones, side='right') - 1
+        destinos = self.destinos[posiciones]
+        linea_recta = np.hypot(self.x[destinos] - self.x[origenes], self.y[destinos] - self.y[origenes])
+        distancia = np.fmax(self.longitudes[posiciones], np.nan_to_num(linea_recta))
+        pesos = self.pesos[posiciones]
+        # Una arista con peso 0 y distancia positiva tendría velocidad infinita, en ese caso la heurística vale 0 en todo el grafo
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(pesos > 0, distancia / pesos, np.where(distancia > 0, np.inf, 0.0))
+
+    # Traduce un ID de OSM a su índice denso, si el nodo no existe lanzamos un KeyError con un mensaje claro
+    def indice(self, nodo):
+        try:
+            return self.indice_de_nodo[nodo]
+        except KeyError:
+            raise KeyError(f"El nodo {nodo} no existe en el grafo compilado") from None
+
+    # Traduce una lista de índices densos a la lista de IDs de OSM correspondiente
+    def nodos_de_indices(self, indices):
+        ids = self.ids_nodos.tolist()
+        return [ids[indice] for indice in indices]
+
+    # Busca la posición de la arista compilada que va del índice u al índice v, o -1 si no existe
+    def posicion_arista(self, indice_u, indice_v):
+        inicio = self.desplazamientos[indice_u]
+        fin = self.desplazamientos[indice_u + 1]
+        posiciones = np.nonzero(self.destinos[inicio:fin] == indice_v)[0]
+        return int(inicio + posiciones[0]) if len(posiciones) else -1
+
+    # Suma la distancia (metros) y el tiempo (segundos) de una ruta dada como lista de IDs de OSM
+    # Usa la misma arista que eligió Dijkstra (la de menor peso), igual que el resumen de 'ejecutar_analisis_ruta'
+    # Si dos nodos seguidos de la ruta no tienen una calle entre ellos lanzamos un KeyError, la ruta no es de este grafo
+    def resumen_ruta(self, ruta):
+        distancia_total_metros = 0.0
+        tiempo_total_segundos = 0.0
+        for nodo_u, nodo_v in zip(ruta[:-1], ruta[1:]):
+            posicion = self.posicion_arista(self.indice(nodo_u), self.indice(nodo_v))
+            if posicion == -1:
+                raise KeyError(f"No hay una calle de {nodo_u} a {nodo_v} en el grafo compilado")
+            distancia_total_metros += float(self.longitudes[posicion])
+            tiempo_total_segundos += float(self.pesos[posicion])
+        return distancia_total_metros, tiempo_total_segundos
+
+    # Calcula cuántos bytes ocupan los arreglos de NumPy del grafo compilado
+    def tamano_bytes(self):
+        arreglos = (self.ids_nodos, self.x, self.y, self.desplazamientos, self.destinos, self.pesos, self.longitudes, self.claves,
+                    self.velocidades_kmh, self.lat, self.lon)
+        return sum(arreglo.nbytes for arreglo in arreglos)
+
+
+# Convierte 'valores' a un arreglo de float64, o crea uno lleno de NaN de tamaño 'tamano' si 'valores' es None
+def _arreglo_o_nan(valores, tamano):
+    if valores is None:
+        return np.full(tamano, np.nan)
+    return np.asarray(valores, dtype=np.float64)
+
+
+# Esta clase guarda las listas que Dijkstra necesita (distancias, predecesores, visitados) y las reutiliza entre consultas
+# En lugar de reiniciar las listas completas en cada consulta usamos "marcas": un valor solo es válido si su marca es igual al número de la consulta actual
+class MemoriaBusqueda:
+    def __init__(self, numero_nodos):
+        self.distancias = [float('inf')] * numero_nodos
+        self.predecesores = [-1] * numero_nodos
+        # 'marcas[i] == consulta' significa que la distancia y el predecesor del nodo i pertenecen a la consulta actual
+        self.marcas = [0] * numero_nodos
+        # 'cerrados[i] == consulta' significa que el nodo i ya fue visitado en la consulta actual
+        self.cerrados = [0] * numero_nodos
+        # Metros recorridos por el camino de menor peso hasta cada nodo, solo lo llenan las búsquedas que reportan distancias (matrices)
+        self.metros = [0.0] * numero_nodos
+        self.consulta = 0
+
+    # Empieza una consulta nueva, con esto todas las distancias anteriores quedan invalidadas de golpe
+    def nueva_consulta(self):
+        self.consulta += 1
+        return self.consulta
+
+
+# Esta función construye un 'GrafoCompilado' a partir de un grafo de OSMnx (normalmente 'grafo_proyectado_metros')
+# Las aristas paralelas entre dos nodos se juntan en una sola, quedándonos con la de menor 'atributo_peso'
+def compilar_grafo(grafo, atributo_peso='tiempo_viaje_segundos'):
+    # Asignamos un índice denso a cada nodo en el mismo orden en que NetworkX los guarda
+    ids_nodos = list(grafo.nodes())
+    indice_de_nodo = {nodo: indice for indice, nodo in enumerate(ids_nodos)}
+
+    # Guardamos las coordenadas de cada nodo, si algún nodo no tiene coordenadas ponemos NaN
+    x = np.array([grafo.nodes[nodo].get('x', np.nan) for nodo in ids_nodos], dtype=np.float64)
+    y = np.array([grafo.nodes[nodo].get('y', np.nan) for nodo in ids_nodos], dtype=np.float64)
+    # 'ox.project_graph' conserva la latitud y longitud originales en los atributos 'lat' y 'lon' de cada nodo
+    lat = np.array([grafo.nodes[nodo].get('lat', np.nan) for nodo in ids_nodos], dtype=np.float64)
+    lon = np.array([grafo.nodes[nodo].get('lon', np.nan) for nodo in ids_nodos], dtype=np.float64)
+
+    # Listas temporales donde vamos acumulando las aristas en el orden del CSR
+    desplazamientos = [0]
+    destinos = []
+    pesos = []
+    longitudes = []
+    claves = []
+    velocidades_kmh = []
+
+    # Recorremos cada nodo y sus vecinos, 'grafo.adj[nodo]' nos da {vecino: {clave: datos_arista}}
+    for nodo in ids_nodos:
+        for vecino, datos_multiples_aristas in grafo.adj[nodo].items():
+            # Un lazo (calle que sale y regresa al mismo nodo) nunca forma parte de un camino más corto
+            if vecino == nodo:
+                continue
+            # Buscamos la arista paralela con el menor peso, igual que hace 'dijkstra_iterativo' con 'min'
+            clave_optima, arista_optima = min(datos_multiples_aristas.items(), key=lambda par: par[1][atributo_peso])
+            destinos.append(indice_de_nodo[vecino])
+            pesos.append(arista_optima[atributo_peso])
+            longitudes.append(arista_optima.get('length', 0.0))
+            claves.append(clave_optima)
+            velocidades_kmh.append(arista_optima.get('velocidad_kmh', np.nan))
+        # Al terminar con el nodo, marcamos dónde empiezan las aristas del siguiente
+        desplazamientos.append(len(destinos))
+
+    return GrafoCompilado(ids_nodos, x, y, desplazamientos, destinos, pesos, longitudes, claves, atributo_peso,
+                          velocidades_kmh, lat, lon)
+
+
+# Lee el atributo 'atributo' (por ejemplo 'highway') de la arista paralela elegida para cada arista compilada, en el orden del CSR
+# Sirve para los datos que el grafo compilado no guarda, las aristas sin ese atributo quedan en 'None'
+def valores_aristas(grafo, grafo_compilado, atributo):
+    ids = grafo_compilado.ids_nodos.tolist()
+    origenes = np.repeat(np.arange(grafo_compilado.numero_nodos), np.diff(grafo_compilado.desplazamientos)).tolist()
+    return [
+        grafo.edges[ids[nodo_u], ids[nodo_v], clave].get(atributo)
+        for nodo_u, nodo_v, clave in zip(origenes, grafo_compilado.destinos.tolist(), grafo_compilado.claves.tolist())
+    ]
+
+
+# Lista las aristas paralelas que el grafo compilado descartó (las que no son la más barata de su par de nodos), como
+# [posición de la arista compilada, clave, peso, 'highway'] en el orden del CSR. Los parches de 'actualizacion_pesos.py' las necesitan:
+# si se cierra o se hace más lenta la arista elegida, la siguiente paralela puede pasar a ser la más barata
+def aristas_paralelas(grafo, grafo_compilado):
+    ids = grafo_compilado.ids_nodos.tolist()
+    origenes = np.repeat(np.arange(grafo_compilado.numero_nodos), np.diff(grafo_compilado.desplazamientos)).tolist()
+    paralelas = []
+    for posicion, (nodo_u, nodo_v, clave_elegida) in enumerate(
+            zip(origenes, grafo_compilado.destinos.tolist(), grafo_compilado.claves.tolist())):
+        datos_multiples_aristas = grafo.adj[ids[nodo_u]][ids[nodo_v]]
+        if len(datos_multiples_aristas) < 2:
+            continue
+        for clave, datos_arista in datos_multiples_aristas.items():
+            if clave != clave_elegida:
+                highway = datos_arista.get('highway')
+                paralelas.append([posicion, int(clave), float(datos_arista[grafo_compilado.atributo_peso]),
+                                  list(highway) if isinstance(highway, tuple) else highway])
+    return paralelas
+
+
+# Construye un 'GrafoCompilado' a partir de arreglos de aristas sueltas (una entrada por arista, con aristas paralelas repetidas)
+# Todo se hace con NumPy: ordenamos las aristas por (origen, destino, peso) y nos quedamos con la primera de cada par (origen, destino),
+# que es la de menor peso. Los índices de 'origenes' y 'destinos' son posiciones dentro de 'ids_nodos'.
+def compilar_desde_aristas(ids_nodos, x, y, origenes, destinos, pesos, longitudes, claves, atributo_peso,
+                           velocidades_kmh=None, lat=None, lon=None):
+    numero_nodos = len(ids_nodos)
+    origenes = np.asarray(origenes, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    claves = np.asarray(claves, dtype=np.int64)
+    velocidades_kmh = _arreglo_o_nan(velocidades_kmh, len(origenes))
+
+    # Quitamos los lazos, igual que 'compilar_grafo'
+    sin_lazos = origenes != destinos
+    origenes, destinos, pesos = origenes[sin_lazos], destinos[sin_lazos], pesos[sin_lazos]
+    longitudes, claves, velocidades_kmh = longitudes[sin_lazos], claves[sin_lazos], velocidades_kmh[sin_lazos]
+
+    # 'np.lexsort' ordena por la última llave primero y es estable, así entre aristas paralelas con el mismo peso gana la primera
+    orden = np.lexsort((pesos, destinos, origenes))
+    origenes, destinos = origenes[orden], destinos[orden]
+    primeras = np.ones(len(orden), dtype=bool)
+    primeras[1:] = (origenes[1:] != origenes[:-1]) | (destinos[1:] != destinos[:-1])
+    elegidas = orden[primeras]
+
+    desplazamientos = np.zeros(numero_nodos + 1, dtype=np.int64)
+    desplazamientos[1:] = np.cumsum(np.bincount(origenes[primeras], minlength=numero_nodos))
+    return GrafoCompilado(
+        ids_nodos, x, y, desplazamientos, destinos[primeras], pesos[elegidas], longitudes[elegidas], claves[elegidas],
+        atributo_peso, velocidades_kmh[elegidas], lat, lon,
+    )
+
+
+
+# Después de 'compilar_desde_aristas', deja en el grafo compilado lo que guardan las instantáneas junto a los arreglos:
+# en 'valores_highway' el 'highway' de la arista elegida para cada arista compilada (en el orden del CSR) y en 'aristas_paralelas'
+# las paralelas descartadas como [posición compilada, clave, peso, 'highway'], igual que 'valores_aristas' y 'aristas_paralelas'
+# 'origenes', 'destinos', 'claves' y 'pesos' son las mismas aristas sueltas que se compilaron; el 'highway' de la arista i es
+# 'valores_highway[i]', o 'valores_highway[codigos[i]]' si se dan 'codigos' (así no hace falta una lista con una entrada por arista)
+def anotar_aristas_compiladas(grafo_compilado, origenes, destinos, claves, pesos, valores_highway, codigos=None):
+    numero_nodos = grafo_compilado.numero_nodos
+    origenes = np.asarray(origenes, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    claves = np.asarray(claves, dtype=np.int64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    indices_highway = np.arange(len(origenes)) if codigos is None else np.asarray(codigos)
+
+    def highway_de(indices):
+        for indice in indices_highway[indices].tolist():
+            highway = valores_highway[indice]
+            yield list(highway) if isinstance(highway, tuple) else highway
+
+    # Buscamos la arista elegida para cada arista compilada por su (origen, destino, clave)
+    maximo_claves = int(claves.max()) + 1 if len(claves) else 1
+    llaves = (origenes * numero_nodos + destinos) * maximo_claves + claves
+    orden = np.argsort(llaves)
+    origenes_compilados = np.repeat(np.arange(numero_nodos), np.diff(grafo_compilado.desplazamientos))
+    llaves_compiladas = (origenes_compilados * numero_nodos + grafo_compilado.destinos) * maximo_claves + grafo_compilado.claves
+    elegidas = orden[np.searchsorted(llaves, llaves_compiladas, sorter=orden)]
+    grafo_compilado.valores_highway = list(highway_de(elegidas))
+
+    # Las demás aristas (sin los lazos) son las paralelas que se descartaron, cada una con la posición de su arista compilada;
+    # los pares (origen, destino) del CSR ya están ordenados, así que basta 'np.searchsorted'
+    descartadas = origenes != destinos
+    descartadas[elegidas] = False
+    descartadas = np.nonzero(descartadas)[0]
+    posiciones_descartadas = np.searchsorted(origenes_compilados * numero_nodos + grafo_compilado.destinos,
+                                             origenes[descartadas] * numero_nodos + destinos[descartadas])
+    orden = np.lexsort((claves[descartadas], posiciones_descartadas))
+    descartadas = descartadas[orden]
+    grafo_compilado.aristas_paralelas = [
+        [posicion, clave, peso, highway]
+        for posicion, clave, peso, highway in zip(
+            posiciones_descartadas[orden].tolist(), claves[descartadas].tolist(), pesos[descartadas].tolist(), highway_de(descartadas))
+    ]
+    return grafo_compilado
+
+
+# Dijkstra sobre índices densos, devuelve (distancia_total, lista_de_indices, nodos_visitados) o (inf, None, nodos_visitados) si no hay camino
+def dijkstra_indices(grafo_compilado, indice_origen, indice_destino):
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+    memoria = grafo_compilado.memoria_busqueda()
+    consulta = memoria.nueva_consulta()
+    distancias = memoria.distancias
+    predecesores = memoria.predecesores
+    marcas = memoria.marcas
+    cerrados = memoria.cerrados
+
+    # Inicializamos solo el nodo de origen, el resto de nodos se consideran a distancia infinita por su marca vieja
+    distancias[indice_origen] = 0.0
+    predecesores[indice_origen] = -1
+    marcas[indice_origen] = consulta
+    cola_prioridad = [(0.0, indice_origen)]
+    nodos_visitados = 0
+
+    while cola_prioridad:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        # Si ya visitamos este nodo en esta consulta, es una entrada vieja de la cola y la ignoramos
+        if cerrados[nodo_actual] == consulta:
+            continue
+        cerrados[nodo_actual] = consulta
+        nodos_visitados += 1
+        # Igual que en 'dijkstra_iterativo', la primera vez que sacamos el destino ya tenemos el camino más corto
+        if nodo_actual == indice_destino:
+            break
+        # Las aristas del nodo actual están entre desplazamientos[nodo_actual] y desplazamientos[nodo_actual + 1]
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            nueva_distancia = distancia_actual + pesos[posicion]
+            # Con una marca vieja basta cualquier distancia finita, las calles cerradas (peso infinito) no cuentan
+            if ((marcas[vecino] != consulta and nueva_distancia < float('inf'))
+                    or nueva_distancia < distancias[vecino]):
+                distancias[vecino] = nueva_distancia
+                predecesores[vecino] = nodo_actual
+                marcas[vecino] = consulta
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+
+    # Si el destino nunca se visitó en esta consulta, no hay camino
+    if cerrados[indice_destino] != consulta:
+        return float('inf'), None, nodos_visitados
+
+    # Reconstruimos el camino yendo hacia atrás por los predecesores, igual que el script principal
+    camino = []
+    nodo_camino_actual = indice_destino
+    while nodo_camino_actual != -1:
+        camino.append(nodo_camino_actual)
+        nodo_camino_actual = predecesores[nodo_camino_actual]
+    return distancias[indice_destino], camino[::-1], nodos_visitados
+
+
+# Versión de 'dijkstra_iterativo' que trabaja sobre el grafo compilado
+# Recibe y devuelve IDs de OSM, así que la ruta se puede pasar directamente a 'ox.plot_graph_route'
+def dijkstra_compilado(grafo_compilado, nodo_origen, nodo_destino):
+    _, camino_indices, _ = dijkstra_indices(
+        grafo_compilado,
+        grafo_compilado.indice(nodo_origen),
+        grafo_compilado.indice(nodo_destino),
+    )
+    # Si no hay camino devolvemos 'None', igual que 'dijkstra_iterativo'
+    if camino_indices is None:
+        return None
+    return grafo_compilado.nodos_de_indices(camino_indices)
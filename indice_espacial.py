@@ -0,0 +1,268 @@
+# En este archivo está el índice espacial para "pegar" coordenadas (latitud, longitud) al grafo: el nodo o la calle más cercana.
+# Antes usábamos 'ox.nearest_nodes' con el grafo sin proyectar, una llamada por punto, y teníamos que guardar una segunda copia del grafo
+# completo solo para eso. Aquí construimos UNA vez una rejilla uniforme sobre los nodos y las aristas del grafo compilado,
+# la guardamos junto con la instantánea y respondemos miles de puntos en una sola llamada vectorizada con NumPy.
+#
+# Las coordenadas se pasan a metros con una proyección equirrectangular local (centrada en el mapa), que para una zona metropolitana
+# tiene errores muy por debajo de un metro y no necesita 'pyproj'.
+#
+# Cómo funciona la rejilla: cada nodo (o arista) se guarda en la celda (o celdas) que ocupa. Para un punto revisamos su celda y las 8 vecinas;
+# si lo más cercano que encontramos está a menos de un tamaño de celda, es seguro que no hay nada más cerca fuera de esas 9 celdas.
+# Los pocos puntos que no cumplen esto (por ejemplo puntos fuera del mapa) se resuelven revisando todos los elementos.
+
+# Importamos 'os' para armar la ruta del archivo del índice dentro de la carpeta de la instantánea
+import os
+
+# Importamos numpy con el alias 'np' para todo el cálculo vectorizado
+import numpy as np
+
+# Radio medio de la Tierra en metros, para pasar grados a metros
+RADIO_TIERRA_METROS = 6371008.8
+
+# Nombre del archivo con el que se guarda el índice dentro de la carpeta de la instantánea
+NOMBRE_ARCHIVO_INDICE = 'indice_espacial.npz'
+
+# Número de elementos que queremos, en promedio, en cada celda de la rejilla
+ELEMENTOS_POR_CELDA = 4
+
+# Número máximo de pares (punto, elemento) que se comparan a la vez en la búsqueda de respaldo, para no usar demasiada memoria
+PARES_POR_BLOQUE_RESPALDO = 1_000_000
+
+
+# Esta clase es una rejilla uniforme sobre elementos (puntos o segmentos) en metros
+class _Rejilla:
+    def __init__(self, origen_x, origen_y, tamano_celda, columnas, filas, desplazamientos, elementos):
+        self.origen_x = float(origen_x)
+        self.origen_y = float(origen_y)
+        self.tamano_celda = float(tamano_celda)
+        self.columnas = int(columnas)
+        self.filas = int(filas)
+        # Formato CSR: los elementos de la celda c están en elementos[desplazamientos[c]:desplazamientos[c + 1]]
+        self.desplazamientos = np.asarray(desplazamientos, dtype=np.int64)
+        self.elementos = np.asarray(elementos, dtype=np.int64)
+
+    # Construye la rejilla a partir de las cajas (x_min, y_min, x_max, y_max) de cada elemento, un punto es una caja de tamaño cero
+    @classmethod
+    def construir(cls, x_min, y_min, x_max, y_max, tamano_celda):
+        origen_x = float(np.min(x_min))
+        origen_y = float(np.min(y_min))
+        columnas = int((np.max(x_max) - origen_x) // tamano_celda) + 1
+        filas = int((np.max(y_max) - origen_y) // tamano_celda) + 1
+        columna_inicio = ((x_min - origen_x) // tamano_celda).astype(np.int64)
+        columna_fin = ((x_max - origen_x) // tamano_celda).astype(np.int64)
+        fila_inicio = ((y_min - origen_y) // tamano_celda).astype(np.int64)
+        fila_fin = ((y_max - origen_y) // tamano_celda).astype(np.int64)
+
+        # Cada elemento ocupa ancho x alto celdas, las repartimos todas de una vez con 'np.repeat'
+        ancho = columna_fin - columna_inicio + 1
+        alto = fila_fin - fila_inicio + 1
+        cantidad = ancho * alto
+        elementos = np.repeat(np.arange(len(cantidad), dtype=np.int64), cantidad)
+        posicion_local = np.arange(len(elementos), dtype=np.int64) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+        columnas_elemento = np.repeat(columna_inicio, cantidad) + posicion_local % np.repeat(ancho, cantidad)
+        filas_elemento = np.repeat(fila_inicio, cantidad) + posicion_local // np.repeat(ancho, cantidad)
+        celdas = filas_elemento * columnas + columnas_elemento
+
+        orden = np.argsort(celdas, kind='stable')
+        desplazamientos = np.zeros(columnas * filas + 1, dtype=np.int64)
+        desplazamientos[1:] = np.cumsum(np.bincount(celdas, minlength=columnas * filas))
+        return cls(origen_x, origen_y, tamano_celda, columnas, filas, desplazamientos, elementos[orden])
+
+    # Devuelve los pares (punto, elemento) candidatos: todos los elementos de la celda de cada punto y de sus 8 vecinas
+    def candidatos(self, x, y):
+        columna = np.clip(((x - self.origen_x) // self.tamano_celda).astype(np.int64), 0, self.columnas - 1)
+        fila = np.clip(((y - self.origen_y) // self.tamano_celda).astype(np.int64), 0, self.filas - 1)
+        puntos_por_vecindario = []
+        elementos_por_vecindario = []
+        for desplazamiento_fila in (-1, 0, 1):
+            for desplazamiento_columna in (-1, 0, 1):
+                columna_vecina = columna + desplazamiento_columna
+                fila_vecina = fila + desplazamiento_fila
+                validas = (columna_vecina >= 0) & (columna_vecina < self.columnas) & (fila_vecina >= 0) & (fila_vecina < self.filas)
+                puntos = np.nonzero(validas)[0]
+                celdas = fila_vecina[puntos] * self.columnas + columna_vecina[puntos]
+                inicio = self.desplazamientos[celdas]
+                cantidad = self.desplazamientos[celdas + 1] - inicio
+                posicion_local = np.arange(cantidad.sum(), dtype=np.int64) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+                puntos_por_vecindario.append(np.repeat(puntos, cantidad))
+                elementos_por_vecindario.append(self.elementos[np.repeat(inicio, cantidad) + posicion_local])
+        return np.concatenate(puntos_por_vecindario), np.concatenate(elementos_por_vecindario)
+
+
+# Para cada punto se queda con el candidato de menor distancia, devuelve (mejor_elemento, mejor_distancia_cuadrada) con -1 / inf si no hubo candidatos
+def _mejor_por_punto(numero_puntos, puntos, elementos, distancias_cuadradas):
+    mejor_elemento = np.full(numero_puntos, -1, dtype=np.int64)
+    mejor_distancia = np.full(numero_puntos, np.inf)
+    if len(puntos) == 0:
+        return mejor_elemento, mejor_distancia
+    # Ordenamos por punto y después por distancia, el primero de cada punto es su mejor candidato
+    orden = np.lexsort((elementos, distancias_cuadradas, puntos))
+    primeros = np.ones(len(orden), dtype=bool)
+    primeros[1:] = puntos[orden][1:] != puntos[orden][:-1]
+    elegidos = orden[primeros]
+    mejor_elemento[puntos[elegidos]] = elementos[elegidos]
+    mejor_distancia[puntos[elegidos]] = distancias_cuadradas[elegidos]
+    return mejor_elemento, mejor_distancia
+
+
+# Distancia cuadrada de cada punto (px, py) al segmento (ax, ay) - (bx, by) y la fracción del segmento donde está el punto más cercano
+def _distancia_a_segmentos(px, py, ax, ay, bx, by):
+    dx = bx - ax
+    dy = by - ay
+    longitud_cuadrada = dx * dx + dy * dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraccion = np.where(longitud_cuadrada > 0, ((px - ax) * dx + (py - ay) * dy) / longitud_cuadrada, 0.0)
+    fraccion = np.clip(fraccion, 0.0, 1.0)
+    cercano_x = ax + fraccion * dx
+    cercano_y = ay + fraccion * dy
+    return (px - cercano_x) ** 2 + (py - cercano_y) ** 2, fraccion
+
+
+# Índice espacial sobre los nodos y las aristas de un 'GrafoCompilado'
+class IndiceEspacial:
+    def __init__(self, latitud_referencia, ids_nodos, x, y, origenes, destinos, claves, rejilla_nodos, rejilla_aristas):
+        # Latitud central del mapa, define la escala de la proyección equirrectangular local
+        self.latitud_referencia = float(latitud_referencia)
+        self.ids_nodos = np.asarray(ids_nodos, dtype=np.int64)
+        # Coordenadas de los nodos en metros (proyección local)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        # Nodo de origen, nodo de destino (índices densos) y clave de OSM de cada arista del grafo compilado
+        self.origenes = np.asarray(origenes, dtype=np.int64)
+        self.destinos = np.asarray(destinos, dtype=np.int64)
+        self.claves = np.asarray(claves, dtype=np.int64)
+        self.rejilla_nodos = rejilla_nodos
+        self.rejilla_aristas = rejilla_aristas
+
+    # Pasa latitudes y longitudes (grados) a metros con la proyección equirrectangular local
+    def proyectar(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        escala_x = RADIO_TIERRA_METROS * np.cos(np.radians(self.latitud_referencia))
+        return np.radians(lon) * escala_x, np.radians(lat) * RADIO_TIERRA_METROS
+
+    # Construye el índice a partir de un 'GrafoCompilado' que tenga 'lat' y 'lon' en sus nodos
+    @classmethod
+    def construir(cls, grafo_compilado):
+        lat = np.asarray(grafo_compilado.lat, dtype=np.float64)
+        lon = np.asarray(grafo_compilado.lon, dtype=np.float64)
+        if np.isnan(lat).any() or np.isnan(lon).any():
+            raise ValueError("El grafo compilado no tiene latitud y longitud en todos sus nodos")
+        latitud_referencia = float(np.mean(lat))
+        escala_x = RADIO_TIERRA_METROS * np.cos(np.radians(latitud_referencia))
+        x = np.radians(lon) * escala_x
+        y = np.radians(lat) * RADIO_TIERRA_METROS
+
+        # El tamaño de celda se elige para que haya en promedio 'ELEMENTOS_POR_CELDA' nodos por celda
+        area = max((x.max() - x.min()) * (y.max() - y.min()), 1.0)
+        tamano_celda = max(float(np.sqrt(area * ELEMENTOS_POR_CELDA / len(x))), 1.0)
+        rejilla_nodos = _Rejilla.construir(x, y, x, y, tamano_celda)
+
+        origenes = np.repeat(np.arange(grafo_compilado.numero_nodos), np.diff(grafo_compilado.desplazamientos))
+        destinos = np.asarray(grafo_compilado.destinos, dtype=np.int64)
+        rejilla_aristas = _Rejilla.construir(
+            np.minimum(x[origenes], x[destinos]), np.minimum(y[origenes], y[destinos]),
+            np.maximum(x[origenes], x[destinos]), np.maximum(y[origenes], y[destinos]),
+            tamano_celda,
+        )
+        return cls(latitud_referencia, grafo_compilado.ids_nodos, x, y, origenes, destinos, grafo_compilado.claves,
+                   rejilla_nodos, rejilla_aristas)
+
+    # Devuelve los IDs de OSM de los nodos más cercanos a cada punto y la distancia en metros, acepta arreglos de miles de puntos
+    def nodos_mas_cercanos(self, lat, lon):
+        px, py = self.proyectar(np.atleast_1d(lat), np.atleast_1d(lon))
+        puntos, nodos = self.rejilla_nodos.candidatos(px, py)
+        distancias_cuadradas = (self.x[nodos] - px[puntos]) ** 2 + (self.y[nodos] - py[puntos]) ** 2
+        mejor_nodo, mejor_distancia = _mejor_por_punto(len(px), puntos, nodos, distancias_cuadradas)
+
+        # Puntos sin garantía (lo más cercano quedó más lejos que un tamaño de celda): los comparamos contra todos los nodos
+        pendientes = np.nonzero(mejor_distancia > self.rejilla_nodos.tamano_celda ** 2)[0]
+        tamano_bloque = max(1, PARES_POR_BLOQUE_RESPALDO // len(self.x))
+        for inicio in range(0, len(pendientes), tamano_bloque):
+            bloque = pendientes[inicio:inicio + tamano_bloque]
+            distancias = (self.x[None, :] - px[bloque, None]) ** 2 + (self.y[None, :] - py[bloque, None]) ** 2
+            mejor_nodo[bloque] = np.argmin(distancias, axis=1)
+            mejor_distancia[bloque] = distancias[np.arange(len(bloque)), mejor_nodo[bloque]]
+        return self.ids_nodos[mejor_nodo], np.sqrt(mejor_distancia)
+
+    # Igual que 'nodos_mas_cercanos' pero para un solo punto, devuelve solo el ID de OSM
+    def nodo_mas_cercano(self, lat, lon):
+        return int(self.nodos_mas_cercanos(lat, lon)[0][0])
+
+    # Pega cada punto a la calle (arista) más cercana, tomando cada calle como un segmento recto entre sus dos nodos
+    # Devuelve un diccionario de arreglos: 'nodo_u', 'nodo_v', 'clave' (la arista de OSM), 'fraccion' (0 en u y 1 en v),
+    # 'distancia_metros' y 'nodo_cercano' (el extremo de la arista más cercano al punto, útil para empezar una ruta)
+    def aristas_mas_cercanas(self, lat, lon):
+        px, py = self.proyectar(np.atleast_1d(lat), np.atleast_1d(lon))
+        puntos, aristas = self.rejilla_aristas.candidatos(px, py)
+        distancias_cuadradas, _ = _distancia_a_segmentos(
+            px[puntos], py[puntos],
+            self.x[self.origenes[aristas]], self.y[self.origenes[aristas]],
+            self.x[self.destinos[aristas]], self.y[self.destinos[aristas]],
+        )
+        mejor_arista, mejor_distancia = _mejor_por_punto(len(px), puntos, aristas, distancias_cuadradas)
+
+        pendientes = np.nonzero(mejor_distancia > self.rejilla_aristas.tamano_celda ** 2)[0]
+        tamano_bloque = max(1, PARES_POR_BLOQUE_RESPALDO // max(len(self.origenes), 1))
+        for inicio in range(0, len(pendientes), tamano_bloque):
+            bloque = pendientes[inicio:inicio + tamano_bloque]
+            distancias, _ = _distancia_a_segmentos(
+                px[bloque, None], py[bloque, None],
+                self.x[self.origenes][None, :], self.y[self.origenes][None, :],
+                self.x[self.destinos][None, :], self.y[self.destinos][None, :],
+            )
+            mejor_arista[bloque] = np.argmin(distancias, axis=1)
+            mejor_distancia[bloque] = distancias[np.arange(len(bloque)), mejor_arista[bloque]]
+
+        nodo_u = self.origenes[mejor_arista]
+        nodo_v = self.destinos[mejor_arista]
+        _, fraccion = _distancia_a_segmentos(px, py, self.x[nodo_u], self.y[nodo_u], self.x[nodo_v], self.y[nodo_v])
+        return {
+            'nodo_u': self.ids_nodos[nodo_u],
+            'nodo_v': self.ids_nodos[nodo_v],
+            'clave': self.claves[mejor_arista],
+            'fraccion': fraccion,
+            'distancia_metros': np.sqrt(mejor_distancia),
+            'nodo_cercano': np.where(fraccion <= 0.5, self.ids_nodos[nodo_u], self.ids_nodos[nodo_v]),
+        }
+
+    # Guarda el índice en un archivo '.npz'
+    def guardar(self, ruta_archivo):
+        datos = {
+            'latitud_referencia': np.array(self.latitud_referencia),
+            'ids_nodos': self.ids_nodos, 'x': self.x, 'y': self.y,
+            'origenes': self.origenes, 'destinos': self.destinos, 'claves': self.claves,
+        }
+        for prefijo, rejilla in (('nodos', self.rejilla_nodos), ('aristas', self.rejilla_aristas)):
+            datos[f'{prefijo}_parametros'] = np.array([rejilla.origen_x, rejilla.origen_y, rejilla.tamano_celda, rejilla.columnas, rejilla.filas])
+            datos[f'{prefijo}_desplazamientos'] = rejilla.desplazamientos
+            datos[f'{prefijo}_elementos'] = rejilla.elementos
+        np.savez(ruta_archivo, **datos)
+
+    # Carga un índice guardado con 'guardar'
+    @classmethod
+    def cargar(cls, ruta_archivo):
+        with np.load(ruta_archivo, allow_pickle=False) as datos:
+            rejillas = []
+            for prefijo in ('nodos', 'aristas'):
+                origen_x, origen_y, tamano_celda, columnas, filas = datos[f'{prefijo}_parametros'].tolist()
+                rejillas.append(_Rejilla(origen_x, origen_y, tamano_celda, columnas, filas,
+                                         datos[f'{prefijo}_desplazamientos'], datos[f'{prefijo}_elementos']))
+            return cls(float(datos['latitud_referencia']), datos['ids_nodos'], datos['x'], datos['y'],
+                       datos['origenes'], datos['destinos'], datos['claves'], rejillas[0], rejillas[1])
+
+
+# Devuelve el índice espacial de un grafo compilado: si el grafo viene de una instantánea, lo lee de su carpeta o lo construye y lo guarda ahí
+def obtener_indice_espacial(grafo_compilado):
+    directorio = getattr(grafo_compilado, 'directorio_instantanea', None)
+    if directorio is None:
+        return IndiceEspacial.construir(grafo_compilado)
+    ruta_archivo = os.path.join(directorio, NOMBRE_ARCHIVO_INDICE)
+    if os.path.exists(ruta_archivo):
+        return IndiceEspacial.cargar(ruta_archivo)
+    indice = IndiceEspacial.construir(grafo_compilado)
+    # Guardamos con otro nombre y después renombramos, así otro proceso nunca lee un índice escrito a medias
+    ruta_temporal = os.path.join(directorio, f'.{os.getpid()}_{NOMBRE_ARCHIVO_INDICE}')
+    indice.guardar(ruta_temporal)
+    os.replace(ruta_temporal, ruta_archivo)
+    return indice
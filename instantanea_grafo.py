@@ -0,0 +1,169 @@
+# En este archivo guardamos en disco una "instantánea" del grafo listo para buscar rutas (el grafo compilado con sus pesos).
+# Así no tenemos que repetir en cada ejecución la descarga con 'ox.graph_from_place', la proyección y el cálculo de tiempos arista por arista.
+#
+# La instantánea es una carpeta con un archivo '.npy' por arreglo y un 'metadatos.json'. Los '.npy' se abren con 'mmap_mode="r"':
+# el sistema operativo lee del disco solo las páginas que se usan, y si varios procesos abren la misma instantánea comparten esas páginas
+# en memoria en lugar de tener cada uno su propia copia.
+#
+# El nombre de la carpeta es un hash de la lista de lugares, el tipo de red, los parámetros de velocidad y la versión del formato,
+# así que si cambia cualquiera de ellos se construye una instantánea nueva de forma automática.
+
+# Importamos 'hashlib' para calcular el hash que identifica cada instantánea
+import hashlib
+# Importamos 'json' para guardar los metadatos y para serializar los parámetros antes de calcular el hash
+import json
+# Importamos 'os' y 'shutil' para crear, renombrar y borrar carpetas
+import os
+import shutil
+# Importamos 'tempfile' para escribir la instantánea en una carpeta temporal antes de publicarla
+import tempfile
+
+# Importamos numpy con el alias 'np' para guardar y abrir los arreglos
+import numpy as np
+
+# Importamos la clase del grafo compilado, que es lo que guardamos y devolvemos
+from grafo_compilado import GrafoCompilado, aristas_paralelas, compilar_grafo, valores_aristas
+
+# Versión del formato de la instantánea, si cambia el formato se sube este número y las instantáneas viejas se reconstruyen
+VERSION_INSTANTANEA = 1
+
+# Carpeta donde se guardan las instantáneas si no se indica otra
+DIRECTORIO_INSTANTANEAS = 'instantaneas'
+
+# Arreglos del grafo compilado que se guardan en la instantánea, cada uno en su propio archivo '.npy'
+ARREGLOS_INSTANTANEA = (
+    'ids_nodos', 'x', 'y', 'lat', 'lon',
+    'desplazamientos', 'destinos', 'pesos', 'longitudes', 'claves', 'velocidades_kmh',
+)
+
+
+# Calcula la clave (hash SHA-1) de una instantánea a partir de todo lo que influye en el grafo resultante
+def clave_instantanea(lista_de_lugares, tipo_de_red, parametros_velocidad):
+    descripcion = json.dumps({
+        'version': VERSION_INSTANTANEA,
+        'lugares': list(lista_de_lugares),
+        'tipo_de_red': tipo_de_red,
+        'parametros_velocidad': parametros_velocidad,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(descripcion.encode('utf-8')).hexdigest()
+
+
+# Archivo opcional de la instantánea con el tipo de calle ('highway' de OSM) de cada arista compilada, lo usan los parches por tipo de calle
+ARCHIVO_HIGHWAY = 'highway.json'
+# Archivo opcional con las aristas paralelas que el grafo compilado descartó, lo usan los parches que cierran o alentan una arista
+ARCHIVO_PARALELAS = 'paralelas.json'
+
+
+# Guarda un grafo compilado en la carpeta 'directorio'
+# Primero escribimos todo en una carpeta temporal y al final la renombramos, así otro proceso nunca ve una instantánea a medias
+# 'valores_highway' (opcional) es el 'highway' de cada arista compilada, en el orden del CSR
+# 'paralelas' (opcional) son las aristas paralelas descartadas, como las devuelve 'aristas_paralelas'
+def guardar_instantanea(grafo_compilado, directorio, metadatos=None, valores_highway=None, paralelas=None):
+    carpeta_padre = os.path.dirname(os.path.abspath(directorio))
+    os.makedirs(carpeta_padre, exist_ok=True)
+    carpeta_temporal = tempfile.mkdtemp(prefix='.instantanea_', dir=carpeta_padre)
+    try:
+        for nombre in ARREGLOS_INSTANTANEA:
+            np.save(os.path.join(carpeta_temporal, f'{nombre}.npy'), np.ascontiguousarray(getattr(grafo_compilado, nombre)))
+        datos_metadatos = dict(metadatos or {})
+        datos_metadatos.update({
+            'version': VERSION_INSTANTANEA,
+            'atributo_peso': grafo_compilado.atributo_peso,
+            'numero_nodos': grafo_compilado.numero_nodos,
+            'numero_aristas': grafo_compilado.numero_aristas,
+        })
+        with open(os.path.join(carpeta_temporal, 'metadatos.json'), 'w', encoding='utf-8') as archivo:
+            json.dump(datos_metadatos, archivo, ensure_ascii=False, indent=2)
+        if valores_highway is not None:
+            with open(os.path.join(carpeta_temporal, ARCHIVO_HIGHWAY), 'w', encoding='utf-8') as archivo:
+                json.dump(list(valores_highway), archivo, ensure_ascii=False)
+        if paralelas is not None:
+            with open(os.path.join(carpeta_temporal, ARCHIVO_PARALELAS), 'w', encoding='utf-8') as archivo:
+                json.dump(list(paralelas), archivo, ensure_ascii=False)
+        # Si ya había una instantánea con el mismo nombre (por ejemplo de una versión vieja) la quitamos antes de publicar la nueva
+        if os.path.isdir(directorio):
+            shutil.rmtree(directorio)
+        os.replace(carpeta_temporal, directorio)
+    except BaseException:
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+        raise
+
+
+# Lee los metadatos de una instantánea, o devuelve 'None' si la carpeta no existe o es de otra versión
+def leer_metadatos(directorio):
+    try:
+        with open(os.path.join(directorio, 'metadatos.json'), encoding='utf-8') as archivo:
+            metadatos = json.load(archivo)
+    except (OSError, ValueError):
+        return None
+    if metadatos.get('version') != VERSION_INSTANTANEA:
+        return None
+    return metadatos
+
+
+# Lee el 'highway' de cada arista compilada guardado con la instantánea, o devuelve 'None' si la instantánea no lo tiene
+def leer_valores_highway(directorio):
+    try:
+        with open(os.path.join(directorio, ARCHIVO_HIGHWAY), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+# Lee las aristas paralelas descartadas guardadas con la instantánea, o devuelve 'None' si la instantánea no las tiene
+def leer_aristas_paralelas(directorio):
+    try:
+        with open(os.path.join(directorio, ARCHIVO_PARALELAS), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+# Abre una instantánea y devuelve un 'GrafoCompilado' cuyos arreglos están mapeados en memoria (solo lectura)
+def cargar_instantanea(directorio):
+    metadatos = leer_metadatos(directorio)
+    if metadatos is None:
+        raise FileNotFoundError(f"No hay una instantánea válida en {directorio}")
+    arreglos = {
+        nombre: np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode='r')
+        for nombre in ARREGLOS_INSTANTANEA
+    }
+    grafo_compilado = GrafoCompilado(
+        arreglos['ids_nodos'], arreglos['x'], arreglos['y'],
+        arreglos['desplazamientos'], arreglos['destinos'], arreglos['pesos'],
+        arreglos['longitudes'], arreglos['claves'], metadatos['atributo_peso'],
+        arreglos['velocidades_kmh'], arreglos['lat'], arreglos['lon'],
+    )
+    # Guardamos los metadatos en el grafo para saber de dónde salió (lugares, parámetros, etc.)
+    grafo_compilado.metadatos = metadatos
+    # También guardamos la carpeta, ahí se guardan los índices que se construyen a partir de la instantánea (por ejemplo el espacial)
+    grafo_compilado.directorio_instantanea = directorio
+    return grafo_compilado
+
+
+# Devuelve el grafo compilado de la instantánea que corresponde a estos parámetros, construyéndola solo si todavía no existe
+# 'construir_grafo' es una función sin argumentos que devuelve un 'GrafoCompilado', o el grafo de NetworkX ya proyectado y con 'tiempo_viaje_segundos'
+# (en el script principal es la descarga con OSMnx), solo se llama cuando hay que reconstruir
+def obtener_instantanea(lista_de_lugares, tipo_de_red, parametros_velocidad, construir_grafo,
+                        directorio_base=DIRECTORIO_INSTANTANEAS, atributo_peso='tiempo_viaje_segundos'):
+    clave = clave_instantanea(lista_de_lugares, tipo_de_red, parametros_velocidad)
+    directorio = os.path.join(directorio_base, clave)
+    if leer_metadatos(directorio) is None:
+        print(f"No existe la instantánea {clave}, construyendo el grafo desde cero")
+        grafo_construido = construir_grafo()
+        if isinstance(grafo_construido, GrafoCompilado):
+            grafo_compilado = grafo_construido
+            # 'compilar_desde_overpass' deja el 'highway' de cada arista y las paralelas descartadas en el grafo compilado
+            valores_highway = getattr(grafo_construido, 'valores_highway', None)
+            paralelas = getattr(grafo_construido, 'aristas_paralelas', None)
+        else:
+            grafo_compilado = compilar_grafo(grafo_construido, atributo_peso)
+            valores_highway = valores_aristas(grafo_construido, grafo_compilado, 'highway')
+            paralelas = aristas_paralelas(grafo_construido, grafo_compilado)
+        guardar_instantanea(grafo_compilado, directorio, {
+            'clave': clave,
+            'lugares': list(lista_de_lugares),
+            'tipo_de_red': tipo_de_red,
+            'parametros_velocidad': parametros_velocidad,
+        }, valores_highway, paralelas)
+    return cargar_instantanea(directorio)
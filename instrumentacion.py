@@ -0,0 +1,247 @@
+# En este archivo están los "observadores" de la búsqueda de Dijkstra.
+# Un observador es un objeto que recibe avisos de lo que va pasando dentro del algoritmo (nodo extraído, vecino revisado, etc.)
+# Así el algoritmo no tiene que imprimir nada por su cuenta y cada quien decide qué hacer con esa información:
+#   - 'ObservadorConsola' imprime paso a paso en español, como lo hacía originalmente 'dijkstra_iterativo'
+#   - 'ObservadorContadores' solo cuenta (nodos visitados, aristas relajadas, tamaño máximo de la cola, tiempo por fase)
+#   - 'ObservadorTraza' escribe los eventos en un archivo JSON-lines, completos o cada cierto número de iteraciones
+# Si no se pasa ningún observador, la búsqueda es silenciosa y no hace ninguna llamada extra.
+
+# Importamos 'json' para escribir cada evento de la traza como una línea JSON
+import json
+# Importamos 'time' para medir el tiempo de cada fase con 'perf_counter'
+import time
+
+
+# Clase base con todos los avisos posibles, cada método no hace nada y los observadores concretos solo sobrescriben los que les interesan
+class ObservadorBusqueda:
+    # Se llama una vez al empezar la búsqueda
+    def inicio_busqueda(self, nodo_origen, nodo_destino, atributo_peso):
+        pass
+
+    # Se llama cuando el algoritmo pasa a otra fase ('inicializacion', 'busqueda', 'reconstruccion')
+    def cambio_fase(self, fase):
+        pass
+
+    # Se llama cada vez que sacamos un nodo de la cola de prioridad, 'tamano_cola' es el tamaño de la cola antes de sacarlo
+    def nodo_extraido(self, iteracion, nodo, distancia, tamano_cola):
+        pass
+
+    # Se llama cuando el nodo sacado de la cola ya había sido visitado (entrada vieja de la cola)
+    def nodo_repetido(self, nodo):
+        pass
+
+    # Se llama cuando el nodo sacado de la cola es el destino
+    def destino_encontrado(self, nodo):
+        pass
+
+    # Se llama justo antes de revisar los vecinos del nodo actual
+    def inicio_vecinos(self, nodo):
+        pass
+
+    # Se llama por cada vecino revisado, 'mejorado' indica si encontramos un camino más corto hacia él
+    def arista_relajada(self, nodo, vecino, peso, distancia_anterior, nueva_distancia, mejorado):
+        pass
+
+    # Se llama al terminar de revisar todos los vecinos del nodo actual
+    def fin_iteracion(self):
+        pass
+
+    # Se llama una vez al terminar, 'camino' es la lista de nodos o 'None' si el destino es inalcanzable
+    def fin_busqueda(self, camino):
+        pass
+
+
+# Observador que imprime en la consola todo el proceso, con los mismos mensajes que tenía 'dijkstra_iterativo'
+class ObservadorConsola(ObservadorBusqueda):
+    def inicio_busqueda(self, nodo_origen, nodo_destino, atributo_peso):
+        print("\nITERACIONES DEL ALGORITMO DIJKSTRA\n")
+        print(f"Buscando ruta de {nodo_origen} a {nodo_destino}...")
+        print(f"Peso a minimizar: {atributo_peso}\n")
+
+    def cambio_fase(self, fase):
+        if fase == 'reconstruccion':
+            print("\nFinalizando y reconstruyendo el camino más corto")
+
+    def nodo_extraido(self, iteracion, nodo, distancia, tamano_cola):
+        print(f"--- Iteración {iteracion} ---")
+        print(f"Nodo actual (más cercano y no visitado): {nodo}")
+        print(f"Distancia conocida para llegar a él: {distancia:.2f} (segundos)")
+
+    def nodo_repetido(self, nodo):
+        print("Este nodo ya fue visitado")
+
+    def destino_encontrado(self, nodo):
+        print(f"\nNodo destino {nodo} encontrado, hemos terminado la búsqueda")
+
+    def inicio_vecinos(self, nodo):
+        print("  Revisando vecinos")
+
+    def arista_relajada(self, nodo, vecino, peso, distancia_anterior, nueva_distancia, mejorado):
+        print(f"  +++++++ Vecino: {vecino} (Peso calle: {peso:.2f} s)")
+        if mejorado:
+            print(f"       *Camino mejorado* --Anterior: {distancia_anterior:.2f}, Nuevo: {nueva_distancia:.2f}--")
+        else:
+            print(f"       --Camino no mejorado, la distancia actual es: {distancia_anterior:.2f}--")
+
+    def fin_iteracion(self):
+        print("-" * 22) # Separador
+
+    def fin_busqueda(self, camino):
+        if camino is None:
+            print("ERROR: No se pudo reconstruir el camino. El destino es inalcanzable.")
+        else:
+            print(f"Camino encontrado: {camino}")
+
+
+# Observador que solo cuenta, pensado para producción donde queremos métricas pero no mensajes en la consola
+class ObservadorContadores(ObservadorBusqueda):
+    def __init__(self):
+        self.reiniciar()
+
+    # Pone todos los contadores en cero, útil para reutilizar el mismo observador en varias búsquedas
+    def reiniciar(self):
+        self.nodos_visitados = 0
+        self.extracciones_repetidas = 0
+        self.aristas_relajadas = 0
+        self.aristas_mejoradas = 0
+        self.maximo_cola = 0
+        # Segundos acumulados en cada fase, por ejemplo {'inicializacion': 0.01, 'busqueda': 0.2, ...}
+        self.tiempo_por_fase = {}
+        self._fase_actual = None
+        self._inicio_fase = None
+
+    # Cierra la fase que estaba corriendo y suma su tiempo
+    def _cerrar_fase(self):
+        if self._fase_actual is not None:
+            transcurrido = time.perf_counter() - self._inicio_fase
+            self.tiempo_por_fase[self._fase_actual] = self.tiempo_por_fase.get(self._fase_actual, 0.0) + transcurrido
+        self._fase_actual = None
+
+    def cambio_fase(self, fase):
+        self._cerrar_fase()
+        self._fase_actual = fase
+        self._inicio_fase = time.perf_counter()
+
+    def nodo_extraido(self, iteracion, nodo, distancia, tamano_cola):
+        if tamano_cola > self.maximo_cola:
+            self.maximo_cola = tamano_cola
+
+    def nodo_repetido(self, nodo):
+        self.extracciones_repetidas += 1
+
+    def inicio_vecinos(self, nodo):
+        self.nodos_visitados += 1
+
+    def destino_encontrado(self, nodo):
+        self.nodos_visitados += 1
+
+    def arista_relajada(self, nodo, vecino, peso, distancia_anterior, nueva_distancia, mejorado):
+        self.aristas_relajadas += 1
+        if mejorado:
+            self.aristas_mejoradas += 1
+
+    def fin_busqueda(self, camino):
+        self._cerrar_fase()
+
+    # Devuelve todos los contadores en un diccionario, fácil de convertir a JSON o de imprimir
+    def como_diccionario(self):
+        return {
+            'nodos_visitados': self.nodos_visitados,
+            'extracciones_repetidas': self.extracciones_repetidas,
+            'aristas_relajadas': self.aristas_relajadas,
+            'aristas_mejoradas': self.aristas_mejoradas,
+            'maximo_cola': self.maximo_cola,
+            'tiempo_por_fase': dict(self.tiempo_por_fase),
+        }
+
+
+# Observador que escribe los eventos en un archivo JSON-lines (un objeto JSON por línea)
+# Con 'muestreo=1' se escriben todas las iteraciones; con 'muestreo=100' solo una de cada 100
+class ObservadorTraza(ObservadorBusqueda):
+    def __init__(self, ruta_archivo, muestreo=1):
+        if muestreo < 1:
+            raise ValueError("El muestreo debe ser un entero mayor o igual a 1")
+        self.ruta_archivo = ruta_archivo
+        self.muestreo = muestreo
+        self._archivo = None
+        # Indica si la iteración actual se está escribiendo o se saltó por el muestreo
+        self._escribiendo = True
+
+    # Escribe un evento como una línea JSON, 'default=str' convierte a texto lo que JSON no entiende (por ejemplo enteros de NumPy)
+    def _escribir(self, evento, **datos):
+        datos['evento'] = evento
+        datos['t'] = time.perf_counter()
+        self._archivo.write(json.dumps(datos, default=str) + "\n")
+
+    def inicio_busqueda(self, nodo_origen, nodo_destino, atributo_peso):
+        # Abrimos el archivo en modo 'a' (append) para que varias búsquedas se acumulen en la misma traza
+        self._archivo = open(self.ruta_archivo, 'a', encoding='utf-8')
+        self._escribir('inicio_busqueda', origen=nodo_origen, destino=nodo_destino, atributo_peso=atributo_peso)
+
+    def cambio_fase(self, fase):
+        self._escribir('cambio_fase', fase=fase)
+
+    def nodo_extraido(self, iteracion, nodo, distancia, tamano_cola):
+        self._escribiendo = iteracion % self.muestreo == 0 or iteracion == 1
+        if self._escribiendo:
+            self._escribir('nodo_extraido', iteracion=iteracion, nodo=nodo, distancia=distancia, tamano_cola=tamano_cola)
+
+    def nodo_repetido(self, nodo):
+        if self._escribiendo:
+            self._escribir('nodo_repetido', nodo=nodo)
+
+    def destino_encontrado(self, nodo):
+        # El destino siempre se escribe, aunque su iteración no toque por el muestreo
+        self._escribir('destino_encontrado', nodo=nodo)
+
+    def arista_relajada(self, nodo, vecino, peso, distancia_anterior, nueva_distancia, mejorado):
+        if self._escribiendo:
+            self._escribir('arista_relajada', nodo=nodo, vecino=vecino, peso=peso,
+                           distancia_anterior=distancia_anterior, nueva_distancia=nueva_distancia, mejorado=mejorado)
+
+    def fin_busqueda(self, camino):
+        self._escribir('fin_busqueda', longitud_camino=None if camino is None else len(camino))
+        self._archivo.close()
+        self._archivo = None
+
+
+# Observador que reenvía cada aviso a varios observadores, por ejemplo contadores y traza al mismo tiempo
+class ObservadorMultiple(ObservadorBusqueda):
+    def __init__(self, *observadores):
+        self.observadores = observadores
+
+    def inicio_busqueda(self, nodo_origen, nodo_destino, atributo_peso):
+        for observador in self.observadores:
+            observador.inicio_busqueda(nodo_origen, nodo_destino, atributo_peso)
+
+    def cambio_fase(self, fase):
+        for observador in self.observadores:
+            observador.cambio_fase(fase)
+
+    def nodo_extraido(self, iteracion, nodo, distancia, tamano_cola):
+        for observador in self.observadores:
+            observador.nodo_extraido(iteracion, nodo, distancia, tamano_cola)
+
+    def nodo_repetido(self, nodo):
+        for observador in self.observadores:
+            observador.nodo_repetido(nodo)
+
+    def destino_encontrado(self, nodo):
+        for observador in self.observadores:
+            observador.destino_encontrado(nodo)
+
+    def inicio_vecinos(self, nodo):
+        for observador in self.observadores:
+            observador.inicio_vecinos(nodo)
+
+    def arista_relajada(self, nodo, vecino, peso, distancia_anterior, nueva_distancia, mejorado):
+        for observador in self.observadores:
+            observador.arista_relajada(nodo, vecino, peso, distancia_anterior, nueva_distancia, mejorado)
+
+    def fin_iteracion(self):
+        for observador in self.observadores:
+            observador.fin_iteracion()
+
+    def fin_busqueda(self, camino):
+        for observador in self.observadores:
+            observador.fin_busqueda(camino)
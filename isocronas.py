@@ -0,0 +1,510 @@
+# En este archivo están las isócronas: "¿a dónde se llega desde este punto en 5, 10 o 15 minutos?".
+# En lugar de buscar una ruta por cada destino, hacemos UNA búsqueda de Dijkstra desde el origen hacia todo el grafo (uno a todos)
+# con los mismos pesos 'tiempo_viaje_segundos', que deja de expandir en cuanto el tiempo pasa del umbral más grande.
+# Como Dijkstra visita los nodos en orden de tiempo, los nodos alcanzables con cada umbral son un prefijo de la lista de visitados:
+# con una sola búsqueda salen todos los umbrales a la vez.
+#
+# Contornos opcionales (necesitan 'lat' y 'lon' en los nodos):
+#   - 'raster': una rejilla de celdas cuadradas con el menor tiempo de llegada a cada celda. Las calles se toman como segmentos rectos
+#     entre sus dos nodos (igual que 'indice_espacial.py') y una calle recorrida solo en parte cuenta hasta donde alcanza el tiempo.
+#   - 'poligono': para cada umbral, el borde de las celdas alcanzables como un MultiPolygon de GeoJSON (anillos exteriores en sentido
+#     antihorario y huecos en sentido horario, coordenadas [lon, lat]).
+#
+# Para muchos orígenes (por ejemplo cientos de depósitos) 'calcular_isocronas' reparte los orígenes entre procesos que abren
+# la instantánea del grafo mapeada en memoria, igual que 'matriz_tiempos.py'.
+#
+# Uso: python isocronas.py LAT LON [--minutos 5,10,15] [--contorno poligono|raster] [--celda 100] [--instantanea CARPETA]
+#      python isocronas.py --depositos depositos.csv [--minutos 5,10,15] [--procesos N] [--salida resultados.jsonl]
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'csv' para leer la lista de depósitos
+import csv
+# Importamos 'heapq' para la cola de prioridad de la búsqueda acotada
+import heapq
+# Importamos 'json' para escribir los resultados
+import json
+# Importamos 'os' para saber cuántos procesadores hay
+import os
+# Importamos 'shutil' y 'tempfile' para la instantánea temporal cuando el grafo no viene de una instantánea
+import shutil
+import tempfile
+# Importamos 'sys' para leer y escribir por la entrada y salida estándar
+import sys
+# Importamos el ejecutor de procesos de la biblioteca estándar
+from concurrent.futures import ProcessPoolExecutor
+
+# Importamos numpy con el alias 'np' para los resultados y la rejilla de los contornos
+import numpy as np
+
+# Importamos el índice espacial (pegar puntos a la red y su proyección local) y la instantánea para los procesos trabajadores
+from indice_espacial import RADIO_TIERRA_METROS, obtener_indice_espacial
+from instantanea_grafo import cargar_instantanea, guardar_instantanea
+
+# Umbrales (minutos) que se usan si no se piden otros
+MINUTOS_POR_DEFECTO = (5, 10, 15)
+
+# Lado de las celdas del contorno en metros
+TAMANO_CELDA_POR_DEFECTO = 100.0
+
+# Celdas vecinas que se rellenan alrededor de cada calle alcanzada, así el contorno no queda como un dibujo de líneas sueltas
+RELLENO_CELDAS_POR_DEFECTO = 1
+
+# Número de bloques de orígenes por proceso, con más de uno el trabajo se reparte mejor si unos orígenes tardan más que otros
+BLOQUES_POR_PROCESO = 4
+
+# Grafo compilado del proceso trabajador, lo llena '_inicializar_trabajador' una sola vez por proceso
+_grafo_trabajador = None
+
+
+# Búsqueda acotada sobre índices densos: Dijkstra desde 'indice_origen' que no expande nada más allá de 'presupuesto_segundos'
+# Devuelve tres arreglos alineados (índices, segundos, metros) con los nodos alcanzables en el orden en que se visitaron,
+# es decir, ordenados por tiempo de llegada; los metros son la suma de las longitudes del camino de menor tiempo
+def alcanzables_indices(grafo_compilado, indice_origen, presupuesto_segundos):
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+    longitudes = grafo_compilado.longitudes_lista()
+    memoria = grafo_compilado.memoria_busqueda()
+    consulta = memoria.nueva_consulta()
+    distancias = memoria.distancias
+    metros = memoria.metros
+    marcas = memoria.marcas
+    cerrados = memoria.cerrados
+
+    distancias[indice_origen] = 0.0
+    metros[indice_origen] = 0.0
+    marcas[indice_origen] = consulta
+    cola_prioridad = [(0.0, indice_origen)]
+    visitados = []
+
+    while cola_prioridad:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        if cerrados[nodo_actual] == consulta:
+            continue
+        cerrados[nodo_actual] = consulta
+        visitados.append(nodo_actual)
+        metros_actuales = metros[nodo_actual]
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            nueva_distancia = distancia_actual + pesos[posicion]
+            # Lo que queda fuera del presupuesto no entra a la cola (esto también salta las calles cerradas, de peso infinito)
+            if nueva_distancia > presupuesto_segundos:
+                continue
+            if marcas[vecino] != consulta or nueva_distancia < distancias[vecino]:
+                distancias[vecino] = nueva_distancia
+                metros[vecino] = metros_actuales + longitudes[posicion]
+                marcas[vecino] = consulta
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+
+    indices = np.array(visitados, dtype=np.int64)
+    segundos = np.array([distancias[indice] for indice in visitados], dtype=np.float64)
+    metros_nodos = np.array([metros[indice] for indice in visitados], dtype=np.float64)
+    return indices, segundos, metros_nodos
+
+
+# Revisa los umbrales (segundos) y los devuelve como arreglo ordenado de menor a mayor
+def _validar_umbrales(umbrales_segundos):
+    umbrales = np.asarray(umbrales_segundos, dtype=np.float64).reshape(-1)
+    if len(umbrales) == 0:
+        raise ValueError("Hace falta al menos un umbral de tiempo")
+    if not np.all(np.isfinite(umbrales)) or np.any(umbrales < 0):
+        raise ValueError("Los umbrales de tiempo deben ser números finitos y no negativos")
+    return np.sort(umbrales)
+
+
+# Isócrona desde el índice denso 'indice_origen' para varios umbrales (segundos) con una sola búsqueda
+# Devuelve un diccionario con:
+#   'umbrales'      -> los umbrales en segundos, de menor a mayor
+#   'indices'       -> índices densos de los nodos alcanzables con el umbral más grande, ordenados por tiempo de llegada
+#   'segundos'      -> tiempo de llegada a cada uno de esos nodos
+#   'metros'        -> metros recorridos hasta cada uno de esos nodos
+#   'cantidades'    -> para cada umbral, cuántos de los primeros nodos lo cumplen (los alcanzables son 'indices[:cantidad]')
+def isocrona_indices(grafo_compilado, indice_origen, umbrales_segundos):
+    umbrales = _validar_umbrales(umbrales_segundos)
+    indices, segundos, metros = alcanzables_indices(grafo_compilado, indice_origen, float(umbrales[-1]))
+    return {
+        'umbrales': umbrales,
+        'indices': indices,
+        'segundos': segundos,
+        'metros': metros,
+        'cantidades': np.searchsorted(segundos, umbrales, side='right'),
+    }
+
+
+# Isócrona desde un nodo (ID de OSM); además de lo que devuelve 'isocrona_indices' agrega 'nodos' (IDs de OSM en el mismo orden)
+# y, si se pide 'contorno' ('raster' o 'poligono'), la rejilla de tiempos o los polígonos de cada umbral
+# 'indice_espacial' es opcional: quien ya tiene abierto el índice del grafo lo pasa para no volver a leerlo en cada isócrona
+def calcular_isocrona(grafo_compilado, nodo_origen, umbrales_segundos, contorno=None, tamano_celda_metros=TAMANO_CELDA_POR_DEFECTO,
+                      relleno_celdas=RELLENO_CELDAS_POR_DEFECTO, indice_espacial=None):
+    if contorno not in (None, 'raster', 'poligono'):
+        raise ValueError(f"Contorno desconocido '{contorno}', los disponibles son: raster, poligono")
+    resultado = isocrona_indices(grafo_compilado, grafo_compilado.indice(nodo_origen), umbrales_segundos)
+    resultado['nodos'] = grafo_compilado.ids_nodos[resultado['indices']]
+    if contorno is not None:
+        rejilla = rasterizar_isocrona(grafo_compilado, resultado, tamano_celda_metros, relleno_celdas, indice_espacial)
+        if contorno == 'raster':
+            resultado['raster'] = rejilla
+        else:
+            resultado['poligonos'] = [poligonos_rejilla(rejilla, umbral) for umbral in resultado['umbrales'].tolist()]
+    return resultado
+
+
+# Rejilla de tiempos de una isócrona: cada celda guarda el menor tiempo (segundos) con el que se llega a algún punto de una calle dentro de ella
+# Las calles se muestrean cada media celda; de una calle que sale de un nodo alcanzado solo cuentan los puntos a los que se llega
+# dentro del umbral más grande, suponiendo velocidad constante a lo largo de la calle
+# 'relleno_celdas' extiende cada tiempo a las celdas vecinas (a esa distancia en celdas) sin sumarle nada
+# Devuelve un diccionario con 'segundos' (arreglo filas x columnas, 'inf' donde no se llega; la fila 0 es la del sur),
+# 'lat_sur', 'lon_oeste', 'grados_lat', 'grados_lon' (tamaño de la celda en grados) y los datos de la proyección para los polígonos
+def rasterizar_isocrona(grafo_compilado, resultado, tamano_celda_metros=TAMANO_CELDA_POR_DEFECTO, relleno_celdas=RELLENO_CELDAS_POR_DEFECTO,
+                        indice_espacial=None):
+    if tamano_celda_metros <= 0:
+        raise ValueError("El tamaño de celda debe ser positivo")
+    if indice_espacial is None:
+        indice_espacial = obtener_indice_espacial(grafo_compilado)
+    limite = float(resultado['umbrales'][-1])
+    indices = resultado['indices']
+    tiempo_nodo = np.full(grafo_compilado.numero_nodos, np.inf)
+    tiempo_nodo[indices] = resultado['segundos']
+
+    # Aristas que salen de los nodos alcanzados, con el tiempo de llegada a su nodo de inicio
+    desplazamientos = np.asarray(grafo_compilado.desplazamientos, dtype=np.int64)
+    grados = desplazamientos[indices + 1] - desplazamientos[indices]
+    origenes = np.repeat(indices, grados)
+    posiciones = np.repeat(desplazamientos[indices] - np.cumsum(grados) + grados, grados) + np.arange(int(grados.sum()))
+    destinos = np.asarray(grafo_compilado.destinos, dtype=np.int64)[posiciones]
+    pesos = np.asarray(grafo_compilado.pesos, dtype=np.float64)[posiciones]
+    abiertas = np.isfinite(pesos)
+    origenes, destinos, pesos = origenes[abiertas], destinos[abiertas], pesos[abiertas]
+    tiempo_inicio = tiempo_nodo[origenes]
+
+    # Puntos de muestra a lo largo de cada arista: fracción 0 en el nodo de inicio y 1 en el de llegada
+    x, y = indice_espacial.x, indice_espacial.y
+    largo = np.hypot(x[destinos] - x[origenes], y[destinos] - y[origenes])
+    muestras = np.floor(largo / (tamano_celda_metros / 2.0)).astype(np.int64) + 2
+    arista = np.repeat(np.arange(len(origenes)), muestras)
+    inicio_muestras = np.cumsum(muestras) - muestras
+    fraccion = (np.arange(int(muestras.sum())) - inicio_muestras[arista]) / (muestras[arista] - 1)
+    tiempo = tiempo_inicio[arista] + fraccion * pesos[arista]
+    dentro = tiempo <= limite
+    arista, fraccion, tiempo = arista[dentro], fraccion[dentro], tiempo[dentro]
+    origen_muestra, destino_muestra = origenes[arista], destinos[arista]
+    px = x[origen_muestra] + fraccion * (x[destino_muestra] - x[origen_muestra])
+    py = y[origen_muestra] + fraccion * (y[destino_muestra] - y[origen_muestra])
+    # Los nodos alcanzados también son muestras (el origen no tiene aristas si todas salen cerradas)
+    px = np.concatenate((x[indices], px))
+    py = np.concatenate((y[indices], py))
+    tiempo = np.concatenate((resultado['segundos'], tiempo))
+
+    # La rejilla cubre las muestras con 'relleno_celdas' celdas de margen por lado
+    x_min = float(px.min()) - (relleno_celdas + 0.5) * tamano_celda_metros
+    y_min = float(py.min()) - (relleno_celdas + 0.5) * tamano_celda_metros
+    columnas = int((float(px.max()) - x_min) // tamano_celda_metros) + relleno_celdas + 1
+    filas = int((float(py.max()) - y_min) // tamano_celda_metros) + relleno_celdas + 1
+    columna = ((px - x_min) // tamano_celda_metros).astype(np.int64)
+    fila = ((py - y_min) // tamano_celda_metros).astype(np.int64)
+    segundos = np.full(filas * columnas, np.inf)
+    np.minimum.at(segundos, fila * columnas + columna, tiempo)
+    segundos = segundos.reshape(filas, columnas)
+
+    # Relleno: cada celda toma el menor tiempo de su vecindario de (2 * relleno + 1) x (2 * relleno + 1) celdas
+    if relleno_celdas > 0:
+        for eje in (0, 1):
+            extendida = segundos.copy()
+            for paso in range(1, relleno_celdas + 1):
+                hacia_adelante = [slice(None), slice(None)]
+                hacia_atras = [slice(None), slice(None)]
+                hacia_adelante[eje], hacia_atras[eje] = slice(paso, None), slice(None, -paso)
+                np.minimum(extendida[tuple(hacia_adelante)], segundos[tuple(hacia_atras)], out=extendida[tuple(hacia_adelante)])
+                np.minimum(extendida[tuple(hacia_atras)], segundos[tuple(hacia_adelante)], out=extendida[tuple(hacia_atras)])
+            segundos = extendida
+
+    escala_x = RADIO_TIERRA_METROS * np.cos(np.radians(indice_espacial.latitud_referencia))
+    return {
+        'segundos': segundos,
+        'lat_sur': float(np.degrees(y_min / RADIO_TIERRA_METROS)),
+        'lon_oeste': float(np.degrees(x_min / escala_x)),
+        'grados_lat': float(np.degrees(tamano_celda_metros / RADIO_TIERRA_METROS)),
+        'grados_lon': float(np.degrees(tamano_celda_metros / escala_x)),
+        'tamano_celda_metros': float(tamano_celda_metros),
+    }
+
+
+# Traza el borde de las celdas de la rejilla con tiempo <= 'umbral' y lo devuelve como MultiPolygon de GeoJSON
+# Cada celda alcanzable aporta los lados que no comparte con otra celda alcanzable, orientados con la celda a la izquierda;
+# al encadenarlos salen anillos antihorarios (exteriores) y horarios (huecos). Ningún anillo se toca consigo mismo: dos celdas
+# que solo se tocan en una esquina quedan en anillos separados
+def poligonos_rejilla(rejilla, umbral):
+    dentro = rejilla['segundos'] <= umbral
+    filas, columnas = dentro.shape
+    relleno = np.zeros((filas + 2, columnas + 2), dtype=bool)
+    relleno[1:-1, 1:-1] = dentro
+    centro = relleno[1:-1, 1:-1]
+
+    # Los vértices son esquinas de celda (fila, columna) numeradas como fila * (columnas + 1) + columna
+    ancho = columnas + 1
+    lados_inicio = []
+    lados_fin = []
+    # Lado sur (fila f) sin vecina al sur: va de oeste a este; norte: de este a oeste; este: de sur a norte; oeste: de norte a sur
+    for vecina, desplazamiento_inicio, desplazamiento_fin in (
+            (relleno[:-2, 1:-1], (0, 0), (0, 1)),
+            (relleno[2:, 1:-1], (1, 1), (1, 0)),
+            (relleno[1:-1, 2:], (0, 1), (1, 1)),
+            (relleno[1:-1, :-2], (1, 0), (0, 0))):
+        fila, columna = np.nonzero(centro & ~vecina)
+        lados_inicio.append((fila + desplazamiento_inicio[0]) * ancho + columna + desplazamiento_inicio[1])
+        lados_fin.append((fila + desplazamiento_fin[0]) * ancho + columna + desplazamiento_fin[1])
+    lados_inicio = np.concatenate(lados_inicio).tolist()
+    lados_fin = np.concatenate(lados_fin).tolist()
+
+    # En una esquina compartida por dos celdas en diagonal salen dos lados: se toma la vuelta a la izquierda, que sigue pegada a la
+    # celda de la que se viene; si esas dos celdas se unen por otro lado el anillo pasa dos veces por la esquina y se parte ahí
+    salidas = {}
+    for inicio, fin in zip(lados_inicio, lados_fin):
+        salidas.setdefault(inicio, []).append(fin)
+    anillos = []
+    while salidas:
+        # Cada anillo empieza en una esquina con un solo lado de salida (siempre hay una: la esquina más al suroeste que queda)
+        primero = next((vertice for vertice, opciones in salidas.items() if len(opciones) == 1), None)
+        if primero is None:
+            primero = min(salidas)
+        anillo = [primero]
+        anterior, actual = None, primero
+        while True:
+            opciones = salidas[actual]
+            if len(opciones) == 1:
+                siguiente = opciones.pop()
+            else:
+                siguiente = _vuelta_a_la_izquierda(anterior, actual, opciones, ancho)
+                opciones.remove(siguiente)
+            if not opciones:
+                del salidas[actual]
+            anterior, actual = actual, siguiente
+            if actual == primero:
+                break
+            anillo.append(actual)
+        anillos.extend(_quitar_colineales(parte, ancho) for parte in _separar_anillo(anillo))
+
+    # Área con signo de cada anillo (en celdas): positiva para los exteriores, negativa para los huecos
+    exteriores = []
+    huecos = []
+    for anillo in anillos:
+        fila = np.array(anillo) // ancho
+        columna = np.array(anillo) % ancho
+        area = 0.5 * float(np.sum(columna * np.roll(fila, -1) - np.roll(columna, -1) * fila))
+        (exteriores if area > 0 else huecos).append((anillo, fila, columna, abs(area)))
+
+    # Cada hueco va con el exterior más chico que contiene la celda alcanzable pegada a su primer lado
+    huecos_de = [[] for _ in exteriores]
+    for anillo, fila, columna, _ in huecos:
+        # Punto un cuarto de celda a la izquierda del primer lado (en la celda alcanzable)
+        fila_punto = (fila[0] + fila[1]) / 2.0 + 0.25 * np.sign(columna[1] - columna[0])
+        columna_punto = (columna[0] + columna[1]) / 2.0 - 0.25 * np.sign(fila[1] - fila[0])
+        contenedores = [
+            (area, numero) for numero, (_, fila_exterior, columna_exterior, area) in enumerate(exteriores)
+            if _punto_en_anillo(fila_punto, columna_punto, fila_exterior, columna_exterior)
+        ]
+        if contenedores:
+            huecos_de[min(contenedores)[1]].append(anillo)
+
+    def coordenadas(anillo):
+        vertices = np.array(anillo + anillo[:1])
+        lon = rejilla['lon_oeste'] + (vertices % ancho) * rejilla['grados_lon']
+        lat = rejilla['lat_sur'] + (vertices // ancho) * rejilla['grados_lat']
+        return np.round(np.column_stack((lon, lat)), 7).tolist()
+
+    return {
+        'type': 'MultiPolygon',
+        'coordinates': [
+            [coordenadas(anillo)] + [coordenadas(hueco) for hueco in huecos_de[numero]]
+            for numero, (anillo, _, _, _) in enumerate(exteriores)
+        ],
+    }
+
+
+# Entre varios lados que salen de 'actual', elige el que da la vuelta a la izquierda viniendo desde 'anterior'
+def _vuelta_a_la_izquierda(anterior, actual, opciones, ancho):
+    direccion_fila = actual // ancho - anterior // ancho
+    direccion_columna = actual % ancho - anterior % ancho
+    for opcion in opciones:
+        # Girar a la izquierda (con el norte hacia arriba): (fila, columna) -> (columna, -fila)
+        if (opcion // ancho - actual // ancho, opcion % ancho - actual % ancho) == (direccion_columna, -direccion_fila):
+            return opcion
+    return opciones[0]
+
+
+# Parte un anillo que pasa más de una vez por la misma esquina en anillos que no se tocan a sí mismos
+# Así una región que encierra un hueco tocándolo en una esquina queda como un exterior más un hueco, que es válido en GeoJSON
+def _separar_anillo(anillo):
+    partes = []
+    pila = []
+    posicion_en_pila = {}
+    for vertice in anillo:
+        posicion = posicion_en_pila.get(vertice)
+        if posicion is None:
+            posicion_en_pila[vertice] = len(pila)
+            pila.append(vertice)
+            continue
+        partes.append(pila[posicion:])
+        for quitado in pila[posicion + 1:]:
+            del posicion_en_pila[quitado]
+        del pila[posicion + 1:]
+    partes.append(pila)
+    return partes
+
+
+# Quita los vértices que están en medio de un tramo recto, el anillo queda solo con sus esquinas
+def _quitar_colineales(anillo, ancho):
+    esquinas = []
+    for posicion, vertice in enumerate(anillo):
+        anterior = anillo[posicion - 1]
+        siguiente = anillo[(posicion + 1) % len(anillo)]
+        if (vertice // ancho - anterior // ancho, vertice % ancho - anterior % ancho) != \
+                (siguiente // ancho - vertice // ancho, siguiente % ancho - vertice % ancho):
+            esquinas.append(vertice)
+    return esquinas
+
+
+# Prueba del rayo: dice si el punto (fila, columna) está dentro del anillo dado por sus vértices
+def _punto_en_anillo(fila_punto, columna_punto, filas, columnas):
+    filas_siguientes = np.roll(filas, -1)
+    columnas_siguientes = np.roll(columnas, -1)
+    cruza = (filas > fila_punto) != (filas_siguientes > fila_punto)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columna_cruce = columnas + (fila_punto - filas) * (columnas_siguientes - columnas) / (filas_siguientes - filas)
+    return bool(np.count_nonzero(cruza & (columna_punto < columna_cruce)) % 2)
+
+
+# Calcula las isócronas de un bloque de orígenes (índices densos), sin contornos
+def _calcular_bloque(grafo_compilado, indices_origen, umbrales_segundos):
+    return [isocrona_indices(grafo_compilado, indice_origen, umbrales_segundos) for indice_origen in indices_origen]
+
+
+# Se ejecuta una vez al arrancar cada proceso trabajador: abre la instantánea mapeada en memoria (solo lectura)
+def _inicializar_trabajador(directorio_instantanea):
+    global _grafo_trabajador
+    _grafo_trabajador = cargar_instantanea(directorio_instantanea)
+
+
+# Tarea de un proceso trabajador: las isócronas de los orígenes 'inicio' a 'inicio + len(indices_origen)'
+def _tarea_bloque(inicio, indices_origen, umbrales_segundos):
+    return inicio, _calcular_bloque(_grafo_trabajador, indices_origen, umbrales_segundos)
+
+
+# Isócronas de muchos orígenes (IDs de OSM) con los mismos umbrales, repartidas entre 'procesos' procesos trabajadores
+# Devuelve una lista alineada con 'nodos_origen' con el diccionario de 'isocrona_indices' de cada uno más 'nodos' (IDs de OSM)
+def calcular_isocronas(grafo_compilado, nodos_origen, umbrales_segundos, procesos=None):
+    umbrales = _validar_umbrales(umbrales_segundos)
+    indices_origen = [grafo_compilado.indice(nodo) for nodo in nodos_origen]
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    procesos = max(1, min(procesos, len(indices_origen)))
+
+    if procesos == 1:
+        resultados = _calcular_bloque(grafo_compilado, indices_origen, umbrales)
+    else:
+        resultados = [None] * len(indices_origen)
+        # Igual que en 'matriz_tiempos.py': si el grafo no viene de una instantánea o sus pesos cambiaron, se guarda una temporal
+        directorio = getattr(grafo_compilado, 'directorio_instantanea', None)
+        directorio_temporal = None
+        if directorio is None or grafo_compilado.version_pesos:
+            directorio_temporal = tempfile.mkdtemp(prefix='isocronas_')
+            directorio = os.path.join(directorio_temporal, 'grafo')
+            guardar_instantanea(grafo_compilado, directorio)
+        try:
+            tamano_bloque = max(1, -(-len(indices_origen) // (procesos * BLOQUES_POR_PROCESO)))
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador, initargs=(directorio,)) as ejecutor:
+                tareas = [
+                    ejecutor.submit(_tarea_bloque, inicio, indices_origen[inicio:inicio + tamano_bloque], umbrales)
+                    for inicio in range(0, len(indices_origen), tamano_bloque)
+                ]
+                for tarea in tareas:
+                    inicio, bloque = tarea.result()
+                    resultados[inicio:inicio + len(bloque)] = bloque
+        finally:
+            if directorio_temporal is not None:
+                shutil.rmtree(directorio_temporal, ignore_errors=True)
+
+    for resultado in resultados:
+        resultado['nodos'] = grafo_compilado.ids_nodos[resultado['indices']]
+    return resultados
+
+
+# Convierte el resultado de una isócrona en un diccionario listo para 'json.dumps': por cada umbral, sus nodos y tiempos
+def isocrona_como_diccionario(resultado, con_nodos=True):
+    umbrales = []
+    for umbral, cantidad in zip(resultado['umbrales'].tolist(), resultado['cantidades'].tolist()):
+        entrada = {'segundos': umbral, 'numero_nodos': cantidad}
+        if con_nodos:
+            entrada['nodos'] = resultado['nodos'][:cantidad].tolist()
+        umbrales.append(entrada)
+    diccionario = {'umbrales': umbrales}
+    if con_nodos:
+        # Tiempo y metros de cada nodo del umbral más grande (los de los umbrales menores son un prefijo)
+        diccionario['segundos'] = resultado['segundos'].tolist()
+        diccionario['metros'] = resultado['metros'].tolist()
+    if 'poligonos' in resultado:
+        diccionario['poligonos'] = resultado['poligonos']
+    if 'raster' in resultado:
+        rejilla = resultado['raster']
+        diccionario['raster'] = {clave: valor for clave, valor in rejilla.items() if clave != 'segundos'}
+        diccionario['raster']['segundos'] = np.where(np.isfinite(rejilla['segundos']), rejilla['segundos'], None).tolist()
+    return diccionario
+
+
+# Lee los depósitos de un CSV con columnas 'lat,lon' (el encabezado es opcional y puede traer más columnas)
+def leer_depositos(archivo):
+    puntos = []
+    columnas = (0, 1)
+    for numero, fila in enumerate(csv.reader(archivo)):
+        if not fila:
+            continue
+        if numero == 0 and 'lat' in fila and 'lon' in fila:
+            columnas = (fila.index('lat'), fila.index('lon'))
+            continue
+        puntos.append((float(fila[columnas[0]]), float(fila[columnas[1]])))
+    return puntos
+
+
+if __name__ == "__main__":
+    # Importamos aquí la apertura del grafo de la línea de comandos, así importar este módulo no carga nada más
+    from consola_rutas import abrir_grafo
+
+    analizador = argparse.ArgumentParser(description='Isócronas: qué se alcanza desde un punto con varios presupuestos de tiempo')
+    analizador.add_argument('lat', type=float, nargs='?')
+    analizador.add_argument('lon', type=float, nargs='?')
+    analizador.add_argument('--minutos', default=','.join(str(minutos) for minutos in MINUTOS_POR_DEFECTO),
+                            help='umbrales en minutos separados por comas')
+    analizador.add_argument('--contorno', choices=('poligono', 'raster'), help='agregar el contorno de cada umbral')
+    analizador.add_argument('--celda', type=float, default=TAMANO_CELDA_POR_DEFECTO, help='lado de las celdas del contorno en metros')
+    analizador.add_argument('--depositos', help="CSV con 'lat,lon' de muchos orígenes ('-' para la entrada estándar)")
+    analizador.add_argument('--procesos', type=int, default=None, help='procesos trabajadores para --depositos')
+    analizador.add_argument('--con-nodos', action='store_true', help='con --depositos, incluir los nodos alcanzables de cada umbral')
+    analizador.add_argument('--salida', default='-', help="archivo de salida ('-' para la salida estándar)")
+    analizador.add_argument('--instantanea', help='carpeta de una instantánea del grafo (por defecto la del script principal)')
+    argumentos = analizador.parse_args()
+    if argumentos.depositos is None and (argumentos.lat is None or argumentos.lon is None):
+        analizador.error('hace falta LAT LON o --depositos')
+    umbrales_pedidos = [float(minutos) * 60.0 for minutos in argumentos.minutos.split(',')]
+
+    grafo = abrir_grafo(argumentos.instantanea)
+    indice_espacial = obtener_indice_espacial(grafo)
+    salida = sys.stdout if argumentos.salida == '-' else open(argumentos.salida, 'w', encoding='utf-8')
+    try:
+        if argumentos.depositos is None:
+            nodo = indice_espacial.nodo_mas_cercano(argumentos.lat, argumentos.lon)
+            resultado_isocrona = calcular_isocrona(grafo, nodo, umbrales_pedidos, argumentos.contorno, argumentos.celda,
+                                                   indice_espacial=indice_espacial)
+            json.dump(dict(isocrona_como_diccionario(resultado_isocrona), nodo_origen=nodo), salida, ensure_ascii=False)
+            salida.write('\n')
+        else:
+            with (sys.stdin if argumentos.depositos == '-' else open(argumentos.depositos, newline='', encoding='utf-8')) as entrada:
+                depositos = np.array(leer_depositos(entrada), dtype=np.float64).reshape(-1, 2)
+            nodos_deposito, _ = indice_espacial.nodos_mas_cercanos(depositos[:, 0], depositos[:, 1])
+            resultados_isocronas = calcular_isocronas(grafo, nodos_deposito.tolist(), umbrales_pedidos, argumentos.procesos)
+            # Una línea JSON por depósito, en el orden del CSV
+            for nodo, resultado_isocrona in zip(nodos_deposito.tolist(), resultados_isocronas):
+                json.dump(dict(isocrona_como_diccionario(resultado_isocrona, argumentos.con_nodos), nodo_origen=nodo),
+                          salida, ensure_ascii=False)
+                salida.write('\n')
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
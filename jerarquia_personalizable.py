@@ -0,0 +1,445 @@
+# En este archivo está una variante de la jerarquía de contracción de 'jerarquias_contraccion.py' que se puede "personalizar":
+# cuando cambian los pesos de algunas calles (cierres, embotellamientos) se recalculan solo los pesos de los atajos afectados,
+# en lugar de volver a construir la jerarquía completa.
+#
+# La jerarquía normal decide qué atajos agregar con búsquedas de testigos que dependen de los pesos: si un peso cambia, un atajo que
+# se omitió porque había otro camino igual de bueno puede volverse necesario y la jerarquía deja de dar la ruta más corta.
+# Aquí la estructura no depende de los pesos (Customizable Contraction Hierarchies):
+#   1. Los nodos se contraen en orden de menor grado, tratando el grafo como no dirigido, y al contraer un nodo se unen TODOS sus
+#      vecinos restantes entre sí, sin buscar testigos.
+#   2. Los pesos de cada arista del índice (en los dos sentidos) se calculan aparte: se empieza con el peso de la calle original
+#      (infinito si no hay calle) y para cada triángulo inferior u - x - w, con x de menor rango, se toma el mínimo con u -> x -> w.
+#   3. Si cambian unas calles, solo se recalculan sus aristas del índice y, hacia arriba, las que usaban a esas en algún triángulo.
+# El desempacado de atajos y la interfaz ('consultar', 'ruta') son los de 'JerarquiaContraccion', que esta clase hereda; la consulta
+# en sí recorre el árbol de eliminación en lugar de usar una cola de prioridad.
+#
+# Uso típico:
+#   jerarquia = construir_jerarquia_personalizable(grafo_compilado)
+#   grafo_compilado.actualizar_pesos(posiciones, pesos_nuevos)
+#   jerarquia.actualizar_aristas(grafo_compilado, posiciones)
+
+# Importamos 'heapq' para el orden de contracción y para recorrer los cambios de abajo hacia arriba
+import heapq
+# Importamos 'time' para medir el tiempo de preprocesamiento
+import time
+
+# Importamos numpy con el alias 'np' para los arreglos del índice
+import numpy as np
+
+# Importamos la jerarquía normal, de la que heredamos las consultas
+from jerarquias_contraccion import JerarquiaContraccion
+
+# Tamaño de las partes que la disección anidada ya no sigue partiendo
+TAMANO_HOJA_DISECCION = 32
+
+
+# Jerarquía cuyos pesos se pueden recalcular sin cambiar su estructura
+# Los grafos hacia arriba de los dos sentidos tienen exactamente las mismas aristas: la arista j va del nodo v (el de menor rango) a
+# 'destinos[j]'; en 'subida_adelante' su peso es el de v -> destino y en 'subida_atras' el de destino -> v
+class JerarquiaPersonalizable(JerarquiaContraccion):
+    def __init__(self, ids_nodos, rangos, subida_adelante, subida_atras, atributo_peso, estadisticas,
+                 originales_adelante, originales_atras, aristas_grafo, sentidos_grafo):
+        super().__init__(ids_nodos, rangos, subida_adelante, subida_atras, atributo_peso, estadisticas)
+        # Peso de la calle original de cada arista del índice en cada sentido (infinito si no hay calle)
+        self.originales_adelante = np.array(originales_adelante, dtype=np.float64)
+        self.originales_atras = np.array(originales_atras, dtype=np.float64)
+        # Para cada arista del grafo compilado, la arista del índice que le corresponde y si va hacia arriba (adelante) o hacia abajo (atrás)
+        self.aristas_grafo = np.asarray(aristas_grafo, dtype=np.int64)
+        self.sentidos_grafo = np.asarray(sentidos_grafo, dtype=bool)
+
+        desplazamientos, destinos, _, _ = self._listas[0]
+        numero_nodos = len(self.ids_nodos)
+        # 'posicion_par[(v, u)]' es la arista del índice entre v y u, con v el de menor rango
+        # 'inferiores[u]' son los pares (x, arista x -> u) de los vecinos de u con menor rango, los que forman sus triángulos inferiores
+        self.posicion_par = {}
+        self.inferiores = [[] for _ in range(numero_nodos)]
+        for nodo in range(numero_nodos):
+            for posicion in range(desplazamientos[nodo], desplazamientos[nodo + 1]):
+                self.posicion_par[(nodo, destinos[posicion])] = posicion
+                self.inferiores[destinos[posicion]].append((nodo, posicion))
+        self._origenes = np.repeat(np.arange(numero_nodos), np.diff(self.subida_adelante[0])).tolist()
+        self._rangos_lista = self.rangos.tolist()
+        # Arreglos de trabajo de las consultas, se crean en la primera consulta
+        self._memoria = None
+        # Árbol de eliminación: el padre de cada nodo es su vecino superior de menor rango (-1 para las raíces)
+        # Todos los nodos a los que sube una búsqueda desde v son ancestros de v en este árbol
+        self.padres = [
+            min((destinos[posicion] for posicion in range(desplazamientos[nodo], desplazamientos[nodo + 1])),
+                key=self._rangos_lista.__getitem__, default=-1)
+            for nodo in range(numero_nodos)
+        ]
+
+    # Consulta sobre índices densos por el árbol de eliminación: en lugar de un Dijkstra con cola, cada lado recorre los ancestros de su
+    # nodo de abajo hacia arriba y relaja sus aristas hacia arriba. Como la estructura tiene todos los atajos posibles, los ancestros son
+    # justo los nodos que la búsqueda puede alcanzar y al procesarlos en orden de rango cada uno ya tiene su distancia final.
+    # Los nodos altos tienen cientos de aristas hacia arriba, así que cada nodo se relaja de una vez con NumPy sobre arreglos del tamaño
+    # del grafo que se reutilizan entre consultas (al terminar solo se limpian los ancestros que se tocaron)
+    def consultar_indices(self, indice_origen, indice_destino):
+        if indice_origen == indice_destino:
+            return 0.0, [indice_origen]
+        if self._memoria is None:
+            numero_nodos = len(self.ids_nodos)
+            self._memoria = tuple((np.full(numero_nodos, np.inf), np.full(numero_nodos, -1, dtype=np.int64)) for _ in range(2))
+        distancias = {}
+        predecesores = {}
+        for lado, inicio in ((0, indice_origen), (1, indice_destino)):
+            desplazamientos = self._listas[lado][0]
+            _, destinos, pesos, _ = (self.subida_adelante, self.subida_atras)[lado]
+            distancias_lado, predecesores_lado = self._memoria[lado]
+            distancias_lado[inicio] = 0.0
+            ancestros = []
+            nodo_actual = inicio
+            while nodo_actual != -1:
+                ancestros.append(nodo_actual)
+                distancia_actual = distancias_lado[nodo_actual]
+                inicio_aristas, fin_aristas = desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]
+                if distancia_actual != np.inf and fin_aristas > inicio_aristas:
+                    vecinos = destinos[inicio_aristas:fin_aristas]
+                    candidatos = distancia_actual + pesos[inicio_aristas:fin_aristas]
+                    mejoran = candidatos < distancias_lado[vecinos]
+                    distancias_lado[vecinos[mejoran]] = candidatos[mejoran]
+                    predecesores_lado[vecinos[mejoran]] = nodo_actual
+                nodo_actual = self.padres[nodo_actual]
+            # Pasamos a diccionarios solo los nodos alcanzados y dejamos los arreglos limpios para la siguiente consulta
+            ancestros = np.array(ancestros, dtype=np.int64)
+            alcanzados = ancestros[distancias_lado[ancestros] != np.inf]
+            distancias[lado] = dict(zip(alcanzados.tolist(), distancias_lado[alcanzados].tolist()))
+            predecesores[lado] = dict(zip(alcanzados.tolist(), predecesores_lado[alcanzados].tolist()))
+            distancias_lado[ancestros] = np.inf
+            predecesores_lado[ancestros] = -1
+
+        # El encuentro es el nodo alcanzado por los dos lados con la menor suma
+        mejor_total = float('inf')
+        nodo_encuentro = -1
+        distancias_atras = distancias[1]
+        for nodo, distancia in distancias[0].items():
+            distancia_otro = distancias_atras.get(nodo)
+            if distancia_otro is not None and distancia + distancia_otro < mejor_total:
+                mejor_total = distancia + distancia_otro
+                nodo_encuentro = nodo
+        if nodo_encuentro == -1:
+            return float('inf'), None
+
+        camino_atajos = []
+        nodo_camino_actual = nodo_encuentro
+        while nodo_camino_actual != -1:
+            camino_atajos.append(nodo_camino_actual)
+            nodo_camino_actual = predecesores[0][nodo_camino_actual]
+        camino_atajos.reverse()
+        nodo_camino_actual = predecesores[1][nodo_encuentro]
+        while nodo_camino_actual != -1:
+            camino_atajos.append(nodo_camino_actual)
+            nodo_camino_actual = predecesores[1][nodo_camino_actual]
+        camino = [camino_atajos[0]]
+        for nodo_u, nodo_v in zip(camino_atajos[:-1], camino_atajos[1:]):
+            self._desempacar(nodo_u, nodo_v, camino)
+        return mejor_total, camino
+
+    # Igual que en 'JerarquiaContraccion' pero con 'posicion_par', sin recorrer las aristas del nodo (aquí los nodos altos tienen muchas)
+    def _medio(self, nodo_u, nodo_v):
+        if self._rangos_lista[nodo_u] < self._rangos_lista[nodo_v]:
+            return self._listas[0][3][self.posicion_par[(nodo_u, nodo_v)]]
+        return self._listas[1][3][self.posicion_par[(nodo_v, nodo_u)]]
+
+    # Calcula todos los pesos desde cero a partir de los originales, recorriendo los nodos del menor al mayor rango
+    # Cuando se procesa un nodo v sus aristas ya tienen el peso final, así que con ellas se mejoran las aristas entre cada par de vecinos superiores
+    def personalizar(self):
+        inicio = time.perf_counter()
+        desplazamientos, destinos, _, _ = self._listas[0]
+        pesos_adelante = self.originales_adelante.tolist()
+        pesos_atras = self.originales_atras.tolist()
+        medios_adelante = [-1] * len(pesos_adelante)
+        medios_atras = [-1] * len(pesos_atras)
+        posicion_par = self.posicion_par
+        rangos = self._rangos_lista
+        for nodo in np.argsort(self.rangos).tolist():
+            posiciones = range(desplazamientos[nodo], desplazamientos[nodo + 1])
+            for posicion_u in posiciones:
+                nodo_u = destinos[posicion_u]
+                # Peso de u -> v
+                hacia_nodo = pesos_atras[posicion_u]
+                if hacia_nodo == float('inf'):
+                    continue
+                for posicion_w in posiciones:
+                    if posicion_w == posicion_u:
+                        continue
+                    nodo_w = destinos[posicion_w]
+                    candidato = hacia_nodo + pesos_adelante[posicion_w]
+                    # La arista u - w existe siempre (al contraer v se unieron todos sus vecinos) y es de u si u tiene menor rango
+                    if rangos[nodo_u] < rangos[nodo_w]:
+                        posicion = posicion_par[(nodo_u, nodo_w)]
+                        if candidato < pesos_adelante[posicion]:
+                            pesos_adelante[posicion] = candidato
+                            medios_adelante[posicion] = nodo
+                    else:
+                        posicion = posicion_par[(nodo_w, nodo_u)]
+                        if candidato < pesos_atras[posicion]:
+                            pesos_atras[posicion] = candidato
+                            medios_atras[posicion] = nodo
+        self._escribir(range(len(pesos_adelante)), pesos_adelante, pesos_atras, medios_adelante, medios_atras)
+        self.estadisticas['personalizacion_segundos'] = time.perf_counter() - inicio
+
+    # Recalcula una arista del índice (en los dos sentidos) con su calle original y todos sus triángulos inferiores
+    def _recalcular(self, posicion):
+        _, _, pesos_adelante, _ = self._listas[0]
+        _, _, pesos_atras, _ = self._listas[1]
+        nodo_v = self._origenes[posicion]
+        nodo_u = self._listas[0][1][posicion]
+        adelante, medio_adelante = float(self.originales_adelante[posicion]), -1
+        atras, medio_atras = float(self.originales_atras[posicion]), -1
+        for nodo_x, posicion_xv in self.inferiores[nodo_v]:
+            posicion_xu = self.posicion_par.get((nodo_x, nodo_u))
+            if posicion_xu is None:
+                continue
+            # v -> x -> u
+            candidato = pesos_atras[posicion_xv] + pesos_adelante[posicion_xu]
+            if candidato < adelante:
+                adelante, medio_adelante = candidato, nodo_x
+            # u -> x -> v
+            candidato = pesos_atras[posicion_xu] + pesos_adelante[posicion_xv]
+            if candidato < atras:
+                atras, medio_atras = candidato, nodo_x
+        return adelante, atras, medio_adelante, medio_atras
+
+    # Avisa que cambiaron los pesos de las aristas 'posiciones' del grafo compilado (ya escritos en 'grafo_compilado.pesos')
+    # En lugar de recalcular cada arista afectada con todos sus triángulos, se propaga solo la diferencia, subiendo de rango:
+    #   - si el camino u -> v -> w bajó, basta con compararlo con el peso actual de u -> w
+    #   - si subió y era justo el que daba el peso de u -> w, esa arista se recalcula completa con '_recalcular'
+    # Devuelve cuántas aristas del índice cambiaron de peso
+    def actualizar_aristas(self, grafo_compilado, posiciones):
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        aristas = self.aristas_grafo[posiciones]
+        sentidos = self.sentidos_grafo[posiciones]
+        self.originales_adelante[aristas[sentidos]] = grafo_compilado.pesos[posiciones[sentidos]]
+        self.originales_atras[aristas[~sentidos]] = grafo_compilado.pesos[posiciones[~sentidos]]
+
+        desplazamientos, destinos, pesos_adelante, medios_adelante = self._listas[0]
+        _, _, pesos_atras, medios_atras = self._listas[1]
+        posicion_par = self.posicion_par
+        origenes = self._origenes
+        rangos = self._rangos_lista
+        # Pesos (adelante, atrás) que tenía cada arista tocada antes de esta actualización
+        anteriores = {}
+        # Aristas que hay que recalcular completas: las de las calles que cambiaron y las que perdieron el camino que les daba su peso
+        por_recalcular = set(aristas.tolist())
+        # Aristas tocadas agrupadas por su nodo inferior, y la cola de esos nodos por rango
+        # Las aristas de un nodo solo dependen de triángulos con nodos de menor rango, así que al sacarlo de la cola ya no cambian más
+        tocadas_por_nodo = {}
+        cola_prioridad = []
+
+        def tocar(posicion):
+            if posicion in anteriores:
+                return
+            anteriores[posicion] = (pesos_adelante[posicion], pesos_atras[posicion])
+            nodo = origenes[posicion]
+            tocadas = tocadas_por_nodo.get(nodo)
+            if tocadas is None:
+                tocadas = tocadas_por_nodo[nodo] = []
+                heapq.heappush(cola_prioridad, (rangos[nodo], nodo))
+            tocadas.append(posicion)
+
+        for posicion in por_recalcular:
+            tocar(posicion)
+        numero_cambiadas = 0
+        while cola_prioridad:
+            _, nodo_v = heapq.heappop(cola_prioridad)
+            cambiadas = set()
+            for posicion in tocadas_por_nodo.pop(nodo_v):
+                if posicion in por_recalcular:
+                    pesos_adelante[posicion], pesos_atras[posicion], medios_adelante[posicion], medios_atras[posicion] = \
+                        self._recalcular(posicion)
+                if (pesos_adelante[posicion], pesos_atras[posicion]) != anteriores[posicion]:
+                    cambiadas.add(posicion)
+            if not cambiadas:
+                continue
+            numero_cambiadas += len(cambiadas)
+
+            # Triángulos con v abajo que usan alguna arista cambiada: u1 -> v -> u2 es un camino para la arista entre u1 y u2
+            posiciones_v = range(desplazamientos[nodo_v], desplazamientos[nodo_v + 1])
+            for posicion_1 in posiciones_v:
+                nodo_1 = destinos[posicion_1]
+                cambio_1 = posicion_1 in cambiadas
+                # Peso de u1 -> v antes y después
+                anterior_1 = anteriores[posicion_1][1] if cambio_1 else pesos_atras[posicion_1]
+                nuevo_1 = pesos_atras[posicion_1]
+                for posicion_2 in posiciones_v:
+                    cambio_2 = posicion_2 in cambiadas
+                    if posicion_2 == posicion_1 or not (cambio_1 or cambio_2):
+                        continue
+                    # Peso de u1 -> v -> u2 antes y después
+                    anterior = anterior_1 + (anteriores[posicion_2][0] if cambio_2 else pesos_adelante[posicion_2])
+                    nuevo = nuevo_1 + pesos_adelante[posicion_2]
+                    if nuevo == anterior:
+                        continue
+                    nodo_2 = destinos[posicion_2]
+                    if rangos[nodo_1] < rangos[nodo_2]:
+                        arista = posicion_par[(nodo_1, nodo_2)]
+                        pesos, medios = pesos_adelante, medios_adelante
+                    else:
+                        arista = posicion_par[(nodo_2, nodo_1)]
+                        pesos, medios = pesos_atras, medios_atras
+                    tocar(arista)
+                    if nuevo < pesos[arista]:
+                        pesos[arista] = nuevo
+                        medios[arista] = nodo_v
+                    elif nuevo > anterior and anterior == pesos[arista]:
+                        por_recalcular.add(arista)
+
+        # Copiamos a los arreglos de NumPy lo que se tocó, para que 'guardar' y 'tamano_bytes' vean los pesos nuevos
+        tocadas = list(anteriores)
+        for arreglos, (_, _, pesos, medios) in ((self.subida_adelante, self._listas[0]), (self.subida_atras, self._listas[1])):
+            arreglos[2][tocadas] = [pesos[posicion] for posicion in tocadas]
+            arreglos[3][tocadas] = [medios[posicion] for posicion in tocadas]
+        return numero_cambiadas
+
+    # Escribe pesos y medios en las listas de la consulta y en los arreglos de NumPy
+    def _escribir(self, posiciones, pesos_adelante, pesos_atras, medios_adelante, medios_atras):
+        for lado, pesos, medios in ((0, pesos_adelante, medios_adelante), (1, pesos_atras, medios_atras)):
+            lista_pesos, lista_medios = self._listas[lado][2], self._listas[lado][3]
+            for posicion in posiciones:
+                lista_pesos[posicion] = pesos[posicion]
+                lista_medios[posicion] = medios[posicion]
+        self.subida_adelante[2][:] = pesos_adelante
+        self.subida_atras[2][:] = pesos_atras
+        self.subida_adelante[3][:] = medios_adelante
+        self.subida_atras[3][:] = medios_atras
+
+
+# Orden de contracción por disección anidada: se parte el conjunto de nodos por la mediana de la coordenada más extendida y los nodos
+# de un lado que tocan al otro forman el "separador". Las dos mitades ya no se tocan, así que se ordenan por separado (recursivamente)
+# y el separador va al final, con los rangos más altos. En una red de calles los separadores son pequeños y casi no hacen falta atajos
+# entre nodos de mitades distintas, que es lo que con el orden por menor grado llenaba el índice de aristas.
+def _orden_diseccion(x, y, vecinos):
+    lados = np.zeros(len(vecinos), dtype=np.int64)
+    marca = [0]
+    orden = []
+
+    def ordenar(nodos):
+        if len(nodos) <= TAMANO_HOJA_DISECCION:
+            # En una hoja el orden importa poco: primero los de menos vecinos
+            orden.extend(sorted(nodos.tolist(), key=lambda nodo: len(vecinos[nodo])))
+            return
+        coordenadas = x[nodos] if np.ptp(x[nodos]) >= np.ptp(y[nodos]) else y[nodos]
+        mitad = np.argsort(coordenadas, kind='stable')
+        primera, segunda = nodos[mitad[:len(nodos) // 2]], nodos[mitad[len(nodos) // 2:]]
+        # Marcamos la segunda mitad y buscamos en la primera los nodos que tienen algún vecino marcado
+        marca[0] += 1
+        lados[segunda] = marca[0]
+        frontera = np.array([
+            nodo for nodo in primera.tolist() if any(lados[vecino] == marca[0] for vecino in vecinos[nodo])
+        ], dtype=np.int64)
+        restantes = np.setdiff1d(primera, frontera, assume_unique=True)
+        ordenar(restantes)
+        ordenar(segunda)
+        orden.extend(frontera.tolist())
+
+    ordenar(np.arange(len(vecinos)))
+    return orden
+
+
+# Contrae los nodos en 'orden' (o por menor grado si es 'None') uniendo entre sí los vecinos restantes de cada nodo contraído
+# Va devolviendo cada nodo en el momento de contraerlo; en ese momento 'vecinos[nodo]' son justo sus vecinos de mayor rango
+def _contraer(vecinos, orden):
+    if orden is None:
+        # Actualización perezosa de la cola, como en la jerarquía normal
+        cola_prioridad = [(len(vecinos[nodo]), nodo) for nodo in range(len(vecinos))]
+        heapq.heapify(cola_prioridad)
+        contraidos = [False] * len(vecinos)
+
+        def siguientes():
+            while cola_prioridad:
+                grado, nodo = heapq.heappop(cola_prioridad)
+                if contraidos[nodo]:
+                    continue
+                if grado != len(vecinos[nodo]):
+                    heapq.heappush(cola_prioridad, (len(vecinos[nodo]), nodo))
+                    continue
+                contraidos[nodo] = True
+                yield nodo
+        orden = siguientes()
+    else:
+        cola_prioridad = None
+
+    for nodo in orden:
+        restantes = vecinos[nodo]
+        # Al quitar el nodo, todos sus vecinos restantes quedan unidos entre sí
+        for vecino in restantes:
+            vecinos_vecino = vecinos[vecino]
+            vecinos_vecino.discard(nodo)
+            vecinos_vecino.update(restantes)
+            vecinos_vecino.discard(vecino)
+            if cola_prioridad is not None:
+                heapq.heappush(cola_prioridad, (len(vecinos_vecino), vecino))
+        yield nodo
+
+
+# Construye la jerarquía personalizable de un 'GrafoCompilado' y calcula sus pesos con los pesos actuales del grafo
+def construir_jerarquia_personalizable(grafo_compilado):
+    inicio_preprocesamiento = time.perf_counter()
+    numero_nodos = grafo_compilado.numero_nodos
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+
+    # Vecinos sin dirección de cada nodo; durante la contracción son los vecinos que todavía no se contraen
+    vecinos = [set() for _ in range(numero_nodos)]
+    for nodo_u in range(numero_nodos):
+        for posicion in range(desplazamientos[nodo_u], desplazamientos[nodo_u + 1]):
+            nodo_v = destinos[posicion]
+            vecinos[nodo_u].add(nodo_v)
+            vecinos[nodo_v].add(nodo_u)
+
+    # Orden de contracción: disección anidada por coordenadas; si faltan coordenadas, siempre el nodo con menos vecinos restantes
+    if numero_nodos and np.isfinite(grafo_compilado.x).all() and np.isfinite(grafo_compilado.y).all():
+        orden = _orden_diseccion(grafo_compilado.x, grafo_compilado.y, vecinos)
+    else:
+        orden = None
+    rangos = np.zeros(numero_nodos, dtype=np.int32)
+    superiores = [None] * numero_nodos
+    for rango, nodo in enumerate(_contraer(vecinos, orden)):
+        rangos[nodo] = rango
+        superiores[nodo] = sorted(vecinos[nodo])
+        vecinos[nodo] = None
+
+    # Grafo hacia arriba en CSR, el mismo para los dos sentidos
+    desplazamientos_indice = np.zeros(numero_nodos + 1, dtype=np.int32)
+    desplazamientos_indice[1:] = np.cumsum([len(lista) for lista in superiores])
+    destinos_indice = np.array([vecino for lista in superiores for vecino in lista], dtype=np.int32)
+    numero_aristas_indice = len(destinos_indice)
+    posicion_par = {}
+    for nodo in range(numero_nodos):
+        for desplazamiento, vecino in enumerate(superiores[nodo]):
+            posicion_par[(nodo, vecino)] = int(desplazamientos_indice[nodo]) + desplazamiento
+
+    # Pesos de las calles originales en cada arista del índice, y de qué arista del índice es cada calle del grafo compilado
+    originales_adelante = np.full(numero_aristas_indice, np.inf)
+    originales_atras = np.full(numero_aristas_indice, np.inf)
+    aristas_grafo = np.zeros(grafo_compilado.numero_aristas, dtype=np.int64)
+    sentidos_grafo = np.zeros(grafo_compilado.numero_aristas, dtype=bool)
+    for nodo_u in range(numero_nodos):
+        for posicion in range(desplazamientos[nodo_u], desplazamientos[nodo_u + 1]):
+            nodo_v = destinos[posicion]
+            if rangos[nodo_u] < rangos[nodo_v]:
+                arista = posicion_par[(nodo_u, nodo_v)]
+                originales_adelante[arista] = pesos[posicion]
+                sentidos_grafo[posicion] = True
+            else:
+                arista = posicion_par[(nodo_v, nodo_u)]
+                originales_atras[arista] = pesos[posicion]
+            aristas_grafo[posicion] = arista
+
+    medios = np.full(numero_aristas_indice, -1, dtype=np.int32)
+    jerarquia = JerarquiaPersonalizable(
+        grafo_compilado.ids_nodos,
+        rangos,
+        (desplazamientos_indice, destinos_indice, originales_adelante.copy(), medios.copy()),
+        (desplazamientos_indice.copy(), destinos_indice.copy(), originales_atras.copy(), medios.copy()),
+        grafo_compilado.atributo_peso,
+        {},
+        originales_adelante, originales_atras, aristas_grafo, sentidos_grafo,
+    )
+    jerarquia.personalizar()
+    # Los atajos son las aristas del índice que no corresponden a ninguna calle original
+    jerarquia.estadisticas.update({
+        'preprocesamiento_segundos': time.perf_counter() - inicio_preprocesamiento,
+        'numero_atajos': int(np.count_nonzero(np.isinf(originales_adelante) & np.isinf(originales_atras))),
+    })
+    return jerarquia
@@ -0,0 +1,387 @@
+# En este archivo construimos y consultamos una "Jerarquía de Contracción" (Contraction Hierarchies) sobre el grafo compilado.
+# La idea es hacer un trabajo pesado UNA sola vez (preprocesamiento) para que después cada consulta tarde muy poco:
+#   1. Ordenamos los nodos por "importancia" y los vamos "contrayendo" (quitando del grafo) del menos al más importante.
+#   2. Cuando quitamos un nodo v, si el único camino más corto de u a w pasaba por v, agregamos un "atajo" u -> w con el mismo peso.
+#   3. Al final cada nodo tiene un rango y solo guardamos las aristas que suben de rango (grafo "hacia arriba").
+# Una consulta es un Dijkstra bidireccional que solo sube: desde el origen por el grafo hacia arriba y desde el destino por el grafo
+# hacia arriba de las aristas invertidas. Los atajos del camino encontrado se "desempacan" otra vez en los nodos originales de OSM,
+# así la ruta se puede dibujar con 'ox.plot_graph_route' igual que la de 'dijkstra_iterativo'.
+#
+# Uso típico:
+#   jerarquia = construir_jerarquia(compilar_grafo(grafo_proyectado_metros))
+#   jerarquia.guardar('jerarquia_oaxaca.npz')
+#   jerarquia = JerarquiaContraccion.cargar('jerarquia_oaxaca.npz')
+#   ruta = jerarquia.ruta(nodo_origen, nodo_destino)
+#   reporte = verificar_jerarquia(jerarquia, grafo_compilado,
+#                                 lambda o, d: dijkstra_iterativo(grafo_proyectado_metros, o, d, 'tiempo_viaje_segundos'))
+
+# Importamos 'heapq' para las colas de prioridad del orden de contracción, de las búsquedas de testigos y de las consultas
+import heapq
+# Importamos 'random' para elegir pares aleatorios en la verificación
+import random
+# Importamos 'time' para medir el tiempo de preprocesamiento y de las consultas
+import time
+
+# Importamos numpy con el alias 'np' para guardar los grafos hacia arriba en formato CSR
+import numpy as np
+
+# Versión del formato del archivo guardado, si cambia el formato se sube este número y los archivos viejos se rechazan
+VERSION_FORMATO = 1
+
+# Límite de nodos que visita cada búsqueda de testigos, si se alcanza agregamos el atajo por si acaso (nunca rompe la corrección)
+LIMITE_TESTIGOS = 60
+
+
+# Esta clase guarda la jerarquía ya construida y responde consultas de ruta
+class JerarquiaContraccion:
+    def __init__(self, ids_nodos, rangos, subida_adelante, subida_atras, atributo_peso, estadisticas=None):
+        # 'ids_nodos[i]' es el ID de OSM del nodo con índice i (los mismos índices que el grafo compilado)
+        self.ids_nodos = np.asarray(ids_nodos, dtype=np.int64)
+        # 'rangos[i]' es la posición del nodo i en el orden de contracción (más alto = más importante)
+        self.rangos = np.asarray(rangos, dtype=np.int32)
+        # Cada grafo hacia arriba es una tupla (desplazamientos, destinos, pesos, medios) en formato CSR
+        # 'medios[j]' es el nodo por el que pasa el atajo j, o -1 si la arista j es una calle original
+        self.subida_adelante = tuple(np.asarray(arreglo) for arreglo in subida_adelante)
+        self.subida_atras = tuple(np.asarray(arreglo) for arreglo in subida_atras)
+        self.atributo_peso = atributo_peso
+        # Datos del preprocesamiento (tiempo, número de atajos), se guardan junto con la jerarquía
+        self.estadisticas = dict(estadisticas or {})
+
+        self.indice_de_nodo = {nodo: indice for indice, nodo in enumerate(self.ids_nodos.tolist())}
+        # Listas de Python de ambos grafos para el bucle de la consulta
+        self._listas = (
+            tuple(arreglo.tolist() for arreglo in self.subida_adelante),
+            tuple(arreglo.tolist() for arreglo in self.subida_atras),
+        )
+
+    # Número total de aristas del índice (calles originales que suben de rango + atajos)
+    @property
+    def numero_aristas(self):
+        return len(self.subida_adelante[1]) + len(self.subida_atras[1])
+
+    # Calcula cuántos bytes ocupa el índice en memoria
+    def tamano_bytes(self):
+        arreglos = (self.ids_nodos, self.rangos) + self.subida_adelante + self.subida_atras
+        return sum(arreglo.nbytes for arreglo in arreglos)
+
+    # Guarda la jerarquía en un archivo '.npz' de NumPy
+    def guardar(self, ruta_archivo):
+        np.savez(
+            ruta_archivo,
+            version=np.array(VERSION_FORMATO),
+            atributo_peso=np.array(self.atributo_peso),
+            ids_nodos=self.ids_nodos,
+            rangos=self.rangos,
+            adelante_desplazamientos=self.subida_adelante[0],
+            adelante_destinos=self.subida_adelante[1],
+            adelante_pesos=self.subida_adelante[2],
+            adelante_medios=self.subida_adelante[3],
+            atras_desplazamientos=self.subida_atras[0],
+            atras_destinos=self.subida_atras[1],
+            atras_pesos=self.subida_atras[2],
+            atras_medios=self.subida_atras[3],
+            preprocesamiento_segundos=np.array(self.estadisticas.get('preprocesamiento_segundos', 0.0)),
+            numero_atajos=np.array(self.estadisticas.get('numero_atajos', 0)),
+        )
+
+    # Carga una jerarquía guardada con 'guardar', si el archivo es de otra versión lanzamos un ValueError
+    @classmethod
+    def cargar(cls, ruta_archivo):
+        with np.load(ruta_archivo, allow_pickle=False) as datos:
+            if int(datos['version']) != VERSION_FORMATO:
+                raise ValueError(f"El archivo {ruta_archivo} tiene la versión {int(datos['version'])} y se esperaba la {VERSION_FORMATO}")
+            subida_adelante = tuple(datos[f'adelante_{nombre}'] for nombre in ('desplazamientos', 'destinos', 'pesos', 'medios'))
+            subida_atras = tuple(datos[f'atras_{nombre}'] for nombre in ('desplazamientos', 'destinos', 'pesos', 'medios'))
+            estadisticas = {
+                'preprocesamiento_segundos': float(datos['preprocesamiento_segundos']),
+                'numero_atajos': int(datos['numero_atajos']),
+            }
+            return cls(datos['ids_nodos'], datos['rangos'], subida_adelante, subida_atras, str(datos['atributo_peso']), estadisticas)
+
+    # Busca la ruta más corta entre dos IDs de OSM, devuelve (tiempo_total, lista_de_IDs) o (inf, None) si no hay camino
+    def consultar(self, nodo_origen, nodo_destino):
+        tiempo_total, camino_indices = self.consultar_indices(self.indice_de_nodo[nodo_origen], self.indice_de_nodo[nodo_destino])
+        if camino_indices is None:
+            return tiempo_total, None
+        ids = self.ids_nodos.tolist()
+        return tiempo_total, [ids[indice] for indice in camino_indices]
+
+    # Igual que 'dijkstra_iterativo': devuelve solo la lista de nodos o 'None'
+    def ruta(self, nodo_origen, nodo_destino):
+        return self.consultar(nodo_origen, nodo_destino)[1]
+
+    # Consulta sobre índices densos: Dijkstra bidireccional que solo sube de rango
+    def consultar_indices(self, indice_origen, indice_destino):
+        if indice_origen == indice_destino:
+            return 0.0, [indice_origen]
+
+        # Cada lado guarda sus distancias y predecesores en diccionarios, las búsquedas hacia arriba visitan muy pocos nodos
+        distancias = ({indice_origen: 0.0}, {indice_destino: 0.0})
+        predecesores = ({indice_origen: -1}, {indice_destino: -1})
+        cerrados = (set(), set())
+        colas = ([(0.0, indice_origen)], [(0.0, indice_destino)])
+        mejor_total = float('inf')
+        nodo_encuentro = -1
+
+        while colas[0] or colas[1]:
+            # Elegimos el lado con el tope más pequeño; un lado cuyo tope ya no mejora 'mejor_total' se da por terminado
+            lado = 0 if colas[0] and (not colas[1] or colas[0][0][0] <= colas[1][0][0]) else 1
+            distancia_actual, nodo_actual = heapq.heappop(colas[lado])
+            if distancia_actual >= mejor_total:
+                colas[lado].clear()
+                continue
+            if nodo_actual in cerrados[lado]:
+                continue
+            cerrados[lado].add(nodo_actual)
+
+            # Si el otro lado también llegó a este nodo, tenemos un camino completo candidato
+            distancia_otro = distancias[1 - lado].get(nodo_actual)
+            if distancia_otro is not None and distancia_actual + distancia_otro < mejor_total:
+                mejor_total = distancia_actual + distancia_otro
+                nodo_encuentro = nodo_actual
+
+            desplazamientos, destinos, pesos, _ = self._listas[lado]
+            distancias_lado = distancias[lado]
+
+            # "Stall-on-demand": si un nodo más alto que ya alcanzamos baja a este nodo con menor costo, su distancia no es la correcta
+            # y ningún camino más corto sube por aquí, así que no vale la pena expandirlo
+            desplazamientos_bajada, destinos_bajada, pesos_bajada, _ = self._listas[1 - lado]
+            detenido = False
+            for posicion in range(desplazamientos_bajada[nodo_actual], desplazamientos_bajada[nodo_actual + 1]):
+                distancia_superior = distancias_lado.get(destinos_bajada[posicion])
+                if distancia_superior is not None and distancia_superior + pesos_bajada[posicion] < distancia_actual:
+                    detenido = True
+                    break
+            if detenido:
+                continue
+
+            for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+                vecino = destinos[posicion]
+                nueva_distancia = distancia_actual + pesos[posicion]
+                if nueva_distancia < distancias_lado.get(vecino, float('inf')):
+                    distancias_lado[vecino] = nueva_distancia
+                    predecesores[lado][vecino] = nodo_actual
+                    heapq.heappush(colas[lado], (nueva_distancia, vecino))
+
+        if nodo_encuentro == -1:
+            return float('inf'), None
+
+        # Armamos el camino en el grafo con atajos: origen -> ... -> encuentro -> ... -> destino
+        camino_atajos = []
+        nodo_camino_actual = nodo_encuentro
+        while nodo_camino_actual != -1:
+            camino_atajos.append(nodo_camino_actual)
+            nodo_camino_actual = predecesores[0][nodo_camino_actual]
+        camino_atajos.reverse()
+        nodo_camino_actual = predecesores[1][nodo_encuentro]
+        while nodo_camino_actual != -1:
+            camino_atajos.append(nodo_camino_actual)
+            nodo_camino_actual = predecesores[1][nodo_camino_actual]
+
+        # Desempacamos cada atajo en las calles originales
+        camino = [camino_atajos[0]]
+        for nodo_u, nodo_v in zip(camino_atajos[:-1], camino_atajos[1:]):
+            self._desempacar(nodo_u, nodo_v, camino)
+        return mejor_total, camino
+
+    # Busca el nodo medio de la arista u -> v del índice, que puede estar guardada subiendo desde u o (invertida) subiendo desde v
+    def _medio(self, nodo_u, nodo_v):
+        desplazamientos, destinos, _, medios = self._listas[0]
+        for posicion in range(desplazamientos[nodo_u], desplazamientos[nodo_u + 1]):
+            if destinos[posicion] == nodo_v:
+                return medios[posicion]
+        desplazamientos, destinos, _, medios = self._listas[1]
+        for posicion in range(desplazamientos[nodo_v], desplazamientos[nodo_v + 1]):
+            if destinos[posicion] == nodo_u:
+                return medios[posicion]
+        raise KeyError(f"La arista {nodo_u} -> {nodo_v} no existe en la jerarquía")
+
+    # Agrega a 'camino' los nodos de la arista u -> v sin atajos (sin repetir u, que ya está en el camino)
+    # Usamos una pila en lugar de recursión para no llegar al límite de recursión de Python con atajos muy anidados
+    def _desempacar(self, nodo_u, nodo_v, camino):
+        pila = [(nodo_u, nodo_v)]
+        while pila:
+            nodo_a, nodo_b = pila.pop()
+            medio = self._medio(nodo_a, nodo_b)
+            if medio == -1:
+                camino.append(nodo_b)
+            else:
+                # Primero se procesa a -> medio y después medio -> b, por eso se meten a la pila al revés
+                pila.append((medio, nodo_b))
+                pila.append((nodo_a, medio))
+
+
+# Búsqueda de testigos: Dijkstra local desde 'inicio' sin pasar por 'ignorado' y sin pasar de 'limite_distancia'
+# Devuelve las distancias encontradas, si un destino no aparece o está más lejos que el atajo, el atajo es necesario
+def _buscar_testigos(salientes, inicio, ignorado, limite_distancia, limite_nodos):
+    distancias = {inicio: 0.0}
+    cola_prioridad = [(0.0, inicio)]
+    cerrados = set()
+    while cola_prioridad and len(cerrados) < limite_nodos:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        if distancia_actual > limite_distancia:
+            break
+        if nodo_actual in cerrados:
+            continue
+        cerrados.add(nodo_actual)
+        for vecino, peso in salientes[nodo_actual].items():
+            if vecino == ignorado:
+                continue
+            nueva_distancia = distancia_actual + peso
+            if nueva_distancia < distancias.get(vecino, float('inf')):
+                distancias[vecino] = nueva_distancia
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+    return distancias
+
+
+# Calcula los atajos que harían falta si contrajéramos el nodo v, como lista de (u, w, peso)
+def _atajos_necesarios(salientes, entrantes, nodo):
+    atajos = []
+    if not entrantes[nodo] or not salientes[nodo]:
+        return atajos
+    maximo_saliente = max(salientes[nodo].values())
+    for nodo_u, peso_entrada in entrantes[nodo].items():
+        testigos = _buscar_testigos(salientes, nodo_u, nodo, peso_entrada + maximo_saliente, LIMITE_TESTIGOS)
+        for nodo_w, peso_salida in salientes[nodo].items():
+            if nodo_w == nodo_u:
+                continue
+            peso_atajo = peso_entrada + peso_salida
+            if testigos.get(nodo_w, float('inf')) > peso_atajo:
+                atajos.append((nodo_u, nodo_w, peso_atajo))
+    return atajos
+
+
+# Prioridad de contracción: "diferencia de aristas" (atajos nuevos menos aristas quitadas) más los vecinos ya contraídos
+# Los nodos con menor prioridad se contraen primero, también devolvemos los atajos para no tener que calcularlos otra vez al contraer
+def _prioridad(salientes, entrantes, vecinos_contraidos, nodo):
+    atajos = _atajos_necesarios(salientes, entrantes, nodo)
+    return 2 * (len(atajos) - len(salientes[nodo]) - len(entrantes[nodo])) + vecinos_contraidos[nodo], atajos
+
+
+# Construye el grafo hacia arriba en formato CSR a partir de la lista de aristas (nodo, vecino_mas_alto, peso, medio)
+def _construir_csr(numero_nodos, aristas):
+    aristas.sort(key=lambda arista: arista[0])
+    desplazamientos = np.zeros(numero_nodos + 1, dtype=np.int32)
+    for nodo, _, _, _ in aristas:
+        desplazamientos[nodo + 1] += 1
+    np.cumsum(desplazamientos, out=desplazamientos)
+    destinos = np.array([arista[1] for arista in aristas], dtype=np.int32)
+    pesos = np.array([arista[2] for arista in aristas], dtype=np.float64)
+    medios = np.array([arista[3] for arista in aristas], dtype=np.int32)
+    return desplazamientos, destinos, pesos, medios
+
+
+# Preprocesamiento: construye la jerarquía de contracción a partir de un 'GrafoCompilado' (ver 'grafo_compilado.py')
+def construir_jerarquia(grafo_compilado):
+    inicio_preprocesamiento = time.perf_counter()
+    numero_nodos = grafo_compilado.numero_nodos
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+
+    # Grafo "restante" (el que todavía no se contrae) como diccionarios: salientes[u][v] = peso y entrantes[v][u] = peso
+    salientes = [dict() for _ in range(numero_nodos)]
+    entrantes = [dict() for _ in range(numero_nodos)]
+    # medios[(u, v)] es el nodo por el que pasa el atajo u -> v, las calles originales no aparecen (medio -1)
+    medios = {}
+    for nodo_u in range(numero_nodos):
+        for posicion in range(desplazamientos[nodo_u], desplazamientos[nodo_u + 1]):
+            nodo_v = destinos[posicion]
+            salientes[nodo_u][nodo_v] = pesos[posicion]
+            entrantes[nodo_v][nodo_u] = pesos[posicion]
+
+    # Prioridad inicial de todos los nodos
+    vecinos_contraidos = [0] * numero_nodos
+    cola_prioridad = [(_prioridad(salientes, entrantes, vecinos_contraidos, nodo)[0], nodo) for nodo in range(numero_nodos)]
+    heapq.heapify(cola_prioridad)
+
+    rangos = np.zeros(numero_nodos, dtype=np.int32)
+    aristas_adelante = []
+    aristas_atras = []
+    numero_atajos = 0
+    siguiente_rango = 0
+
+    while cola_prioridad:
+        _, nodo = heapq.heappop(cola_prioridad)
+        # Actualización perezosa: recalculamos la prioridad y si ya no es la menor, regresamos el nodo a la cola
+        prioridad_nueva, atajos = _prioridad(salientes, entrantes, vecinos_contraidos, nodo)
+        if cola_prioridad and prioridad_nueva > cola_prioridad[0][0]:
+            heapq.heappush(cola_prioridad, (prioridad_nueva, nodo))
+            continue
+
+        # Contraemos el nodo: sus aristas hacia nodos no contraídos van al índice (siempre suben de rango)
+        rangos[nodo] = siguiente_rango
+        siguiente_rango += 1
+        for vecino, peso in salientes[nodo].items():
+            aristas_adelante.append((nodo, vecino, peso, medios.get((nodo, vecino), -1)))
+        for vecino, peso in entrantes[nodo].items():
+            aristas_atras.append((nodo, vecino, peso, medios.get((vecino, nodo), -1)))
+
+        # Agregamos los atajos que hacen falta, solo si mejoran la arista que ya existía entre u y w
+        for nodo_u, nodo_w, peso_atajo in atajos:
+            if peso_atajo < salientes[nodo_u].get(nodo_w, float('inf')):
+                salientes[nodo_u][nodo_w] = peso_atajo
+                entrantes[nodo_w][nodo_u] = peso_atajo
+                medios[(nodo_u, nodo_w)] = nodo
+                numero_atajos += 1
+
+        # Quitamos el nodo del grafo restante y avisamos a sus vecinos
+        for vecino in salientes[nodo]:
+            del entrantes[vecino][nodo]
+            vecinos_contraidos[vecino] += 1
+        for vecino in entrantes[nodo]:
+            del salientes[vecino][nodo]
+            vecinos_contraidos[vecino] += 1
+        salientes[nodo] = {}
+        entrantes[nodo] = {}
+
+    estadisticas = {
+        'preprocesamiento_segundos': time.perf_counter() - inicio_preprocesamiento,
+        'numero_atajos': numero_atajos,
+    }
+    return JerarquiaContraccion(
+        grafo_compilado.ids_nodos,
+        rangos,
+        _construir_csr(numero_nodos, aristas_adelante),
+        _construir_csr(numero_nodos, aristas_atras),
+        grafo_compilado.atributo_peso,
+        estadisticas,
+    )
+
+
+# Compara la jerarquía contra una búsqueda de referencia (normalmente 'dijkstra_iterativo') en pares aleatorios de nodos
+# 'buscar_referencia(nodo_origen, nodo_destino)' debe devolver la lista de nodos o 'None', igual que 'dijkstra_iterativo'
+# Devuelve un reporte con los errores encontrados, el tiempo de preprocesamiento, el tamaño del índice y la latencia de las consultas
+def verificar_jerarquia(jerarquia, grafo_compilado, buscar_referencia, numero_pares=100, semilla=0, tolerancia=1e-6):
+    generador = random.Random(semilla)
+    ids = grafo_compilado.ids_nodos.tolist()
+    errores = []
+    latencias = []
+    for _ in range(numero_pares):
+        nodo_origen = generador.choice(ids)
+        nodo_destino = generador.choice(ids)
+
+        inicio = time.perf_counter()
+        tiempo_jerarquia, ruta_jerarquia = jerarquia.consultar(nodo_origen, nodo_destino)
+        latencias.append(time.perf_counter() - inicio)
+
+        ruta_referencia = buscar_referencia(nodo_origen, nodo_destino)
+        if ruta_referencia is None or ruta_jerarquia is None:
+            if (ruta_referencia is None) != (ruta_jerarquia is None):
+                errores.append((nodo_origen, nodo_destino, ruta_referencia is not None, ruta_jerarquia is not None))
+            continue
+        # Comparamos los tiempos sumando las aristas de cada ruta en el grafo compilado, así también revisamos que la ruta desempacada sea válida
+        _, tiempo_referencia = grafo_compilado.resumen_ruta(ruta_referencia)
+        _, tiempo_ruta = grafo_compilado.resumen_ruta(ruta_jerarquia)
+        if abs(tiempo_referencia - tiempo_ruta) > tolerancia or abs(tiempo_referencia - tiempo_jerarquia) > tolerancia:
+            errores.append((nodo_origen, nodo_destino, tiempo_referencia, tiempo_ruta))
+
+    latencias_ordenadas = sorted(latencias)
+    return {
+        'pares_revisados': numero_pares,
+        'errores': errores,
+        'preprocesamiento_segundos': jerarquia.estadisticas.get('preprocesamiento_segundos'),
+        'numero_atajos': jerarquia.estadisticas.get('numero_atajos'),
+        'tamano_indice_bytes': jerarquia.tamano_bytes(),
+        'latencia_promedio_ms': 1000 * sum(latencias) / len(latencias) if latencias else 0.0,
+        'latencia_mediana_ms': 1000 * latencias_ordenadas[len(latencias_ordenadas) // 2] if latencias else 0.0,
+        'latencia_maxima_ms': 1000 * latencias_ordenadas[-1] if latencias else 0.0,
+    }
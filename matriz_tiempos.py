@@ -0,0 +1,148 @@
+# En este archivo calculamos matrices de tiempos y distancias de viaje de muchos orígenes a muchos destinos.
+# En lugar de llamar a Dijkstra una vez por cada par (origen, destino), hacemos UNA búsqueda por origen que no se detiene
+# hasta haber visitado todos los destinos pedidos (búsqueda "uno a muchos").
+# Los orígenes se reparten en bloques entre varios procesos ('ProcessPoolExecutor'); cada proceso abre la instantánea del grafo
+# en modo de solo lectura (ver 'instantanea_grafo.py'), así todos comparten las mismas páginas de memoria en lugar de copiar el grafo.
+#
+# Resultado: arreglos densos de NumPy de tamaño (orígenes x destinos) con los segundos y los metros de cada par.
+# Los pares sin camino tienen 'inf' en ambos arreglos y 'False' en el arreglo 'alcanzable'.
+
+# Importamos 'heapq' para la cola de prioridad de la búsqueda uno a muchos
+import heapq
+# Importamos 'os' para saber cuántos procesadores hay
+import os
+# Importamos 'shutil' y 'tempfile' para la instantánea temporal cuando el grafo no viene de una instantánea
+import shutil
+import tempfile
+# Importamos el ejecutor de procesos de la biblioteca estándar
+from concurrent.futures import ProcessPoolExecutor
+
+# Importamos numpy con el alias 'np' para las matrices de resultados
+import numpy as np
+
+# Importamos la instantánea para que cada proceso trabajador abra el grafo mapeado en memoria
+from instantanea_grafo import cargar_instantanea, guardar_instantanea
+
+# Número de bloques de orígenes por proceso, con más de uno el trabajo se reparte mejor si unos orígenes tardan más que otros
+BLOQUES_POR_PROCESO = 4
+
+# Grafo compilado del proceso trabajador, lo llena '_inicializar_trabajador' una sola vez por proceso
+_grafo_trabajador = None
+
+
+# Búsqueda uno a muchos sobre índices densos: Dijkstra desde 'indice_origen' hasta visitar todos los 'indices_destino'
+# Devuelve dos arreglos (segundos, metros) alineados con 'indices_destino', con 'inf' para los destinos inalcanzables
+# Los metros son la suma de las longitudes del camino de menor tiempo, igual que el resumen de 'ejecutar_analisis_ruta'
+def uno_a_muchos_indices(grafo_compilado, indice_origen, indices_destino):
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+    longitudes = grafo_compilado.longitudes_lista()
+    memoria = grafo_compilado.memoria_busqueda()
+    consulta = memoria.nueva_consulta()
+    distancias = memoria.distancias
+    metros = memoria.metros
+    marcas = memoria.marcas
+    cerrados = memoria.cerrados
+
+    # Cuántas veces se pidió cada destino (puede repetirse), la búsqueda termina cuando ya no queda ninguno pendiente
+    pendientes = {}
+    for indice_destino in indices_destino:
+        pendientes[indice_destino] = pendientes.get(indice_destino, 0) + 1
+    destinos_faltantes = len(pendientes)
+
+    distancias[indice_origen] = 0.0
+    metros[indice_origen] = 0.0
+    marcas[indice_origen] = consulta
+    cola_prioridad = [(0.0, indice_origen)]
+
+    while cola_prioridad and destinos_faltantes:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        if cerrados[nodo_actual] == consulta:
+            continue
+        cerrados[nodo_actual] = consulta
+        if nodo_actual in pendientes:
+            destinos_faltantes -= 1
+        metros_actuales = metros[nodo_actual]
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            nueva_distancia = distancia_actual + pesos[posicion]
+            # Las calles cerradas (peso infinito) se saltan
+            if ((marcas[vecino] != consulta and nueva_distancia < float('inf'))
+                    or nueva_distancia < distancias[vecino]):
+                distancias[vecino] = nueva_distancia
+                metros[vecino] = metros_actuales + longitudes[posicion]
+                marcas[vecino] = consulta
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+
+    segundos = np.full(len(indices_destino), np.inf)
+    metros_destino = np.full(len(indices_destino), np.inf)
+    for columna, indice_destino in enumerate(indices_destino):
+        if cerrados[indice_destino] == consulta:
+            segundos[columna] = distancias[indice_destino]
+            metros_destino[columna] = metros[indice_destino]
+    return segundos, metros_destino
+
+
+# Calcula un bloque de filas de la matriz (varios orígenes contra todos los destinos)
+def _calcular_bloque(grafo_compilado, indices_origen, indices_destino):
+    segundos = np.empty((len(indices_origen), len(indices_destino)))
+    metros = np.empty((len(indices_origen), len(indices_destino)))
+    for fila, indice_origen in enumerate(indices_origen):
+        segundos[fila], metros[fila] = uno_a_muchos_indices(grafo_compilado, indice_origen, indices_destino)
+    return segundos, metros
+
+
+# Se ejecuta una vez al arrancar cada proceso trabajador: abre la instantánea mapeada en memoria (solo lectura)
+def _inicializar_trabajador(directorio_instantanea):
+    global _grafo_trabajador
+    _grafo_trabajador = cargar_instantanea(directorio_instantanea)
+
+
+# Tarea de un proceso trabajador: calcula las filas 'inicio' a 'inicio + len(indices_origen)' de la matriz
+def _tarea_bloque(inicio, indices_origen, indices_destino):
+    segundos, metros = _calcular_bloque(_grafo_trabajador, indices_origen, indices_destino)
+    return inicio, segundos, metros
+
+
+# Calcula la matriz de tiempos (segundos) y distancias (metros) entre listas de IDs de OSM
+# 'procesos' es el número de procesos trabajadores; con 1 todo se calcula en el proceso actual
+# Devuelve un diccionario con 'segundos', 'metros' (arreglos orígenes x destinos) y 'alcanzable' (arreglo de booleanos)
+def calcular_matriz(grafo_compilado, nodos_origen, nodos_destino, procesos=None):
+    indices_origen = [grafo_compilado.indice(nodo) for nodo in nodos_origen]
+    indices_destino = [grafo_compilado.indice(nodo) for nodo in nodos_destino]
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    procesos = max(1, min(procesos, len(indices_origen)))
+
+    if procesos == 1:
+        segundos, metros = _calcular_bloque(grafo_compilado, indices_origen, indices_destino)
+    else:
+        segundos = np.empty((len(indices_origen), len(indices_destino)))
+        metros = np.empty((len(indices_origen), len(indices_destino)))
+        # Los trabajadores abren el grafo desde una instantánea; si el grafo no viene de una, o sus pesos cambiaron después de abrirla
+        # (por ejemplo con parches de 'actualizacion_pesos.py'), guardamos una temporal con los pesos actuales
+        directorio = getattr(grafo_compilado, 'directorio_instantanea', None)
+        directorio_temporal = None
+        if directorio is None or grafo_compilado.version_pesos:
+            directorio_temporal = tempfile.mkdtemp(prefix='matriz_')
+            directorio = os.path.join(directorio_temporal, 'grafo')
+            guardar_instantanea(grafo_compilado, directorio)
+        try:
+            tamano_bloque = max(1, -(-len(indices_origen) // (procesos * BLOQUES_POR_PROCESO)))
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador, initargs=(directorio,)) as ejecutor:
+                tareas = [
+                    ejecutor.submit(_tarea_bloque, inicio, indices_origen[inicio:inicio + tamano_bloque], indices_destino)
+                    for inicio in range(0, len(indices_origen), tamano_bloque)
+                ]
+                for tarea in tareas:
+                    inicio, segundos_bloque, metros_bloque = tarea.result()
+                    segundos[inicio:inicio + len(segundos_bloque)] = segundos_bloque
+                    metros[inicio:inicio + len(metros_bloque)] = metros_bloque
+        finally:
+            if directorio_temporal is not None:
+                shutil.rmtree(directorio_temporal, ignore_errors=True)
+
+    return {
+        'segundos': segundos,
+        'metros': metros,
+        'alcanzable': np.isfinite(segundos),
+    }
@@ -0,0 +1,414 @@
+# En este archivo está el banco de pruebas de rendimiento de los motores de búsqueda de rutas.
+# Todo corre sin red y sin pantalla, así se puede repetir en cualquier máquina y comparar los resultados entre versiones del código.
+#
+# Grafos de prueba ("fixtures"):
+#   - 'rejilla': una cuadrícula de calles de N x N intersecciones, con tipos de calle, 'maxspeed' y algunos sentidos únicos al azar
+#   - 'geometrico': N puntos al azar conectados con los vecinos que están a menos de cierto radio (grafo geométrico aleatorio)
+#   - 'osm': un grafo real armado con una respuesta de Overpass ya guardada en la carpeta 'cache/' de OSMnx (ver 'grafo_desde_overpass')
+# Los pares (origen, destino) se eligen con una semilla fija dentro de la componente fuertemente conexa más grande,
+# así dos corridas con la misma semilla consultan exactamente las mismas rutas.
+#
+# Para cada motor se mide: latencia por consulta (p50, p95, p99, promedio), nodos visitados, costo de preprocesamiento,
+# pico de memoria (RSS) del proceso y cuántas rutas no dieron el mismo tiempo que la referencia ('dijkstra' compilado).
+# El resultado se escribe en un archivo JSON.
+#
+# Uso: python medicion_rendimiento.py [--tamano-rejilla 60] [--nodos-geometrico 3000] [--pares 200] [--semilla 0]
+#                                     [--motores iterativo,networkx,dijkstra,...] [--salida resultados_rendimiento.json]
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'glob' para buscar las respuestas de Overpass en la carpeta de caché
+import glob
+# Importamos 'json' para leer las respuestas de Overpass y escribir los resultados
+import json
+# Importamos 'math' para las distancias sobre la Tierra
+import math
+# Importamos 'os' para armar rutas de archivos
+import os
+# Importamos 'platform' para guardar en el resultado en qué máquina se midió
+import platform
+# Importamos 'random' para generar los grafos sintéticos y los pares con semilla fija
+import random
+# Importamos 'time' para medir los tiempos
+import time
+
+# 'resource' solo existe en sistemas tipo Unix, en Windows no se reporta el pico de memoria
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Importamos networkx con el alias 'nx' para los grafos de prueba y para medir 'nx.shortest_path'
+import networkx as nx
+# Importamos numpy con el alias 'np' para los percentiles
+import numpy as np
+
+# Importamos los motores que vamos a medir
+from estrategias_busqueda import ESTRATEGIAS, buscar_ruta
+from grafo_compilado import compilar_grafo
+from instrumentacion import ObservadorContadores
+from jerarquia_personalizable import construir_jerarquia_personalizable
+from jerarquias_contraccion import construir_jerarquia
+from ponderacion import ponderar_grafo
+from script_principal import cargar_script_principal
+
+# Carpeta donde OSMnx guarda las respuestas de Nominatim y Overpass
+DIRECTORIO_CACHE_OSM = 'cache'
+
+# Atributo de peso que usan todos los motores, el mismo del script principal
+ATRIBUTO_PESO = 'tiempo_viaje_segundos'
+
+# Punto de referencia (centro de Oaxaca) para dar latitud y longitud a los grafos sintéticos
+LATITUD_REFERENCIA = 17.0654
+LONGITUD_REFERENCIA = -96.7237
+
+# Radio de la Tierra en metros, para pasar de grados a metros
+RADIO_TIERRA_METROS = 6371008.8
+
+# Valores que se reparten al azar en las calles de los grafos sintéticos
+TIPOS_DE_CALLE = ('residential', 'residential', 'residential', 'tertiary', 'secondary', 'primary')
+VALORES_VELOCIDAD_MAXIMA = (None, None, None, '30', '40', '60 km/h', ['40', '60'])
+
+# Valores de 'oneway' de OSM que indican sentido único en la dirección de la vía o en la contraria
+SENTIDO_UNICO = ('yes', 'true', '1')
+SENTIDO_CONTRARIO = ('-1', 'reverse')
+
+# Motores disponibles, en el orden en que se miden
+MOTORES = ('iterativo', 'networkx') + tuple(ESTRATEGIAS) + ('jerarquia', 'jerarquia_personalizable')
+
+# Diferencia máxima (segundos) entre el tiempo de una ruta y el de la referencia para considerarla igual
+TOLERANCIA_SEGUNDOS = 1e-6
+
+
+# Pasa latitud y longitud (grados) a metros con una proyección equirectangular local, suficiente para una ciudad
+def _a_metros(lat, lon, latitud_referencia):
+    return (math.radians(lon) * RADIO_TIERRA_METROS * math.cos(math.radians(latitud_referencia)),
+            math.radians(lat) * RADIO_TIERRA_METROS)
+
+
+# Pasa metros a latitud y longitud alrededor del punto de referencia (inverso de '_a_metros')
+def _a_grados(x, y):
+    return (LATITUD_REFERENCIA + math.degrees(y / RADIO_TIERRA_METROS),
+            LONGITUD_REFERENCIA + math.degrees(x / (RADIO_TIERRA_METROS * math.cos(math.radians(LATITUD_REFERENCIA)))))
+
+
+# Distancia en metros entre dos puntos dados en grados (fórmula del haversine)
+def _distancia_haversine(lat_1, lon_1, lat_2, lon_2):
+    fi_1, fi_2 = math.radians(lat_1), math.radians(lat_2)
+    seno_lat = math.sin((fi_2 - fi_1) / 2)
+    seno_lon = math.sin(math.radians(lon_2 - lon_1) / 2)
+    return 2 * RADIO_TIERRA_METROS * math.asin(math.sqrt(seno_lat ** 2 + math.cos(fi_1) * math.cos(fi_2) * seno_lon ** 2))
+
+
+# Agrega al grafo una calle entre dos nodos con los mismos atributos que dejaría OSMnx ('length', 'highway', 'maxspeed', 'oneway')
+def _agregar_calle(grafo, nodo_u, nodo_v, longitud, highway, velocidad_maxima, sentido_unico=False):
+    datos_arista = {'length': longitud, 'highway': highway, 'oneway': sentido_unico}
+    if velocidad_maxima is not None:
+        datos_arista['maxspeed'] = velocidad_maxima
+    grafo.add_edge(nodo_u, nodo_v, **datos_arista)
+    if not sentido_unico:
+        grafo.add_edge(nodo_v, nodo_u, **datos_arista)
+
+
+# Grafo sintético de una cuadrícula de 'tamano' x 'tamano' intersecciones separadas por unos 'separacion_metros'
+# Un 10% de las calles son de un solo sentido, como en el centro de una ciudad
+def grafo_rejilla(tamano, semilla=0, separacion_metros=120.0):
+    generador = random.Random(semilla)
+    grafo = nx.MultiDiGraph(crs='local')
+    for fila in range(tamano):
+        for columna in range(tamano):
+            x = columna * separacion_metros + generador.uniform(-10.0, 10.0)
+            y = fila * separacion_metros + generador.uniform(-10.0, 10.0)
+            lat, lon = _a_grados(x, y)
+            grafo.add_node(fila * tamano + columna, x=x, y=y, lat=lat, lon=lon)
+    for fila in range(tamano):
+        for columna in range(tamano):
+            nodo_u = fila * tamano + columna
+            for vecino in ((nodo_u + 1) if columna + 1 < tamano else None, (nodo_u + tamano) if fila + 1 < tamano else None):
+                if vecino is None:
+                    continue
+                datos_u, datos_v = grafo.nodes[nodo_u], grafo.nodes[vecino]
+                longitud = math.hypot(datos_v['x'] - datos_u['x'], datos_v['y'] - datos_u['y'])
+                nodo_a, nodo_b = (nodo_u, vecino) if generador.random() < 0.5 else (vecino, nodo_u)
+                _agregar_calle(grafo, nodo_a, nodo_b, longitud, generador.choice(TIPOS_DE_CALLE),
+                               generador.choice(VALORES_VELOCIDAD_MAXIMA), generador.random() < 0.1)
+    return grafo
+
+
+# Grafo sintético geométrico aleatorio: 'numero_nodos' puntos en un cuadrado, unidos si están a menos de 'radio_metros'
+# El radio por defecto da en promedio unos 6 vecinos por nodo
+def grafo_geometrico(numero_nodos, semilla=0, lado_metros=None, radio_metros=None):
+    generador = random.Random(semilla)
+    lado_metros = lado_metros or 120.0 * math.sqrt(numero_nodos)
+    radio_metros = radio_metros or lado_metros * math.sqrt(6.0 / (math.pi * numero_nodos))
+    posiciones = {nodo: (generador.uniform(0, lado_metros), generador.uniform(0, lado_metros)) for nodo in range(numero_nodos)}
+    base = nx.random_geometric_graph(numero_nodos, radio_metros, pos=posiciones)
+    grafo = nx.MultiDiGraph(crs='local')
+    for nodo, (x, y) in posiciones.items():
+        lat, lon = _a_grados(x, y)
+        grafo.add_node(nodo, x=x, y=y, lat=lat, lon=lon)
+    for nodo_u, nodo_v in base.edges():
+        (x_u, y_u), (x_v, y_v) = posiciones[nodo_u], posiciones[nodo_v]
+        # La calle es un poco más larga que la línea recta, como las calles reales
+        longitud = math.hypot(x_v - x_u, y_v - y_u) * generador.uniform(1.0, 1.3)
+        _agregar_calle(grafo, nodo_u, nodo_v, longitud, generador.choice(TIPOS_DE_CALLE), generador.choice(VALORES_VELOCIDAD_MAXIMA))
+    return grafo
+
+
+# Arma un grafo (con los mismos atributos que OSMnx) a partir de una respuesta de Overpass guardada en JSON
+# Se usan las vías con etiqueta 'highway' y se respeta 'oneway'. Si la respuesta no trae ninguna calle (por ejemplo es una consulta
+# de parques), con 'solo_calles=False' se usan los contornos de todas las vías: no son calles, pero la geometría sigue siendo real
+def grafo_desde_overpass(ruta_archivo, solo_calles=True):
+    with open(ruta_archivo, encoding='utf-8') as archivo:
+        elementos = json.load(archivo).get('elements', [])
+    coordenadas = {elemento['id']: (elemento['lat'], elemento['lon']) for elemento in elementos if elemento.get('type') == 'node'}
+    vias = [elemento for elemento in elementos if elemento.get('type') == 'way' and len(elemento.get('nodes', ())) > 1]
+    if solo_calles:
+        vias = [via for via in vias if 'highway' in via.get('tags', {})]
+    if not vias:
+        return None
+
+    latitud_referencia = sum(lat for lat, _ in coordenadas.values()) / len(coordenadas)
+    grafo = nx.MultiDiGraph(crs='local')
+    for via in vias:
+        etiquetas = via.get('tags', {})
+        sentido = str(etiquetas.get('oneway', 'no')).lower()
+        sentido_unico = sentido in SENTIDO_UNICO or sentido in SENTIDO_CONTRARIO
+        nodos_via = [nodo for nodo in via['nodes'] if nodo in coordenadas]
+        if sentido in SENTIDO_CONTRARIO:
+            nodos_via.reverse()
+        for nodo in nodos_via:
+            if nodo not in grafo:
+                lat, lon = coordenadas[nodo]
+                x, y = _a_metros(lat, lon, latitud_referencia)
+                grafo.add_node(nodo, x=x, y=y, lat=lat, lon=lon)
+        for nodo_u, nodo_v in zip(nodos_via[:-1], nodos_via[1:]):
+            if nodo_u == nodo_v:
+                continue
+            longitud = _distancia_haversine(*coordenadas[nodo_u], *coordenadas[nodo_v])
+            _agregar_calle(grafo, nodo_u, nodo_v, longitud, etiquetas.get('highway', 'unclassified'),
+                           etiquetas.get('maxspeed'), sentido_unico)
+    return grafo
+
+
+# Busca en la carpeta de caché la respuesta de Overpass con más vías y arma el grafo con ella
+# Devuelve (grafo, descripción) o (None, motivo) si no hay ninguna respuesta de Overpass utilizable
+def grafo_desde_cache_osm(directorio_cache=DIRECTORIO_CACHE_OSM):
+    mejor_archivo, mejor_numero_vias = None, 0
+    for ruta_archivo in sorted(glob.glob(os.path.join(directorio_cache, '*.json'))):
+        try:
+            with open(ruta_archivo, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except (OSError, ValueError):
+            continue
+        # Las respuestas de Nominatim son listas de lugares, las de Overpass son un objeto con 'elements'
+        if not isinstance(datos, dict) or 'elements' not in datos:
+            continue
+        numero_vias = sum(1 for elemento in datos['elements'] if elemento.get('type') == 'way')
+        if numero_vias > mejor_numero_vias:
+            mejor_archivo, mejor_numero_vias = ruta_archivo, numero_vias
+    if mejor_archivo is None:
+        return None, f'No hay respuestas de Overpass en {directorio_cache}'
+
+    grafo = grafo_desde_overpass(mejor_archivo)
+    descripcion = f'{os.path.basename(mejor_archivo)}: vías con highway'
+    if grafo is None:
+        grafo = grafo_desde_overpass(mejor_archivo, solo_calles=False)
+        descripcion = f'{os.path.basename(mejor_archivo)}: no trae calles, se usan los contornos de todas las vías'
+    return grafo, descripcion
+
+
+# Elige 'numero_pares' pares (origen, destino) con semilla fija dentro de la componente fuertemente conexa más grande
+def elegir_pares(grafo, numero_pares, semilla=0):
+    componente = sorted(max(nx.strongly_connected_components(grafo), key=len))
+    generador = random.Random(semilla)
+    return [(generador.choice(componente), generador.choice(componente)) for _ in range(numero_pares)]
+
+
+# Pico de memoria (RSS) del proceso en kilobytes, o 'None' si el sistema no lo reporta
+# Es el máximo desde que arrancó el proceso, así que solo crece de un motor al siguiente
+def pico_memoria_kb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS lo reporta en bytes y Linux en kilobytes
+    return pico // 1024 if platform.system() == 'Darwin' else pico
+
+
+# Prepara un motor sobre un grafo ya ponderado y compilado
+# Devuelve (segundos de preprocesamiento, función consultar(origen, destino) -> (ruta o None, nodos visitados o None))
+def preparar_motor(nombre, grafo, grafo_compilado, script_principal=None):
+    inicio = time.perf_counter()
+    if nombre == 'iterativo':
+        dijkstra_iterativo = script_principal.dijkstra_iterativo
+
+        def consultar(nodo_origen, nodo_destino):
+            return dijkstra_iterativo(grafo, nodo_origen, nodo_destino, ATRIBUTO_PESO), None
+
+    elif nombre == 'networkx':
+        def consultar(nodo_origen, nodo_destino):
+            try:
+                return nx.shortest_path(grafo, nodo_origen, nodo_destino, weight=ATRIBUTO_PESO), None
+            except nx.NetworkXNoPath:
+                return None, None
+
+    elif nombre in ESTRATEGIAS:
+        # Lo que estas estrategias construyen la primera vez (listas, grafo reverso, velocidad máxima) cuenta como preprocesamiento
+        grafo_compilado.listas()
+        grafo_compilado.coordenadas_listas()
+        if nombre.startswith('bidireccional'):
+            grafo_compilado.reverso().listas()
+        if nombre.endswith('a_estrella'):
+            grafo_compilado.velocidad_maxima()
+
+        def consultar(nodo_origen, nodo_destino):
+            resultado_busqueda = buscar_ruta(grafo_compilado, nodo_origen, nodo_destino, nombre)
+            return resultado_busqueda.camino, resultado_busqueda.nodos_visitados
+
+    elif nombre == 'jerarquia':
+        jerarquia = construir_jerarquia(grafo_compilado)
+
+        def consultar(nodo_origen, nodo_destino):
+            return jerarquia.ruta(nodo_origen, nodo_destino), None
+
+    elif nombre == 'jerarquia_personalizable':
+        jerarquia = construir_jerarquia_personalizable(grafo_compilado)
+
+        def consultar(nodo_origen, nodo_destino):
+            return jerarquia.ruta(nodo_origen, nodo_destino), None
+
+    else:
+        raise ValueError(f"Motor desconocido '{nombre}', los disponibles son: {', '.join(MOTORES)}")
+    return time.perf_counter() - inicio, consultar
+
+
+# Resume una lista de latencias (segundos) en milisegundos
+def resumir_latencias(latencias):
+    if not latencias:
+        return None
+    milisegundos = np.asarray(latencias) * 1000.0
+    return {
+        'p50': float(np.percentile(milisegundos, 50)),
+        'p95': float(np.percentile(milisegundos, 95)),
+        'p99': float(np.percentile(milisegundos, 99)),
+        'promedio': float(milisegundos.mean()),
+        'maximo': float(milisegundos.max()),
+    }
+
+
+# Mide todos los 'motores' sobre un grafo con los 'pares' dados y devuelve el diccionario de resultados de este grafo
+def medir_grafo(nombre_grafo, grafo, pares, motores, script_principal=None):
+    print(f"[{nombre_grafo}] {grafo.number_of_nodes()} nodos, {grafo.number_of_edges()} aristas, {len(pares)} pares")
+    inicio = time.perf_counter()
+    ponderar_grafo(grafo)
+    ponderacion_segundos = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    grafo_compilado = compilar_grafo(grafo, ATRIBUTO_PESO)
+    compilacion_segundos = time.perf_counter() - inicio
+
+    # Tiempos de referencia con el Dijkstra compilado, contra ellos se revisan todos los motores
+    tiempos_referencia = []
+    for nodo_origen, nodo_destino in pares:
+        resultado_busqueda = buscar_ruta(grafo_compilado, nodo_origen, nodo_destino, 'dijkstra')
+        tiempos_referencia.append(resultado_busqueda.tiempo_total if resultado_busqueda.camino is not None else None)
+
+    resultados_motores = {}
+    for nombre_motor in motores:
+        preprocesamiento_segundos, consultar = preparar_motor(nombre_motor, grafo, grafo_compilado, script_principal)
+        latencias, visitados, diferencias = [], [], 0
+        for (nodo_origen, nodo_destino), tiempo_referencia in zip(pares, tiempos_referencia):
+            inicio = time.perf_counter()
+            ruta, nodos_visitados = consultar(nodo_origen, nodo_destino)
+            latencias.append(time.perf_counter() - inicio)
+            if nodos_visitados is not None:
+                visitados.append(nodos_visitados)
+            tiempo_ruta = grafo_compilado.resumen_ruta(ruta)[1] if ruta is not None else None
+            if (tiempo_ruta is None) != (tiempo_referencia is None) or (
+                    tiempo_ruta is not None and abs(tiempo_ruta - tiempo_referencia) > TOLERANCIA_SEGUNDOS):
+                diferencias += 1
+
+        # 'dijkstra_iterativo' cuenta sus nodos visitados con un observador, en una pasada aparte para no sumar su costo a la latencia
+        if nombre_motor == 'iterativo':
+            observador = ObservadorContadores()
+            for nodo_origen, nodo_destino in pares:
+                script_principal.dijkstra_iterativo(grafo, nodo_origen, nodo_destino, ATRIBUTO_PESO, observador)
+                visitados.append(observador.nodos_visitados)
+
+        resultados_motores[nombre_motor] = {
+            'preprocesamiento_segundos': preprocesamiento_segundos,
+            'latencia_ms': resumir_latencias(latencias),
+            'nodos_visitados_promedio': float(np.mean(visitados)) if visitados else None,
+            'rutas_distintas_a_referencia': diferencias,
+            'pico_memoria_kb': pico_memoria_kb(),
+        }
+        latencia_ms = resultados_motores[nombre_motor]['latencia_ms']
+        print(f"  {nombre_motor:<26} p50 {latencia_ms['p50']:9.3f} ms   p99 {latencia_ms['p99']:9.3f} ms   "
+              f"preprocesamiento {preprocesamiento_segundos:8.3f} s   distintas {diferencias}")
+
+    return {
+        'nodos': grafo.number_of_nodes(),
+        'aristas': grafo.number_of_edges(),
+        'pares': len(pares),
+        'ponderacion_segundos': ponderacion_segundos,
+        'compilacion_segundos': compilacion_segundos,
+        'motores': resultados_motores,
+    }
+
+
+# Corre todo el banco de pruebas y devuelve el diccionario que se escribe en el JSON
+def ejecutar_mediciones(tamano_rejilla=60, nodos_geometrico=3000, numero_pares=200, semilla=0, motores=MOTORES,
+                        usar_cache_osm=True, directorio_cache=DIRECTORIO_CACHE_OSM):
+    script_principal = cargar_script_principal() if 'iterativo' in motores else None
+    grafos = []
+    if tamano_rejilla:
+        grafos.append((f'rejilla_{tamano_rejilla}x{tamano_rejilla}', grafo_rejilla(tamano_rejilla, semilla), None))
+    if nodos_geometrico:
+        grafos.append((f'geometrico_{nodos_geometrico}', grafo_geometrico(nodos_geometrico, semilla), None))
+    if usar_cache_osm:
+        grafo_osm, descripcion = grafo_desde_cache_osm(directorio_cache)
+        grafos.append(('osm_cache', grafo_osm, descripcion))
+
+    resultados = {
+        'semilla': semilla,
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'procesador': platform.processor() or platform.machine(),
+            'networkx': nx.__version__,
+            'numpy': np.__version__,
+        },
+        'grafos': {},
+    }
+    for nombre_grafo, grafo, descripcion in grafos:
+        if grafo is None:
+            print(f"[{nombre_grafo}] se omite: {descripcion}")
+            resultados['grafos'][nombre_grafo] = {'omitido': descripcion}
+            continue
+        pares = elegir_pares(grafo, numero_pares, semilla)
+        resultados['grafos'][nombre_grafo] = medir_grafo(nombre_grafo, grafo, pares, motores, script_principal)
+        if descripcion is not None:
+            resultados['grafos'][nombre_grafo]['origen'] = descripcion
+    return resultados
+
+
+if __name__ == "__main__":
+    analizador = argparse.ArgumentParser(description='Banco de pruebas de rendimiento de los motores de rutas (sin red ni pantalla)')
+    analizador.add_argument('--tamano-rejilla', type=int, default=60, help='lado de la cuadrícula (0 para omitirla)')
+    analizador.add_argument('--nodos-geometrico', type=int, default=3000, help='nodos del grafo geométrico (0 para omitirlo)')
+    analizador.add_argument('--pares', type=int, default=200)
+    analizador.add_argument('--semilla', type=int, default=0)
+    analizador.add_argument('--motores', default=','.join(MOTORES), help='lista separada por comas')
+    analizador.add_argument('--sin-osm', action='store_true', help='no usar el grafo real de la carpeta cache/')
+    analizador.add_argument('--cache-osm', default=DIRECTORIO_CACHE_OSM)
+    analizador.add_argument('--salida', default='resultados_rendimiento.json')
+    argumentos = analizador.parse_args()
+
+    motores_elegidos = tuple(motor.strip() for motor in argumentos.motores.split(',') if motor.strip())
+    for motor in motores_elegidos:
+        if motor not in MOTORES:
+            analizador.error(f"Motor desconocido '{motor}', los disponibles son: {', '.join(MOTORES)}")
+    resultado = ejecutar_mediciones(argumentos.tamano_rejilla, argumentos.nodos_geometrico, argumentos.pares, argumentos.semilla,
+                                    motores_elegidos, not argumentos.sin_osm, argumentos.cache_osm)
+    with open(argumentos.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {argumentos.salida}")
@@ -0,0 +1,887 @@
+# En este archivo partimos un grafo compilado muy grande (por ejemplo todo el estado de Oaxaca y sus vecinos) en "tiles": cuadros de
+# una rejilla fija de latitud y longitud. Cada tile se guarda en disco como su propia instantánea (ver 'instantanea_grafo.py') y solo se
+# abre cuando una consulta lo necesita, así nunca hace falta tener el grafo completo en memoria.
+#
+# Para cruzar de un tile a otro sin abrir los de en medio se precalcula una "superposición" de varios niveles (como en Customizable
+# Route Planning):
+#   - Los nodos frontera son los extremos de las calles que cruzan de un tile a otro (arcos de corte).
+#   - Nivel 1: las celdas son los tiles; para cada tile se guarda el tiempo más corto, sin salir del tile, entre cada par de sus nodos frontera.
+#   - Nivel L: las celdas juntan 2 x 2 celdas del nivel L - 1; sus tiempos se calculan con Dijkstra sobre la superposición del nivel L - 1.
+# Una consulta es un Dijkstra que dentro de los tiles del origen y del destino usa las calles originales y, en cualquier otro lugar, salta
+# de frontera en frontera por la celda más grande que no contiene ni al origen ni al destino. Al final cada salto se "desempaca" otra vez
+# en calles bajando de nivel; eso solo abre los tiles por los que pasa la ruta.
+#
+# Cada tile incluye además, como nodos "fantasma" sin aristas de salida, los nodos de otros tiles a los que llegan sus arcos de corte;
+# así las calles que salen del tile se pueden recorrer y sumar sin abrir el tile vecino.
+#
+# Uso: python particiones_grafo.py construir [ARCHIVOS_OVERPASS] [--instantanea CARPETA] --salida CARPETA [--grados-tile 0.05] [--niveles 3]
+#      python particiones_grafo.py ruta CARPETA LAT_ORIGEN LON_ORIGEN LAT_DESTINO LON_DESTINO
+#      python particiones_grafo.py informe CARPETA
+#      python particiones_grafo.py medir CARPETA [--pares 200] [--instantanea CARPETA_COMPLETA]
+# Sin archivos ni '--instantanea', 'construir' parte la instantánea del script principal.
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'heapq' para las colas de prioridad de las búsquedas
+import heapq
+# Importamos 'json' para guardar la descripción de la partición y escribir resultados
+import json
+# Importamos 'os' y 'shutil' para crear, renombrar y borrar carpetas
+import os
+import shutil
+# Importamos 'resource' para medir la memoria máxima del proceso en el informe de consultas
+import resource
+# Importamos 'tempfile' para escribir la partición en una carpeta temporal antes de publicarla
+import tempfile
+# Importamos 'time' para medir el preprocesamiento y las consultas
+import time
+# Importamos 'OrderedDict' para llevar los tiles abiertos del más viejo al más reciente
+from collections import OrderedDict
+# Importamos el ejecutor de procesos de la biblioteca estándar
+from concurrent.futures import ProcessPoolExecutor
+
+# Importamos numpy con el alias 'np' para partir el grafo y guardar la superposición
+import numpy as np
+
+# Importamos el grafo compilado, sus instantáneas, el índice espacial y las búsquedas que se usan dentro de cada tile
+from estrategias_busqueda import ResultadoBusqueda
+from grafo_compilado import GrafoCompilado, dijkstra_indices
+from indice_espacial import RADIO_TIERRA_METROS, obtener_indice_espacial
+from instantanea_grafo import cargar_instantanea, guardar_instantanea, leer_metadatos, leer_valores_highway
+from matriz_tiempos import uno_a_muchos_indices
+
+# Versión del formato de la partición, si cambia el formato se sube este número y las particiones viejas se rechazan
+VERSION_PARTICION = 1
+
+# Lado de los tiles en grados (0.05 grados son unos 5.5 km) y número de niveles de la superposición
+GRADOS_TILE_POR_DEFECTO = 0.05
+NIVELES_POR_DEFECTO = 3
+
+# Máximo de tiles abiertos a la vez, al pasarse se cierra el que lleva más tiempo sin usarse
+MAXIMO_TILES_ABIERTOS_POR_DEFECTO = 16
+
+# Nombres de los archivos y carpetas dentro de la carpeta de la partición
+ARCHIVO_PARTICION = 'particion.json'
+CARPETA_TILES = 'tiles'
+CARPETA_SUPERPOSICION = 'superposicion'
+# Dentro de cada tile: para cada nodo (propio o fantasma), su número de nodo frontera en la superposición o -1
+ARCHIVO_FRONTERA_TILE = 'frontera.npy'
+
+# Pares aleatorios que usa 'medir' si no se piden otros
+PARES_MEDICION_POR_DEFECTO = 200
+
+
+# Fila y columna de la rejilla de tiles de cada punto; la rejilla está fija en grados, así un tile no cambia cuando crece la cobertura
+def tiles_de_puntos(lat, lon, grados_tile):
+    fila = np.floor(np.asarray(lat, dtype=np.float64) / grados_tile).astype(np.int64)
+    columna = np.floor(np.asarray(lon, dtype=np.float64) / grados_tile).astype(np.int64)
+    return fila, columna
+
+
+# Posiciones en el CSR de todas las aristas que salen de los nodos 'indices', en el orden de 'indices'
+def _posiciones_aristas(desplazamientos, indices):
+    grados = desplazamientos[indices + 1] - desplazamientos[indices]
+    inicio = np.cumsum(grados) - grados
+    return np.repeat(desplazamientos[indices] - inicio, grados) + np.arange(int(grados.sum()))
+
+
+# Tarea de un proceso trabajador: tiempos de nivel 1 entre los nodos frontera de un tile (índices locales), sin salir del tile
+def _tarea_celda_tile(numero_tile, directorio_tile, miembros_locales):
+    return numero_tile, _tiempos_en_tile(cargar_instantanea(directorio_tile), miembros_locales)
+
+
+# Matriz (miembros x miembros) de tiempos más cortos entre nodos de un tile usando solo sus calles
+def _tiempos_en_tile(grafo_tile, miembros_locales):
+    return np.array([uno_a_muchos_indices(grafo_tile, miembro, miembros_locales)[0] for miembro in miembros_locales])
+
+
+# Parte 'grafo_compilado' en tiles de 'grados_tile' grados, precalcula la superposición de 'niveles' niveles y lo guarda en 'directorio'
+# 'valores_highway' (opcional) es el 'highway' de cada arista compilada, se reparte entre los tiles para los parches por tipo de calle
+# 'procesos' reparte el cálculo del nivel 1 (el más pesado, un tile por tarea) entre procesos trabajadores
+# Igual que las instantáneas, todo se escribe en una carpeta temporal que al final se renombra
+def particionar_grafo(grafo_compilado, directorio, grados_tile=GRADOS_TILE_POR_DEFECTO, niveles=NIVELES_POR_DEFECTO,
+                      valores_highway=None, procesos=None):
+    if grados_tile <= 0 or niveles < 1:
+        raise ValueError("El tamaño de los tiles debe ser positivo y debe haber al menos un nivel")
+    lat = np.asarray(grafo_compilado.lat, dtype=np.float64)
+    lon = np.asarray(grafo_compilado.lon, dtype=np.float64)
+    if np.isnan(lat).any() or np.isnan(lon).any():
+        raise ValueError("El grafo compilado no tiene latitud y longitud en todos sus nodos")
+    inicio_preprocesamiento = time.perf_counter()
+    numero_nodos = grafo_compilado.numero_nodos
+    desplazamientos = np.asarray(grafo_compilado.desplazamientos, dtype=np.int64)
+    destinos = np.asarray(grafo_compilado.destinos, dtype=np.int64)
+    origenes = np.repeat(np.arange(numero_nodos), np.diff(desplazamientos))
+
+    # Tile de cada nodo y celda de cada tile en cada nivel (numeradas de forma compacta; en el nivel 1 la celda es el tile)
+    fila, columna = tiles_de_puntos(lat, lon, grados_tile)
+    claves_tile, tile_de_nodo = np.unique(np.column_stack((fila, columna)), axis=0, return_inverse=True)
+    tile_de_nodo = tile_de_nodo.reshape(-1)
+    numero_tiles = len(claves_tile)
+    celdas_de_tile = [np.unique(claves_tile >> (nivel - 1), axis=0, return_inverse=True)[1].reshape(-1)
+                      for nivel in range(1, niveles + 1)]
+
+    # Arcos de corte y su nivel: el último nivel en el que sus dos extremos quedan en celdas distintas
+    corte = np.nonzero(tile_de_nodo[origenes] != tile_de_nodo[destinos])[0]
+    origenes_corte, destinos_corte = origenes[corte], destinos[corte]
+    nivel_arco = np.zeros(len(corte), dtype=np.int64)
+    for nivel, celda_de_tile in enumerate(celdas_de_tile, start=1):
+        nivel_arco[celda_de_tile[tile_de_nodo[origenes_corte]] != celda_de_tile[tile_de_nodo[destinos_corte]]] = nivel
+
+    # Nodos frontera (numerados en el orden de sus índices globales) y el nivel más alto en el que cada uno es frontera
+    frontera = np.unique(np.concatenate((origenes_corte, destinos_corte)))
+    numero_frontera = len(frontera)
+    indice_frontera = np.full(numero_nodos, -1, dtype=np.int64)
+    indice_frontera[frontera] = np.arange(numero_frontera)
+    nivel_frontera = np.zeros(numero_frontera, dtype=np.int64)
+    np.maximum.at(nivel_frontera, indice_frontera[origenes_corte], nivel_arco)
+    np.maximum.at(nivel_frontera, indice_frontera[destinos_corte], nivel_arco)
+
+    # Posición de cada nodo dentro de su tile: los nodos propios de un tile van en el orden de sus índices globales
+    orden_tiles = np.argsort(tile_de_nodo, kind='stable')
+    nodos_por_tile = np.bincount(tile_de_nodo, minlength=numero_tiles)
+    inicio_tile = np.cumsum(nodos_por_tile) - nodos_por_tile
+    local_de_nodo = np.empty(numero_nodos, dtype=np.int64)
+    local_de_nodo[orden_tiles] = np.arange(numero_nodos) - inicio_tile[tile_de_nodo[orden_tiles]]
+
+    carpeta_padre = os.path.dirname(os.path.abspath(directorio))
+    os.makedirs(carpeta_padre, exist_ok=True)
+    carpeta_temporal = tempfile.mkdtemp(prefix='.particion_', dir=carpeta_padre)
+    try:
+        # Cada tile: sus nodos propios, después los fantasma, y las aristas que salen de sus nodos propios
+        os.makedirs(os.path.join(carpeta_temporal, CARPETA_TILES))
+        local_temporal = np.full(numero_nodos, -1, dtype=np.int64)
+        descripcion_tiles = []
+        if procesos is None:
+            procesos = os.cpu_count() or 1
+        # Nivel 1: una matriz por tile con los tiempos entre sus nodos frontera sin salir del tile (con un solo proceso se calcula aquí mismo)
+        matrices_tile = [None] * numero_tiles
+        tareas_tile = []
+        for numero_tile in range(numero_tiles):
+            propios = orden_tiles[inicio_tile[numero_tile]:inicio_tile[numero_tile] + nodos_por_tile[numero_tile]]
+            posiciones = _posiciones_aristas(desplazamientos, propios)
+            destinos_tile = destinos[posiciones]
+            fantasmas = np.unique(destinos_tile[tile_de_nodo[destinos_tile] != numero_tile])
+            todos = np.concatenate((propios, fantasmas))
+            local_temporal[todos] = np.arange(len(todos))
+            desplazamientos_tile = np.empty(len(todos) + 1, dtype=np.int64)
+            desplazamientos_tile[0] = 0
+            desplazamientos_tile[1:len(propios) + 1] = np.cumsum(desplazamientos[propios + 1] - desplazamientos[propios])
+            desplazamientos_tile[len(propios) + 1:] = desplazamientos_tile[len(propios)]
+            grafo_tile = GrafoCompilado(
+                grafo_compilado.ids_nodos[todos], grafo_compilado.x[todos], grafo_compilado.y[todos],
+                desplazamientos_tile, local_temporal[destinos_tile], grafo_compilado.pesos[posiciones],
+                grafo_compilado.longitudes[posiciones], grafo_compilado.claves[posiciones], grafo_compilado.atributo_peso,
+                grafo_compilado.velocidades_kmh[posiciones], lat[todos], lon[todos],
+            )
+            local_temporal[todos] = -1
+            fila_tile, columna_tile = claves_tile[numero_tile].tolist()
+            directorio_tile = os.path.join(carpeta_temporal, CARPETA_TILES, f'{fila_tile}_{columna_tile}')
+            guardar_instantanea(grafo_tile, directorio_tile, {
+                'tile': [fila_tile, columna_tile],
+                'grados_tile': grados_tile,
+                'numero_nodos_propios': len(propios),
+            }, None if valores_highway is None else [valores_highway[posicion] for posicion in posiciones.tolist()])
+            np.save(os.path.join(directorio_tile, ARCHIVO_FRONTERA_TILE), indice_frontera[todos])
+            descripcion_tiles.append({
+                'fila': fila_tile, 'columna': columna_tile,
+                'numero_nodos': len(propios), 'numero_fantasmas': len(fantasmas), 'numero_aristas': len(posiciones),
+                'numero_frontera': int(np.count_nonzero(indice_frontera[propios] >= 0)),
+                'bytes': grafo_tile.tamano_bytes(),
+            })
+            miembros_locales = np.nonzero(indice_frontera[propios] >= 0)[0].tolist()
+            if procesos == 1:
+                matrices_tile[numero_tile] = _tiempos_en_tile(grafo_tile, miembros_locales)
+            else:
+                tareas_tile.append((numero_tile, directorio_tile, miembros_locales))
+
+        # Miembros de cada celda en cada nivel: sus nodos frontera de ese nivel, en orden
+        celda_frontera = [celda_de_tile[tile_de_nodo[frontera]] for celda_de_tile in celdas_de_tile]
+        miembros = []
+        for nivel in range(1, niveles + 1):
+            en_nivel = np.nonzero(nivel_frontera >= nivel)[0]
+            orden = en_nivel[np.argsort(celda_frontera[nivel - 1][en_nivel], kind='stable')]
+            numero_celdas = int(celdas_de_tile[nivel - 1].max()) + 1
+            conteo = np.bincount(celda_frontera[nivel - 1][orden], minlength=numero_celdas)
+            miembros.append((np.concatenate(([0], np.cumsum(conteo))), orden))
+
+        superposicion = Superposicion(
+            frontera_ids=grafo_compilado.ids_nodos[frontera], frontera_tile=tile_de_nodo[frontera],
+            frontera_local=local_de_nodo[frontera], frontera_nivel=nivel_frontera,
+            arcos_desplazamientos=np.concatenate(([0], np.cumsum(np.bincount(indice_frontera[origenes_corte], minlength=numero_frontera)))),
+            arcos_destinos=indice_frontera[destinos_corte], arcos_pesos=np.asarray(grafo_compilado.pesos)[corte], arcos_nivel=nivel_arco,
+            celdas_de_tile=celdas_de_tile, celda_frontera=celda_frontera,
+            miembros_desplazamientos=[desplazamientos_miembros for desplazamientos_miembros, _ in miembros],
+            miembros=[lista_miembros for _, lista_miembros in miembros],
+            matrices_desplazamientos=[], matrices=[],
+        )
+
+        if tareas_tile:
+            with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+                tareas = [ejecutor.submit(_tarea_celda_tile, *tarea_tile) for tarea_tile in tareas_tile]
+                for tarea in tareas:
+                    numero_tile, matriz = tarea.result()
+                    matrices_tile[numero_tile] = matriz
+        superposicion.agregar_nivel(matrices_tile)
+
+        # Niveles 2 en adelante: Dijkstra sobre la superposición del nivel anterior sin salir de la celda
+        for nivel in range(2, niveles + 1):
+            desplazamientos_miembros, lista_miembros = miembros[nivel - 1]
+            matrices_nivel = []
+            for celda in range(len(desplazamientos_miembros) - 1):
+                miembros_celda = lista_miembros[desplazamientos_miembros[celda]:desplazamientos_miembros[celda + 1]]
+                matriz = np.full((len(miembros_celda), len(miembros_celda)), np.inf)
+                for fila_matriz, miembro in enumerate(miembros_celda.tolist()):
+                    superposicion.buscar_en_celda(nivel, miembro)
+                    matriz[fila_matriz] = superposicion.distancias(miembros_celda)
+                matrices_nivel.append(matriz)
+            superposicion.agregar_nivel(matrices_nivel)
+
+        superposicion.guardar(os.path.join(carpeta_temporal, CARPETA_SUPERPOSICION))
+        orden_ids = np.argsort(grafo_compilado.ids_nodos, kind='stable')
+        np.save(os.path.join(carpeta_temporal, 'ids_ordenados.npy'), np.asarray(grafo_compilado.ids_nodos)[orden_ids])
+        np.save(os.path.join(carpeta_temporal, 'tile_de_id.npy'), tile_de_nodo[orden_ids].astype(np.int32))
+        np.save(os.path.join(carpeta_temporal, 'local_de_id.npy'), local_de_nodo[orden_ids].astype(np.int32))
+        descripcion = {
+            'version': VERSION_PARTICION,
+            'grados_tile': grados_tile,
+            'niveles': niveles,
+            'atributo_peso': grafo_compilado.atributo_peso,
+            'numero_nodos': numero_nodos,
+            'numero_aristas': grafo_compilado.numero_aristas,
+            'numero_frontera': numero_frontera,
+            'numero_arcos_corte': len(corte),
+            'segundos_preprocesamiento': time.perf_counter() - inicio_preprocesamiento,
+            'bytes_superposicion': superposicion.tamano_bytes(),
+            'celdas_por_nivel': [len(desplazamientos_miembros) - 1 for desplazamientos_miembros, _ in miembros],
+            'frontera_por_nivel': [len(lista_miembros) for _, lista_miembros in miembros],
+            'tiles': descripcion_tiles,
+        }
+        with open(os.path.join(carpeta_temporal, ARCHIVO_PARTICION), 'w', encoding='utf-8') as archivo:
+            json.dump(descripcion, archivo, ensure_ascii=False, indent=2)
+        if os.path.isdir(directorio):
+            shutil.rmtree(directorio)
+        os.replace(carpeta_temporal, directorio)
+    except BaseException:
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+        raise
+    return descripcion
+
+
+# La superposición: los nodos frontera, los arcos de corte y, por cada nivel, la matriz de tiempos de cada celda entre sus miembros
+# Los arreglos viven en NumPy (para guardarlos); las búsquedas usan listas de Python y vistas de las matrices que se crean la primera vez
+class Superposicion:
+    def __init__(self, frontera_ids, frontera_tile, frontera_local, frontera_nivel, arcos_desplazamientos, arcos_destinos,
+                 arcos_pesos, arcos_nivel, celdas_de_tile, celda_frontera, miembros_desplazamientos, miembros,
+                 matrices_desplazamientos, matrices):
+        # ID de OSM, tile, índice dentro de su tile y nivel más alto de cada nodo frontera
+        self.frontera_ids = np.asarray(frontera_ids, dtype=np.int64)
+        self.frontera_tile = np.asarray(frontera_tile, dtype=np.int64)
+        self.frontera_local = np.asarray(frontera_local, dtype=np.int64)
+        self.frontera_nivel = np.asarray(frontera_nivel, dtype=np.int64)
+        # Arcos de corte en formato CSR sobre los nodos frontera, con su peso y su nivel
+        self.arcos_desplazamientos = np.asarray(arcos_desplazamientos, dtype=np.int64)
+        self.arcos_destinos = np.asarray(arcos_destinos, dtype=np.int64)
+        self.arcos_pesos = np.asarray(arcos_pesos, dtype=np.float64)
+        self.arcos_nivel = np.asarray(arcos_nivel, dtype=np.int64)
+        # Por nivel: celda de cada tile, celda de cada nodo frontera, miembros de cada celda (CSR) y matrices de cada celda (CSR)
+        self.celdas_de_tile = [np.asarray(celdas, dtype=np.int64) for celdas in celdas_de_tile]
+        self.celda_frontera = [np.asarray(celdas, dtype=np.int64) for celdas in celda_frontera]
+        self.miembros_desplazamientos = [np.asarray(arreglo, dtype=np.int64) for arreglo in miembros_desplazamientos]
+        self.miembros = [np.asarray(arreglo, dtype=np.int64) for arreglo in miembros]
+        self.matrices_desplazamientos = [np.asarray(arreglo, dtype=np.int64) for arreglo in matrices_desplazamientos]
+        self.matrices = [np.asarray(arreglo, dtype=np.float64) for arreglo in matrices]
+        self._listas = None
+        self._distancias = None
+        self._consulta = 0
+
+    @property
+    def niveles(self):
+        return len(self.celdas_de_tile)
+
+    # Agrega las matrices del siguiente nivel (una por celda, en el orden de las celdas)
+    def agregar_nivel(self, matrices_celdas):
+        tamanos = [matriz.size for matriz in matrices_celdas]
+        self.matrices_desplazamientos.append(np.concatenate(([0], np.cumsum(tamanos))).astype(np.int64))
+        self.matrices.append(np.concatenate([np.ravel(matriz) for matriz in matrices_celdas]) if matrices_celdas else np.empty(0))
+        self._listas = None
+
+    # Devuelve las estructuras que usan las búsquedas, creándolas la primera vez: los datos de los nodos frontera y los arcos de corte
+    # como listas y, para cada nivel ya calculado: (celda de cada nodo frontera, posición de cada nodo frontera entre los miembros de su
+    # celda o -1, miembros de cada celda como arreglo, matriz de cada celda como arreglo de filas)
+    # Las matrices son vistas del arreglo guardado: con la superposición mapeada en memoria solo se leen las filas que se usan
+    def listas(self):
+        if self._listas is None:
+            niveles = []
+            for nivel in range(len(self.matrices)):
+                desplazamientos_miembros = self.miembros_desplazamientos[nivel]
+                miembros = np.asarray(self.miembros[nivel])
+                posicion = np.full(len(self.frontera_ids), -1, dtype=np.int64)
+                posicion[miembros] = np.arange(len(miembros)) - np.repeat(desplazamientos_miembros[:-1], np.diff(desplazamientos_miembros))
+                miembros_celdas = []
+                matrices_celdas = []
+                for celda in range(len(desplazamientos_miembros) - 1):
+                    miembros_celda = miembros[desplazamientos_miembros[celda]:desplazamientos_miembros[celda + 1]]
+                    matriz = self.matrices[nivel][self.matrices_desplazamientos[nivel][celda]:self.matrices_desplazamientos[nivel][celda + 1]]
+                    miembros_celdas.append(miembros_celda)
+                    matrices_celdas.append(np.reshape(matriz, (len(miembros_celda), len(miembros_celda))))
+                niveles.append((self.celda_frontera[nivel].tolist(), posicion.tolist(), miembros_celdas, matrices_celdas))
+            self._listas = (
+                self.frontera_ids.tolist(), self.frontera_tile.tolist(), self.frontera_local.tolist(),
+                self.arcos_desplazamientos.tolist(), self.arcos_destinos.tolist(), self.arcos_pesos.tolist(), self.arcos_nivel.tolist(),
+                niveles,
+            )
+        return self._listas
+
+    # Empieza una búsqueda sobre los nodos frontera, como 'GrafoCompilado.memoria_busqueda': los arreglos se crean una vez y una marca por
+    # búsqueda dice qué distancias y qué nodos cerrados son de la búsqueda actual, así no hay que reiniciarlos
+    def nueva_busqueda(self):
+        if self._distancias is None:
+            numero_frontera = len(self.frontera_ids)
+            self._distancias = np.full(numero_frontera, np.inf)
+            self._marcas = np.zeros(numero_frontera, dtype=np.int64)
+            self._cerrados = np.zeros(numero_frontera, dtype=np.int64)
+            # Si la distancia actual de cada nodo llegó por un salto de celda
+            self._por_salto = np.zeros(numero_frontera, dtype=bool)
+        self._consulta += 1
+
+    # Distancia de un nodo frontera en la búsqueda actual (infinito si no se alcanzó)
+    def distancia(self, nodo):
+        return self._distancias[nodo] if self._marcas[nodo] == self._consulta else np.inf
+
+    # Distancias en la búsqueda actual de un arreglo de nodos frontera
+    def distancias(self, nodos):
+        return np.where(self._marcas[nodos] == self._consulta, self._distancias[nodos], np.inf)
+
+    # Si el nodo ya se cerró en la búsqueda actual; si no, lo cierra y devuelve False
+    def cerrar(self, nodo):
+        if self._cerrados[nodo] == self._consulta:
+            return True
+        self._cerrados[nodo] = self._consulta
+        return False
+
+    # Si la distancia actual del nodo llegó por un salto de celda: desde ahí no hace falta volver a saltar por la misma celda,
+    # porque la matriz ya tiene el tiempo más corto entre cada par de miembros
+    def llego_por_salto(self, nodo):
+        return self._por_salto[nodo]
+
+    # Mejora la distancia de un nodo si 'nueva_distancia' es menor; devuelve True si la mejoró
+    def mejorar(self, nodo, nueva_distancia, por_salto=False):
+        if self._marcas[nodo] == self._consulta and nueva_distancia >= self._distancias[nodo]:
+            return False
+        self._distancias[nodo] = nueva_distancia
+        self._marcas[nodo] = self._consulta
+        self._por_salto[nodo] = por_salto
+        return True
+
+    # Relaja de una vez una fila de la matriz de una celda desde un nodo a 'distancia_actual'
+    # Devuelve los miembros cuya distancia mejoró y sus nuevas distancias, como listas
+    def relajar_fila(self, distancia_actual, miembros_celda, fila):
+        nuevas = fila + distancia_actual
+        mejoran = np.flatnonzero(nuevas < self.distancias(miembros_celda))
+        if not len(mejoran):
+            return (), ()
+        nodos = miembros_celda[mejoran]
+        nuevas = nuevas[mejoran]
+        self._distancias[nodos] = nuevas
+        self._marcas[nodos] = self._consulta
+        self._por_salto[nodos] = True
+        return nodos.tolist(), nuevas.tolist()
+
+    # Dijkstra sobre la superposición del nivel 'nivel' - 1 sin salir de la celda de nivel 'nivel' de 'origen' (índice de nodo frontera)
+    # Sirve para calcular las matrices del nivel 'nivel' (las distancias quedan en la búsqueda actual, ver 'distancias') y para
+    # desempacar sus saltos; el nivel - 1 debe ser al menos 1
+    # Con 'objetivo' se detiene al cerrarlo y devuelve los predecesores: (nodo anterior, True si se llegó con un salto de celda)
+    def buscar_en_celda(self, nivel, origen, objetivo=None):
+        _, _, _, arcos_desplazamientos, arcos_destinos, arcos_pesos, arcos_nivel, niveles = self.listas()
+        nivel_inferior = nivel - 1
+        celda_inferior, posicion_inferior, miembros_inferior, matrices_inferior = niveles[nivel_inferior - 1]
+        # La celda del nivel 'nivel' de cada nodo frontera (mientras se construye este nivel todavía no está en las listas)
+        celda_superior = niveles[nivel - 1][0] if nivel <= len(niveles) else self.celda_frontera[nivel - 1].tolist()
+        celda = celda_superior[origen]
+        self.nueva_busqueda()
+        self.mejorar(origen, 0.0)
+        predecesores = {origen: (-1, False)}
+        con_predecesores = objetivo is not None
+        cola_prioridad = [(0.0, origen)]
+        while cola_prioridad:
+            distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+            if self.cerrar(nodo_actual):
+                continue
+            if nodo_actual == objetivo:
+                break
+            # Saltos dentro de su celda del nivel inferior
+            posicion = posicion_inferior[nodo_actual]
+            if posicion >= 0 and not self.llego_por_salto(nodo_actual):
+                celda_actual = celda_inferior[nodo_actual]
+                nodos, nuevas_distancias = self.relajar_fila(distancia_actual, miembros_inferior[celda_actual],
+                                                             matrices_inferior[celda_actual][posicion])
+                salto = (nodo_actual, True)
+                for vecino, nueva_distancia in zip(nodos, nuevas_distancias):
+                    if con_predecesores:
+                        predecesores[vecino] = salto
+                    heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+            # Arcos de corte del nivel inferior exacto: los de nivel más alto salen de la celda
+            for arco in range(arcos_desplazamientos[nodo_actual], arcos_desplazamientos[nodo_actual + 1]):
+                vecino = arcos_destinos[arco]
+                if arcos_nivel[arco] == nivel_inferior and celda_superior[vecino] == celda:
+                    nueva_distancia = distancia_actual + arcos_pesos[arco]
+                    if self.mejorar(vecino, nueva_distancia):
+                        if con_predecesores:
+                            predecesores[vecino] = (nodo_actual, False)
+                        heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+        return predecesores
+
+    # Guarda la superposición en una carpeta, un '.npy' por arreglo
+    def guardar(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        arreglos = {
+            'frontera_ids': self.frontera_ids, 'frontera_tile': self.frontera_tile, 'frontera_local': self.frontera_local,
+            'frontera_nivel': self.frontera_nivel, 'arcos_desplazamientos': self.arcos_desplazamientos,
+            'arcos_destinos': self.arcos_destinos, 'arcos_pesos': self.arcos_pesos, 'arcos_nivel': self.arcos_nivel,
+        }
+        for nivel in range(1, self.niveles + 1):
+            arreglos[f'nivel{nivel}_celdas_de_tile'] = self.celdas_de_tile[nivel - 1]
+            arreglos[f'nivel{nivel}_celda_frontera'] = self.celda_frontera[nivel - 1]
+            arreglos[f'nivel{nivel}_miembros_desplazamientos'] = self.miembros_desplazamientos[nivel - 1]
+            arreglos[f'nivel{nivel}_miembros'] = self.miembros[nivel - 1]
+            arreglos[f'nivel{nivel}_matrices_desplazamientos'] = self.matrices_desplazamientos[nivel - 1]
+            arreglos[f'nivel{nivel}_matrices'] = self.matrices[nivel - 1]
+        for nombre, arreglo in arreglos.items():
+            np.save(os.path.join(directorio, f'{nombre}.npy'), np.ascontiguousarray(arreglo))
+
+    # Abre una superposición guardada con 'guardar' (arreglos mapeados en memoria)
+    @classmethod
+    def cargar(cls, directorio, niveles):
+        def abrir(nombre):
+            return np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode='r')
+
+        def por_nivel(nombre):
+            return [abrir(f'nivel{nivel}_{nombre}') for nivel in range(1, niveles + 1)]
+
+        return cls(
+            abrir('frontera_ids'), abrir('frontera_tile'), abrir('frontera_local'), abrir('frontera_nivel'),
+            abrir('arcos_desplazamientos'), abrir('arcos_destinos'), abrir('arcos_pesos'), abrir('arcos_nivel'),
+            por_nivel('celdas_de_tile'), por_nivel('celda_frontera'), por_nivel('miembros_desplazamientos'), por_nivel('miembros'),
+            por_nivel('matrices_desplazamientos'), por_nivel('matrices'),
+        )
+
+    # Bytes que ocupan los arreglos de la superposición
+    def tamano_bytes(self):
+        arreglos = [self.frontera_ids, self.frontera_tile, self.frontera_local, self.frontera_nivel,
+                    self.arcos_desplazamientos, self.arcos_destinos, self.arcos_pesos, self.arcos_nivel]
+        for grupo in (self.celdas_de_tile, self.celda_frontera, self.miembros_desplazamientos, self.miembros,
+                      self.matrices_desplazamientos, self.matrices):
+            arreglos.extend(grupo)
+        return sum(arreglo.nbytes for arreglo in arreglos)
+
+
+# Un grafo partido en tiles abierto desde disco: la superposición se abre completa (es chica) y los tiles solo cuando se necesitan
+class GrafoParticionado:
+    def __init__(self, directorio, maximo_tiles_abiertos=MAXIMO_TILES_ABIERTOS_POR_DEFECTO):
+        try:
+            with open(os.path.join(directorio, ARCHIVO_PARTICION), encoding='utf-8') as archivo:
+                self.descripcion = json.load(archivo)
+        except (OSError, ValueError):
+            raise FileNotFoundError(f"No hay una partición válida en {directorio}") from None
+        if self.descripcion.get('version') != VERSION_PARTICION:
+            raise ValueError(f"La partición de {directorio} es de otra versión del formato")
+        self.directorio = directorio
+        self.grados_tile = self.descripcion['grados_tile']
+        self.atributo_peso = self.descripcion['atributo_peso']
+        self.superposicion = Superposicion.cargar(os.path.join(directorio, CARPETA_SUPERPOSICION), self.descripcion['niveles'])
+        self._celdas_de_tile = [celdas.tolist() for celdas in self.superposicion.celdas_de_tile]
+        # Tabla de IDs de OSM ordenados con el tile y el índice local de cada uno, para ubicar un nodo sin abrir ningún tile
+        self.ids_ordenados = np.load(os.path.join(directorio, 'ids_ordenados.npy'), mmap_mode='r')
+        self.tile_de_id = np.load(os.path.join(directorio, 'tile_de_id.npy'), mmap_mode='r')
+        self.local_de_id = np.load(os.path.join(directorio, 'local_de_id.npy'), mmap_mode='r')
+        self.numero_tile = {(tile['fila'], tile['columna']): numero for numero, tile in enumerate(self.descripcion['tiles'])}
+        self.maximo_tiles_abiertos = maximo_tiles_abiertos
+        # Tiles abiertos: número de tile -> (grafo del tile, frontera de cada nodo como lista, número de nodos propios)
+        self._tiles = OrderedDict()
+        self._indices_espaciales = {}
+        self.contadores = {'consultas': 0, 'tiles_abiertos': 0, 'tiles_cerrados': 0}
+
+    @property
+    def numero_nodos(self):
+        return self.descripcion['numero_nodos']
+
+    def _directorio_tile(self, numero_tile):
+        tile = self.descripcion['tiles'][numero_tile]
+        return os.path.join(self.directorio, CARPETA_TILES, f"{tile['fila']}_{tile['columna']}")
+
+    # Devuelve (grafo del tile, frontera de cada nodo, número de nodos propios), abriendo el tile si hace falta
+    def tile(self, numero_tile):
+        abierto = self._tiles.get(numero_tile)
+        if abierto is not None:
+            self._tiles.move_to_end(numero_tile)
+            return abierto
+        directorio_tile = self._directorio_tile(numero_tile)
+        grafo_tile = cargar_instantanea(directorio_tile)
+        abierto = (grafo_tile, np.load(os.path.join(directorio_tile, ARCHIVO_FRONTERA_TILE)).tolist(),
+                   grafo_tile.metadatos['numero_nodos_propios'])
+        # Los IDs como lista, la búsqueda los lee uno por uno
+        grafo_tile.ids_lista = grafo_tile.ids_nodos.tolist()
+        self._tiles[numero_tile] = abierto
+        self.contadores['tiles_abiertos'] += 1
+        while len(self._tiles) > self.maximo_tiles_abiertos:
+            numero_cerrado, _ = self._tiles.popitem(last=False)
+            self._indices_espaciales.pop(numero_cerrado, None)
+            self.contadores['tiles_cerrados'] += 1
+        return abierto
+
+    # Devuelve (número de tile, índice dentro del tile) del nodo con ID de OSM 'nodo', sin abrir ningún tile
+    def ubicar(self, nodo):
+        posicion = int(np.searchsorted(self.ids_ordenados, nodo))
+        if posicion >= len(self.ids_ordenados) or int(self.ids_ordenados[posicion]) != nodo:
+            raise KeyError(f"El nodo {nodo} no existe en el grafo particionado")
+        return int(self.tile_de_id[posicion]), int(self.local_de_id[posicion])
+
+    # Nodo (ID de OSM) más cercano a un punto: se busca en su tile y, si el punto está más cerca del borde que del nodo, también en los vecinos
+    def nodo_mas_cercano(self, lat, lon):
+        fila, columna = (int(valor[0]) for valor in tiles_de_puntos([lat], [lon], self.grados_tile))
+        mejor_nodo, mejor_distancia = None, float('inf')
+        vecinos = [(fila, columna)] + [(fila + df, columna + dc) for df in (-1, 0, 1) for dc in (-1, 0, 1) if df or dc]
+        for numero_vecino, (fila_tile, columna_tile) in enumerate(vecinos):
+            if numero_vecino == 1:
+                # Distancia del punto al borde de su tile: si el nodo encontrado está más cerca, ningún vecino puede ganarle
+                grados_al_borde = min(lat / self.grados_tile - fila, fila + 1 - lat / self.grados_tile,
+                                      lon / self.grados_tile - columna, columna + 1 - lon / self.grados_tile) * self.grados_tile
+                metros_al_borde = np.radians(grados_al_borde) * RADIO_TIERRA_METROS * min(1.0, np.cos(np.radians(lat)))
+                if mejor_distancia <= metros_al_borde:
+                    break
+            numero_tile = self.numero_tile.get((fila_tile, columna_tile))
+            if numero_tile is None:
+                continue
+            indice = self._indices_espaciales.get(numero_tile)
+            if indice is None:
+                indice = self._indices_espaciales[numero_tile] = obtener_indice_espacial(self.tile(numero_tile)[0])
+            nodos, distancias = indice.nodos_mas_cercanos(lat, lon)
+            if distancias[0] < mejor_distancia:
+                mejor_nodo, mejor_distancia = int(nodos[0]), float(distancias[0])
+        if mejor_nodo is None:
+            raise ValueError(f"El punto ({lat}, {lon}) está fuera de la cobertura de la partición")
+        return mejor_nodo
+
+    # Ruta más rápida entre dos nodos (IDs de OSM) abriendo solo los tiles del origen, del destino y los de la ruta
+    # Devuelve un 'ResultadoBusqueda' con la estrategia 'particionada'
+    def buscar_ruta(self, nodo_origen, nodo_destino):
+        self.contadores['consultas'] += 1
+        tile_origen, local_origen = self.ubicar(nodo_origen)
+        tile_destino, local_destino = self.ubicar(nodo_destino)
+        superposicion = self.superposicion
+        (frontera_ids, frontera_tile, frontera_local, arcos_desplazamientos, arcos_destinos, arcos_pesos, arcos_nivel,
+         niveles) = superposicion.listas()
+        celdas_de_tile = self._celdas_de_tile
+        numero_frontera = len(frontera_ids)
+
+        # Nivel de consulta de cada tile: 0 para los tiles del origen y del destino; si no, el nivel más alto cuya celda no contiene a ninguno
+        nivel_de_tile = {}
+
+        def nivel_consulta(numero_tile):
+            nivel = nivel_de_tile.get(numero_tile)
+            if nivel is None:
+                nivel = 0
+                for celdas in celdas_de_tile:
+                    if celdas[numero_tile] in (celdas[tile_origen], celdas[tile_destino]):
+                        break
+                    nivel += 1
+                nivel_de_tile[numero_tile] = nivel
+            return nivel
+
+        # Claves de la búsqueda: los nodos frontera usan su índice en la superposición y su distancia vive en la memoria de la superposición;
+        # los demás nodos (solo se alcanzan dentro de los tiles del origen y del destino) usan numero_frontera + base del tile + índice local
+        base_de_tile = {tile_origen: numero_frontera}
+        if tile_destino != tile_origen:
+            base_de_tile[tile_destino] = numero_frontera + self.tile(tile_origen)[2]
+
+        def clave_de(numero_tile, local):
+            frontera = self.tile(numero_tile)[1][local]
+            return frontera if frontera >= 0 else base_de_tile[numero_tile] + local
+
+        def ubicacion_de(clave):
+            if clave < numero_frontera:
+                return frontera_tile[clave], frontera_local[clave]
+            numero_tile = tile_destino if tile_destino in base_de_tile and clave >= base_de_tile[tile_destino] else tile_origen
+            return numero_tile, clave - base_de_tile[numero_tile]
+
+        clave_origen = clave_de(tile_origen, local_origen)
+        clave_destino = clave_de(tile_destino, local_destino)
+        distancias_locales = {}
+        superposicion.nueva_busqueda()
+        cerrados_locales = set()
+
+        def mejorar(clave, nueva_distancia, por_salto=False):
+            if clave < numero_frontera:
+                return superposicion.mejorar(clave, nueva_distancia, por_salto)
+            if nueva_distancia < distancias_locales.get(clave, float('inf')):
+                distancias_locales[clave] = nueva_distancia
+                return True
+            return False
+
+        mejorar(clave_origen, 0.0)
+        # Predecesor de cada clave: (clave anterior, nivel del salto de celda con el que se llegó, 0 si fue por una calle)
+        predecesores = {clave_origen: (None, 0)}
+        cola_prioridad = [(0.0, clave_origen)]
+        nodos_visitados = 0
+        encontrado = False
+        while cola_prioridad:
+            distancia_actual, clave_actual = heapq.heappop(cola_prioridad)
+            if clave_actual < numero_frontera:
+                if superposicion.cerrar(clave_actual):
+                    continue
+            elif clave_actual in cerrados_locales:
+                continue
+            else:
+                cerrados_locales.add(clave_actual)
+            nodos_visitados += 1
+            if clave_actual == clave_destino:
+                encontrado = True
+                break
+            numero_tile, local = ubicacion_de(clave_actual)
+            nivel = nivel_consulta(numero_tile)
+            if nivel == 0:
+                # En los tiles del origen y del destino se recorren las calles originales (incluidas las que salen a nodos fantasma)
+                grafo_tile, frontera_tile_nodos, _ = self.tile(numero_tile)
+                desplazamientos, destinos, pesos = grafo_tile.listas()
+                base = base_de_tile[numero_tile]
+                for posicion in range(desplazamientos[local], desplazamientos[local + 1]):
+                    vecino_local = destinos[posicion]
+                    frontera_vecino = frontera_tile_nodos[vecino_local]
+                    vecino = frontera_vecino if frontera_vecino >= 0 else base + vecino_local
+                    nueva_distancia = distancia_actual + pesos[posicion]
+                    if mejorar(vecino, nueva_distancia):
+                        predecesores[vecino] = (clave_actual, 0)
+                        heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+                continue
+            # En los demás tiles se salta por la celda de su nivel de consulta (salvo si se llegó con un salto de esa misma celda)
+            # y se siguen los arcos de corte que salen de ella
+            if not superposicion.llego_por_salto(clave_actual):
+                celda_nivel, posicion_nivel, miembros_nivel, matrices_nivel = niveles[nivel - 1]
+                celda = celda_nivel[clave_actual]
+                nodos, nuevas_distancias = superposicion.relajar_fila(distancia_actual, miembros_nivel[celda],
+                                                                      matrices_nivel[celda][posicion_nivel[clave_actual]])
+                salto = (clave_actual, nivel)
+                for vecino, nueva_distancia in zip(nodos, nuevas_distancias):
+                    predecesores[vecino] = salto
+                    heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+            for arco in range(arcos_desplazamientos[clave_actual], arcos_desplazamientos[clave_actual + 1]):
+                if arcos_nivel[arco] >= nivel:
+                    vecino = arcos_destinos[arco]
+                    nueva_distancia = distancia_actual + arcos_pesos[arco]
+                    if superposicion.mejorar(vecino, nueva_distancia):
+                        predecesores[vecino] = (clave_actual, 0)
+                        heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+
+        if not encontrado:
+            return ResultadoBusqueda(None, float('inf'), nodos_visitados, 'particionada')
+
+        # Reconstruimos los saltos del destino al origen y desempacamos cada salto de celda en calles
+        saltos = []
+        clave_camino_actual = clave_destino
+        while predecesores[clave_camino_actual][0] is not None:
+            anterior, nivel_salto = predecesores[clave_camino_actual]
+            saltos.append((anterior, clave_camino_actual, nivel_salto))
+            clave_camino_actual = anterior
+        camino = [nodo_origen]
+        for anterior, siguiente, nivel_salto in reversed(saltos):
+            if nivel_salto:
+                camino.extend(self._desempacar(nivel_salto, anterior, siguiente))
+            elif siguiente < numero_frontera:
+                camino.append(frontera_ids[siguiente])
+            else:
+                numero_tile, local = ubicacion_de(siguiente)
+                camino.append(self.tile(numero_tile)[0].ids_lista[local])
+        _, tiempo_total = self.resumen_ruta(camino)
+        return ResultadoBusqueda(camino, tiempo_total, nodos_visitados, 'particionada')
+
+    # Convierte un salto de nivel 'nivel' entre los nodos frontera 'origen' y 'destino' en la lista de IDs de OSM que sigue a 'origen'
+    def _desempacar(self, nivel, origen, destino):
+        frontera_ids, frontera_tile, frontera_local = self.superposicion.listas()[:3]
+        if nivel == 1:
+            # Un salto de nivel 1 no sale de su tile: Dijkstra sobre las calles del tile
+            grafo_tile = self.tile(frontera_tile[origen])[0]
+            _, camino_local, _ = dijkstra_indices(grafo_tile, frontera_local[origen], frontera_local[destino])
+            return grafo_tile.nodos_de_indices(camino_local[1:])
+        predecesores = self.superposicion.buscar_en_celda(nivel, origen, destino)
+        saltos = []
+        nodo_camino_actual = destino
+        while nodo_camino_actual != origen:
+            anterior, es_salto = predecesores[nodo_camino_actual]
+            saltos.append((anterior, nodo_camino_actual, es_salto))
+            nodo_camino_actual = anterior
+        camino = []
+        for anterior, siguiente, es_salto in reversed(saltos):
+            if es_salto:
+                camino.extend(self._desempacar(nivel - 1, anterior, siguiente))
+            else:
+                camino.append(frontera_ids[siguiente])
+        return camino
+
+    # Suma la distancia (metros) y el tiempo (segundos) de una ruta dada como lista de IDs de OSM, igual que 'GrafoCompilado.resumen_ruta'
+    # Cada calle se busca en el tile de su nodo de inicio (las que cruzan a otro tile llegan a un nodo fantasma)
+    def resumen_ruta(self, ruta):
+        distancia_total_metros = 0.0
+        tiempo_total_segundos = 0.0
+        for nodo_u, nodo_v in zip(ruta[:-1], ruta[1:]):
+            numero_tile, local = self.ubicar(nodo_u)
+            grafo_tile = self.tile(numero_tile)[0]
+            inicio, fin = grafo_tile.desplazamientos[local], grafo_tile.desplazamientos[local + 1]
+            posiciones = inicio + np.nonzero(grafo_tile.ids_nodos[grafo_tile.destinos[inicio:fin]] == nodo_v)[0]
+            if len(posiciones) == 0:
+                raise KeyError(f"No hay una calle de {nodo_u} a {nodo_v} en el grafo particionado")
+            distancia_total_metros += float(grafo_tile.longitudes[posiciones[0]])
+            tiempo_total_segundos += float(grafo_tile.pesos[posiciones[0]])
+        return distancia_total_metros, tiempo_total_segundos
+
+    # Memoria de la partición: bytes de la superposición, de los tiles abiertos y de todos los tiles en disco
+    def memoria(self):
+        return {
+            'bytes_superposicion': self.superposicion.tamano_bytes(),
+            'tiles_abiertos': len(self._tiles),
+            'bytes_tiles_abiertos': sum(grafo_tile.tamano_bytes() for grafo_tile, _, _ in self._tiles.values()),
+            'bytes_todos_los_tiles': sum(tile['bytes'] for tile in self.descripcion['tiles']),
+        }
+
+
+# Informe de la partición: una fila por tile con sus nodos, aristas, nodos frontera y memoria, y el acumulado a medida que se agregan tiles
+def informe_particion(grafo_particionado):
+    descripcion = grafo_particionado.descripcion
+    filas = []
+    nodos_acumulados = 0
+    bytes_acumulados = 0
+    for tile in sorted(descripcion['tiles'], key=lambda tile: (tile['fila'], tile['columna'])):
+        nodos_acumulados += tile['numero_nodos']
+        bytes_acumulados += tile['bytes']
+        filas.append(dict(tile, nodos_acumulados=nodos_acumulados, bytes_acumulados=bytes_acumulados))
+    return {
+        'numero_tiles': len(filas),
+        'numero_nodos': descripcion['numero_nodos'],
+        'numero_frontera': descripcion['numero_frontera'],
+        'celdas_por_nivel': descripcion['celdas_por_nivel'],
+        'frontera_por_nivel': descripcion['frontera_por_nivel'],
+        'bytes_superposicion': descripcion['bytes_superposicion'],
+        'bytes_tile_mayor': max(tile['bytes'] for tile in filas),
+        'segundos_preprocesamiento': descripcion['segundos_preprocesamiento'],
+        'tiles': filas,
+    }
+
+
+# Mide consultas entre pares de nodos al azar, agrupadas por cuántos tiles hay en línea recta entre origen y destino (la cobertura que
+# cruza la consulta): milisegundos, tiles abiertos y memoria de los tiles abiertos al terminar cada consulta
+# Con 'grafo_completo' (el grafo sin partir) también se compara el tiempo de viaje contra Dijkstra sobre todo el grafo
+def medir_particion(grafo_particionado, numero_pares=PARES_MEDICION_POR_DEFECTO, semilla=0, grafo_completo=None):
+    generador = np.random.default_rng(semilla)
+    posiciones = generador.integers(0, len(grafo_particionado.ids_ordenados), size=(numero_pares, 2))
+    tiles = grafo_particionado.descripcion['tiles']
+    grupos = {}
+    diferencias = 0
+    for posicion_origen, posicion_destino in posiciones.tolist():
+        nodo_origen = int(grafo_particionado.ids_ordenados[posicion_origen])
+        nodo_destino = int(grafo_particionado.ids_ordenados[posicion_destino])
+        tile_origen = tiles[int(grafo_particionado.tile_de_id[posicion_origen])]
+        tile_destino = tiles[int(grafo_particionado.tile_de_id[posicion_destino])]
+        separacion = max(abs(tile_origen['fila'] - tile_destino['fila']), abs(tile_origen['columna'] - tile_destino['columna']))
+        abiertos_antes = grafo_particionado.contadores['tiles_abiertos']
+        inicio = time.perf_counter()
+        resultado_busqueda = grafo_particionado.buscar_ruta(nodo_origen, nodo_destino)
+        milisegundos = (time.perf_counter() - inicio) * 1000.0
+        grupo = grupos.setdefault(separacion, {'consultas': 0, 'milisegundos': [], 'tiles_abiertos': [], 'bytes_tiles_abiertos': []})
+        grupo['consultas'] += 1
+        grupo['milisegundos'].append(milisegundos)
+        grupo['tiles_abiertos'].append(grafo_particionado.contadores['tiles_abiertos'] - abiertos_antes)
+        grupo['bytes_tiles_abiertos'].append(grafo_particionado.memoria()['bytes_tiles_abiertos'])
+        if grafo_completo is not None:
+            _, camino_indices, _ = dijkstra_indices(grafo_completo, grafo_completo.indice(nodo_origen), grafo_completo.indice(nodo_destino))
+            tiempo_completo = float('inf') if camino_indices is None else \
+                grafo_completo.resumen_ruta(grafo_completo.nodos_de_indices(camino_indices))[1]
+            if not np.isclose(tiempo_completo, resultado_busqueda.tiempo_total, rtol=1e-9, atol=1e-6) and \
+                    not (np.isinf(tiempo_completo) and np.isinf(resultado_busqueda.tiempo_total)):
+                diferencias += 1
+    informe = {
+        'pares': numero_pares,
+        'por_separacion_en_tiles': {
+            separacion: {
+                'consultas': grupo['consultas'],
+                'milisegundos_mediana': float(np.median(grupo['milisegundos'])),
+                'milisegundos_p95': float(np.percentile(grupo['milisegundos'], 95)),
+                'tiles_abiertos_promedio': float(np.mean(grupo['tiles_abiertos'])),
+                'bytes_tiles_abiertos_maximo': int(max(grupo['bytes_tiles_abiertos'])),
+            }
+            for separacion, grupo in sorted(grupos.items())
+        },
+        'memoria': grafo_particionado.memoria(),
+        'memoria_maxima_proceso_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+    if grafo_completo is not None:
+        informe['diferencias_con_grafo_completo'] = diferencias
+        informe['bytes_grafo_completo'] = grafo_completo.tamano_bytes()
+    return informe
+
+
+if __name__ == "__main__":
+    analizador = argparse.ArgumentParser(description='Grafo partido en tiles con superposición de varios niveles')
+    subcomandos = analizador.add_subparsers(dest='subcomando', required=True)
+    comando_construir = subcomandos.add_parser('construir', help='parte un grafo en tiles y precalcula la superposición')
+    comando_construir.add_argument('archivos', nargs='*', help='respuestas JSON de Overpass (ver carga_overpass.py)')
+    comando_construir.add_argument('--instantanea', help='carpeta de una instantánea del grafo a partir')
+    comando_construir.add_argument('--salida', required=True, help='carpeta donde se guarda la partición')
+    comando_construir.add_argument('--grados-tile', type=float, default=GRADOS_TILE_POR_DEFECTO)
+    comando_construir.add_argument('--niveles', type=int, default=NIVELES_POR_DEFECTO)
+    comando_construir.add_argument('--procesos', type=int, default=None, help='procesos trabajadores (por defecto uno por procesador)')
+    comando_ruta = subcomandos.add_parser('ruta', help='una ruta entre dos puntos sobre la partición')
+    comando_ruta.add_argument('particion')
+    for nombre in ('lat_origen', 'lon_origen', 'lat_destino', 'lon_destino'):
+        comando_ruta.add_argument(nombre, type=float)
+    comando_informe = subcomandos.add_parser('informe', help='memoria por tile y tamaño de la superposición')
+    comando_informe.add_argument('particion')
+    comando_medir = subcomandos.add_parser('medir', help='tiempo por consulta y memoria según cuántos tiles cruza la consulta')
+    comando_medir.add_argument('particion')
+    comando_medir.add_argument('--pares', type=int, default=PARES_MEDICION_POR_DEFECTO)
+    comando_medir.add_argument('--semilla', type=int, default=0)
+    comando_medir.add_argument('--maximo-tiles', type=int, default=MAXIMO_TILES_ABIERTOS_POR_DEFECTO)
+    comando_medir.add_argument('--instantanea', help='instantánea del grafo sin partir, para comparar los tiempos de viaje')
+    argumentos = analizador.parse_args()
+
+    if argumentos.subcomando == 'construir':
+        if argumentos.archivos:
+            # Importamos aquí el cargador de Overpass, así los demás subcomandos no lo cargan
+            from carga_overpass import compilar_desde_overpass
+            from script_principal import cargar_script_principal
+            principal = cargar_script_principal()
+            grafo = compilar_desde_overpass(argumentos.archivos, principal.VELOCIDADES_POR_TIPO_KMH, principal.VELOCIDAD_POR_DEFECTO_KMH)
+            highway = grafo.valores_highway
+        else:
+            directorio = argumentos.instantanea
+            if directorio is None:
+                from script_principal import cargar_script_principal
+                directorio = cargar_script_principal().cargar_grafo_enrutamiento().directorio_instantanea
+            if leer_metadatos(directorio) is None:
+                analizador.error(f'no hay una instantánea válida en {directorio}')
+            grafo = cargar_instantanea(directorio)
+            highway = leer_valores_highway(directorio)
+        descripcion_particion = particionar_grafo(grafo, argumentos.salida, argumentos.grados_tile, argumentos.niveles, highway,
+                                                  argumentos.procesos)
+        print(f"{len(descripcion_particion['tiles'])} tiles, {descripcion_particion['numero_frontera']} nodos frontera, "
+              f"superposición de {descripcion_particion['bytes_superposicion'] / 1e6:.1f} MB, "
+              f"guardada en {argumentos.salida} en {descripcion_particion['segundos_preprocesamiento']:.1f} s")
+    elif argumentos.subcomando == 'ruta':
+        particionado = GrafoParticionado(argumentos.particion)
+        nodo_inicio = particionado.nodo_mas_cercano(argumentos.lat_origen, argumentos.lon_origen)
+        nodo_fin = particionado.nodo_mas_cercano(argumentos.lat_destino, argumentos.lon_destino)
+        inicio_consulta = time.perf_counter()
+        resultado = particionado.buscar_ruta(nodo_inicio, nodo_fin)
+        respuesta = {'nodo_origen': nodo_inicio, 'nodo_destino': nodo_fin, 'encontrada': resultado.camino is not None,
+                     'nodos_visitados': resultado.nodos_visitados,
+                     'milisegundos': (time.perf_counter() - inicio_consulta) * 1000.0}
+        if resultado.camino is not None:
+            metros, segundos = particionado.resumen_ruta(resultado.camino)
+            respuesta.update({'ruta': resultado.camino, 'distancia_metros': metros, 'tiempo_segundos': segundos})
+        respuesta['memoria'] = particionado.memoria()
+        print(json.dumps(respuesta, ensure_ascii=False))
+    elif argumentos.subcomando == 'informe':
+        print(json.dumps(informe_particion(GrafoParticionado(argumentos.particion)), ensure_ascii=False, indent=2))
+    else:
+        completo = cargar_instantanea(argumentos.instantanea) if argumentos.instantanea else None
+        print(json.dumps(medir_particion(GrafoParticionado(argumentos.particion, argumentos.maximo_tiles), argumentos.pares,
+                                         argumentos.semilla, completo), ensure_ascii=False, indent=2))
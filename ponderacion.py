@@ -0,0 +1,155 @@
+# En este archivo calculamos los pesos (velocidad y tiempo de viaje) de todas las aristas de una sola vez con NumPy.
+# El cálculo original recorría arista por arista en Python y volvía a interpretar el texto de 'maxspeed' cada vez,
+# aunque en un mapa real solo hay unos cuantos valores distintos ('40', '60 km/h', ['30', '50'], ...) repetidos miles de veces.
+# Aquí cada valor distinto se interpreta UNA sola vez (con caché) y después los tiempos se calculan para todas las aristas en un solo paso.
+# También se puede dar una velocidad por defecto distinta para cada tipo de calle ('highway'), en lugar de una sola para todo el mapa.
+
+# Importamos 'functools' para guardar en caché la interpretación de cada valor distinto de 'maxspeed'
+import functools
+
+# Importamos numpy con el alias 'np' para el cálculo vectorizado
+import numpy as np
+
+# Importamos la construcción del grafo compilado a partir de arreglos de aristas
+from grafo_compilado import anotar_aristas_compiladas, compilar_desde_aristas
+
+# Mismas constantes que usa el script principal
+VELOCIDAD_POR_DEFECTO_KMH = 20.0
+FACTOR_CONVERSION_MS = 3.6
+
+
+# Convierte un valor de 'maxspeed' o 'highway' a algo que se pueda usar como llave de diccionario (las listas no se pueden)
+def _hacer_llave(valor):
+    if isinstance(valor, list):
+        return tuple(valor)
+    return valor
+
+
+# Interpreta un valor de 'maxspeed' (ya convertido con '_hacer_llave') y devuelve la velocidad en km/h, o 'None' si no se entiende
+# Sigue exactamente las mismas reglas que el cálculo original:
+#   - una lista ['40', '50'] se convierte en el promedio de los valores que empiezan con un número
+#   - un texto '60 km/h' se convierte en el número del inicio
+@functools.lru_cache(maxsize=None)
+def interpretar_velocidad_maxima(valor):
+    try:
+        if isinstance(valor, tuple):
+            lista_valores_velocidad = [float(val.split()[0]) for val in valor if val.split()[0].isdigit()]
+            if lista_valores_velocidad:
+                return sum(lista_valores_velocidad) / len(lista_valores_velocidad)
+        elif isinstance(valor, str):
+            partes_velocidad = valor.split()
+            if partes_velocidad[0].isdigit():
+                return float(partes_velocidad[0])
+    except Exception:
+        # Si algo falla, la calle se queda con la velocidad por defecto
+        return None
+    return None
+
+
+# Devuelve la velocidad por defecto de una calle según su 'highway', si es una lista usamos el primer tipo que tenga velocidad configurada
+def velocidad_por_tipo(highway, velocidades_por_tipo, velocidad_por_defecto_kmh):
+    tipos = highway if isinstance(highway, tuple) else (highway,)
+    for tipo in tipos:
+        if tipo in velocidades_por_tipo:
+            return float(velocidades_por_tipo[tipo])
+    return velocidad_por_defecto_kmh
+
+
+# Calcula la velocidad (km/h) de cada arista a partir de sus valores de 'maxspeed' y 'highway' (None si la arista no lo tiene)
+# Cada combinación distinta de (maxspeed, highway) se resuelve una sola vez y después se reparte a todas las aristas con NumPy
+def calcular_velocidades(valores_velocidad_maxima, valores_highway, velocidades_por_tipo=None,
+                         velocidad_por_defecto_kmh=VELOCIDAD_POR_DEFECTO_KMH):
+    velocidades_por_tipo = velocidades_por_tipo or {}
+    # Asignamos un código entero a cada combinación distinta, 'codigos[i]' es el código de la arista i
+    codigo_de_combinacion = {}
+    codigos = np.empty(len(valores_velocidad_maxima), dtype=np.int64)
+    for posicion, combinacion in enumerate(zip(map(_hacer_llave, valores_velocidad_maxima), map(_hacer_llave, valores_highway))):
+        codigos[posicion] = codigo_de_combinacion.setdefault(combinacion, len(codigo_de_combinacion))
+
+    # Resolvemos la velocidad de cada combinación distinta
+    tabla_velocidades = np.empty(len(codigo_de_combinacion), dtype=np.float64)
+    for (velocidad_maxima, highway), codigo in codigo_de_combinacion.items():
+        velocidad = interpretar_velocidad_maxima(velocidad_maxima) if velocidad_maxima is not None else None
+        if velocidad is None:
+            velocidad = velocidad_por_tipo(highway, velocidades_por_tipo, velocidad_por_defecto_kmh)
+        tabla_velocidades[codigo] = velocidad
+    return tabla_velocidades[codigos]
+
+
+# Calcula el tiempo de viaje (segundos) de cada arista: Tiempo = Distancia / Velocidad, con tiempo "infinito" si la velocidad es 0
+def calcular_tiempos(longitudes_metros, velocidades_kmh):
+    velocidades_ms = np.asarray(velocidades_kmh, dtype=np.float64) / FACTOR_CONVERSION_MS
+    with np.errstate(divide='ignore'):
+        return np.where(velocidades_ms > 0, np.asarray(longitudes_metros, dtype=np.float64) / velocidades_ms, np.inf)
+
+
+# Saca de un grafo de NetworkX los datos que necesitamos de cada arista, en una sola pasada
+def extraer_aristas(grafo):
+    ids_nodos = list(grafo.nodes())
+    indice_de_nodo = {nodo: indice for indice, nodo in enumerate(ids_nodos)}
+    origenes, destinos, claves, longitudes, valores_velocidad_maxima, valores_highway = [], [], [], [], [], []
+    for nodo_u, nodo_v, clave_arista, datos_arista in grafo.edges(keys=True, data=True):
+        origenes.append(indice_de_nodo[nodo_u])
+        destinos.append(indice_de_nodo[nodo_v])
+        claves.append(clave_arista)
+        longitudes.append(datos_arista['length'])
+        valores_velocidad_maxima.append(datos_arista.get('maxspeed'))
+        valores_highway.append(datos_arista.get('highway'))
+    return {
+        'ids_nodos': ids_nodos,
+        'origenes': np.array(origenes, dtype=np.int64),
+        'destinos': np.array(destinos, dtype=np.int64),
+        'claves': np.array(claves, dtype=np.int64),
+        'longitudes': np.array(longitudes, dtype=np.float64),
+        'velocidad_maxima': valores_velocidad_maxima,
+        'highway': valores_highway,
+    }
+
+
+# Calcula velocidades y tiempos de todas las aristas de un grafo de NetworkX y los escribe en sus atributos 'velocidad_kmh' y 'tiempo_viaje_segundos'
+# Sirve para el flujo que todavía usa el grafo de NetworkX ('dijkstra_iterativo' y el mapa de OSMnx)
+def ponderar_grafo(grafo, velocidades_por_tipo=None, velocidad_por_defecto_kmh=VELOCIDAD_POR_DEFECTO_KMH):
+    aristas = extraer_aristas(grafo)
+    velocidades_kmh = calcular_velocidades(aristas['velocidad_maxima'], aristas['highway'], velocidades_por_tipo, velocidad_por_defecto_kmh)
+    tiempos_segundos = calcular_tiempos(aristas['longitudes'], velocidades_kmh)
+    # Escribimos directo en el diccionario de datos de cada arista, en el mismo orden en que las extrajimos
+    for (_, _, datos_arista), velocidad, tiempo in zip(grafo.edges(data=True), velocidades_kmh.tolist(), tiempos_segundos.tolist()):
+        datos_arista['velocidad_kmh'] = velocidad
+        datos_arista['tiempo_viaje_segundos'] = tiempo
+    return velocidades_kmh, tiempos_segundos
+
+
+# Construye directamente el grafo compilado con los tiempos de viaje, sin escribir nada en el grafo de NetworkX
+# Como 'compilar_desde_overpass', deja en el grafo 'valores_highway' y 'aristas_paralelas' para guardarlos con la instantánea
+def compilar_grafo_ponderado(grafo, velocidades_por_tipo=None, velocidad_por_defecto_kmh=VELOCIDAD_POR_DEFECTO_KMH,
+                             atributo_peso='tiempo_viaje_segundos'):
+    aristas = extraer_aristas(grafo)
+    velocidades_kmh = calcular_velocidades(aristas['velocidad_maxima'], aristas['highway'], velocidades_por_tipo, velocidad_por_defecto_kmh)
+    tiempos_segundos = calcular_tiempos(aristas['longitudes'], velocidades_kmh)
+    datos_nodos = [grafo.nodes[nodo] for nodo in aristas['ids_nodos']]
+    grafo_compilado = compilar_desde_aristas(
+        aristas['ids_nodos'],
+        [datos.get('x', np.nan) for datos in datos_nodos],
+        [datos.get('y', np.nan) for datos in datos_nodos],
+        aristas['origenes'], aristas['destinos'], tiempos_segundos, aristas['longitudes'], aristas['claves'],
+        atributo_peso,
+        velocidades_kmh,
+        [datos.get('lat', np.nan) for datos in datos_nodos],
+        [datos.get('lon', np.nan) for datos in datos_nodos],
+    )
+    return anotar_aristas_compiladas(grafo_compilado, aristas['origenes'], aristas['destinos'], aristas['claves'], tiempos_segundos,
+                                     aristas['highway'])
+
+
+# Vuelve a calcular los pesos de un grafo compilado ya existente con otros parámetros de velocidad
+# 'valores_velocidad_maxima' y 'valores_highway' deben venir en el mismo orden que las aristas del grafo compilado
+# La arista paralela que se eligió al compilar no cambia, si eso importa hay que compilar otra vez con 'compilar_grafo_ponderado'
+# Los arreglos de velocidades y pesos se reemplazan por unos nuevos en lugar de escribir encima: los de una instantánea están mapeados
+# en memoria y son de solo lectura (igual que la copia propia que hace 'actualizar_pesos' del grafo compilado)
+def reponderar_grafo_compilado(grafo_compilado, valores_velocidad_maxima, valores_highway, velocidades_por_tipo=None,
+                               velocidad_por_defecto_kmh=VELOCIDAD_POR_DEFECTO_KMH):
+    velocidades_kmh = calcular_velocidades(valores_velocidad_maxima, valores_highway, velocidades_por_tipo, velocidad_por_defecto_kmh)
+    grafo_compilado.velocidades_kmh = np.asarray(velocidades_kmh, dtype=np.float64)
+    grafo_compilado.pesos = calcular_tiempos(grafo_compilado.longitudes, velocidades_kmh)
+    grafo_compilado.pesos_modificados()
+    return grafo_compilado
@@ -0,0 +1,305 @@
+# En este archivo dibujamos las rutas sobre el mapa sin volver a dibujar toda la ciudad cada vez.
+# 'ox.plot_graph_route' dibuja todas las calles del grafo (miles de segmentos) para cada ruta, aunque el mapa de fondo siempre es el mismo.
+# Aquí el fondo (las calles) se rasteriza UNA sola vez por grafo y vista, se guarda en memoria y como PNG en disco,
+# y para cada ruta solo se dibujan encima la línea de la ruta, los marcadores de origen y destino, el título y el cuadro de resumen.
+#
+# El dibujo se hace con el mismo estilo que usaba 'ejecutar_analisis_ruta' (fondo negro, calles grises, ruta cian).
+# El grafo compilado no guarda la geometría curva de las calles: si se tiene el grafo de NetworkX proyectado (como en
+# 'ejecutar_analisis_ruta' con 'dijkstra_iterativo') se le pasa 'geometrias_aristas' al renderizador y las calles y la ruta siguen
+# las curvas igual que 'ox.plot_graph_route'; con solo la instantánea se dibujan como segmentos rectos entre nodos.
+# Todo funciona sin pantalla: 'renderizar' y 'renderizar_lote' devuelven los bytes de la imagen en PNG o SVG.
+# matplotlib se importa dentro de las funciones que dibujan, igual que en el script principal.
+#
+# Uso típico:
+#   renderizador = RenderizadorMapa(grafo_compilado)
+#   imagen_png = renderizador.renderizar(ruta, texto=texto_resumen(distancia_metros, tiempo_segundos))
+
+# Importamos 'hashlib' para la llave de la caché del mapa base
+import hashlib
+# Importamos 'io' para guardar las imágenes en memoria y devolver sus bytes
+import io
+# Importamos 'os' para la carpeta de la caché en disco
+import os
+# Importamos 'OrderedDict' para la caché en memoria de mapas base (la menos usada se tira primero)
+from collections import OrderedDict
+
+# Importamos numpy con el alias 'np' para los arreglos de coordenadas y de píxeles
+import numpy as np
+
+# Versión del dibujo del mapa base, si cambia la forma de dibujarlo se sube este número y los PNG viejos se ignoran
+VERSION_MAPA_BASE = 1
+
+# Carpeta de los PNG de mapas base cuando el grafo no viene de una instantánea
+DIRECTORIO_MAPAS_BASE = 'mapas_base'
+
+# Mapas base que se guardan en memoria a la vez
+MAXIMO_MAPAS_EN_MEMORIA = 8
+
+# Estilo del mapa, el mismo que se le pasaba a 'ox.plot_graph_route'
+ESTILO_POR_DEFECTO = {
+    'color_fondo': 'k',
+    'color_calles': '#999999',
+    'grosor_calles': 0.5,
+    'color_ruta': 'cyan',
+    'grosor_ruta': 3,
+    'opacidad_ruta': 0.8,
+    'tamano_origen_destino': 100,
+}
+
+# Margen alrededor del grafo (fracción de su ancho y alto), igual que el 'padding' de OSMnx
+MARGEN_VISTA = 0.02
+
+# Fracción de la altura de la figura que se deja arriba para el título
+FRACCION_TITULO = 0.05
+
+# Título que usa el script principal
+TITULO_POR_DEFECTO = "Ruta Óptima de Oaxaca (Dijkstra por Tiempo)"
+
+# Mapas base en memoria: llave -> arreglo RGBA de píxeles
+_mapas_en_memoria = OrderedDict()
+
+
+# Geometría de las calles del grafo de NetworkX proyectado para el grafo compilado que salió de él:
+# devuelve un diccionario (ID de u, ID de v) -> arreglo de puntos (x, y) de u a v, solo para las calles que traen 'geometry'
+# De las aristas paralelas se usa la que eligió el grafo compilado (su clave), que es la que siguen las rutas
+def geometrias_aristas(grafo, grafo_compilado):
+    ids = grafo_compilado.ids_nodos.tolist()
+    claves = grafo_compilado.claves.tolist()
+    lista_x, lista_y = grafo_compilado.coordenadas_listas()
+    desplazamientos, destinos, _ = grafo_compilado.listas()
+    geometrias = {}
+    for indice_u in range(grafo_compilado.numero_nodos):
+        for posicion in range(desplazamientos[indice_u], desplazamientos[indice_u + 1]):
+            datos = grafo.get_edge_data(ids[indice_u], ids[destinos[posicion]], claves[posicion])
+            geometria = datos.get('geometry') if datos else None
+            if geometria is None:
+                continue
+            puntos = np.asarray(geometria.coords, dtype=np.float64)[:, :2]
+            # La geometría va de u a v; si viene al revés la volteamos
+            if (np.hypot(*(puntos[0] - (lista_x[indice_u], lista_y[indice_u])))
+                    > np.hypot(*(puntos[-1] - (lista_x[indice_u], lista_y[indice_u])))):
+                puntos = puntos[::-1]
+            geometrias[(ids[indice_u], ids[destinos[posicion]])] = puntos
+    return geometrias
+
+
+# Arma el texto del cuadro de resumen, igual que en 'ejecutar_analisis_ruta'
+def texto_resumen(distancia_total_metros, tiempo_total_segundos):
+    return (
+        f"Distancia Física Total: {distancia_total_metros / 1000:.2f} km\n"
+        f"Tiempo Estimado de Viaje: {tiempo_total_segundos / 60:.2f} min"
+    )
+
+
+# Pone el título y el cuadro de resumen sobre el mapa, con el mismo formato que 'ejecutar_analisis_ruta'
+def anotar_mapa(eje, titulo=TITULO_POR_DEFECTO, texto=None):
+    if titulo:
+        eje.set_title(titulo, fontsize=20, color='white')
+    if texto:
+        eje.text(
+            0.03,
+            0.97,
+            texto,
+            transform=eje.transAxes,
+            fontsize=14,
+            color='black',
+            verticalalignment='top',
+            bbox=dict(boxstyle='round,pad=0.5', fc='white', ec='cyan', lw=1, alpha=0.8),
+        )
+
+
+# Dibuja rutas sobre un mapa base rasterizado que se calcula una sola vez por grafo, vista, tamaño y estilo
+class RenderizadorMapa:
+    # 'vista' es (x_min, y_min, x_max, y_max) en las coordenadas del grafo, si no se da se usa todo el grafo
+    # 'directorio_cache' es donde se guardan los PNG del mapa base; por defecto la carpeta de la instantánea del grafo si la tiene
+    # 'geometrias' es opcional, el diccionario de 'geometrias_aristas'; sin él las calles se dibujan rectas
+    def __init__(self, grafo_compilado, tamano_pulgadas=(15, 15), dpi=100, vista=None, estilo=None, directorio_cache=None,
+                 geometrias=None):
+        self.grafo_compilado = grafo_compilado
+        self.geometrias = geometrias or {}
+        self._huella_geometrias = None
+        self.tamano_pulgadas = tuple(tamano_pulgadas)
+        self.dpi = dpi
+        self.estilo = dict(ESTILO_POR_DEFECTO, **(estilo or {}))
+        # El eje ocupa todo el ancho y deja arriba una franja para el título
+        self.rectangulo_eje = (0.0, 0.0, 1.0, 1.0 - FRACCION_TITULO)
+        self.vista = self._ajustar_vista(vista if vista is not None else self._vista_completa())
+        if directorio_cache is None:
+            directorio_instantanea = getattr(grafo_compilado, 'directorio_instantanea', None)
+            directorio_cache = os.path.join(directorio_instantanea, 'mapas') if directorio_instantanea else DIRECTORIO_MAPAS_BASE
+        self.directorio_cache = directorio_cache
+        self._lista_x, self._lista_y = grafo_compilado.coordenadas_listas()
+
+    # Caja de todo el grafo más el margen
+    def _vista_completa(self):
+        x_min, x_max = float(np.nanmin(self.grafo_compilado.x)), float(np.nanmax(self.grafo_compilado.x))
+        y_min, y_max = float(np.nanmin(self.grafo_compilado.y)), float(np.nanmax(self.grafo_compilado.y))
+        margen_x = (x_max - x_min) * MARGEN_VISTA or 1.0
+        margen_y = (y_max - y_min) * MARGEN_VISTA or 1.0
+        return x_min - margen_x, y_min - margen_y, x_max + margen_x, y_max + margen_y
+
+    # Agranda la vista para que tenga la misma proporción que el eje, así un metro mide lo mismo a lo ancho que a lo alto
+    def _ajustar_vista(self, vista):
+        x_min, y_min, x_max, y_max = (float(valor) for valor in vista)
+        ancho_eje = self.tamano_pulgadas[0] * self.rectangulo_eje[2]
+        alto_eje = self.tamano_pulgadas[1] * self.rectangulo_eje[3]
+        centro_x, centro_y = (x_min + x_max) / 2, (y_min + y_max) / 2
+        ancho, alto = x_max - x_min, y_max - y_min
+        if ancho / alto > ancho_eje / alto_eje:
+            alto = ancho * alto_eje / ancho_eje
+        else:
+            ancho = alto * ancho_eje / alto_eje
+        return centro_x - ancho / 2, centro_y - alto / 2, centro_x + ancho / 2, centro_y + alto / 2
+
+    # Llave del mapa base: cambia si cambia la red de calles, la vista, el tamaño, la resolución o el estilo de las calles
+    def clave_mapa_base(self):
+        huella = hashlib.sha1()
+        for arreglo in (self.grafo_compilado.ids_nodos, self.grafo_compilado.x, self.grafo_compilado.y,
+                        self.grafo_compilado.desplazamientos, self.grafo_compilado.destinos):
+            huella.update(np.ascontiguousarray(arreglo).tobytes())
+        huella.update(repr((
+            VERSION_MAPA_BASE, self.vista, self.tamano_pulgadas, self.rectangulo_eje, self.dpi,
+            self.estilo['color_fondo'], self.estilo['color_calles'], self.estilo['grosor_calles'],
+        )).encode('utf-8'))
+        if self.geometrias:
+            huella.update(self.huella_geometrias())
+        return huella.hexdigest()
+
+    # Huella de las geometrías de las calles, se calcula una sola vez por renderizador
+    def huella_geometrias(self):
+        if self._huella_geometrias is None:
+            huella = hashlib.sha1()
+            for (nodo_u, nodo_v), puntos in sorted(self.geometrias.items(), key=lambda elemento: elemento[0]):
+                huella.update(repr((nodo_u, nodo_v)).encode('utf-8'))
+                huella.update(np.ascontiguousarray(puntos).tobytes())
+            self._huella_geometrias = huella.digest()
+        return self._huella_geometrias
+
+    # Devuelve los píxeles (RGBA) del mapa base: de la memoria, del PNG en disco, o dibujándolo si no existe en ninguno
+    def mapa_base(self):
+        import matplotlib.image
+
+        clave = self.clave_mapa_base()
+        pixeles = _mapas_en_memoria.get(clave)
+        if pixeles is not None:
+            _mapas_en_memoria.move_to_end(clave)
+            return pixeles
+
+        ruta_archivo = os.path.join(self.directorio_cache, f'mapa_base_{clave}.png')
+        if os.path.exists(ruta_archivo):
+            # 'imread' devuelve los PNG con valores entre 0 y 1
+            pixeles = (matplotlib.image.imread(ruta_archivo) * 255).round().astype(np.uint8)
+        else:
+            pixeles = self._dibujar_mapa_base()
+            os.makedirs(self.directorio_cache, exist_ok=True)
+            # Escribimos a un archivo temporal y lo renombramos, así otro proceso nunca lee un PNG a medias
+            ruta_temporal = f'{ruta_archivo}.{os.getpid()}.tmp'
+            matplotlib.image.imsave(ruta_temporal, pixeles, format='png')
+            os.replace(ruta_temporal, ruta_archivo)
+
+        _mapas_en_memoria[clave] = pixeles
+        while len(_mapas_en_memoria) > MAXIMO_MAPAS_EN_MEMORIA:
+            _mapas_en_memoria.popitem(last=False)
+        return pixeles
+
+    # Rasteriza todas las calles del grafo del tamaño exacto del eje, con una sola colección de líneas
+    def _dibujar_mapa_base(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+
+        ancho = self.tamano_pulgadas[0] * self.rectangulo_eje[2]
+        alto = self.tamano_pulgadas[1] * self.rectangulo_eje[3]
+        figura = Figure(figsize=(ancho, alto), dpi=self.dpi, facecolor=self.estilo['color_fondo'])
+        lienzo = FigureCanvasAgg(figura)
+        eje = figura.add_axes((0, 0, 1, 1))
+        self._configurar_eje(eje)
+
+        gc = self.grafo_compilado
+        origenes = np.repeat(np.arange(gc.numero_nodos), np.diff(gc.desplazamientos))
+        destinos = np.asarray(gc.destinos)
+        # Una calle de doble sentido son dos aristas con el mismo segmento, basta con dibujar una
+        unica = (origenes < destinos) | ~_tiene_reversa(origenes, destinos, gc.numero_nodos)
+        segmentos = np.stack([
+            np.column_stack([gc.x[origenes[unica]], gc.y[origenes[unica]]]),
+            np.column_stack([gc.x[destinos[unica]], gc.y[destinos[unica]]]),
+        ], axis=1)
+        if self.geometrias:
+            # Las calles con geometría se dibujan con todos sus puntos, las demás se quedan como segmento recto
+            # (de una calle de doble sentido se dibuja un solo sentido, si ese no trae geometría puede traerla el otro)
+            ids = gc.ids_nodos.tolist()
+            polilineas = []
+            for origen, destino, segmento in zip(origenes[unica].tolist(), destinos[unica].tolist(), segmentos):
+                puntos = self.geometrias.get((ids[origen], ids[destino]))
+                if puntos is None:
+                    puntos = self.geometrias.get((ids[destino], ids[origen]), segmento)
+                polilineas.append(puntos)
+            segmentos = polilineas
+        eje.add_collection(LineCollection(segmentos, colors=self.estilo['color_calles'], linewidths=self.estilo['grosor_calles']))
+        lienzo.draw()
+        return np.asarray(lienzo.buffer_rgba()).copy()
+
+    def _configurar_eje(self, eje):
+        x_min, y_min, x_max, y_max = self.vista
+        eje.set_xlim(x_min, x_max)
+        eje.set_ylim(y_min, y_max)
+        eje.set_facecolor(self.estilo['color_fondo'])
+        eje.axis('off')
+
+    # Crea (o usa) una figura con el mapa base de fondo y la ruta encima, devuelve (figura, eje) como 'ox.plot_graph_route'
+    # Si no se da 'figura' se crea una sin pantalla; el script principal le pasa una de 'plt.figure' para mostrarla en una ventana
+    def figura_ruta(self, ruta, figura=None):
+        from matplotlib.figure import Figure
+
+        if figura is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            figura = Figure(figsize=self.tamano_pulgadas, dpi=self.dpi)
+            FigureCanvasAgg(figura)
+        figura.set_facecolor(self.estilo['color_fondo'])
+        eje = figura.add_axes(self.rectangulo_eje)
+        x_min, y_min, x_max, y_max = self.vista
+        eje.imshow(self.mapa_base(), extent=(x_min, x_max, y_min, y_max), interpolation='nearest', aspect='auto', zorder=0)
+        self._configurar_eje(eje)
+        if ruta:
+            self.dibujar_ruta(eje, ruta)
+        return figura, eje
+
+    # Dibuja solo la ruta y los marcadores de origen y destino, es lo único que cambia de una ruta a otra
+    def dibujar_ruta(self, eje, ruta):
+        indices = [self.grafo_compilado.indice(nodo) for nodo in ruta]
+        x = [self._lista_x[indices[0]]]
+        y = [self._lista_y[indices[0]]]
+        for nodo_u, nodo_v, indice_v in zip(ruta[:-1], ruta[1:], indices[1:]):
+            # Cada calle sigue su geometría si la tiene (sin repetir el primer punto, que es el nodo anterior), si no va recta
+            puntos = self.geometrias.get((nodo_u, nodo_v))
+            if puntos is None:
+                x.append(self._lista_x[indice_v])
+                y.append(self._lista_y[indice_v])
+            else:
+                x.extend(puntos[1:, 0].tolist())
+                y.extend(puntos[1:, 1].tolist())
+        eje.scatter((x[0], x[-1]), (y[0], y[-1]), s=self.estilo['tamano_origen_destino'], c=self.estilo['color_ruta'],
+                    alpha=self.estilo['opacidad_ruta'], edgecolor='none', zorder=3)
+        eje.plot(x, y, c=self.estilo['color_ruta'], lw=self.estilo['grosor_ruta'], alpha=self.estilo['opacidad_ruta'], zorder=2)
+
+    # Dibuja una ruta completa (fondo, ruta, título y resumen) y devuelve los bytes de la imagen en 'formato' ('png' o 'svg')
+    def renderizar(self, ruta, formato='png', titulo=TITULO_POR_DEFECTO, texto=None):
+        figura, eje = self.figura_ruta(ruta)
+        anotar_mapa(eje, titulo, texto)
+        memoria = io.BytesIO()
+        figura.savefig(memoria, format=formato, dpi=self.dpi, facecolor=figura.get_facecolor())
+        return memoria.getvalue()
+
+    # Dibuja muchas rutas seguidas reutilizando el mapa base; 'rutas' es una lista de (ruta, texto del resumen o None)
+    # Es un generador: devuelve los bytes de cada imagen en cuanto está lista
+    def renderizar_lote(self, rutas, formato='png', titulo=TITULO_POR_DEFECTO):
+        self.mapa_base()
+        for ruta, texto in rutas:
+            yield self.renderizar(ruta, formato, titulo, texto)
+
+
+# Indica para cada arista u -> v si también existe la arista v -> u (para no dibujar dos veces las calles de doble sentido)
+def _tiene_reversa(origenes, destinos, numero_nodos):
+    codigos = origenes.astype(np.int64) * numero_nodos + destinos
+    codigos_reversa = destinos.astype(np.int64) * numero_nodos + origenes
+    return np.isin(codigos_reversa, codigos)
@@ -0,0 +1,351 @@
+# En este archivo están las rutas alternativas: además de la ruta más rápida, dos o tres rutas distintas que también tengan sentido.
+# Penalizar las calles y volver a buscar, o correr Yen con una búsqueda completa por cada desviación, multiplica el costo de la consulta.
+# Aquí se hace con "mesetas" (plateaus) sobre solo dos árboles de caminos más cortos:
+#   - Un Dijkstra desde el origen que sigue después de sacar el destino, hasta (1 + estiramiento) veces el tiempo de la ruta más rápida.
+#     No entra a los nodos que ni en línea recta a la velocidad máxima (la heurística de A*) llegarían al destino dentro de ese límite.
+#   - Un Dijkstra desde el destino sobre las aristas invertidas que solo entra a los nodos donde d_origen(v) + d_destino(v) cabe en
+#     ese mismo límite (la "elipse" entre origen y destino); todas las alternativas posibles viven ahí, así que el árbol sigue siendo exacto.
+# Una meseta es un tramo de calles que está en los dos árboles a la vez. La ruta por un nodo de la meseta (nodo vía) es: del origen a la
+# meseta por el árbol de adelante y de la meseta al destino por el árbol de atrás. Una meseta larga quiere decir que la ruta es
+# razonable en un tramo largo, así que las candidatas se ordenan por 2 * tiempo - longitud de la meseta (menor es mejor) y se aceptan
+# solo si pasan tres límites:
+#   - Estiramiento: el tiempo de la alternativa no pasa de (1 + estiramiento) veces el de la ruta más rápida.
+#   - Compartido: el tiempo que comparte con la ruta más rápida y las alternativas ya elegidas no pasa de 'compartido' veces el de la más rápida.
+#   - Optimalidad local (prueba T): alrededor del nodo vía, el tramo de T = 'optimalidad' veces el tiempo de la más rápida hacia cada lado
+#     tiene que ser un camino más corto, así la alternativa no da vueltas innecesarias. Si la meseta ya cubre ese tramo no hace falta buscar.
+# La distancia y el tiempo de cada ruta se suman con 'GrafoCompilado.resumen_ruta', igual que el resumen de 'ejecutar_analisis_ruta'.
+#
+# Uso: python rutas_alternativas.py ruta 17.0612 -96.7254 17.0776 -96.7081 [--alternativas 3] [--estiramiento 0.25] [--compartido 0.8]
+#                                   [--optimalidad 0.25] [--con-ruta] [--instantanea CARPETA]
+#      python rutas_alternativas.py medir [--pares 100] [--semilla 0] [--instantanea CARPETA]
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'heapq' para las colas de prioridad de los dos árboles
+import heapq
+# Importamos 'json' para escribir los resultados
+import json
+# Importamos 'time' para medir las consultas
+import time
+
+# Importamos numpy con el alias 'np' para buscar las mesetas sobre los nodos de la elipse
+import numpy as np
+
+# Importamos la búsqueda bidireccional (prueba de optimalidad local), la heurística de A* y las estrategias para comparar la latencia
+from estrategias_busqueda import ESTRATEGIAS, bidireccional_indices, heuristica_hacia
+
+# Número de alternativas (sin contar la ruta más rápida) que se buscan si no se piden otras
+ALTERNATIVAS_POR_DEFECTO = 3
+
+# Límites de una alternativa admisible, como fracción del tiempo de la ruta más rápida
+ESTIRAMIENTO_POR_DEFECTO = 0.25
+COMPARTIDO_POR_DEFECTO = 0.8
+OPTIMALIDAD_POR_DEFECTO = 0.25
+
+# Tolerancia relativa del límite: el árbol de atrás suma los mismos pesos en otro orden y, con estiramiento 0, el origen y los nodos
+# de la ruta más rápida pueden quedar una fracción de redondeo por encima de un límite exacto
+TOLERANCIA_LIMITE = 1e-9
+
+# Candidatas que se revisan como máximo por cada alternativa pedida, cada prueba T puede costar una búsqueda corta
+CANDIDATAS_POR_ALTERNATIVA = 10
+
+# Pares al azar de la medición de latencia
+PARES_MEDICION_POR_DEFECTO = 100
+
+
+# Árbol hacia adelante: Dijkstra desde 'indice_origen' que, al sacar 'indice_destino' de la cola, fija el límite en
+# (1 + estiramiento) veces su tiempo y sigue hasta pasarlo. Deja las distancias y predecesores en la memoria de búsqueda del grafo
+# Desde que hay límite no se agrega ningún nodo con distancia + heurística al destino mayor que el límite: la heurística nunca
+# sobreestima, así que los nodos de la elipse (y los de sus caminos más cortos) siguen con su distancia exacta
+# Devuelve (tiempo de la ruta más rápida o inf, límite, consulta de la memoria, nodos visitados)
+def _arbol_adelante(grafo_compilado, indice_origen, indice_destino, estiramiento):
+    desplazamientos, destinos, pesos = grafo_compilado.listas()
+    heuristica = heuristica_hacia(grafo_compilado, indice_destino, grafo_compilado.velocidad_maxima())
+    memoria = grafo_compilado.memoria_busqueda()
+    consulta = memoria.nueva_consulta()
+    distancias = memoria.distancias
+    predecesores = memoria.predecesores
+    marcas = memoria.marcas
+    cerrados = memoria.cerrados
+
+    distancias[indice_origen] = 0.0
+    predecesores[indice_origen] = -1
+    marcas[indice_origen] = consulta
+    cola_prioridad = [(0.0, indice_origen)]
+    tiempo_optimo = float('inf')
+    limite = float('inf')
+    nodos_visitados = 0
+
+    while cola_prioridad:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        if distancia_actual > limite:
+            break
+        if cerrados[nodo_actual] == consulta:
+            continue
+        cerrados[nodo_actual] = consulta
+        nodos_visitados += 1
+        if nodo_actual == indice_destino:
+            tiempo_optimo = distancia_actual
+            limite = distancia_actual * (1.0 + estiramiento) * (1.0 + TOLERANCIA_LIMITE)
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            nueva_distancia = distancia_actual + pesos[posicion]
+            if nueva_distancia > limite or (limite < float('inf') and nueva_distancia + heuristica(vecino) > limite):
+                continue
+            if ((marcas[vecino] != consulta and nueva_distancia < float('inf'))
+                    or nueva_distancia < distancias[vecino]):
+                distancias[vecino] = nueva_distancia
+                predecesores[vecino] = nodo_actual
+                marcas[vecino] = consulta
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+    return tiempo_optimo, limite, consulta, nodos_visitados
+
+
+# Árbol hacia atrás: Dijkstra desde 'indice_destino' sobre el grafo reverso que solo entra a los nodos cerrados por el árbol de adelante
+# con d_adelante(v) + d_atras(v) <= límite. Devuelve la lista de nodos visitados (la elipse) en orden
+def _arbol_atras(grafo_compilado, indice_destino, limite, consulta_adelante):
+    memoria_adelante = grafo_compilado.memoria_busqueda()
+    distancias_adelante = memoria_adelante.distancias
+    cerrados_adelante = memoria_adelante.cerrados
+    grafo_reverso = grafo_compilado.reverso()
+    desplazamientos, destinos, pesos = grafo_reverso.listas()
+    memoria = grafo_reverso.memoria_busqueda()
+    consulta = memoria.nueva_consulta()
+    distancias = memoria.distancias
+    predecesores = memoria.predecesores
+    marcas = memoria.marcas
+    cerrados = memoria.cerrados
+
+    distancias[indice_destino] = 0.0
+    predecesores[indice_destino] = -1
+    marcas[indice_destino] = consulta
+    cola_prioridad = [(0.0, indice_destino)]
+    visitados = []
+
+    while cola_prioridad:
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+        if cerrados[nodo_actual] == consulta:
+            continue
+        cerrados[nodo_actual] = consulta
+        visitados.append(nodo_actual)
+        for posicion in range(desplazamientos[nodo_actual], desplazamientos[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            # Fuera de la elipse (o no alcanzado hacia adelante) no puede haber ningún nodo vía
+            if cerrados_adelante[vecino] != consulta_adelante:
+                continue
+            nueva_distancia = distancia_actual + pesos[posicion]
+            if distancias_adelante[vecino] + nueva_distancia > limite:
+                continue
+            if marcas[vecino] != consulta or nueva_distancia < distancias[vecino]:
+                distancias[vecino] = nueva_distancia
+                predecesores[vecino] = nodo_actual
+                marcas[vecino] = consulta
+                heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+    return visitados
+
+
+# Sigue un arreglo de "siguiente posición" hasta su punto fijo duplicando los saltos (cada vuelta salta el doble de lejos)
+def _punto_fijo(siguiente):
+    while True:
+        saltado = siguiente[siguiente]
+        if np.array_equal(saltado, siguiente):
+            return siguiente
+        siguiente = saltado
+
+
+# Rutas alternativas sobre índices densos. Devuelve (rutas, nodos visitados), donde cada ruta es un diccionario con
+#   'indices'     -> lista de índices densos del origen al destino
+#   'tiempo'      -> suma de los pesos de la ruta
+#   'compartido'  -> tiempo que comparte con las rutas anteriores de la lista (0 para la más rápida)
+#   'indice_via'  -> índice denso del nodo vía (-1 para la más rápida)
+# La primera ruta es la más rápida; la lista está vacía si el destino es inalcanzable
+def rutas_alternativas_indices(grafo_compilado, indice_origen, indice_destino, numero_alternativas=ALTERNATIVAS_POR_DEFECTO,
+                               estiramiento=ESTIRAMIENTO_POR_DEFECTO, compartido=COMPARTIDO_POR_DEFECTO,
+                               optimalidad=OPTIMALIDAD_POR_DEFECTO):
+    if not estiramiento >= 0:
+        raise ValueError(f"El estiramiento debe ser un número no negativo, se recibió {estiramiento}")
+    tiempo_optimo, limite, consulta_adelante, nodos_visitados = _arbol_adelante(
+        grafo_compilado, indice_origen, indice_destino, estiramiento)
+    if tiempo_optimo == float('inf'):
+        return [], nodos_visitados
+    if indice_origen == indice_destino:
+        return [{'indices': [indice_origen], 'tiempo': 0.0, 'compartido': 0.0, 'indice_via': -1}], nodos_visitados
+    visitados = _arbol_atras(grafo_compilado, indice_destino, limite, consulta_adelante)
+    nodos_visitados += len(visitados)
+
+    # Los datos de los dos árboles sobre los nodos de la elipse, como arreglos alineados con 'visitados'
+    # (los predecesores de un nodo de la elipse en cualquiera de los dos árboles también están en la elipse)
+    memoria_adelante = grafo_compilado.memoria_busqueda()
+    memoria_atras = grafo_compilado.reverso().memoria_busqueda()
+    distancia_adelante = np.array([memoria_adelante.distancias[nodo] for nodo in visitados])
+    distancia_atras = np.array([memoria_atras.distancias[nodo] for nodo in visitados])
+    predecesor_adelante = [memoria_adelante.predecesores[nodo] for nodo in visitados]
+    siguiente_atras = [memoria_atras.predecesores[nodo] for nodo in visitados]
+    # Posición en 'visitados' de cada nodo, para seguir los árboles sin tocar más la memoria de búsqueda (la usa la prueba T)
+    posicion_de = {nodo: posicion for posicion, nodo in enumerate(visitados)}
+    posicion_adelante = np.array([posicion_de.get(nodo, -1) for nodo in predecesor_adelante], dtype=np.int64)
+    posicion_atras = np.array([posicion_de.get(nodo, -1) for nodo in siguiente_atras], dtype=np.int64)
+    posiciones = np.arange(len(visitados))
+
+    # Una calle u -> v es de meseta si está en los dos árboles: v viene de u hacia adelante y u sigue a v hacia atrás
+    sale_por_meseta = (posicion_atras >= 0) & (posicion_adelante[np.maximum(posicion_atras, 0)] == posiciones)
+    entra_por_meseta = (posicion_adelante >= 0) & (posicion_atras[np.maximum(posicion_adelante, 0)] == posiciones)
+    # Inicio y fin de la meseta de cada nodo
+    fin = _punto_fijo(np.where(sale_por_meseta, posicion_atras, posiciones))
+    inicio = _punto_fijo(np.where(entra_por_meseta, posicion_adelante, posiciones))
+    longitud_meseta = distancia_adelante[fin] - distancia_adelante[inicio]
+    tiempo_via = distancia_adelante + distancia_atras
+
+    # Una candidata por meseta (su nodo de inicio), de la más prometedora a la menos
+    # Las mesetas más cortas que T casi nunca pasan la prueba T (la ruta da la vuelta justo en el nodo vía), así que ni se prueban
+    tramo = optimalidad * tiempo_optimo
+    candidatas = np.flatnonzero((inicio == posiciones) & (longitud_meseta > 0) & (longitud_meseta >= tramo) & (tiempo_via <= limite))
+    candidatas = candidatas[np.argsort(2.0 * tiempo_via[candidatas] - longitud_meseta[candidatas], kind='stable')]
+
+    # Ruta por la posición 'via' de la elipse: hacia atrás por el árbol de adelante y hacia adelante por el de atrás
+    # Devuelve la lista de posiciones y el tiempo de cada calle
+    def ruta_por(via):
+        mitad_adelante = [via]
+        while posicion_adelante[mitad_adelante[-1]] >= 0:
+            mitad_adelante.append(int(posicion_adelante[mitad_adelante[-1]]))
+        ruta = mitad_adelante[::-1]
+        while posicion_atras[ruta[-1]] >= 0:
+            ruta.append(int(posicion_atras[ruta[-1]]))
+        tiempos = [float(distancia_adelante[siguiente] - distancia_adelante[anterior]) if numero < len(mitad_adelante) - 1 else
+                   float(distancia_atras[anterior] - distancia_atras[siguiente])
+                   for numero, (anterior, siguiente) in enumerate(zip(ruta[:-1], ruta[1:]))]
+        return ruta, tiempos
+
+    # Prueba T alrededor del nodo de la ruta que está a la mitad de la meseta que empieza en 'via': el tramo de T antes a T después
+    # (o hasta los extremos) debe ser un camino más corto. Devuelve (si pasa, número del nodo vía dentro de la ruta)
+    def prueba_t(ruta, tiempos, via):
+        acumulado = np.concatenate(([0.0], np.cumsum(tiempos)))
+        mitad = acumulado[ruta.index(via)] + 0.5 * longitud_meseta[via]
+        numero_via = min(int(np.searchsorted(acumulado, mitad)), len(ruta) - 1)
+        # Si la meseta cubre T hacia los dos lados de su mitad, el tramo es parte de un camino más corto y no hace falta buscar
+        if longitud_meseta[via] >= 2.0 * tramo:
+            return True, numero_via
+        primero = max(int(np.searchsorted(acumulado, acumulado[numero_via] - tramo, side='right')) - 1, 0)
+        ultimo = min(int(np.searchsorted(acumulado, acumulado[numero_via] + tramo, side='left')), len(ruta) - 1)
+        tiempo_tramo, _, _ = bidireccional_indices(grafo_compilado, visitados[ruta[primero]], visitados[ruta[ultimo]],
+                                                   grafo_compilado.velocidad_maxima())
+        return tiempo_tramo >= (acumulado[ultimo] - acumulado[primero]) * (1.0 - 1e-9), numero_via
+
+    # La ruta más rápida es la del árbol de atrás desde el origen
+    ruta_optima, _ = ruta_por(posicion_de[indice_origen])
+    rutas = [{'indices': [visitados[posicion] for posicion in ruta_optima], 'tiempo': tiempo_optimo, 'compartido': 0.0,
+              'indice_via': -1}]
+    # Calles (pares de posiciones) ya usadas por alguna ruta de la lista
+    calles_usadas = set(zip(ruta_optima[:-1], ruta_optima[1:]))
+    for via in candidatas[:numero_alternativas * CANDIDATAS_POR_ALTERNATIVA].tolist():
+        if len(rutas) > numero_alternativas:
+            break
+        ruta, tiempos = ruta_por(via)
+        tiempo_compartido = sum(tiempo for calle, tiempo in zip(zip(ruta[:-1], ruta[1:]), tiempos) if calle in calles_usadas)
+        if tiempo_compartido > compartido * tiempo_optimo:
+            continue
+        pasa, numero_via = prueba_t(ruta, tiempos, via)
+        if not pasa:
+            continue
+        rutas.append({'indices': [visitados[posicion] for posicion in ruta], 'tiempo': float(tiempo_via[via]),
+                      'compartido': tiempo_compartido, 'indice_via': visitados[ruta[numero_via]]})
+        calles_usadas.update(zip(ruta[:-1], ruta[1:]))
+    return rutas, nodos_visitados
+
+
+# Función principal de este archivo: la ruta más rápida y sus alternativas entre dos nodos (IDs de OSM), lista para pasar a JSON
+# Cada ruta trae su distancia y tiempo sumados con 'resumen_ruta', su estiramiento y su parte compartida (fracciones de la más rápida)
+def rutas_alternativas(grafo_compilado, nodo_origen, nodo_destino, numero_alternativas=ALTERNATIVAS_POR_DEFECTO,
+                       estiramiento=ESTIRAMIENTO_POR_DEFECTO, compartido=COMPARTIDO_POR_DEFECTO, optimalidad=OPTIMALIDAD_POR_DEFECTO,
+                       con_ruta=True):
+    rutas_indices, nodos_visitados = rutas_alternativas_indices(
+        grafo_compilado, grafo_compilado.indice(nodo_origen), grafo_compilado.indice(nodo_destino), numero_alternativas,
+        estiramiento, compartido, optimalidad)
+    rutas = []
+    for ruta_indices in rutas_indices:
+        camino = grafo_compilado.nodos_de_indices(ruta_indices['indices'])
+        distancia_total_metros, tiempo_total_segundos = grafo_compilado.resumen_ruta(camino)
+        tiempo_optimo = rutas_indices[0]['tiempo']
+        ruta = {
+            'distancia_metros': distancia_total_metros,
+            'tiempo_segundos': tiempo_total_segundos,
+            'estiramiento': ruta_indices['tiempo'] / tiempo_optimo if tiempo_optimo > 0 else 1.0,
+            'compartido': ruta_indices['compartido'] / tiempo_optimo if tiempo_optimo > 0 else 0.0,
+            'nodo_via': None if ruta_indices['indice_via'] < 0 else grafo_compilado.nodos_de_indices([ruta_indices['indice_via']])[0],
+        }
+        if con_ruta:
+            ruta['ruta'] = [int(nodo) for nodo in camino]
+        rutas.append(ruta)
+    return {
+        'nodo_origen': nodo_origen,
+        'nodo_destino': nodo_destino,
+        'encontrada': bool(rutas),
+        'nodos_visitados': nodos_visitados,
+        'rutas': rutas,
+    }
+
+
+# Mide la latencia de las alternativas contra una sola consulta ('dijkstra', como 'dijkstra_iterativo', y la estrategia 'comparar')
+# sobre pares de nodos al azar; reporta medianas, la razón entre ambas y cuántas alternativas se encontraron en promedio
+def medir_alternativas(grafo_compilado, numero_pares=PARES_MEDICION_POR_DEFECTO, semilla=0, comparar='bidireccional_a_estrella',
+                       **opciones):
+    generador = np.random.default_rng(semilla)
+    pares = generador.integers(0, grafo_compilado.numero_nodos, size=(numero_pares, 2)).tolist()
+    milisegundos = {'alternativas': [], 'dijkstra': [], comparar: []}
+    numero_rutas = []
+    for indice_origen, indice_destino in pares:
+        for nombre in ('dijkstra', comparar):
+            inicio = time.perf_counter()
+            ESTRATEGIAS[nombre](grafo_compilado, indice_origen, indice_destino)
+            milisegundos[nombre].append((time.perf_counter() - inicio) * 1000.0)
+        inicio = time.perf_counter()
+        rutas, _ = rutas_alternativas_indices(grafo_compilado, indice_origen, indice_destino, **opciones)
+        milisegundos['alternativas'].append((time.perf_counter() - inicio) * 1000.0)
+        if rutas:
+            numero_rutas.append(len(rutas) - 1)
+    medianas = {nombre: float(np.median(valores)) for nombre, valores in milisegundos.items()}
+    return {
+        'pares': numero_pares,
+        'pares_con_ruta': len(numero_rutas),
+        'alternativas_promedio': float(np.mean(numero_rutas)) if numero_rutas else 0.0,
+        'milisegundos_mediana': medianas,
+        'razon_contra_dijkstra': medianas['alternativas'] / medianas['dijkstra'] if medianas['dijkstra'] > 0 else None,
+        f'razon_contra_{comparar}': medianas['alternativas'] / medianas[comparar] if medianas[comparar] > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    # Importamos aquí la apertura del grafo de la línea de comandos, así importar este módulo no carga nada más
+    from consola_rutas import abrir_grafo
+    from indice_espacial import obtener_indice_espacial
+
+    analizador = argparse.ArgumentParser(description='Ruta más rápida y rutas alternativas por mesetas')
+    subcomandos = analizador.add_subparsers(dest='comando', required=True)
+    comando_ruta = subcomandos.add_parser('ruta', help='alternativas entre dos puntos')
+    for nombre in ('lat_origen', 'lon_origen', 'lat_destino', 'lon_destino'):
+        comando_ruta.add_argument(nombre, type=float)
+    comando_ruta.add_argument('--con-ruta', action='store_true', help='incluir la lista de nodos de cada ruta')
+    comando_medir = subcomandos.add_parser('medir', help='latencia contra una sola consulta sobre pares al azar')
+    comando_medir.add_argument('--pares', type=int, default=PARES_MEDICION_POR_DEFECTO)
+    comando_medir.add_argument('--semilla', type=int, default=0)
+    for comando in (comando_ruta, comando_medir):
+        comando.add_argument('--alternativas', type=int, default=ALTERNATIVAS_POR_DEFECTO, help='alternativas además de la más rápida')
+        comando.add_argument('--estiramiento', type=float, default=ESTIRAMIENTO_POR_DEFECTO)
+        comando.add_argument('--compartido', type=float, default=COMPARTIDO_POR_DEFECTO)
+        comando.add_argument('--optimalidad', type=float, default=OPTIMALIDAD_POR_DEFECTO)
+        comando.add_argument('--instantanea', help='carpeta de una instantánea del grafo (por defecto la del script principal)')
+    argumentos = analizador.parse_args()
+    if not argumentos.estiramiento >= 0:
+        analizador.error('--estiramiento debe ser un número no negativo')
+    opciones = {'numero_alternativas': argumentos.alternativas, 'estiramiento': argumentos.estiramiento,
+                'compartido': argumentos.compartido, 'optimalidad': argumentos.optimalidad}
+
+    grafo = abrir_grafo(argumentos.instantanea)
+    if argumentos.comando == 'ruta':
+        nodos, _ = obtener_indice_espacial(grafo).nodos_mas_cercanos(
+            [argumentos.lat_origen, argumentos.lat_destino], [argumentos.lon_origen, argumentos.lon_destino])
+        nodo_origen, nodo_destino = nodos.tolist()
+        resultado = rutas_alternativas(grafo, nodo_origen, nodo_destino, con_ruta=argumentos.con_ruta, **opciones)
+    else:
+        resultado = medir_alternativas(grafo, argumentos.pares, argumentos.semilla, **opciones)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -0,0 +1,27 @@
+# En este archivo cargamos el script principal como módulo.
+# Su nombre tiene espacios ('Alejandro Cinco Prieto_Dijkstra.py'), así que no se puede hacer 'import' normal, pero el servidor,
+# la línea de comandos y el banco de pruebas necesitan su configuración del mapa y su 'dijkstra_iterativo'.
+# Como el script principal importa osmnx, matplotlib y tkinter solo dentro de las funciones que los usan, cargarlo es rápido.
+
+# Importamos 'importlib.util' para cargar un archivo de Python por su ruta
+import importlib.util
+# Importamos 'os' para armar la ruta del script
+import os
+
+# Nombre del script principal
+ARCHIVO_SCRIPT_PRINCIPAL = 'Alejandro Cinco Prieto_Dijkstra.py'
+
+# Módulo ya cargado, para no ejecutar el script otra vez en cada llamada
+_modulo_principal = None
+
+
+# Devuelve el script principal cargado como módulo (solo se ejecuta la primera vez)
+def cargar_script_principal():
+    global _modulo_principal
+    if _modulo_principal is None:
+        ruta_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), ARCHIVO_SCRIPT_PRINCIPAL)
+        especificacion = importlib.util.spec_from_file_location('dijkstra_app', ruta_script)
+        modulo = importlib.util.module_from_spec(especificacion)
+        especificacion.loader.exec_module(modulo)
+        _modulo_principal = modulo
+    return _modulo_principal
@@ -0,0 +1,543 @@
+# En este archivo está el servidor de rutas: un proceso que se queda corriendo sin ventana ni mapa y responde peticiones HTTP con JSON.
+# El grafo se abre UNA sola vez al arrancar (desde la instantánea de 'instantanea_grafo.py') y se queda "caliente" en memoria,
+# en lugar de descargar y ponderar todo el mapa para cada ruta como hace el flujo con la ventana de Tkinter.
+#
+# Cómo está armado:
+#   - El frente es 'asyncio': acepta conexiones, lee las peticiones y escribe las respuestas, pero NO busca rutas.
+#   - Las búsquedas (que usan mucho CPU) se mandan a un grupo de procesos trabajadores ('ProcessPoolExecutor'), cada uno abre la
+#     misma instantánea mapeada en memoria, así que todos comparten las páginas del grafo.
+#   - Si llegan varias peticiones idénticas mientras la primera todavía se está calculando, todas esperan el mismo resultado
+#     en lugar de calcularlo varias veces.
+#   - Hay un límite de trabajos pendientes: si se llena, el servidor contesta 503 de inmediato en lugar de encolar sin fin.
+#   - Cada trabajador tiene su propia caché de rutas y árboles de búsqueda por origen (ver 'cache_rutas.py').
+#   - Se lleva un histograma de latencias por ruta HTTP, que se consulta en '/metricas'.
+#   - Los parches de pesos (cierres, embotellamientos, ver 'actualizacion_pesos.py') se validan en el proceso principal y se agregan a un
+#     registro en disco con un número de versión. Cada tarea lleva la versión vigente y el trabajador, antes de calcular, aplica los
+#     lotes del registro que todavía no tiene; su caché solo descarta lo que usaba las calles que cambiaron.
+#
+# Rutas HTTP:
+#   GET  /salud     -> estado del servidor, tamaño del grafo y la caja (lat/lon) que cubre
+#   GET  /metricas  -> histogramas de latencia y contadores
+#   POST /ruta      -> {"lat_origen", "lon_origen", "lat_destino", "lon_destino", "estrategia" (opcional)}
+#   POST /matriz    -> {"origenes": [[lat, lon], ...], "destinos": [[lat, lon], ...]}
+#   POST /ajustar   -> {"puntos": [[lat, lon], ...]}
+#   POST /isocrona  -> {"lat", "lon", "umbrales_segundos": [300, 600, ...], "contorno" ("poligono" | "raster", opcional),
+#                       "celda_metros" (opcional), "con_nodos" (opcional, por defecto true)}
+#   POST /alternativas -> {"lat_origen", "lon_origen", "lat_destino", "lon_destino", "alternativas" (opcional),
+#                          "con_ruta" (opcional, por defecto true)}: la ruta más rápida y hasta 'alternativas' rutas distintas
+#   GET  /parches   -> parches activos
+#   POST /parches   -> {"parches": [{"id", "arista" | "caja" | "highway", "factor" | "segundos" | "cerrada" | "quitar"}, ...]}
+#
+# Uso: python servidor_rutas.py [--instantanea CARPETA] [--puerto 8080] [--procesos N] [--cache-mb 64]
+# Sin '--instantanea' se usa la instantánea del script principal (la construye descargando el mapa si todavía no existe).
+
+# Importamos 'argparse' para leer las opciones de la línea de comandos
+import argparse
+# Importamos 'asyncio' para el frente del servidor
+import asyncio
+# Importamos 'bisect' para encontrar la cubeta del histograma de cada latencia
+import bisect
+# Importamos 'json' para leer y escribir los cuerpos de las peticiones
+import json
+# Importamos 'os' para armar rutas de archivos y contar procesadores
+import os
+# Importamos 'shutil' y 'tempfile' para la carpeta temporal del registro de parches
+import shutil
+import tempfile
+# Importamos 'time' para medir latencias
+import time
+# Importamos el ejecutor de procesos de la biblioteca estándar
+from concurrent.futures import ProcessPoolExecutor
+
+# Importamos numpy con el alias 'np' para los arreglos de coordenadas
+import numpy as np
+
+# Importamos lo necesario para abrir el grafo, pegar puntos a la red, buscar rutas y aplicar parches de pesos
+from actualizacion_pesos import ActualizadorPesos, RegistroParches
+from cache_rutas import PRESUPUESTO_POR_DEFECTO_BYTES, CacheRutas
+from estrategias_busqueda import ESTRATEGIAS, buscar_ruta
+from indice_espacial import obtener_indice_espacial
+from instantanea_grafo import cargar_instantanea, leer_aristas_paralelas, leer_valores_highway
+from isocronas import TAMANO_CELDA_POR_DEFECTO, calcular_isocrona, isocrona_como_diccionario
+from matriz_tiempos import calcular_matriz
+from rutas_alternativas import ALTERNATIVAS_POR_DEFECTO, rutas_alternativas
+from script_principal import cargar_script_principal
+
+# Estrategia de búsqueda que se usa si la petición no pide otra
+ESTRATEGIA_POR_DEFECTO = 'bidireccional_a_estrella'
+
+# Límites superiores (en milisegundos) de las cubetas de los histogramas de latencia, la última cubeta es "más que eso"
+CUBETAS_LATENCIA_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Máximo de parches en una sola petición a '/parches'
+MAXIMO_PARCHES = 1000
+
+# Máximo de trabajos que pueden estar esperando o corriendo en los procesos trabajadores al mismo tiempo
+LIMITE_PENDIENTES_POR_DEFECTO = 256
+
+# Tamaño máximo del cuerpo de una petición y máximo de puntos por petición, para que una sola petición no acapare el servidor
+TAMANO_MAXIMO_CUERPO = 1 << 20
+MAXIMO_PUNTOS = 10_000
+
+# Máximo de umbrales por isócrona y lado mínimo de sus celdas, una rejilla demasiado fina haría contornos enormes
+MAXIMO_UMBRALES = 16
+TAMANO_MINIMO_CELDA_METROS = 20.0
+
+# Máximo de rutas alternativas por petición
+MAXIMO_ALTERNATIVAS = 5
+
+# Textos de los códigos HTTP que usamos
+TEXTOS_ESTADO = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+                 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# Grafo compilado, índice espacial y caché de rutas del proceso trabajador, los llena '_inicializar_trabajador' una sola vez por proceso
+_grafo_trabajador = None
+_indice_trabajador = None
+_cache_trabajador = None
+# Parches del proceso trabajador: el actualizador, el registro compartido y cuántos lotes del registro ya se aplicaron
+_actualizador_trabajador = None
+_registro_trabajador = None
+_version_parches_trabajador = 0
+
+
+# Error de una petición mal formada, se contesta con el código 'estado' y el mensaje en JSON
+class ErrorPeticion(Exception):
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# Histograma de latencias con cubetas fijas, guarda también el total, la suma y el máximo
+class HistogramaLatencias:
+    def __init__(self, cubetas_ms=CUBETAS_LATENCIA_MS):
+        self.cubetas_ms = tuple(cubetas_ms)
+        self.conteos = [0] * (len(self.cubetas_ms) + 1)
+        self.total = 0
+        self.suma_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def registrar(self, latencia_ms):
+        self.conteos[bisect.bisect_left(self.cubetas_ms, latencia_ms)] += 1
+        self.total += 1
+        self.suma_ms += latencia_ms
+        self.maximo_ms = max(self.maximo_ms, latencia_ms)
+
+    # Percentil aproximado: el límite superior de la cubeta donde cae el percentil (o el máximo si cae en la última)
+    def percentil(self, porcentaje):
+        if self.total == 0:
+            return None
+        objetivo = self.total * porcentaje / 100.0
+        acumulado = 0
+        for limite, conteo in zip(self.cubetas_ms, self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return min(float(limite), self.maximo_ms)
+        return self.maximo_ms
+
+    def como_diccionario(self):
+        etiquetas = [f'<={limite}' for limite in self.cubetas_ms] + [f'>{self.cubetas_ms[-1]}']
+        return {
+            'total': self.total,
+            'promedio_ms': self.suma_ms / self.total if self.total else None,
+            'maximo_ms': self.maximo_ms,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'cubetas_ms': dict(zip(etiquetas, self.conteos)),
+        }
+
+
+# Se ejecuta una vez al arrancar cada proceso trabajador: abre la instantánea mapeada en memoria, su índice espacial y la caché
+# Con 'presupuesto_cache_bytes' en 0 el trabajador no usa caché; 'ruta_registro_parches' es el archivo del registro de parches
+def _inicializar_trabajador(directorio_instantanea, presupuesto_cache_bytes=0, ruta_registro_parches=None):
+    global _grafo_trabajador, _indice_trabajador, _cache_trabajador, _actualizador_trabajador, _registro_trabajador
+    _grafo_trabajador = cargar_instantanea(directorio_instantanea)
+    _indice_trabajador = obtener_indice_espacial(_grafo_trabajador)
+    _cache_trabajador = CacheRutas(_grafo_trabajador, presupuesto_cache_bytes) if presupuesto_cache_bytes > 0 else None
+    _actualizador_trabajador = ActualizadorPesos(_grafo_trabajador, leer_valores_highway(directorio_instantanea),
+                                                 aristas_paralelas=leer_aristas_paralelas(directorio_instantanea))
+    _registro_trabajador = RegistroParches(ruta_registro_parches) if ruta_registro_parches else None
+
+
+# Aplica los lotes de parches del registro hasta llegar a 'version_parches' (la versión que tenía el servidor al mandar la tarea)
+def _ponerse_al_dia(version_parches):
+    global _version_parches_trabajador
+    while _version_parches_trabajador < version_parches:
+        lotes = _registro_trabajador.leer_nuevos()
+        if not lotes:
+            raise RuntimeError(f'El registro de parches no tiene la versión {version_parches}')
+        for lote in lotes:
+            _actualizador_trabajador.aplicar(lote)
+            _version_parches_trabajador += 1
+
+
+# Pega una lista de puntos [[lat, lon], ...] a los nodos más cercanos, devuelve (IDs de OSM, metros hasta el nodo)
+def _nodos_de_puntos(puntos):
+    coordenadas = np.asarray(puntos, dtype=np.float64).reshape(-1, 2)
+    return _indice_trabajador.nodos_mas_cercanos(coordenadas[:, 0], coordenadas[:, 1])
+
+
+# Tarea de un proceso trabajador: la ruta más rápida entre dos puntos
+def _tarea_ruta(version_parches, lat_origen, lon_origen, lat_destino, lon_destino, estrategia):
+    _ponerse_al_dia(version_parches)
+    nodos, _ = _nodos_de_puntos([[lat_origen, lon_origen], [lat_destino, lon_destino]])
+    nodo_origen, nodo_destino = int(nodos[0]), int(nodos[1])
+    if _cache_trabajador is not None:
+        resultado_busqueda = _cache_trabajador.buscar_ruta(nodo_origen, nodo_destino, estrategia)
+    else:
+        resultado_busqueda = buscar_ruta(_grafo_trabajador, nodo_origen, nodo_destino, estrategia)
+    respuesta = {
+        'nodo_origen': nodo_origen,
+        'nodo_destino': nodo_destino,
+        'estrategia': estrategia,
+        'nodos_visitados': resultado_busqueda.nodos_visitados,
+        'encontrada': resultado_busqueda.camino is not None,
+    }
+    if resultado_busqueda.camino is not None:
+        distancia_total_metros, tiempo_total_segundos = _grafo_trabajador.resumen_ruta(resultado_busqueda.camino)
+        respuesta.update({
+            'ruta': [int(nodo) for nodo in resultado_busqueda.camino],
+            'distancia_metros': distancia_total_metros,
+            'tiempo_segundos': tiempo_total_segundos,
+        })
+    return respuesta
+
+
+# Tarea de un proceso trabajador: la matriz de tiempos y distancias entre dos listas de puntos (los pares sin camino quedan en 'null')
+def _tarea_matriz(version_parches, origenes, destinos):
+    _ponerse_al_dia(version_parches)
+    nodos_origen, _ = _nodos_de_puntos(origenes)
+    nodos_destino, _ = _nodos_de_puntos(destinos)
+    matriz = calcular_matriz(_grafo_trabajador, nodos_origen.tolist(), nodos_destino.tolist(), procesos=1)
+    alcanzable = matriz['alcanzable']
+    return {
+        'nodos_origen': nodos_origen.tolist(),
+        'nodos_destino': nodos_destino.tolist(),
+        'segundos': np.where(alcanzable, matriz['segundos'], None).tolist(),
+        'metros': np.where(alcanzable, matriz['metros'], None).tolist(),
+    }
+
+
+# Tarea de un proceso trabajador: la isócrona desde un punto con varios umbrales y, si se pide, su contorno
+def _tarea_isocrona(version_parches, lat, lon, umbrales_segundos, contorno, tamano_celda_metros, con_nodos):
+    _ponerse_al_dia(version_parches)
+    nodo_origen = _indice_trabajador.nodo_mas_cercano(lat, lon)
+    resultado = calcular_isocrona(_grafo_trabajador, nodo_origen, umbrales_segundos, contorno, tamano_celda_metros,
+                                  indice_espacial=_indice_trabajador)
+    return dict(isocrona_como_diccionario(resultado, con_nodos), nodo_origen=nodo_origen)
+
+
+# Tarea de un proceso trabajador: la ruta más rápida entre dos puntos y sus alternativas (ver 'rutas_alternativas.py')
+def _tarea_alternativas(version_parches, lat_origen, lon_origen, lat_destino, lon_destino, numero_alternativas, con_ruta):
+    _ponerse_al_dia(version_parches)
+    nodos, _ = _nodos_de_puntos([[lat_origen, lon_origen], [lat_destino, lon_destino]])
+    return rutas_alternativas(_grafo_trabajador, int(nodos[0]), int(nodos[1]), numero_alternativas, con_ruta=con_ruta)
+
+
+# Tarea de un proceso trabajador: pega cada punto al nodo más cercano
+def _tarea_ajustar(puntos):
+    nodos, distancias = _nodos_de_puntos(puntos)
+    return {'nodos': nodos.tolist(), 'distancia_metros': distancias.tolist()}
+
+
+# Revisa que 'valor' sea una lista de pares [lat, lon] y la devuelve como lista de listas de floats
+def _validar_puntos(valor, nombre):
+    if not isinstance(valor, list) or not valor:
+        raise ErrorPeticion(f"'{nombre}' debe ser una lista no vacía de pares [lat, lon]")
+    if len(valor) > MAXIMO_PUNTOS:
+        raise ErrorPeticion(f"'{nombre}' tiene más de {MAXIMO_PUNTOS} puntos", 413)
+    try:
+        puntos = [[float(lat), float(lon)] for lat, lon in valor]
+    except (TypeError, ValueError):
+        raise ErrorPeticion(f"'{nombre}' debe ser una lista no vacía de pares [lat, lon]") from None
+    return puntos
+
+
+# Revisa que 'datos[clave]' sea un número y lo devuelve como float
+def _validar_numero(datos, clave):
+    try:
+        return float(datos[clave])
+    except KeyError:
+        raise ErrorPeticion(f"Falta el campo '{clave}'") from None
+    except (TypeError, ValueError):
+        raise ErrorPeticion(f"El campo '{clave}' debe ser un número") from None
+
+
+# Revisa las opciones de una isócrona y las devuelve como (umbrales, contorno, tamaño de celda, con nodos)
+def _validar_isocrona(datos):
+    umbrales = datos.get('umbrales_segundos')
+    if not isinstance(umbrales, list) or not umbrales:
+        raise ErrorPeticion("'umbrales_segundos' debe ser una lista no vacía de segundos")
+    if len(umbrales) > MAXIMO_UMBRALES:
+        raise ErrorPeticion(f"'umbrales_segundos' tiene más de {MAXIMO_UMBRALES} umbrales", 413)
+    try:
+        umbrales = sorted(float(umbral) for umbral in umbrales)
+    except (TypeError, ValueError):
+        raise ErrorPeticion("'umbrales_segundos' debe ser una lista no vacía de segundos") from None
+    if not all(0 <= umbral < float('inf') for umbral in umbrales):
+        raise ErrorPeticion("Los umbrales deben ser números finitos y no negativos")
+    contorno = datos.get('contorno')
+    if contorno not in (None, 'poligono', 'raster'):
+        raise ErrorPeticion(f"Contorno desconocido '{contorno}', los disponibles son: poligono, raster")
+    tamano_celda_metros = _validar_numero(datos, 'celda_metros') if 'celda_metros' in datos else TAMANO_CELDA_POR_DEFECTO
+    if not TAMANO_MINIMO_CELDA_METROS <= tamano_celda_metros < float('inf'):
+        raise ErrorPeticion(f"'celda_metros' debe ser de al menos {TAMANO_MINIMO_CELDA_METROS:g} metros")
+    return tuple(umbrales), contorno, tamano_celda_metros, bool(datos.get('con_nodos', True))
+
+
+# Revisa las opciones de las rutas alternativas y las devuelve como (número de alternativas, con ruta)
+def _validar_alternativas(datos):
+    numero_alternativas = datos.get('alternativas', ALTERNATIVAS_POR_DEFECTO)
+    if isinstance(numero_alternativas, bool) or not isinstance(numero_alternativas, int) \
+            or not 0 <= numero_alternativas <= MAXIMO_ALTERNATIVAS:
+        raise ErrorPeticion(f"'alternativas' debe ser un entero entre 0 y {MAXIMO_ALTERNATIVAS}")
+    return numero_alternativas, bool(datos.get('con_ruta', True))
+
+
+# El servidor: guarda el grafo caliente, el grupo de procesos, las peticiones en curso y las métricas
+class ServidorRutas:
+    def __init__(self, directorio_instantanea, procesos=None, limite_pendientes=LIMITE_PENDIENTES_POR_DEFECTO,
+                 presupuesto_cache_bytes=PRESUPUESTO_POR_DEFECTO_BYTES):
+        self.directorio_instantanea = directorio_instantanea
+        self.presupuesto_cache_bytes = presupuesto_cache_bytes
+        self.procesos = procesos or os.cpu_count() or 1
+        self.limite_pendientes = limite_pendientes
+        # El proceso principal también abre la instantánea, para '/salud' y para construir el índice espacial antes que los trabajadores
+        self.grafo_compilado = cargar_instantanea(directorio_instantanea)
+        obtener_indice_espacial(self.grafo_compilado)
+        # El proceso principal también aplica los parches a su copia del grafo: así los valida antes de publicarlos en el registro
+        self.actualizador = ActualizadorPesos(self.grafo_compilado, leer_valores_highway(directorio_instantanea),
+                                              aristas_paralelas=leer_aristas_paralelas(directorio_instantanea))
+        self._directorio_parches = tempfile.mkdtemp(prefix='parches_')
+        self.registro_parches = RegistroParches(os.path.join(self._directorio_parches, 'parches.jsonl'))
+        self.version_parches = 0
+        self.ejecutor = None
+        # Peticiones que se están calculando, por llave (ruta HTTP + cuerpo normalizado), para juntar las idénticas
+        self._en_curso = {}
+        self.pendientes = 0
+        self.histogramas = {}
+        self.contadores = {'peticiones': 0, 'agrupadas': 0, 'rechazadas': 0, 'errores': 0, 'parches': 0}
+        self.inicio = time.time()
+
+    def iniciar_trabajadores(self):
+        self.ejecutor = ProcessPoolExecutor(max_workers=self.procesos, initializer=_inicializar_trabajador,
+                                            initargs=(self.directorio_instantanea, self.presupuesto_cache_bytes,
+                                                      self.registro_parches.ruta_archivo))
+
+    def cerrar(self):
+        if self.ejecutor is not None:
+            self.ejecutor.shutdown(cancel_futures=True)
+            self.ejecutor = None
+        shutil.rmtree(self._directorio_parches, ignore_errors=True)
+
+    # Manda una tarea a los trabajadores, o se une a la que ya está en curso si alguien pidió exactamente lo mismo
+    async def _calcular(self, llave, funcion, *argumentos):
+        tarea = self._en_curso.get(llave)
+        if tarea is not None:
+            self.contadores['agrupadas'] += 1
+            return await asyncio.shield(tarea)
+        if self.pendientes >= self.limite_pendientes:
+            self.contadores['rechazadas'] += 1
+            raise ErrorPeticion('El servidor está saturado, intente de nuevo más tarde', 503)
+        self.pendientes += 1
+        tarea = asyncio.get_running_loop().run_in_executor(self.ejecutor, funcion, *argumentos)
+        self._en_curso[llave] = tarea
+        # La tarea se quita de las peticiones en curso cuando termina, aunque el cliente que la pidió ya se haya desconectado
+        tarea.add_done_callback(lambda _: self._terminar(llave, tarea))
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, llave, tarea):
+        self.pendientes -= 1
+        if self._en_curso.get(llave) is tarea:
+            del self._en_curso[llave]
+
+    async def atender(self, metodo, ruta, datos):
+        if ruta == '/salud':
+            return self._salud()
+        if ruta == '/metricas':
+            return self.metricas()
+        if ruta == '/parches' and metodo == 'GET':
+            return {'version': self.version_parches, 'parches': self.actualizador.parches()}
+        if ruta not in ('/ruta', '/matriz', '/ajustar', '/isocrona', '/alternativas', '/parches'):
+            raise ErrorPeticion(f'No existe la ruta {ruta}', 404)
+        if metodo != 'POST':
+            raise ErrorPeticion(f'La ruta {ruta} solo acepta POST', 405)
+        if not isinstance(datos, dict):
+            raise ErrorPeticion('El cuerpo debe ser un objeto JSON')
+        if ruta == '/parches':
+            return self._aplicar_parches(datos.get('parches'))
+
+        if ruta == '/ruta':
+            estrategia = datos.get('estrategia', ESTRATEGIA_POR_DEFECTO)
+            if estrategia not in ESTRATEGIAS:
+                raise ErrorPeticion(f"Estrategia desconocida '{estrategia}', las disponibles son: {', '.join(ESTRATEGIAS)}")
+            # La versión de los parches va en los argumentos, así una petición nunca se junta con una calculada con otros pesos
+            argumentos = (self.version_parches, _validar_numero(datos, 'lat_origen'), _validar_numero(datos, 'lon_origen'),
+                          _validar_numero(datos, 'lat_destino'), _validar_numero(datos, 'lon_destino'), estrategia)
+            return await self._calcular((ruta, argumentos), _tarea_ruta, *argumentos)
+        if ruta == '/matriz':
+            origenes = _validar_puntos(datos.get('origenes'), 'origenes')
+            destinos = _validar_puntos(datos.get('destinos'), 'destinos')
+            if len(origenes) * len(destinos) > MAXIMO_PUNTOS * 10:
+                raise ErrorPeticion('La matriz pedida es demasiado grande', 413)
+            llave = (ruta, self.version_parches, json.dumps([origenes, destinos]))
+            return await self._calcular(llave, _tarea_matriz, self.version_parches, origenes, destinos)
+        if ruta == '/isocrona':
+            argumentos = (self.version_parches, _validar_numero(datos, 'lat'), _validar_numero(datos, 'lon'),
+                          *_validar_isocrona(datos))
+            return await self._calcular((ruta, argumentos), _tarea_isocrona, *argumentos)
+        if ruta == '/alternativas':
+            argumentos = (self.version_parches, _validar_numero(datos, 'lat_origen'), _validar_numero(datos, 'lon_origen'),
+                          _validar_numero(datos, 'lat_destino'), _validar_numero(datos, 'lon_destino'), *_validar_alternativas(datos))
+            return await self._calcular((ruta, argumentos), _tarea_alternativas, *argumentos)
+        puntos = _validar_puntos(datos.get('puntos'), 'puntos')
+        return await self._calcular((ruta, json.dumps(puntos)), _tarea_ajustar, puntos)
+
+    # Aplica un lote de parches en el proceso principal (si alguno está mal no se aplica nada) y lo publica para los trabajadores
+    def _aplicar_parches(self, especificaciones):
+        if not isinstance(especificaciones, list) or not especificaciones:
+            raise ErrorPeticion("'parches' debe ser una lista no vacía de parches")
+        if len(especificaciones) > MAXIMO_PARCHES:
+            raise ErrorPeticion(f"'parches' tiene más de {MAXIMO_PARCHES} parches", 413)
+        try:
+            resumen = self.actualizador.aplicar(especificaciones)
+        except (KeyError, ValueError) as error:
+            raise ErrorPeticion(str(error.args[0]) if error.args else str(error)) from None
+        # Los trabajadores reciben los parches con el identificador que les asignó el proceso principal
+        self.registro_parches.agregar([
+            dict(especificacion, id=identificador)
+            for especificacion, identificador in zip(especificaciones, resumen['identificadores'])
+        ])
+        self.version_parches += 1
+        self.contadores['parches'] += len(especificaciones)
+        resumen['version'] = self.version_parches
+        return resumen
+
+    def _salud(self):
+        lat = np.asarray(self.grafo_compilado.lat)
+        lon = np.asarray(self.grafo_compilado.lon)
+        return {
+            'estado': 'ok',
+            'numero_nodos': self.grafo_compilado.numero_nodos,
+            'numero_aristas': self.grafo_compilado.numero_aristas,
+            'caja': {'lat_min': float(np.nanmin(lat)), 'lat_max': float(np.nanmax(lat)),
+                     'lon_min': float(np.nanmin(lon)), 'lon_max': float(np.nanmax(lon))},
+            'procesos': self.procesos,
+            'version_parches': self.version_parches,
+        }
+
+    def metricas(self):
+        return {
+            'segundos_activo': time.time() - self.inicio,
+            'pendientes': self.pendientes,
+            'limite_pendientes': self.limite_pendientes,
+            'contadores': dict(self.contadores),
+            'latencias': {ruta: histograma.como_diccionario() for ruta, histograma in self.histogramas.items()},
+        }
+
+    def _registrar_latencia(self, ruta, inicio):
+        histograma = self.histogramas.get(ruta)
+        if histograma is None:
+            histograma = self.histogramas[ruta] = HistogramaLatencias()
+        histograma.registrar((time.perf_counter() - inicio) * 1000.0)
+
+    # Atiende una conexión: lee peticiones HTTP/1.1 una tras otra (mantiene la conexión abierta) hasta que el cliente la cierre
+    async def manejar_conexion(self, lector, escritor):
+        try:
+            while True:
+                linea_inicial = await lector.readline()
+                if not linea_inicial:
+                    break
+                inicio = time.perf_counter()
+                try:
+                    metodo, ruta, version = linea_inicial.decode('latin-1').split()
+                except ValueError:
+                    break
+                encabezados = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    encabezados[nombre.strip().lower()] = valor.strip()
+                mantener_abierta = encabezados.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                ruta = ruta.split('?', 1)[0]
+
+                self.contadores['peticiones'] += 1
+                try:
+                    try:
+                        tamano_cuerpo = int(encabezados.get('content-length', 0))
+                    except ValueError:
+                        tamano_cuerpo = -1
+                    if tamano_cuerpo < 0:
+                        # Sin un tamaño válido no sabemos dónde termina el cuerpo, así que la conexión ya no sirve para otra petición
+                        mantener_abierta = False
+                        raise ErrorPeticion("El encabezado 'Content-Length' debe ser un entero no negativo")
+                    if tamano_cuerpo > TAMANO_MAXIMO_CUERPO:
+                        mantener_abierta = False
+                        raise ErrorPeticion('El cuerpo de la petición es demasiado grande', 413)
+                    cuerpo = await lector.readexactly(tamano_cuerpo) if tamano_cuerpo else b''
+                    try:
+                        datos = json.loads(cuerpo) if cuerpo else None
+                    except ValueError:
+                        raise ErrorPeticion('El cuerpo no es JSON válido') from None
+                    estado, respuesta = 200, await self.atender(metodo, ruta, datos)
+                except ErrorPeticion as error:
+                    estado, respuesta = error.estado, {'error': str(error)}
+                except Exception as error:
+                    # Cualquier otro error (por ejemplo en un proceso trabajador) se contesta con 500 sin tirar la conexión
+                    self.contadores['errores'] += 1
+                    estado, respuesta = 500, {'error': str(error)}
+
+                cuerpo_respuesta = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+                encabezados_respuesta = [
+                    f'HTTP/1.1 {estado} {TEXTOS_ESTADO.get(estado, "")}',
+                    'Content-Type: application/json; charset=utf-8',
+                    f'Content-Length: {len(cuerpo_respuesta)}',
+                    'Connection: keep-alive' if mantener_abierta else 'Connection: close',
+                ]
+                if estado == 503:
+                    encabezados_respuesta.append('Retry-After: 1')
+                escritor.write(('\r\n'.join(encabezados_respuesta) + '\r\n\r\n').encode('latin-1') + cuerpo_respuesta)
+                await escritor.drain()
+                self._registrar_latencia(ruta, inicio)
+                if not mantener_abierta:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+
+# Arranca el servidor y lo deja corriendo hasta que se interrumpa
+async def servir(servidor_rutas, anfitrion='127.0.0.1', puerto=8080):
+    servidor_rutas.iniciar_trabajadores()
+    servidor = await asyncio.start_server(servidor_rutas.manejar_conexion, anfitrion, puerto, backlog=1024)
+    print(f"Servidor de rutas escuchando en http://{anfitrion}:{puerto} con {servidor_rutas.procesos} procesos trabajadores")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servidor_rutas.cerrar()
+
+
+if __name__ == "__main__":
+    analizador = argparse.ArgumentParser(description='Servidor HTTP/JSON de rutas con el grafo caliente en memoria')
+    analizador.add_argument('--instantanea', help='carpeta de una instantánea del grafo (por defecto la del script principal)')
+    analizador.add_argument('--anfitrion', default='127.0.0.1')
+    analizador.add_argument('--puerto', type=int, default=8080)
+    analizador.add_argument('--procesos', type=int, default=None, help='procesos trabajadores (por defecto uno por procesador)')
+    analizador.add_argument('--limite-pendientes', type=int, default=LIMITE_PENDIENTES_POR_DEFECTO)
+    analizador.add_argument('--cache-mb', type=float, default=PRESUPUESTO_POR_DEFECTO_BYTES / (1024 * 1024),
+                            help='memoria de la caché de rutas de cada trabajador en MB (0 para no usar caché)')
+    argumentos = analizador.parse_args()
+
+    directorio = argumentos.instantanea
+    if directorio is None:
+        directorio = cargar_script_principal().cargar_grafo_enrutamiento().directorio_instantanea
+    try:
+        asyncio.run(servir(ServidorRutas(directorio, argumentos.procesos, argumentos.limite_pendientes,
+                                         int(argumentos.cache_mb * 1024 * 1024)),
+                           argumentos.anfitrion, argumentos.puerto))
+    except KeyboardInterrupt:
+        print("Servidor detenido")